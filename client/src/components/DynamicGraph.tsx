@@ -6,6 +6,8 @@ import { TimeInput } from './TimeInput.tsx';
 import { useFetchHistoricalIPData } from '../hooks/useFetchHistoricalIPData.ts';
 import { dateFormatConversion } from '../utils/dateFormatConversion.ts';
 import LoadingSpinner from './LoadingSpinner.tsx';
+import DownloadButton from './DownloadButton.tsx';
+import { downloadHistoryExport } from '../utils/downloadFormats.ts';
 import '../styles/DynamicGraph.css';
 
 interface DynamicGraphProps {
@@ -127,6 +129,13 @@ export default function DynamicGraph({
     onMeasurementChange(event.target.value as Measurement);
   };
 
+  // The whole history of the chosen period is exported by the server and saved while it is received,
+  // so long periods are not loaded into the page like the data of the chart
+  const handleHistoryExport = () => {
+    const { startDate, endDate } = getTimeRange();
+    downloadHistoryExport(servers, dateFormatConversion(startDate), dateFormatConversion(endDate), 'parquet');
+  };
+
   // Show loading state while fetching data (only if showTimeInput is true)
   if (showTimeInput && apiHistoricalLoading) {
     return (
@@ -220,6 +229,12 @@ export default function DynamicGraph({
           legendDisplay={legendDisplay}
         />
       </div>
+
+      {showTimeInput && servers.length > 0 && (
+        <div className="history-export">
+          <DownloadButton name="Download Parquet" onclick={handleHistoryExport} />
+        </div>
+      )}
     </div>
   );
 }
\ No newline at end of file
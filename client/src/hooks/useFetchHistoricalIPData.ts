@@ -10,6 +10,8 @@ import { transformJSONDataToNTPData } from "../utils/transformJSONDataToNTPData.
  * startDate the start time from when the measurements were taken
  * endDate the end time until when the measurements were taken
  * The dates should be provided in ISO 8601 format
+ * The endpoint returns the measurements in pages, so the next pages are requested with the
+ * returned next_cursor until there are no more
  * Each data point received is transformed to an NTPData data point
  * @param endpoint the link to the endpoint that will provide the data: under the form
  * @returns the data, loading and error status, and a function to call the GET
@@ -24,9 +26,16 @@ export const useFetchHistoricalIPData = () => {
         setLoading(true)
         setError(null)
         try {
-            const resp = await axios.get(endpoint);
+            let resp = await axios.get(endpoint);
             // console.log(`API call successful, received ${resp.data?.measurements?.length || 0} measurements`);
-            const measurements = resp.data?.measurements || []
+            let measurements = resp.data?.measurements || []
+            while (resp.data?.next_cursor) {
+                // the history endpoint is rate limited per client
+                await new Promise(resolve => setTimeout(resolve, 1000))
+                const separator = endpoint.includes("?") ? "&" : "?"
+                resp = await axios.get(`${endpoint}${separator}cursor=${encodeURIComponent(resp.data.next_cursor)}`)
+                measurements = measurements.concat(resp.data?.measurements || [])
+            }
             const transformedData = measurements.map((d: any) => transformJSONDataToNTPData(d))
             setData(transformedData)
             return transformedData
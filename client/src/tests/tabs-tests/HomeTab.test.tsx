@@ -28,7 +28,8 @@ vi.mock('../../hooks/useTriggerRipeMeasurement.ts', () => ({
 
 vi.mock('../../utils/downloadFormats.ts', () => ({
   downloadJSON: vi.fn(),
-  downloadCSV: vi.fn()
+  downloadCSV: vi.fn(),
+  downloadHistoryExport: vi.fn()
 }))
 
 vi.mock('../../components/WorldMap.tsx', () => ({
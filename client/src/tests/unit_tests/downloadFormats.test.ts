@@ -1,5 +1,5 @@
 import { describe, test, expect, vi, beforeEach, afterEach } from 'vitest'
-import { downloadJSON, downloadCSV } from '../../utils/downloadFormats'
+import { downloadJSON, downloadCSV, downloadHistoryExport } from '../../utils/downloadFormats'
 import type { NTPData, RIPEData } from '../../utils/types'
 
 describe('Test Download Formats', () => {
@@ -83,4 +83,15 @@ describe('Test Download Formats', () => {
     expect(mockClick).toHaveBeenCalled()
     expect(mockRevokeObjectURL).toHaveBeenCalled()
   })
-})
\ No newline at end of file
+
+  test('Test Download history export', () => {
+    const link = { href: '', download: '', click: mockClick }
+    vi.mocked(document.createElement).mockReturnValueOnce(link as unknown as HTMLElement)
+
+    downloadHistoryExport(['time.example.net', '203.0.113.10'], '2025-06-01T00:00:00Z', '2025-06-08T00:00:00Z')
+    expect(link.href).toContain('/measurements/history/export/?server=time.example.net&server=203.0.113.10'
+      + '&start=2025-06-01T00%3A00%3A00Z&end=2025-06-08T00%3A00%3A00Z&format=parquet')
+    expect(link.download).toBe('measurements.parquet')
+    expect(mockClick).toHaveBeenCalled()
+  })
+})
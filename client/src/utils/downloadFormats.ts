@@ -55,3 +55,29 @@ export function downloadCSV(data : InputData) {
   window.URL.revokeObjectURL(downloadLink.href)
 
 }
+
+/**
+ * Downloads the whole history of one or more servers in a time range, exported by the server
+ * as an Apache Arrow stream or a Parquet file. The browser saves the file while it is received,
+ * so large histories are not loaded and re-serialized in the page.
+ * @param servers the IP addresses or domain names of the servers
+ * @param startDate the start of the time range, in ISO 8601 format
+ * @param endDate the end of the time range, in ISO 8601 format
+ * @param format 'arrow' or 'parquet'
+ * @param columns the columns to export, or all of them if it is not given
+ */
+export function downloadHistoryExport(servers: string[], startDate: string, endDate: string,
+                                      format: 'arrow' | 'parquet' = 'parquet', columns?: string[]) {
+  const params = new URLSearchParams()
+  servers.forEach((server) => params.append('server', server))
+  params.append('start', startDate)
+  params.append('end', endDate)
+  params.append('format', format)
+  if (columns && columns.length > 0) {
+    params.append('columns', columns.join(','))
+  }
+  const downloadLink = document.createElement('a');
+  downloadLink.href = `${import.meta.env.VITE_SERVER_HOST_ADDRESS}/measurements/history/export/?${params.toString()}`
+  downloadLink.download = `measurements.${format}`
+  downloadLink.click()
+}
@@ -30,6 +30,9 @@ cron
 # Ensure we can import `server` as a top-level package
 export PYTHONPATH=/app
 
+echo "Migrating the measurements to the partitioned table if needed..."
+python3 server/scripts/migrate_to_partitioned_measurements.py
+
 echo "Creating tables if not exist..."
 python3 server/scripts/create_tables.py
 
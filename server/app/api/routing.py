@@ -1,32 +1,46 @@
-from fastapi import HTTPException, APIRouter, Request, Depends
-from fastapi.responses import HTMLResponse
+import asyncio
+import itertools
+
+from fastapi import HTTPException, APIRouter, Request, Depends, Query
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Optional, Union
 from fastapi.responses import JSONResponse
 
 from sqlalchemy.orm import Session
 from starlette.responses import HTMLResponse
 
-from server.app.utils.load_config_data import get_rate_limit_per_client_ip
+from server.app.utils.load_config_data import get_rate_limit_per_client_ip, get_max_mind_enrichment_debug_headers, \
+    get_monitoring_stats_endpoint
+from server.app.utils.enrichment_context import EnrichmentContext
 from server.app.dtos.RipeMeasurementResponse import RipeResult
-from server.app.dtos.NtpMeasurementResponse import MeasurementResponse
+from server.app.dtos.NtpMeasurementResponse import MeasurementResponse, MeasurementBucketsResponse
 from server.app.dtos.RipeMeasurementTriggerResponse import RipeMeasurementTriggerResponse
-from server.app.utils.location_resolver import get_country_for_ip, get_coordinates_for_ip
+from server.app.utils.location_resolver import lookup_ip
 from server.app.utils.ip_utils import client_ip_fetch, get_server_ip_if_possible, get_server_ip
 from server.app.models.CustomError import DNSError, MeasurementQueryError
 from server.app.utils.ip_utils import ip_to_str
 from server.app.models.CustomError import InputError, RipeMeasurementError
-from server.app.db_config import get_db
+from server.app.db_config import get_db, get_session_maker
 
 from server.app.services.api_services import fetch_ripe_data, override_desired_ip_type_if_input_is_ip
 from server.app.services.api_services import perform_ripe_measurement
 from server.app.rate_limiter import limiter
 from server.app.dtos.MeasurementRequest import MeasurementRequest
-from server.app.services.api_services import get_format, measure, fetch_historic_data_with_timestamps
+from server.app.services.api_services import get_format, measure, fetch_historic_data_json, \
+    stream_historic_data_chunks, fetch_downsampled_history, get_server_stats
+from server.app.services.export_services import EXPORT_MEDIA_TYPES, parse_export_columns, stream_history_export
 
 router = APIRouter()
 
+# the formats of the history endpoint and their media types
+HISTORY_MEDIA_TYPES = {
+    "json": "application/json",
+    "json-stream": "application/json",
+    "ndjson": "application/x-ndjson"
+}
+
 
 @router.get("/", response_class=HTMLResponse)
 def read_root() -> str:
@@ -84,6 +98,8 @@ async def read_data_measurement(payload: MeasurementRequest, request: Request,
             A Pydantic model containing:
                 - server (str): IP address (IPv4/IPv6) or domain name of the NTP server.
                 - ipv6_measurement (bool): True if the type of IPs that we want to measure is IPv6. False otherwise.
+                - samples (int): How many NTP requests to send to every server (1 to 8). With more than one,
+                  the sample with the minimum delay is kept, and the jitter is calculated from the burst.
         request (Request): The Request object that gives you the IP of the client.
         session (Session): The currently active database session.
 
@@ -118,7 +134,7 @@ async def read_data_measurement(payload: MeasurementRequest, request: Request,
     # get the client IP (the same type as wanted_ip_type)
     client_ip: Optional[str] = client_ip_fetch(request=request, wanted_ip_type=wanted_ip_type)
     try:
-        response = measure(server, wanted_ip_type, session, client_ip)
+        response = await measure(server, wanted_ip_type, session, client_ip, samples=payload.samples)
         if response is not None:
             new_format = []
             for r in response:
@@ -143,6 +159,65 @@ async def read_data_measurement(payload: MeasurementRequest, request: Request,
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}.")
 
 
+def check_time_range(start: datetime, end: datetime) -> None:
+    """
+    Checks the time range of a history request.
+
+    Args:
+        start (datetime): Start timestamp for data filtering.
+        end (datetime): End timestamp for data filtering.
+
+    Raises:
+        HTTPException: 400 - If "start" is not earlier than "end", or "end" is in the future.
+    """
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'start' must be earlier than 'end'")
+
+    if end > datetime.now(timezone.utc):
+        raise HTTPException(status_code=400, detail="'end' cannot be in the future")
+
+
+def enrichment_headers(context: EnrichmentContext) -> Optional[dict[str, str]]:
+    """
+    Returns the debug headers with the hits and misses of the lookup memo of a response,
+    if they are enabled in the config ("enrichment_debug_headers").
+
+    Args:
+        context (EnrichmentContext): The lookups of the response.
+
+    Returns:
+        Optional[dict[str, str]]: The headers, or None if they are disabled.
+    """
+    return context.debug_headers() if get_max_mind_enrichment_debug_headers() else None
+
+
+def check_history_parameters(server: str, start: datetime, end: datetime, response_format: str,
+                             resolution: Optional[int]) -> None:
+    """
+    Checks the parameters of the history endpoint that do not need the database.
+
+    Args:
+        server (str): IP address or domain name of the NTP server.
+        start (datetime): Start timestamp for data filtering.
+        end (datetime): End timestamp for data filtering.
+        response_format (str): The format of the response.
+        resolution (Optional[int]): The number of points of the chart, if the history is downsampled.
+
+    Raises:
+        HTTPException: 400 - If one of the parameters is invalid.
+    """
+    if len(server) == 0:
+        raise HTTPException(status_code=400, detail="Either 'ip' or 'domain name' must be provided")
+
+    check_time_range(start, end)
+
+    if response_format not in HISTORY_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"'format' must be one of {list(HISTORY_MEDIA_TYPES)}")
+
+    if resolution is not None and response_format != "json":
+        raise HTTPException(status_code=400, detail="'resolution' can only be used with the 'json' format")
+
+
 @router.get(
     "/measurements/history/",
     summary="Retrieve historic NTP measurements",
@@ -152,9 +227,20 @@ Fetch historic NTP measurement data for a given server over a specified time ran
 - Accepts a server IP or domain name.
 - Filters data between `start` and `end` timestamps (UTC).
 - Rejects queries with invalid or future timestamps.
+- `format=json` (the default) returns one JSON document. `format=json-stream` returns the same document,
+  but streamed while it is read from the database, and `format=ndjson` streams one measurement per line.
+- The `json` format is paginated: at most `limit` measurements (capped by the server) are returned, the oldest first.
+  Pass the returned `next_cursor` as `cursor` to get the next page. It is null on the last page.
+- `resolution` sizes the response to a chart of that many points (`json` format only). With `downsample=bucket`
+  (the default) the measurements are aggregated per time bucket in the database (count, and min, max, mean,
+  median and 95th percentile of the offset and RTT). With `downsample=lttb` the measurements that keep the shape
+  of the `metric` (`offset` or `rtt`) are returned.
+- The location of every distinct server IP is looked up once per response. If `enrichment_debug_headers` is enabled
+  in the config, the non-streamed responses report how many lookups were saved in the `X-Enrichment-Memo-Hits`
+  and `X-Enrichment-Memo-Misses` headers.
 - Limited to 5 requests per second.
 """,
-    response_model=MeasurementResponse,
+    response_model=Union[MeasurementResponse, MeasurementBucketsResponse],
     responses={
         200: {"description": "Successful retrieval of historic measurements"},
         400: {"description": "Invalid parameters or malformed datetime values"},
@@ -164,49 +250,135 @@ Fetch historic NTP measurement data for a given server over a specified time ran
 @limiter.limit(get_rate_limit_per_client_ip())
 async def read_historic_data_time(server: str,
                                   start: datetime, end: datetime, request: Request,
-                                  session: Session = Depends(get_db)) -> JSONResponse:
+                                  response_format: str = Query("json", alias="format"),
+                                  limit: Optional[int] = None, cursor: Optional[str] = None,
+                                  resolution: Optional[int] = None, downsample: str = "bucket",
+                                  metric: str = "offset",
+                                  session: Session = Depends(get_db)) -> Response:
     """
     Retrieve historic NTP measurements for a given server and optional time range.
 
     This endpoint fetches past measurement data for the specified server using the
-    `fetch_historic_data_with_timestamps()` function. It can optionally filter results
-    based on a time range (start and end datetime).
+    `fetch_historic_data_json()` function, which serializes the rows of the database directly.
+    It can optionally filter results based on a time range (start and end datetime).
 
     Args:
         server (str): IP address or domain name of the NTP server.
         start (datetime, optional): Start timestamp for data filtering.
         end (datetime, optional): End timestamp for data filtering.
         request (Request): Request object for making the limiter work.
+        response_format (str): "json", "json-stream" or "ndjson". The streaming formats read the rows
+            from the database in batches and send them while they are read, so the memory use stays flat.
+        limit (Optional[int]): The size of the page of the "json" format. It is capped by the server.
+        cursor (Optional[str]): The "next_cursor" of the previous page, or None for the first page.
+        resolution (Optional[int]): The number of points of the chart. If it is set, the history is downsampled
+            to at most this many points, and it is not paginated.
+        downsample (str): How to downsample: "bucket" (aggregates per time bucket) or "lttb".
+        metric (str): The value whose shape is kept by "lttb": "offset" or "rtt".
         session (Session): The currently active database session.
 
     Returns:
-        JSONResponse: A json response containing a list of formatted measurements under "measurements".
+        Response: A json response containing a list of formatted measurements
+        under "measurements" and the cursor of the next page under "next_cursor", the buckets under "buckets",
+        or the streamed measurements.
 
     Raises:
-        HTTPException: 400 - If `server` parameter is empty, or the start and end dates are badly formatted (e.g., `start >= end`, `end` in future).
+        HTTPException: 400 - If `server` parameter is empty, the format, limit, cursor or downsampling is invalid, or the start and end dates are badly formatted (e.g., `start >= end`, `end` in future).
         HTTPException: 500 - If there's an internal server error, such as a database access issue (`MeasurementQueryError`) or any other unexpected server-side exception.
 
     Notes:
         - This endpoint is also limited to <`see config file`> to prevent abuse and reduce server load.
     """
-    if len(server) == 0:
-        raise HTTPException(status_code=400, detail="Either 'ip' or 'domain name' must be provided")
+    check_history_parameters(server, start, end, response_format, resolution)
 
-    if start >= end:
-        raise HTTPException(status_code=400, detail="'start' must be earlier than 'end'")
+    context = EnrichmentContext()
+    try:
+        if resolution is not None:
+            content = fetch_downsampled_history(server, start, end, session, resolution, downsample, metric, context)
+            return JSONResponse(status_code=200, content=content, headers=enrichment_headers(context))
+        if response_format != "json":
+            chunks = stream_historic_data_chunks(server, start, end, get_session_maker(),
+                                                 ndjson=response_format == "ndjson")
+            # read the first chunk now, so a database error is still reported with a 500
+            first_chunk = await asyncio.to_thread(next, chunks, b"")
+            return StreamingResponse(itertools.chain([first_chunk], chunks),
+                                     media_type=HISTORY_MEDIA_TYPES[response_format])
+        document = fetch_historic_data_json(server, start, end, session, limit, cursor, context)
+        return Response(status_code=200, content=document, media_type=HISTORY_MEDIA_TYPES["json"],
+                        headers=enrichment_headers(context))
+    except InputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except MeasurementQueryError as e:
+        raise HTTPException(status_code=500, detail=f"There was an error with accessing the database: {str(e)}.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Sever error: {str(e)}.")
 
-    if end > datetime.now(timezone.utc):
-        raise HTTPException(status_code=400, detail="'end' cannot be in the future")
+
+@router.get(
+    "/measurements/history/export/",
+    summary="Export historic NTP measurements as Apache Arrow or Parquet",
+    description="""
+Export the historic NTP measurements of one or more servers over a time range, for offline analysis.
+
+- `server` can be repeated. Each one is a server IP or domain name.
+- Filters data between `start` and `end` timestamps (UTC). The rows are ordered by `client_sent`.
+- `format=arrow` (the default) returns an Apache Arrow IPC stream and `format=parquet` returns a Parquet file.
+  Both are compressed with zstd, and are streamed while the rows are read from the database.
+- `columns` is a comma-separated list of the columns to export (all of them by default).
+- The NTP timestamps (`client_sent`, `server_recv`, `server_sent`, `client_recv`, `ntp_last_sync_time`,
+  `root_delay` and `root_dispersion`) are unsigned 64-bit NTP fixed-point numbers (seconds << 32 | fraction),
+  and the IP addresses are their packed 4 or 16 bytes.
+- Limited to 5 requests per second.
+""",
+    response_class=StreamingResponse,
+    responses={
+        200: {"description": "The exported measurements",
+              "content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()}},
+        400: {"description": "Invalid parameters or malformed datetime values"},
+        500: {"description": "Server error or database access issue"}
+    }
+)
+@limiter.limit(get_rate_limit_per_client_ip())
+async def export_historic_data(start: datetime, end: datetime, request: Request,
+                               server: list[str] = Query(...),
+                               export_format: str = Query("arrow", alias="format"),
+                               columns: Optional[str] = None) -> StreamingResponse:
+    """
+    Export the historic NTP measurements of one or more servers as an Apache Arrow IPC stream or a Parquet file.
+    The file is built from the batches of the database cursor while it is sent.
+
+    Args:
+        start (datetime): Start timestamp for data filtering.
+        end (datetime): End timestamp for data filtering.
+        request (Request): Request object for making the limiter work.
+        server (list[str]): The IP addresses or domain names of the NTP servers.
+        export_format (str): "arrow" or "parquet".
+        columns (Optional[str]): The comma-separated names of the columns to export, or None for all of them.
+
+    Returns:
+        StreamingResponse: The exported file.
+
+    Raises:
+        HTTPException: 400 - If no server is given, the format or the columns are invalid, or the start and end dates are badly formatted (e.g., `start >= end`, `end` in future).
+        HTTPException: 500 - If there's an internal server error, such as a database access issue (`MeasurementQueryError`) or any other unexpected server-side exception.
+    """
+    if len(server) == 0 or any(len(s) == 0 for s in server):
+        raise HTTPException(status_code=400, detail="Either 'ip' or 'domain name' must be provided")
+    check_time_range(start, end)
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"'format' must be one of {list(EXPORT_MEDIA_TYPES)}")
 
     try:
-        result = fetch_historic_data_with_timestamps(server, start, end, session)
-        formatted_results = [get_format(entry, nr_jitter_measurements=0) for entry in result]
-        return JSONResponse(
-            status_code=200,
-            content={
-                "measurements": formatted_results
-            }
+        export_columns = parse_export_columns(columns)
+        chunks = stream_history_export(server, start, end, get_session_maker(), export_columns, export_format)
+        # read the first chunk now, so a database error is still reported with a 500
+        first_chunk = await asyncio.to_thread(next, chunks, b"")
+        return StreamingResponse(
+            itertools.chain([first_chunk], chunks), media_type=EXPORT_MEDIA_TYPES[export_format],
+            headers={"Content-Disposition": f'attachment; filename="measurements.{export_format}"'}
         )
+    except InputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except MeasurementQueryError as e:
         raise HTTPException(status_code=500, detail=f"There was an error with accessing the database: {str(e)}.")
     except Exception as e:
@@ -275,14 +447,15 @@ async def trigger_ripe_measurement(payload: MeasurementRequest, request: Request
     try:
         measurement_id = perform_ripe_measurement(server, client_ip=client_ip, wanted_ip_type=wanted_ip_type)
         this_server_ip = get_server_ip_if_possible(wanted_ip_type)  # this does not affect the measurement
+        vantage_point_geo = lookup_ip(ip_to_str(this_server_ip))
         return JSONResponse(
             status_code=200,
             content={
                 "measurement_id": measurement_id,
                 "vantage_point_ip": ip_to_str(this_server_ip),
                 "vantage_point_location": {
-                    "country_code": get_country_for_ip(ip_to_str(this_server_ip)),
-                    "coordinates": get_coordinates_for_ip(ip_to_str(this_server_ip))
+                    "country_code": vantage_point_geo.country_code,
+                    "coordinates": vantage_point_geo.coordinates
                 },
                 "status": "started",
                 "message": "You can fetch the result at /measurements/ripe/{measurement_id}",
@@ -418,3 +591,41 @@ async def get_ripe_measurement_result(measurement_id: str, request: Request) ->
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=f"Sever error: {str(e)}.")
+
+
+@router.get(
+    "/stats/",
+    summary="Runtime statistics of the server",
+    description="""
+Returns the runtime statistics of the worker process that answers the request.
+
+- `geo_cache`: the size, hits, misses and evictions of the geolocation cache.
+- `probe_cache`: the same counters for the cache of the metadata of the RIPE Atlas probes.
+- `measurement_writer`: the queue size and the counters of the background writer of the measurements.
+- `ripe_http`: the latency histogram of every endpoint of RIPE Atlas and stat.ripe.net that was called.
+- Only available if "stats_endpoint" is enabled in the config.
+- Limited to 5 requests per second.
+""",
+    responses={
+        200: {"description": "The statistics of the worker"},
+        404: {"description": "The endpoint is disabled in the config"}
+    }
+)
+@limiter.limit(get_rate_limit_per_client_ip())
+async def read_server_stats(request: Request) -> JSONResponse:
+    """
+    Returns the statistics of the caches, of the measurement writer and of the requests to RIPE Atlas
+    of the worker process that answers. Every worker has its own counters.
+
+    Args:
+        request (Request): Request object for making the limiter work.
+
+    Returns:
+        JSONResponse: The statistics (see `get_server_stats`).
+
+    Raises:
+        HTTPException: 404 - If the endpoint is disabled in the config ("stats_endpoint").
+    """
+    if not get_monitoring_stats_endpoint():
+        raise HTTPException(status_code=404, detail="Not Found")
+    return JSONResponse(content=get_server_stats())
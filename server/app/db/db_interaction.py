@@ -1,36 +1,38 @@
+from functools import lru_cache
 from ipaddress import IPv4Address, IPv6Address, ip_address
 
-from sqlalchemy import Row
+from sqlalchemy import ColumnElement, Label, Row, case, func, insert, or_, select, tuple_
 from sqlalchemy.orm import Session
 
 from server.app.utils.validate import sanitize_string
 from server.app.dtos.ProbeData import ServerLocation
-from server.app.utils.location_resolver import get_country_for_ip, get_coordinates_for_ip
+from server.app.utils.location_resolver import lookup_ip
+from server.app.utils.enrichment_context import EnrichmentContext
 from server.app.dtos.NtpExtraDetails import NtpExtraDetails
 from server.app.dtos.NtpMainDetails import NtpMainDetails
 from server.app.dtos.NtpServerInfo import NtpServerInfo
 from server.app.dtos.NtpTimestamps import NtpTimestamps
 from server.app.utils.ip_utils import ip_to_str
 from server.app.models.Measurement import Measurement
-from server.app.models.Time import Time
+from server.app.models.MeasurementRollup import RollupQueue
+from server.app.db.partitions import create_measurement_partitions, forget_measurement_partitions
 from server.app.dtos.PreciseTime import PreciseTime
 from server.app.dtos.NtpMeasurement import NtpMeasurement
 from server.app.models.CustomError import InvalidMeasurementDataError
 from server.app.models.CustomError import DatabaseInsertError
 from server.app.models.CustomError import MeasurementQueryError
-from typing import Any
+from typing import Any, Iterator, Optional, Sequence
 
 
-def row_to_dict(m: Measurement, t: Time) -> dict[str, Any]:
+def row_to_dict(m: Measurement) -> dict[str, Any]:
     """
-    Converts a Measurement and Time SQLAlchemy row into a dictionary.
+    Converts a Measurement SQLAlchemy row into a dictionary.
 
     Args:
-        m (Measurement): The measurement row containing NTP measurement data.
-        t (Time): The time row containing timestamp data for the measurement.
+        m (Measurement): The measurement row containing NTP measurement data and its timestamps.
 
     Returns:
-        dict[str, Any]: A dictionary representation of the combined measurement and timestamp data.
+        dict[str, Any]: A dictionary representation of the measurement and timestamp data.
     """
     return {
         "id": m.id,
@@ -52,36 +54,38 @@ def row_to_dict(m: Measurement, t: Time) -> dict[str, Any]:
         "root_dispersion_prec": m.root_dispersion_prec,
         "ntp_last_sync_time": m.ntp_last_sync_time,
         "ntp_last_sync_time_prec": m.ntp_last_sync_time_prec,
-        "client_sent": t.client_sent,
-        "client_sent_prec": t.client_sent_prec,
-        "server_recv": t.server_recv,
-        "server_recv_prec": t.server_recv_prec,
-        "server_sent": t.server_sent,
-        "server_sent_prec": t.server_sent_prec,
-        "client_recv": t.client_recv,
-        "client_recv_prec": t.client_recv_prec
+        "client_sent": m.client_sent,
+        "client_sent_prec": m.client_sent_prec,
+        "server_recv": m.server_recv,
+        "server_recv_prec": m.server_recv_prec,
+        "server_sent": m.server_sent,
+        "server_sent_prec": m.server_sent_prec,
+        "client_recv": m.client_recv,
+        "client_recv_prec": m.client_recv_prec
     }
 
 
-def rows_to_dicts(rows: list[Row[tuple[Measurement, Time]]]) -> list[dict[str, Any]]:
+def rows_to_dicts(rows: list[Measurement]) -> list[dict[str, Any]]:
     """
-    Converts a list of Measurement-Time row tuples into a list of dictionaries.
+    Converts a list of Measurement rows into a list of dictionaries.
 
     Args:
-        rows (list[Row[tuple[Measurement, Time]]]): List of database rows containing Measurement and Time.
+        rows (list[Measurement]): List of database rows.
 
     Returns:
-        list[dict[str, Any]]: A list of dictionaries where each dictionary contains combined data from Measurement and Time.
+        list[dict[str, Any]]: A list of dictionaries where each dictionary contains the data of one measurement.
     """
-    return [row_to_dict(row.Measurement, row.Time) for row in rows]
+    return [row_to_dict(row) for row in rows]
 
 
-def dict_to_measurement(entry: dict[str, Any]) -> NtpMeasurement:
+def dict_to_measurement(entry: dict[str, Any], context: Optional[EnrichmentContext] = None) -> NtpMeasurement:
     """
     Converts a dictionary representation of a measurement into an NtpMeasurement object.
 
     Args:
         entry (dict[str, Any]): A dictionary containing the keys needed to construct an NtpMeasurement object.
+        context (Optional[EnrichmentContext]): The lookups of the current response, so the location of every
+            distinct server IP is looked up only once. None looks it up for every measurement.
 
     Returns:
         NtpMeasurement: A fully constructed NtpMeasurement using the provided data.
@@ -107,11 +111,10 @@ def dict_to_measurement(entry: dict[str, Any]) -> NtpMeasurement:
         vantage_point_ip = ip_address(entry['vantage_point_ip']) if entry['vantage_point_ip'] else None
         ntp_ref_parent_ip = ip_address(entry['ntp_server_ref_parent_ip']) if entry['ntp_server_ref_parent_ip'] else None
         ntp_server_ip = ip_address(entry['ntp_server_ip'])
-        ntp_server_country_code = get_country_for_ip(entry['ntp_server_ip'])
-        ntp_server_coordinates = get_coordinates_for_ip(entry['ntp_server_ip'])
+        geo = lookup_ip(entry['ntp_server_ip']) if context is None else context.lookup_ip(entry['ntp_server_ip'])
         server_info = NtpServerInfo(ntp_version=entry['ntp_version'], ntp_server_ip=ntp_server_ip,
                                     ntp_server_name=entry['ntp_server_name'],
-                                    ntp_server_location=ServerLocation(ntp_server_country_code, ntp_server_coordinates),
+                                    ntp_server_location=ServerLocation(geo.country_code, geo.coordinates),
                                     ntp_server_ref_parent_ip=ntp_ref_parent_ip, ref_name=entry['ref_name'])
         extra_details = NtpExtraDetails(PreciseTime(entry['root_delay'], entry['root_delay_prec']),
                                         entry['poll'],
@@ -130,17 +133,116 @@ def dict_to_measurement(entry: dict[str, Any]) -> NtpMeasurement:
         raise InvalidMeasurementDataError(f"Failed to build NtpMeasurement: {e}")
 
 
-def rows_to_measurements(rows: list[Row[tuple[Measurement, Time]]]) -> list[NtpMeasurement]:
+@lru_cache(maxsize=4096)
+def parse_stored_ip(ip: Any) -> IPv4Address | IPv6Address:
     """
-    Converts a list of Measurement-Time row tuples into NtpMeasurement objects.
+    Parses an IP address read from the database. The result is cached, because the rows of a history
+    contain the same few addresses many times, and the address objects are immutable.
 
     Args:
-        rows (list[Row[tuple[Measurement, Time]]]): List of database rows containing Measurement and Time data.
+        ip (Any): The IP address, as a string or as an address object (depending on the database driver).
+
+    Returns:
+        IPv4Address | IPv6Address: The IP address.
+
+    Raises:
+        ValueError: If it is not a valid IP address.
+    """
+    return ip_address(ip)
+
+
+def row_to_measurement(m: Measurement, context: Optional[EnrichmentContext] = None) -> NtpMeasurement:
+    """
+    Converts a Measurement row directly into an NtpMeasurement object.
+    The rows of our own database were validated before they were inserted, so unlike `dict_to_measurement`
+    it skips the intermediate dictionary and builds the DTOs with their `trusted` constructors.
+
+    Args:
+        m (Measurement): The measurement row.
+        context (Optional[EnrichmentContext]): The lookups of the current response (see `dict_to_measurement`).
+
+    Returns:
+        NtpMeasurement: The measurement of the row.
+
+    Raises:
+        InvalidMeasurementDataError: If an IP address of the row is invalid.
+    """
+    try:
+        vantage_point_ip = parse_stored_ip(m.vantage_point_ip) if m.vantage_point_ip else None
+        ntp_ref_parent_ip = parse_stored_ip(m.ntp_server_ref_parent) if m.ntp_server_ref_parent else None
+        ntp_server_ip = parse_stored_ip(m.ntp_server_ip)
+    except ValueError as e:
+        raise InvalidMeasurementDataError(f"Failed to build NtpMeasurement: {e}")
+    geo = lookup_ip(m.ntp_server_ip) if context is None else context.lookup_ip(m.ntp_server_ip)
+    server_info = NtpServerInfo.trusted(m.ntp_version, ntp_server_ip,
+                                        ServerLocation.trusted(geo.country_code, geo.coordinates),
+                                        m.ntp_server_name, ntp_ref_parent_ip, m.ref_name)
+    extra_details = NtpExtraDetails.trusted(PreciseTime.trusted(m.root_delay, m.root_delay_prec), m.poll,
+                                            PreciseTime.trusted(m.root_dispersion, m.root_dispersion_prec),
+                                            PreciseTime.trusted(m.ntp_last_sync_time, m.ntp_last_sync_time_prec),
+                                            0)
+    main_details = NtpMainDetails.trusted(m.time_offset, m.rtt, m.stratum, m.precision, m.reachability)
+    time_stamps = NtpTimestamps.trusted(PreciseTime.trusted(m.client_sent, m.client_sent_prec),
+                                        PreciseTime.trusted(m.server_recv, m.server_recv_prec),
+                                        PreciseTime.trusted(m.server_sent, m.server_sent_prec),
+                                        PreciseTime.trusted(m.client_recv, m.client_recv_prec))
+    return NtpMeasurement.trusted(vantage_point_ip, server_info, time_stamps, main_details, extra_details)
+
+
+def rows_to_measurements(rows: list[Measurement],
+                         context: Optional[EnrichmentContext] = None) -> list[NtpMeasurement]:
+    """
+    Converts a list of Measurement rows into NtpMeasurement objects.
+
+    Args:
+        rows (list[Measurement]): List of database rows.
+        context (Optional[EnrichmentContext]): The lookups of the current response (see `dict_to_measurement`).
 
     Returns:
         list[NtpMeasurement]: A list of NtpMeasurement objects created from the row data.
     """
-    return [dict_to_measurement(d) for d in rows_to_dicts(rows)]
+    return [row_to_measurement(row, context) for row in rows]
+
+
+def measurement_to_row(measurement: NtpMeasurement) -> dict[str, Any]:
+    """
+    Converts an NTP measurement into the values of a row of the `measurements` table.
+    The string fields are sanitized, because some fields may have a null character at the end which should be removed.
+
+    Args:
+        measurement (NtpMeasurement): The measurement to store.
+
+    Returns:
+        dict[str, Any]: The column values of the `measurements` row.
+    """
+    return {
+        "vantage_point_ip": ip_to_str(measurement.vantage_point_ip),
+        "ntp_server_ip": ip_to_str(measurement.server_info.ntp_server_ip),
+        "ntp_server_name": sanitize_string(measurement.server_info.ntp_server_name),
+        "ntp_version": measurement.server_info.ntp_version,
+        "ntp_server_ref_parent": sanitize_string(ip_to_str(measurement.server_info.ntp_server_ref_parent_ip)),
+        "ref_name": sanitize_string(measurement.server_info.ref_name),
+        "time_offset": measurement.main_details.offset,
+        "rtt": measurement.main_details.rtt,
+        "stratum": measurement.main_details.stratum,
+        "precision": measurement.main_details.precision,
+        "reachability": sanitize_string(measurement.main_details.reachability),
+        "root_delay": measurement.extra_details.root_delay.seconds,
+        "root_delay_prec": measurement.extra_details.root_delay.fraction,
+        "poll": measurement.extra_details.poll,
+        "root_dispersion": measurement.extra_details.root_dispersion.seconds,
+        "root_dispersion_prec": measurement.extra_details.root_dispersion.fraction,
+        "ntp_last_sync_time": measurement.extra_details.ntp_last_sync_time.seconds,
+        "ntp_last_sync_time_prec": measurement.extra_details.ntp_last_sync_time.fraction,
+        "client_sent": measurement.timestamps.client_sent_time.seconds,
+        "client_sent_prec": measurement.timestamps.client_sent_time.fraction,
+        "server_recv": measurement.timestamps.server_recv_time.seconds,
+        "server_recv_prec": measurement.timestamps.server_recv_time.fraction,
+        "server_sent": measurement.timestamps.server_sent_time.seconds,
+        "server_sent_prec": measurement.timestamps.server_sent_time.fraction,
+        "client_recv": measurement.timestamps.client_recv_time.seconds,
+        "client_recv_prec": measurement.timestamps.client_recv_time.fraction
+    }
 
 
 def insert_measurement(measurement: NtpMeasurement, session: Session) -> None:
@@ -148,113 +250,230 @@ def insert_measurement(measurement: NtpMeasurement, session: Session) -> None:
     Inserts a new NTP measurement into the database. Before inserting, it sanitizes the string fields,
     because some fields may have a null character at the end which should be removed.
 
-    This function stores both the raw timestamps (in the `times` table) and the
-    processed measurement data (in the `measurements` table).
-    It wraps operations in a single transaction to ensure consistency and atomicity.
-    If any insert fails, the transaction is rolled back.
+    The measurement and its timestamps are stored in one row of the `measurements` table, and the measurement
+    is added to the queue of the rollups. If the monthly partition of this measurement does not exist yet,
+    it is created in the same transaction.
+    If the insert fails, the transaction is rolled back.
 
     Args:
         measurement (NtpMeasurement): The measurement data to store.
         session (Session): The currently active database session.
 
     Raises:
-        DatabaseInsertError: If inserting the measurement or timestamps fails.
+        DatabaseInsertError: If inserting the measurement fails.
 
     Notes:
         - Timestamps are stored with both second and fractional parts.
-        - A foreign key (`time_id`) is used to link `measurements` to the `times` table.
         - Any failure within the transaction block results in automatic rollback.
 
     """
     try:
-        time = Time(
-            client_sent=measurement.timestamps.client_sent_time.seconds,
-            client_sent_prec=measurement.timestamps.client_sent_time.fraction,
-            server_recv=measurement.timestamps.server_recv_time.seconds,
-            server_recv_prec=measurement.timestamps.server_recv_time.fraction,
-            server_sent=measurement.timestamps.server_sent_time.seconds,
-            server_sent_prec=measurement.timestamps.server_sent_time.fraction,
-            client_recv=measurement.timestamps.client_recv_time.seconds,
-            client_recv_prec=measurement.timestamps.client_recv_time.fraction
-        )
-        session.add(time)
+        create_measurement_partitions(session, [measurement.timestamps.client_sent_time.seconds])
+        row = Measurement(**measurement_to_row(measurement))
+        session.add(row)
         session.flush()
-        measurement_entry = Measurement(
-            vantage_point_ip=ip_to_str(measurement.vantage_point_ip),
-            ntp_server_ip=ip_to_str(measurement.server_info.ntp_server_ip),
-            ntp_server_name=sanitize_string(measurement.server_info.ntp_server_name),
-            ntp_version=measurement.server_info.ntp_version,
-            ntp_server_ref_parent=sanitize_string(ip_to_str(measurement.server_info.ntp_server_ref_parent_ip)),
-            ref_name=sanitize_string(measurement.server_info.ref_name),
-            time_id=time.id,
-            time_offset=measurement.main_details.offset,
-            rtt=measurement.main_details.rtt,
-            stratum=measurement.main_details.stratum,
-            precision=measurement.main_details.precision,
-            reachability=sanitize_string(measurement.main_details.reachability),
-            root_delay=measurement.extra_details.root_delay.seconds,
-            root_delay_prec=measurement.extra_details.root_delay.fraction,
-            poll=measurement.extra_details.poll,
-            root_dispersion=measurement.extra_details.root_dispersion.seconds,
-            root_dispersion_prec=measurement.extra_details.root_dispersion.fraction,
-            ntp_last_sync_time=measurement.extra_details.ntp_last_sync_time.seconds,
-            ntp_last_sync_time_prec=measurement.extra_details.ntp_last_sync_time.fraction,
-            timestamps=time
-        )
-        session.add(measurement_entry)
+        session.add(RollupQueue(measurement_id=row.id, client_sent=row.client_sent))
         session.commit()
     except Exception as e:
         session.rollback()
+        forget_measurement_partitions()
         raise DatabaseInsertError(f"Failed to insert measurement: {e}")
 
 
-def get_measurements_timestamps_ip(session: Session, ip: IPv4Address | IPv6Address | None, start: PreciseTime,
-                                   end: PreciseTime) -> list[NtpMeasurement]:
+def insert_measurements_bulk(measurements: list[NtpMeasurement], session: Session) -> None:
+    """
+    Inserts many NTP measurements into the database at once, for example all the IPs of a domain name.
+
+    Instead of one flush per measurement, all the rows are written with a single executemany INSERT
+    (batched into multi-row statements by SQLAlchemy), in one transaction: either all the measurements are stored,
+    or none of them. The string fields are sanitized in the same way as in `insert_measurement`.
+
+    Args:
+        measurements (list[NtpMeasurement]): The measurements to store.
+        session (Session): The currently active database session.
+
+    Raises:
+        DatabaseInsertError: If inserting the measurements fails.
+    """
+    insert_measurement_rows_bulk([measurement_to_row(m) for m in measurements], session)
+
+
+def insert_measurement_rows_bulk(rows: list[dict[str, Any]], session: Session) -> None:
     """
-    Fetch measurements for a specific IP address within a precise time range.
+    Inserts many already converted measurements into the database in one transaction
+    (see `insert_measurements_bulk`), and adds them to the queue of the rollups.
+    The missing monthly partitions are created first.
 
-    This function queries the `measurements` table, joined with the `times` table,
-    and filters the results by:
-    - The NTP server IP (`ntp_server_ip`)
-    - The timestamp range (`client_sent` field) between `start` and `end`
+    Args:
+        rows (list[dict[str, Any]]): The `measurements` rows, as built by `measurement_to_row`.
+        session (Session): The currently active database session.
+
+    Raises:
+        DatabaseInsertError: If inserting the measurements fails.
+    """
+    if len(rows) == 0:
+        return
+    try:
+        create_measurement_partitions(session, [row["client_sent"] for row in rows])
+        inserted = session.execute(insert(Measurement).returning(Measurement.id, Measurement.client_sent), rows)
+        # queued in the same transaction, so the rollups see the measurements exactly when they are committed
+        session.execute(insert(RollupQueue), [{"measurement_id": measurement_id, "client_sent": client_sent}
+                                              for measurement_id, client_sent in inserted])
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        forget_measurement_partitions()
+        raise DatabaseInsertError(f"Failed to insert {len(rows)} measurements: {e}")
+
+
+def aggregate_measurements_per_bucket(session: Session, condition: ColumnElement[bool], start: PreciseTime,
+                                      end: PreciseTime, bucket_s: int) -> list[dict[str, Any]]:
+    """
+    Aggregates the offset and the RTT of the measurements that match a condition per time bucket, in the database
+    (GROUP BY (client_sent - start) / bucket_s), so only one row per bucket leaves the database.
+    The buckets start at "start".
+    The percentiles are only computed by PostgreSQL (percentile_cont). They are None for other databases.
+
+    Args:
+        session (Session): The currently active database session.
+        condition (ColumnElement[bool]): Selects the measurements of the server.
+        start (PreciseTime): The start of the time range to filter on.
+        end (PreciseTime): The end of the time range to filter on.
+        bucket_s (int): The size of a bucket, in seconds.
+
+    Returns:
+        list[dict[str, Any]]: One dictionary per non-empty bucket, the oldest first, with the start of the bucket
+        (in NTP seconds) under "bucket_start", the number of measurements under "count", the min, max, mean,
+        median (p50) and 95th percentile (p95) of the offset and the RTT (e.g. "offset_min", "rtt_p95"),
+        the min and max stratum ("stratum_min", "stratum_max", they differ if the stratum changed) and the number
+        of measurements of an unsynchronized server (stratum 0 or 16) under "failures".
+    """
+    bucket = ((Measurement.client_sent - start.seconds) // bucket_s).label("bucket")
+    columns: list[Label[Any]] = [bucket, func.count().label("count")]
+    for name, column in [("offset", Measurement.time_offset), ("rtt", Measurement.rtt)]:
+        columns += [func.min(column).label(f"{name}_min"), func.max(column).label(f"{name}_max"),
+                    func.avg(column).label(f"{name}_mean")]
+        if session.get_bind().dialect.name == "postgresql":
+            columns += [func.percentile_cont(0.5).within_group(column).label(f"{name}_p50"),
+                        func.percentile_cont(0.95).within_group(column).label(f"{name}_p95")]
+    failed = case((or_(Measurement.stratum == 0, Measurement.stratum >= 16), 1), else_=0)
+    columns += [func.min(Measurement.stratum).label("stratum_min"), func.max(Measurement.stratum).label("stratum_max"),
+                func.sum(failed).label("failures")]
+    query = (
+        session.query(*columns)
+        .filter(condition, Measurement.client_sent >= start.seconds, Measurement.client_sent <= end.seconds)
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+    result = []
+    for row in query.all():
+        values = row._asdict()
+        bucket_start = start.seconds + values.pop("bucket") * bucket_s
+        result.append({"bucket_start": bucket_start, "offset_p50": None, "offset_p95": None, "rtt_p50": None,
+                       "rtt_p95": None, **values})
+    return result
+
+
+def get_measurement_buckets_ip(session: Session, ip: IPv4Address | IPv6Address | None, start: PreciseTime,
+                               end: PreciseTime, bucket_s: int) -> list[dict[str, Any]]:
+    """
+    Aggregates the measurements of a specific IP address within a precise time range per time bucket.
 
     Args:
         session (Session): The currently active database session.
         ip (IPv4Address | IPv6Address | None): The IP address of the NTP server.
         start (PreciseTime): The start of the time range to filter on.
         end (PreciseTime): The end of the time range to filter on.
+        bucket_s (int): The size of a bucket, in seconds.
 
     Returns:
-        list[dict]: A list of measurement records. Each record includes:
-            - IP, version, stratum
-            - client/server send/receive timestamps with fractional parts
-            - other measurement metadata
+        list[dict[str, Any]]: The statistics of every non-empty bucket (see `aggregate_measurements_per_bucket`).
 
     Raises:
         MeasurementQueryError: If the database query fails.
     """
     try:
-        query = (
-            session.query(Measurement, Time)
-            .join(Time, Measurement.time_id == Time.id)
-            .filter(
-                Measurement.ntp_server_ip == str(ip),
-                Time.client_sent >= start.seconds,
-                Time.client_sent <= end.seconds
-            )
-        )
-        return rows_to_measurements(query.all())
+        return aggregate_measurements_per_bucket(session, Measurement.ntp_server_ip == str(ip), start, end, bucket_s)
     except Exception as e:
-        raise MeasurementQueryError(f"Failed to fetch measurements for IP {ip}: {e}")
+        raise MeasurementQueryError(f"Failed to aggregate measurements for IP {ip}: {e}")
 
 
-def get_measurements_timestamps_dn(session: Session, dn: str, start: PreciseTime, end: PreciseTime) -> list[
-    NtpMeasurement]:
+def get_measurement_buckets_dn(session: Session, dn: str, start: PreciseTime, end: PreciseTime,
+                               bucket_s: int) -> list[dict[str, Any]]:
     """
-    Fetches measurements for a specific domain name within a precise time range.
+    Aggregates the measurements of a specific domain name within a precise time range per time bucket.
 
-    Similar to `get_measurements_timestamps_ip`, but filters by `ntp_server_name`.
-    instead of `ntp_server_ip`.
+    Args:
+        session (Session): The currently active database session.
+        dn (str): The domain name of the NTP server.
+        start (PreciseTime): The start of the time range to filter on.
+        end (PreciseTime): The end of the time range to filter on.
+        bucket_s (int): The size of a bucket, in seconds.
+
+    Returns:
+        list[dict[str, Any]]: The statistics of every non-empty bucket (see `aggregate_measurements_per_bucket`).
+
+    Raises:
+        MeasurementQueryError: If the database query fails.
+    """
+    try:
+        return aggregate_measurements_per_bucket(session, Measurement.ntp_server_name == dn, start, end, bucket_s)
+    except Exception as e:
+        raise MeasurementQueryError(f"Failed to aggregate measurements for domain name: {dn}: {e}")
+
+
+def select_measurement_points(session: Session, condition: ColumnElement[bool], start: PreciseTime,
+                              end: PreciseTime) -> list[tuple[int, int, int, float, float]]:
+    """
+    Fetches only the columns needed to draw the measurements that match a condition, the oldest first.
+    It is used to choose which measurements to show before the whole rows are fetched.
+
+    Args:
+        session (Session): The currently active database session.
+        condition (ColumnElement[bool]): Selects the measurements of the server.
+        start (PreciseTime): The start of the time range to filter on.
+        end (PreciseTime): The end of the time range to filter on.
+
+    Returns:
+        list[tuple[int, int, int, float, float]]: The id, client sent time (seconds and fraction),
+        offset and RTT of every measurement.
+    """
+    query = (
+        session.query(Measurement.id, Measurement.client_sent, Measurement.client_sent_prec,
+                      Measurement.time_offset, Measurement.rtt)
+        .filter(condition, Measurement.client_sent >= start.seconds, Measurement.client_sent <= end.seconds)
+        .order_by(Measurement.client_sent, Measurement.id)
+    )
+    return [(row[0], row[1], row[2], row[3], row[4]) for row in query.all()]
+
+
+def get_measurement_points_ip(session: Session, ip: IPv4Address | IPv6Address | None, start: PreciseTime,
+                              end: PreciseTime) -> list[tuple[int, int, int, float, float]]:
+    """
+    Fetches the points to draw of the measurements of a specific IP address within a precise time range.
+
+    Args:
+        session (Session): The currently active database session.
+        ip (IPv4Address | IPv6Address | None): The IP address of the NTP server.
+        start (PreciseTime): The start of the time range to filter on.
+        end (PreciseTime): The end of the time range to filter on.
+
+    Returns:
+        list[tuple[int, int, int, float, float]]: The points (see `select_measurement_points`).
+
+    Raises:
+        MeasurementQueryError: If the database query fails.
+    """
+    try:
+        return select_measurement_points(session, Measurement.ntp_server_ip == str(ip), start, end)
+    except Exception as e:
+        raise MeasurementQueryError(f"Failed to fetch measurement points for IP {ip}: {e}")
+
+
+def get_measurement_points_dn(session: Session, dn: str, start: PreciseTime,
+                              end: PreciseTime) -> list[tuple[int, int, int, float, float]]:
+    """
+    Fetches the points to draw of the measurements of a specific domain name within a precise time range.
 
     Args:
         session (Session): The currently active database session.
@@ -263,58 +482,193 @@ def get_measurements_timestamps_dn(session: Session, dn: str, start: PreciseTime
         end (PreciseTime): The end of the time range to filter on.
 
     Returns:
-        list[dict]: A list of measurement records (as dictionaries), each including:
-            - Measurement metadata (domain name, version, etc.)
-            - Timing data (client/server send/receive with precision)
+        list[tuple[int, int, int, float, float]]: The points (see `select_measurement_points`).
 
     Raises:
         MeasurementQueryError: If the database query fails.
     """
+    try:
+        return select_measurement_points(session, Measurement.ntp_server_name == dn, start, end)
+    except Exception as e:
+        raise MeasurementQueryError(f"Failed to fetch measurement points for domain name: {dn}: {e}")
+
+
+def get_measurements_by_ids(session: Session, ids: list[int], start: PreciseTime, end: PreciseTime,
+                            context: Optional[EnrichmentContext] = None) -> list[NtpMeasurement]:
+    """
+    Fetches the measurements with the given ids, the oldest first. The time range of the measurements
+    lets PostgreSQL only look in the monthly partitions of that range.
+
+    Args:
+        session (Session): The currently active database session.
+        ids (list[int]): The ids of the measurements.
+        start (PreciseTime): The start of the time range of the measurements.
+        end (PreciseTime): The end of the time range of the measurements.
+        context (Optional[EnrichmentContext]): The lookups of the current response (see `dict_to_measurement`).
+
+    Returns:
+        list[NtpMeasurement]: The measurements.
+
+    Raises:
+        MeasurementQueryError: If the database query fails.
+    """
+    if len(ids) == 0:
+        return []
     try:
         query = (
-            session.query(Measurement, Time)
-            .join(Time, Measurement.time_id == Time.id)
-            .filter(
-                Measurement.ntp_server_name == dn,
-                Time.client_sent >= start.seconds,
-                Time.client_sent <= end.seconds
+            session.query(Measurement)
+            .filter(Measurement.id.in_(ids), Measurement.client_sent >= start.seconds,
+                    Measurement.client_sent <= end.seconds)
+            .order_by(Measurement.client_sent, Measurement.id)
+        )
+        return rows_to_measurements(query.all(), context)
+    except Exception as e:
+        raise MeasurementQueryError(f"Failed to fetch the measurements by id: {e}")
+
+
+def servers_condition(ips: list[str], names: list[str]) -> ColumnElement[bool]:
+    """
+    Selects the measurements of some NTP servers, given by their IP addresses and their domain names.
+    An empty list adds no condition, so the query of a single server stays a plain index lookup.
+
+    Args:
+        ips (list[str]): The IP addresses of the NTP servers.
+        names (list[str]): The domain names of the NTP servers.
+
+    Returns:
+        ColumnElement[bool]: The condition on the `measurements` table.
+    """
+    conditions = []
+    if ips:
+        conditions.append(Measurement.ntp_server_ip.in_(ips))
+    if names:
+        conditions.append(Measurement.ntp_server_name.in_(names))
+    return or_(*conditions)
+
+
+def get_measurement_columns_page(session: Session, ips: list[str], names: list[str], columns: list[str],
+                                 start: PreciseTime, end: PreciseTime, limit: int,
+                                 after: Optional[tuple[int, int]] = None) -> tuple[list[Row[Any]],
+                                                                                   Optional[tuple[int, int]]]:
+    """
+    Fetches some columns of the measurements of NTP servers within a precise time range, one page at a time,
+    the oldest first, with keyset pagination on (`client_sent`, `id`). The next page starts right after the key
+    of the last row of this page, so every page is an index range scan that does not depend on how many pages
+    came before (unlike OFFSET). Only the requested columns are read, and the rows are returned as they are,
+    without being converted to measurements.
+
+    Args:
+        session (Session): The currently active database session.
+        ips (list[str]): The IP addresses of the NTP servers.
+        names (list[str]): The domain names of the NTP servers.
+        columns (list[str]): The names of the columns of the `measurements` table to read, in this order.
+            They must contain "client_sent" and "id", which are the key of the page.
+        start (PreciseTime): The start of the time range to filter on.
+        end (PreciseTime): The end of the time range to filter on.
+        limit (int): The maximum number of measurements of the page.
+        after (Optional[tuple[int, int]]): The (`client_sent`, `id`) key of the last row of the previous page,
+            or None for the first page.
+
+    Returns:
+        tuple[list[Row[Any]], Optional[tuple[int, int]]]: The rows of the page, with the values of the columns
+        in the requested order, and the key of the next page (None if there are no more measurements).
+
+    Raises:
+        MeasurementQueryError: If the database query fails.
+    """
+    try:
+        table = Measurement.__table__.c
+        statement = (
+            select(*[table[c] for c in columns])
+            .where(
+                servers_condition(ips, names),
+                Measurement.client_sent >= start.seconds,
+                Measurement.client_sent <= end.seconds
+            )
+        )
+        if after is not None:
+            statement = statement.where(tuple_(Measurement.client_sent, Measurement.id) > tuple_(*after))
+        # one more row tells us if there is a next page
+        rows = list(session.execute(statement.order_by(Measurement.client_sent, Measurement.id).limit(limit + 1)))
+    except Exception as e:
+        raise MeasurementQueryError(f"Failed to fetch the measurements of {ips + names}: {e}")
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], (last.client_sent, last.id)
+
+
+def stream_measurement_columns(session: Session, ips: list[str], names: list[str], columns: list[str],
+                               start: PreciseTime, end: PreciseTime, batch_size: int) -> Iterator[Sequence[Row[Any]]]:
+    """
+    Streams some columns of the measurements of several servers within a precise time range, the oldest first.
+    Only the requested columns are read, and the rows are returned in the batches of the database cursor,
+    without being converted to measurements, so they can be turned into columnar data directly.
+
+    Args:
+        session (Session): The currently active database session. It must stay open while the result is consumed.
+        ips (list[str]): The IP addresses of the NTP servers.
+        names (list[str]): The domain names of the NTP servers.
+        columns (list[str]): The names of the columns of the `measurements` table to read, in this order.
+        start (PreciseTime): The start of the time range to filter on.
+        end (PreciseTime): The end of the time range to filter on.
+        batch_size (int): How many rows are fetched from the database at a time.
+
+    Returns:
+        Iterator[Sequence[Row[Any]]]: The batches of rows, with the values of the columns in the requested order.
+
+    Raises:
+        MeasurementQueryError: If the database query fails.
+    """
+    try:
+        table = Measurement.__table__.c
+        statement = (
+            select(*[table[c] for c in columns])
+            .where(
+                servers_condition(ips, names),
+                Measurement.client_sent >= start.seconds,
+                Measurement.client_sent <= end.seconds
             )
+            .order_by(Measurement.client_sent, Measurement.id)
+            .execution_options(yield_per=batch_size)
         )
-        return rows_to_measurements(query.all())
+        yield from session.execute(statement).partitions()
     except Exception as e:
-        raise MeasurementQueryError(f"Failed to fetch measurements for domain name: {dn}: {e}")
+        raise MeasurementQueryError(f"Failed to export the measurements of {ips + names}: {e}")
 
 
-def get_measurements_for_jitter_ip(session: Session, ip: IPv4Address | IPv6Address | None, number: int = 7) -> list[
-    NtpMeasurement]:
+def get_timestamps_for_jitter_ip(session: Session, ip: IPv4Address | IPv6Address | None,
+                                 number: int = 7) -> list[tuple[int, int, int, int, int, int, int, int]]:
     """
-    Fetches the last specified number (default 7) of measurements for specific IP address for calculating the jitter.
+    Fetches only the timestamps of the last specified number (default 7) of measurements for a specific IP address,
+    the newest first. This is everything we need to calculate the jitter, so no NtpMeasurement objects are built.
 
-    This function queries the `measurements` table, joined with the `times` table,
-    and filters the results by: The NTP server IP (`ntp_server_ip`) and limits the result to the number specified.
+    The index on (`ntp_server_ip`, `client_sent` DESC) includes all the timestamps, so the database reads them
+    directly from the index (index-only scan), without touching the table.
 
     Args:
         session (Session): The currently active database session.
-        ip (IPv4Address | IPv6Address): The IP address of the NTP server.
+        ip (IPv4Address | IPv6Address | None): The IP address of the NTP server.
         number (int): The number of measurements to get.
 
     Returns:
-        list[dict]: A list of measurement records (as dictionaries), each including
-            - Measurement metadata (IP, version, stratum, etc.)
-            - Timing data (client/server send/receive with fractions)
+        list[tuple[int, int, int, int, int, int, int, int]]: For every measurement the seconds and the fraction of
+        client_sent, server_recv, server_sent and client_recv (in this order).
 
     Raises:
         MeasurementQueryError: If the database query fails.
     """
     try:
         query = (
-            session.query(Measurement, Time)
-            .join(Time, Measurement.time_id == Time.id)
+            session.query(Measurement.client_sent, Measurement.client_sent_prec, Measurement.server_recv,
+                          Measurement.server_recv_prec, Measurement.server_sent, Measurement.server_sent_prec,
+                          Measurement.client_recv, Measurement.client_recv_prec)
             .filter(
                 Measurement.ntp_server_ip == ip_to_str(ip)
             )
+            .order_by(Measurement.client_sent.desc(), Measurement.client_sent_prec.desc())
             .limit(number)
         )
-        return rows_to_measurements(query.all())
+        return [tuple(row) for row in query.all()]
     except Exception as e:
-        raise MeasurementQueryError(f"Failed to fetch measurements for jitter for IP {ip}: {e}")
+        raise MeasurementQueryError(f"Failed to fetch timestamps for jitter for IP {ip}: {e}")
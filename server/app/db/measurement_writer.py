@@ -0,0 +1,496 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from ipaddress import IPv4Address, IPv6Address
+from typing import Any, Callable, Optional
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.orm import Session
+
+from server.app.db.db_interaction import insert_measurement, insert_measurements_bulk, insert_measurement_rows_bulk, \
+    measurement_to_row
+from server.app.dtos.NtpMeasurement import NtpMeasurement
+from server.app.utils.file_lock import locked_file
+from server.app.utils.load_config_data import get_write_queue_max_size, get_write_batch_size, \
+    get_write_flush_interval_s, get_write_spill_path
+
+
+class MeasurementWriter:
+    """
+    A write-behind stage for the measurements. The measurements are put in a bounded in-memory queue and a background
+    thread writes them to the database in batches, when the queue has "batch_size" measurements or
+    every "flush_interval_s" seconds, whichever comes first. This way the HTTP requests do not wait for the database.
+
+    If the database is unavailable, the batch is appended to a spill file (JSON lines, fsync-ed), and the same happens
+    to new measurements when the queue is full. The spill file is replayed after the next successful flush.
+    The spill file is shared by all the workers of the server, so it is protected by file locks: one for appending
+    to it, and one that only the worker that replays it holds. The rows that the database keeps rejecting
+    are moved to a dead-letter file ("<spill_path>.dead"), so they do not block the others.
+
+    Attributes:
+        session_factory (Callable[[], Session]): Opens a new database session for every flush.
+        max_size (int): The maximum number of measurements waiting in memory.
+        batch_size (int): The maximum number of measurements written in one batch.
+        flush_interval_s (float | int): How long (in seconds) a measurement can wait before it is written.
+        spill_path (str): The path of the spill file.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], max_size: int, batch_size: int,
+                 flush_interval_s: float | int, spill_path: str) -> None:
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.spill_path = spill_path
+        self._queue: deque[NtpMeasurement] = deque()
+        # the batch that is being written right now. It is still visible to the jitter calculation.
+        self._in_flight: list[NtpMeasurement] = []
+        self._condition = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._metrics = {"enqueued": 0, "flushed": 0, "batches": 0, "failed_batches": 0, "spilled": 0,
+                         "replayed": 0, "dead_lettered": 0, "high_water_mark": 0}
+        self._last_flush_ms = 0.0
+
+    def start(self) -> None:
+        """
+        Starts the background thread that writes the measurements.
+        """
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="measurement-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops the background thread after it wrote (or spilled) all the measurements that are still in the queue.
+
+        Args:
+            timeout (Optional[float]): How long (in seconds) to wait for the thread. None waits until it is done.
+        """
+        with self._condition:
+            thread = self._thread
+            self._stopping = True
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        with self._condition:
+            self._thread = None
+
+    def is_running(self) -> bool:
+        """
+        Returns whether the background thread is running.
+
+        Returns:
+            bool: True if the measurements are written in the background.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def enqueue(self, measurements: list[NtpMeasurement]) -> None:
+        """
+        Adds measurements to the queue without waiting for the database.
+        If the queue is full, the measurements that do not fit are spilled to disk instead.
+
+        Args:
+            measurements (list[NtpMeasurement]): The measurements to store.
+        """
+        overflow: list[NtpMeasurement] = []
+        with self._condition:
+            for m in measurements:
+                if len(self._queue) >= self.max_size:
+                    overflow.append(m)
+                else:
+                    self._queue.append(m)
+                    self._metrics["enqueued"] += 1
+            self._metrics["high_water_mark"] = max(self._metrics["high_water_mark"], len(self._queue))
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify_all()
+        if len(overflow) > 0:
+            print(f"The measurement queue is full. Spilling {len(overflow)} measurements to disk.")
+            self._spill(overflow)
+
+    def pending_measurements(self, ip: IPv4Address | IPv6Address | None, number: int) -> list[NtpMeasurement]:
+        """
+        Returns the measurements of an NTP server that were not written to the database yet, the newest first.
+
+        Args:
+            ip (IPv4Address | IPv6Address | None): The IP address of the NTP server.
+            number (int): The maximum number of measurements to return.
+
+        Returns:
+            list[NtpMeasurement]: At most "number" pending measurements of this server.
+        """
+        result: list[NtpMeasurement] = []
+        with self._condition:
+            for m in reversed(self._in_flight + list(self._queue)):
+                if len(result) >= number:
+                    break
+                if m.server_info.ntp_server_ip == ip:
+                    result.append(m)
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the back-pressure metrics of the writer.
+
+        Returns:
+            dict[str, Any]: The current queue size, its maximum size and high-water mark, how many measurements were
+            enqueued, written, spilled to disk, replayed from disk and moved to the dead-letter file,
+            how many batches were written or failed,
+            and how long the last batch took (in milliseconds).
+        """
+        with self._condition:
+            return {
+                "queue_size": len(self._queue) + len(self._in_flight),
+                "max_size": self.max_size,
+                **self._metrics,
+                "last_flush_ms": self._last_flush_ms
+            }
+
+    def _run(self) -> None:
+        """
+        The loop of the background thread. It waits for a full batch or for the flush interval, writes the batch,
+        and then tries to replay the spill file.
+        """
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._stopping or len(self._queue) >= self.batch_size,
+                                         timeout=self.flush_interval_s)
+                self._in_flight = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                batch = self._in_flight
+                done = self._stopping and len(self._queue) == 0
+            if len(batch) > 0:
+                flushed = self._flush(batch)
+                with self._condition:
+                    self._in_flight = []
+                if flushed:
+                    self._replay_spill()
+            if done:
+                return
+
+    def _flush(self, batch: list[NtpMeasurement]) -> bool:
+        """
+        Writes a batch to the database. If it fails, the batch is spilled to disk.
+
+        Args:
+            batch (list[NtpMeasurement]): The measurements to write.
+
+        Returns:
+            bool: True if the batch was written to the database.
+        """
+        start = time.perf_counter()
+        try:
+            session = self.session_factory()
+            try:
+                insert_measurements_bulk(batch, session)
+            finally:
+                session.close()
+        except Exception as e:
+            print(e)
+            with self._condition:
+                self._metrics["failed_batches"] += 1
+            self._spill(batch)
+            return False
+        with self._condition:
+            self._metrics["flushed"] += len(batch)
+            self._metrics["batches"] += 1
+            self._last_flush_ms = (time.perf_counter() - start) * 1000
+        return True
+
+    def _spill(self, measurements: list[NtpMeasurement]) -> None:
+        """
+        Appends measurements to the spill file, as the rows that will be inserted later.
+        The file is fsync-ed, so the measurements survive a crash of the server.
+
+        Args:
+            measurements (list[NtpMeasurement]): The measurements that could not be written to the database.
+        """
+        try:
+            append_rows(self.spill_path, [measurement_to_row(m) for m in measurements], self._spill_lock)
+            with self._condition:
+                self._metrics["spilled"] += len(measurements)
+        except OSError as e:
+            print(f"Lost {len(measurements)} measurements, because they could not be spilled to disk: {e}")
+
+    def _replay_spill(self) -> None:
+        """
+        Writes the spilled measurements to the database, in batches. The spill file is first moved aside,
+        so new measurements can be spilled in the meantime, and the measurements spilled during the replay
+        are replayed right after. Only one worker replays at a time, the others skip it.
+        If the database fails again, the rest of the file is kept and retried after the next successful flush.
+        """
+        replay_path = self.spill_path + ".replay"
+        try:
+            with locked_file(self.spill_path + ".replay.lock", blocking=False) as locked:
+                if not locked:
+                    return  # another worker is replaying the spill file
+                self._replay_spill_files(replay_path)
+        except OSError as e:
+            print(e)
+
+    def _replay_spill_files(self, replay_path: str) -> None:
+        """
+        Replays the spill file that was moved aside, then moves the spill file aside and replays it,
+        until there is nothing left or the database fails. The caller holds the replay lock.
+
+        Args:
+            replay_path (str): The path of the spill file that is moved aside.
+        """
+        while True:
+            with self._spill_lock, locked_file(self.spill_path + ".lock"):
+                if not os.path.exists(replay_path):
+                    if not os.path.exists(self.spill_path):
+                        return
+                    os.replace(self.spill_path, replay_path)
+            if not self._replay_file(replay_path):
+                return
+
+    def _replay_file(self, replay_path: str) -> bool:
+        """
+        Writes the rows of a spill file that was moved aside to the database, and removes the file.
+
+        Args:
+            replay_path (str): The path of the file.
+
+        Returns:
+            bool: True if all the rows were written. Otherwise, the rows that are left are kept in the file.
+        """
+        try:
+            rows = read_spill_file(replay_path)
+        except OSError as e:
+            print(e)
+            return False
+        for i in range(0, len(rows), self.batch_size):
+            batch = rows[i:i + self.batch_size]
+            done = self._replay_rows(batch)
+            if done < len(batch):
+                try:
+                    # only the rows that were not committed are kept, so none of them is inserted twice
+                    replace_rows(replay_path, rows[i + done:])
+                except OSError as e:
+                    print(e)
+                return False
+        os.remove(replay_path)
+        return True
+
+    def _replay_rows(self, rows: list[dict[str, Any]]) -> int:
+        """
+        Inserts spilled rows. If the database rejects them, the batch is split in two and each half is retried,
+        until the rows that fail on their own are found. Those are moved to the dead-letter file.
+        It stops at the first part that cannot be written because the database is unavailable.
+
+        Args:
+            rows (list[dict[str, Any]]): The rows to insert.
+
+        Returns:
+            int: How many of the first rows were committed (or moved to the dead-letter file). If it is less than
+            the number of rows, the database is unavailable and the rest must be kept in the spill file.
+        """
+        try:
+            session = self.session_factory()
+            try:
+                insert_measurement_rows_bulk(rows, session)
+            finally:
+                session.close()
+        except Exception as e:
+            if is_connection_error(e):
+                print(e)
+                return 0
+            if len(rows) > 1:
+                half = len(rows) // 2
+                done = self._replay_rows(rows[:half])
+                if done < half:
+                    return done
+                return half + self._replay_rows(rows[half:])
+            print(f"Moving a spilled measurement to the dead-letter file, because it cannot be inserted: {e}")
+            try:
+                append_rows(self.spill_path + ".dead", rows, self._spill_lock)
+            except OSError as error:
+                print(error)
+                return 0
+            with self._condition:
+                self._metrics["dead_lettered"] += 1
+            return 1
+        with self._condition:
+            self._metrics["replayed"] += len(rows)
+        return len(rows)
+
+
+def append_rows(path: str, rows: list[dict[str, Any]], lock: threading.Lock) -> None:
+    """
+    Appends rows to a JSON lines file (spill or dead-letter file) and fsyncs it. The file is locked,
+    for the threads of this process and for the other workers.
+
+    Args:
+        path (str): The path of the file.
+        rows (list[dict[str, Any]]): The `measurements` rows.
+        lock (threading.Lock): The lock of the threads of this process.
+
+    Raises:
+        OSError: If the file cannot be written.
+    """
+    lines = "".join(json.dumps(row) + "\n" for row in rows)
+    with lock, locked_file(path + ".lock"):
+        with open(path, "a") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def replace_rows(path: str, rows: list[dict[str, Any]]) -> None:
+    """
+    Replaces the content of a JSON lines file with rows. They are written to a temporary file in the same directory,
+    which then replaces the file, so a crash never leaves it partly written.
+
+    Args:
+        path (str): The path of the file.
+        rows (list[dict[str, Any]]): The `measurements` rows.
+
+    Raises:
+        OSError: If the file cannot be written.
+    """
+    fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".",
+                                          suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def is_connection_error(e: BaseException) -> bool:
+    """
+    Returns whether an insert failed because the database is unavailable (so it may succeed later),
+    instead of because of the rows themselves.
+
+    Args:
+        e (BaseException): The exception of the insert.
+
+    Returns:
+        bool: True if the error (or the error that caused it) is a connection error.
+    """
+    error: Optional[BaseException] = e
+    while error is not None:
+        if isinstance(error, (OperationalError, InterfaceError)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def read_spill_file(path: str) -> list[dict[str, Any]]:
+    """
+    Reads the rows of the measurements from a spill file. The invalid lines are skipped.
+
+    Args:
+        path (str): The path of the spill file.
+
+    Returns:
+        list[dict[str, Any]]: The `measurements` rows.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    rows: list[dict[str, Any]] = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict) or "client_sent" not in row:
+                    raise ValueError(f"Not a measurement: {line.strip()}")
+                rows.append(row)
+            except ValueError as e:
+                # a line that was cut by a crash while it was written
+                print(f"Skipping an invalid line of the spill file: {e}")
+    return rows
+
+
+_writer: Optional[MeasurementWriter] = None
+
+
+def start_measurement_writer(session_factory: Callable[[], Session]) -> MeasurementWriter:
+    """
+    Creates the measurement writer from the config and starts its background thread.
+    It is called when the application starts.
+
+    Args:
+        session_factory (Callable[[], Session]): Opens a new database session for every flush.
+
+    Returns:
+        MeasurementWriter: The running writer.
+    """
+    global _writer
+    if _writer is None:
+        _writer = MeasurementWriter(session_factory, max_size=get_write_queue_max_size(),
+                                    batch_size=get_write_batch_size(), flush_interval_s=get_write_flush_interval_s(),
+                                    spill_path=get_write_spill_path())
+    _writer.start()
+    return _writer
+
+
+def stop_measurement_writer() -> None:
+    """
+    Writes the measurements that are still in the queue and stops the background thread.
+    It is called when the application shuts down.
+    """
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+def store_measurements(measurements: list[NtpMeasurement], session: Session) -> None:
+    """
+    Stores measurements through the write-behind queue. If the writer is not running (for example in the tests
+    or in scripts), they are written to the database right away with the given session.
+
+    Args:
+        measurements (list[NtpMeasurement]): The measurements to store.
+        session (Session): The currently active database session.
+
+    Raises:
+        DatabaseInsertError: If the writer is not running and inserting the measurements fails.
+    """
+    if _writer is not None and _writer.is_running():
+        _writer.enqueue(measurements)
+    elif len(measurements) == 1:
+        insert_measurement(measurements[0], session)
+    else:
+        insert_measurements_bulk(measurements, session)
+
+
+def get_pending_measurements(ip: IPv4Address | IPv6Address | None, number: int) -> list[NtpMeasurement]:
+    """
+    Returns the measurements of an NTP server that are still waiting in the write-behind queue, the newest first.
+
+    Args:
+        ip (IPv4Address | IPv6Address | None): The IP address of the NTP server.
+        number (int): The maximum number of measurements to return.
+
+    Returns:
+        list[NtpMeasurement]: At most "number" pending measurements of this server.
+    """
+    if _writer is None:
+        return []
+    return _writer.pending_measurements(ip, number)
+
+
+def get_measurement_writer_stats() -> Optional[dict[str, Any]]:
+    """
+    Returns the back-pressure metrics of the measurement writer.
+
+    Returns:
+        Optional[dict[str, Any]]: The metrics, or None if the writer is not running.
+    """
+    if _writer is None:
+        return None
+    return _writer.stats()
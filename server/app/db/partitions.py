@@ -0,0 +1,74 @@
+import threading
+from datetime import datetime, timezone
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from server.app.utils.ntp_engine import NTP_DELTA
+
+# the names of the monthly partitions that we know exist in this process
+_known_partitions: set[str] = set()
+_known_partitions_lock = threading.Lock()
+
+
+def month_partition_bounds(client_sent: int) -> tuple[str, int, int]:
+    """
+    Returns the monthly partition of the `measurements` table that holds a measurement sent at a given time.
+
+    Args:
+        client_sent (int): The time the measurement was sent, in NTP seconds.
+
+    Returns:
+        tuple[str, int, int]: The name of the partition, and its range in NTP seconds
+        (the start is included, the end is not).
+    """
+    moment = datetime.fromtimestamp(client_sent - NTP_DELTA, tz=timezone.utc)
+    start = datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+    end = datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1, tzinfo=timezone.utc)
+    name = f"measurements_y{start.year:04d}m{start.month:02d}"
+    return name, int(start.timestamp()) + NTP_DELTA, int(end.timestamp()) + NTP_DELTA
+
+
+def create_measurement_partitions(session: Session, client_sent_values: Iterable[int]) -> list[str]:
+    """
+    Creates the monthly partitions of the `measurements` table that are needed to store measurements
+    sent at the given times, if they do not exist yet. It does nothing for other databases than PostgreSQL.
+
+    The partitions that were already created (or seen) by this process are remembered, so in the common case
+    it does not send anything to the database. Otherwise, the partitions are created in the current transaction,
+    under an advisory lock, so the workers that see a new month at the same time do not race.
+
+    Args:
+        session (Session): The session used for the insert.
+        client_sent_values (Iterable[int]): The times the measurements were sent, in NTP seconds.
+
+    Returns:
+        list[str]: The names of the partitions that were checked in the database.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return []
+    missing: dict[str, tuple[int, int]] = {}
+    for client_sent in client_sent_values:
+        name, start, end = month_partition_bounds(client_sent)
+        if name not in _known_partitions:
+            missing[name] = (start, end)
+    if len(missing) == 0:
+        return []
+    session.execute(text("SELECT pg_advisory_xact_lock(hashtext('measurements_partitions'))"))
+    for name, (start, end) in missing.items():
+        # the bounds are integers computed by us, and the name only contains digits and letters
+        session.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF measurements "
+                             f"FOR VALUES FROM ({start}) TO ({end})"))
+    with _known_partitions_lock:
+        _known_partitions.update(missing)
+    return list(missing)
+
+
+def forget_measurement_partitions() -> None:
+    """
+    Forgets which partitions exist, so they are checked in the database again.
+    It is needed when a transaction that created partitions was rolled back.
+    """
+    with _known_partitions_lock:
+        _known_partitions.clear()
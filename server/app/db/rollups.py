@@ -0,0 +1,376 @@
+import threading
+from ipaddress import IPv4Address, IPv6Address
+from typing import Any, Callable, Optional
+
+from sqlalchemy import ColumnElement, Label, case, delete, func, or_, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from server.app.dtos.PreciseTime import PreciseTime
+from server.app.models.CustomError import MeasurementQueryError
+from server.app.models.Measurement import Measurement
+from server.app.models.MeasurementRollup import MeasurementRollup, MeasurementRollup1m, MeasurementRollup1h, \
+    MeasurementRollup1d, RollupState, RollupQueue
+from server.app.utils.load_config_data import get_rollup_interval_s, get_rollup_batch_size
+
+# the rollup tables by granularity (in seconds), the coarsest first
+ROLLUPS: dict[int, type[MeasurementRollup]] = {
+    86400: MeasurementRollup1d,
+    3600: MeasurementRollup1h,
+    60: MeasurementRollup1m
+}
+ROLLUP_STATE_NAME = "measurements"
+
+
+def merge_into_rollup(session: Session, rollup: type[MeasurementRollup], granularity: int,
+                      measurement_ids: list[int]) -> None:
+    """
+    Aggregates the queued measurements with these ids per server and per bucket of "granularity" seconds,
+    and merges the result into a rollup table (INSERT ... SELECT ... ON CONFLICT DO UPDATE),
+    so the existing buckets are updated instead of recomputed.
+
+    Args:
+        session (Session): The session of the rollup transaction.
+        rollup (type[MeasurementRollup]): The rollup table.
+        granularity (int): The size of the buckets of the rollup table, in seconds.
+        measurement_ids (list[int]): The ids of the measurements to merge (they are in the rollup queue).
+    """
+    name = func.coalesce(Measurement.ntp_server_name, "")
+    bucket = (Measurement.client_sent // granularity) * granularity
+    failed = case((or_(Measurement.stratum == 0, Measurement.stratum >= 16), 1), else_=0)
+    new_rows = (
+        select(Measurement.ntp_server_ip, bucket, name, func.count(),
+               func.min(Measurement.time_offset), func.max(Measurement.time_offset), func.sum(Measurement.time_offset),
+               func.min(Measurement.rtt), func.max(Measurement.rtt), func.sum(Measurement.rtt),
+               func.min(Measurement.stratum), func.max(Measurement.stratum), func.sum(failed))
+        # the client_sent of the queue lets PostgreSQL read only the partitions of these measurements
+        .join(RollupQueue, (RollupQueue.measurement_id == Measurement.id)
+              & (RollupQueue.client_sent == Measurement.client_sent))
+        .where(RollupQueue.measurement_id.in_(measurement_ids), Measurement.ntp_server_ip.is_not(None))
+        .group_by(Measurement.ntp_server_ip, bucket, name)
+    )
+    columns = ["ntp_server_ip", "bucket_start", "ntp_server_name", "count", "offset_min", "offset_max", "offset_sum",
+               "rtt_min", "rtt_max", "rtt_sum", "stratum_min", "stratum_max", "failures"]
+    is_sqlite = session.get_bind().dialect.name == "sqlite"
+    statement = (sqlite.insert if is_sqlite else postgresql.insert)(rollup).from_select(columns, new_rows)
+    # the 2-argument min() and max() of SQLite are LEAST() and GREATEST() in PostgreSQL
+    least = func.min if is_sqlite else func.least
+    greatest = func.max if is_sqlite else func.greatest
+    table = rollup.__table__.c
+    new = statement.excluded
+    merged: dict[str, Any] = {"count": table.count + new.count, "failures": table.failures + new.failures}
+    for column in ["offset", "rtt", "stratum"]:
+        old_min, new_min = table[f"{column}_min"], new[f"{column}_min"]
+        old_max, new_max = table[f"{column}_max"], new[f"{column}_max"]
+        merged[f"{column}_min"] = least(func.coalesce(old_min, new_min), func.coalesce(new_min, old_min))
+        merged[f"{column}_max"] = greatest(func.coalesce(old_max, new_max), func.coalesce(new_max, old_max))
+    for column in ["offset_sum", "rtt_sum"]:
+        merged[column] = func.coalesce(table[column], 0) + func.coalesce(new[column], 0)
+    session.execute(statement.on_conflict_do_update(index_elements=["ntp_server_ip", "bucket_start", "ntp_server_name"],
+                                                    set_=merged))
+
+
+def queue_existing_measurements(session: Session) -> None:
+    """
+    Adds all the measurements to the rollup queue. It is done once, when the rollups are first updated,
+    for the measurements that were stored before the rollups existed. The measurements that are already queued
+    are skipped.
+
+    Args:
+        session (Session): The session of the rollup transaction.
+    """
+    is_sqlite = session.get_bind().dialect.name == "sqlite"
+    statement = (sqlite.insert if is_sqlite else postgresql.insert)(RollupQueue).from_select(
+        # the WHERE is needed by SQLite to parse the ON CONFLICT of an INSERT ... SELECT
+        ["measurement_id", "client_sent"], select(Measurement.id, Measurement.client_sent).where(true()))
+    session.execute(statement.on_conflict_do_nothing(index_elements=["measurement_id"]))
+
+
+def rollup_new_measurements(session: Session, batch_size: int) -> int:
+    """
+    Merges the next batch of queued measurements into all the rollup tables and removes them from the queue,
+    in one transaction. A measurement is queued in the transaction that inserts it, so it is merged once it is
+    committed, even if measurements with a higher id were committed (and merged) before it.
+    The rollup state is locked during the transaction, so the workers of the server do not merge the same
+    measurements twice.
+
+    Args:
+        session (Session): A new database session.
+        batch_size (int): The maximum number of measurements to merge.
+
+    Returns:
+        int: The number of measurements that were merged. If it is "batch_size", there may be more.
+    """
+    try:
+        state = session.get(RollupState, ROLLUP_STATE_NAME, with_for_update=True)
+        if state is None:
+            queue_existing_measurements(session)
+            session.add(RollupState(name=ROLLUP_STATE_NAME))
+        # the ids are read once, so the merge and the delete work on the same measurements
+        measurement_ids = list(session.execute(
+            select(RollupQueue.measurement_id).order_by(RollupQueue.measurement_id).limit(batch_size)
+        ).scalars())
+        if len(measurement_ids) == 0:
+            session.commit()
+            return 0
+        for granularity, rollup in ROLLUPS.items():
+            merge_into_rollup(session, rollup, granularity, measurement_ids)
+        session.execute(delete(RollupQueue).where(RollupQueue.measurement_id.in_(measurement_ids)))
+        session.commit()
+        return len(measurement_ids)
+    except Exception:
+        session.rollback()
+        raise
+
+
+def choose_rollup_granularity(start: PreciseTime, bucket_s: int) -> Optional[int]:
+    """
+    Chooses the coarsest rollup whose buckets fit exactly in the requested buckets: the requested buckets must
+    start on a rollup bucket ("start" is a multiple of the granularity) and be made of whole rollup buckets
+    ("bucket_s" is a multiple of the granularity). Otherwise, a rollup bucket could be split between two requested
+    buckets or contain measurements from before "start", so a finer rollup (or the measurements) must be used.
+
+    Args:
+        start (PreciseTime): The start of the requested buckets.
+        bucket_s (int): The size of the buckets that are requested, in seconds.
+
+    Returns:
+        Optional[int]: The granularity of the rollup in seconds, or None if no rollup is aligned with the buckets.
+    """
+    for granularity in ROLLUPS:
+        if start.seconds % granularity == 0 and bucket_s % granularity == 0:
+            return granularity
+    return None
+
+
+def aggregate_rollup_per_bucket(session: Session, rollup: type[MeasurementRollup], condition: ColumnElement[bool],
+                                start: PreciseTime, end: PreciseTime, bucket_s: int) -> list[dict[str, Any]]:
+    """
+    Aggregates the rows of a rollup table into buckets of "bucket_s" seconds that start at "start".
+    It gives the same statistics as `aggregate_measurements_per_bucket` on the measurements, but it reads one row
+    per server and per rollup bucket instead of one row per measurement. The percentiles cannot be computed
+    from a rollup, so they are None.
+
+    Args:
+        session (Session): The currently active database session.
+        rollup (type[MeasurementRollup]): The rollup table. Its buckets must be aligned with the requested buckets
+            (see `choose_rollup_granularity`).
+        condition (ColumnElement[bool]): Selects the rows of the server.
+        start (PreciseTime): The start of the time range to filter on.
+        end (PreciseTime): The end of the time range to filter on.
+        bucket_s (int): The size of a bucket, in seconds.
+
+    Returns:
+        list[dict[str, Any]]: One dictionary per non-empty bucket, the oldest first (see
+        `aggregate_measurements_per_bucket`).
+    """
+    bucket = ((rollup.bucket_start - start.seconds) // bucket_s).label("bucket")
+    count = func.sum(rollup.count)
+    columns: list[Label[Any]] = [
+        bucket, count.label("count"),
+        func.min(rollup.offset_min).label("offset_min"), func.max(rollup.offset_max).label("offset_max"),
+        (func.sum(rollup.offset_sum) / count).label("offset_mean"),
+        func.min(rollup.rtt_min).label("rtt_min"), func.max(rollup.rtt_max).label("rtt_max"),
+        (func.sum(rollup.rtt_sum) / count).label("rtt_mean"),
+        func.min(rollup.stratum_min).label("stratum_min"), func.max(rollup.stratum_max).label("stratum_max"),
+        func.sum(rollup.failures).label("failures")
+    ]
+    query = (
+        session.query(*columns)
+        .filter(condition, rollup.bucket_start >= start.seconds, rollup.bucket_start <= end.seconds)
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+    result = []
+    for row in query.all():
+        values = row._asdict()
+        bucket_start = start.seconds + values.pop("bucket") * bucket_s
+        result.append({"bucket_start": bucket_start, "offset_p50": None, "offset_p95": None, "rtt_p50": None,
+                       "rtt_p95": None, **values})
+    return result
+
+
+def get_rollup_buckets_ip(session: Session, granularity: int, ip: IPv4Address | IPv6Address | None,
+                          start: PreciseTime, end: PreciseTime, bucket_s: int) -> list[dict[str, Any]]:
+    """
+    Aggregates the history of a specific IP address per time bucket from a rollup table.
+
+    Args:
+        session (Session): The currently active database session.
+        granularity (int): The granularity of the rollup table to read, in seconds.
+        ip (IPv4Address | IPv6Address | None): The IP address of the NTP server.
+        start (PreciseTime): The start of the time range to filter on.
+        end (PreciseTime): The end of the time range to filter on.
+        bucket_s (int): The size of a bucket, in seconds.
+
+    Returns:
+        list[dict[str, Any]]: The statistics of every non-empty bucket (see `aggregate_rollup_per_bucket`).
+
+    Raises:
+        MeasurementQueryError: If the database query fails.
+    """
+    rollup = ROLLUPS[granularity]
+    try:
+        return aggregate_rollup_per_bucket(session, rollup, rollup.ntp_server_ip == str(ip), start, end, bucket_s)
+    except Exception as e:
+        raise MeasurementQueryError(f"Failed to read the rollups for IP {ip}: {e}")
+
+
+def get_rollup_buckets_dn(session: Session, granularity: int, dn: str, start: PreciseTime, end: PreciseTime,
+                          bucket_s: int) -> list[dict[str, Any]]:
+    """
+    Aggregates the history of a specific domain name per time bucket from a rollup table.
+
+    Args:
+        session (Session): The currently active database session.
+        granularity (int): The granularity of the rollup table to read, in seconds.
+        dn (str): The domain name of the NTP server.
+        start (PreciseTime): The start of the time range to filter on.
+        end (PreciseTime): The end of the time range to filter on.
+        bucket_s (int): The size of a bucket, in seconds.
+
+    Returns:
+        list[dict[str, Any]]: The statistics of every non-empty bucket (see `aggregate_rollup_per_bucket`).
+
+    Raises:
+        MeasurementQueryError: If the database query fails.
+    """
+    rollup = ROLLUPS[granularity]
+    try:
+        return aggregate_rollup_per_bucket(session, rollup, rollup.ntp_server_name == dn, start, end, bucket_s)
+    except Exception as e:
+        raise MeasurementQueryError(f"Failed to read the rollups for domain name: {dn}: {e}")
+
+
+class RollupJob:
+    """
+    A background thread that merges the new measurements into the rollup tables every "interval_s" seconds.
+    When there is a backlog (for example after the first start), it merges batch after batch until it caught up.
+    The rollups are incomplete until the first backlog is merged, so they are not read before that.
+
+    Attributes:
+        session_factory (Callable[[], Session]): Opens a new database session for every batch.
+        interval_s (float | int): How long (in seconds) to wait between two runs.
+        batch_size (int): The maximum number of measurements merged in one transaction.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], interval_s: float | int, batch_size: int) -> None:
+        self.session_factory = session_factory
+        self.interval_s = interval_s
+        self.batch_size = batch_size
+        self._stop_event = threading.Event()
+        self._caught_up = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Starts the background thread.
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="measurement-rollups", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops the background thread. A batch that is being merged is finished first.
+
+        Args:
+            timeout (Optional[float]): How long (in seconds) to wait for the thread. None waits until it is done.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def is_running(self) -> bool:
+        """
+        Returns whether the background thread is running.
+
+        Returns:
+            bool: True if the rollup tables are kept up to date.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def is_caught_up(self) -> bool:
+        """
+        Returns whether all the measurements that were queued when the job started were merged at least once.
+
+        Returns:
+            bool: True if the rollup tables contain the whole history.
+        """
+        return self._caught_up.is_set()
+
+    def run_once(self) -> int:
+        """
+        Merges all the new measurements into the rollup tables, batch after batch.
+
+        Returns:
+            int: The number of measurements that were merged.
+        """
+        total = 0
+        while not self._stop_event.is_set():
+            session = self.session_factory()
+            try:
+                merged = rollup_new_measurements(session, self.batch_size)
+            finally:
+                session.close()
+            total += merged
+            if merged < self.batch_size:
+                self._caught_up.set()
+                break
+        return total
+
+    def _run(self) -> None:
+        """
+        The loop of the background thread.
+        """
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Failed to update the rollups: {e}")
+            self._stop_event.wait(self.interval_s)
+
+
+_job: Optional[RollupJob] = None
+
+
+def start_rollup_job(session_factory: Callable[[], Session]) -> RollupJob:
+    """
+    Creates the rollup job from the config and starts its background thread.
+    It is called when the application starts.
+
+    Args:
+        session_factory (Callable[[], Session]): Opens a new database session for every batch.
+
+    Returns:
+        RollupJob: The running job.
+    """
+    global _job
+    if _job is None:
+        _job = RollupJob(session_factory, interval_s=get_rollup_interval_s(), batch_size=get_rollup_batch_size())
+    _job.start()
+    return _job
+
+
+def stop_rollup_job() -> None:
+    """
+    Stops the rollup job. It is called when the application shuts down.
+    """
+    global _job
+    if _job is not None:
+        _job.stop()
+        _job = None
+
+
+def rollups_available() -> bool:
+    """
+    Returns whether the rollup tables are kept up to date by this process, so the history can be read from them.
+    They lag behind the measurements by at most the rollup interval, once the first backlog was merged.
+
+    Returns:
+        bool: True if the rollup job is running and caught up.
+    """
+    return _job is not None and _job.is_running() and _job.is_caught_up()
@@ -73,3 +73,18 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def get_session_maker() -> sessionmaker:
+    """
+    Returns the session maker, creating the engine if it does not exist yet.
+    It is used by the code that opens its own sessions outside a request (for example the background writer).
+
+    Returns:
+        sessionmaker: The session maker bound to the engine.
+    """
+    if _SessionLocal is None:
+        init_engine()
+
+    assert _SessionLocal is not None
+    return _SessionLocal
@@ -0,0 +1,32 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+
+@dataclass
+class GeoRecord:
+    """
+    Represents everything the MaxMind GeoLite2 databases know about a single IP address.
+
+    Attributes:
+        country_code (str | None): Two-letter ISO 3166-1 alpha-2 country code of the IP (from GeoLite2-Country)
+        continent_code (str | None): Two-letter continent code of the IP (from GeoLite2-Country)
+        coordinates (Tuple[float, float]): The latitude and longitude of the IP (from GeoLite2-City).
+            It is (25.0, -71.0) if the location could not be resolved.
+        asn (str | None): The autonomous system number of the IP (from GeoLite2-ASN)
+    """
+    country_code: str | None
+    continent_code: str | None
+    coordinates: Tuple[float, float]
+    asn: str | None
+
+    def __post_init__(self) -> None:
+        if not isinstance(self.country_code, str | None):
+            raise TypeError(f"country_code must be str, got {type(self.country_code).__name__}")
+        if not isinstance(self.continent_code, str | None):
+            raise TypeError(f"continent_code must be str, got {type(self.continent_code).__name__}")
+        if not isinstance(self.coordinates[0], (float, int)):
+            raise TypeError(f"coordinates must be float or int, got {type(self.coordinates[0]).__name__}")
+        if not isinstance(self.coordinates[1], (float, int)):
+            raise TypeError(f"coordinates must be float or int, got {type(self.coordinates[1]).__name__}")
+        if not isinstance(self.asn, str | None):
+            raise TypeError(f"asn must be str, got {type(self.asn).__name__}")
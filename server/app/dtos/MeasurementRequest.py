@@ -9,9 +9,11 @@ class MeasurementRequest(BaseModel):
     Attributes:
         server (str): The IP address or domain name of the NTP server to be measured.
         ipv6_measurement (bool): True if the type of IPs that we want to measure is IPv6. False otherwise.
+        samples (int): How many NTP requests to send to every server (burst mode if it is more than 1).
     """
     server: str
     ipv6_measurement: bool = False
+    samples: int = Field(default=1, ge=1, le=8)
 
     @model_validator(mode='after')
     def validate_after(self) -> Self:
@@ -25,10 +27,13 @@ class MeasurementRequest(BaseModel):
         Raises:
             TypeError: if the server is not a string.
             TypeError: if the flag for ipv6 measurement is not a bool.
+            TypeError: if the number of samples is not an int.
 
         """
         if not isinstance(self.server, str):
             raise TypeError(f"server must be str, got {type(self.server).__name__}")
         if not isinstance(self.ipv6_measurement, bool):
             raise TypeError(f"Flag for ipv6 measurement must be bool, got {type(self.ipv6_measurement).__name__}")
+        if not isinstance(self.samples, int):
+            raise TypeError(f"samples must be int, got {type(self.samples).__name__}")
         return self
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from server.app.dtos.PreciseTime import PreciseTime
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class NtpExtraDetails:
     """
     Represents additional measurements for a given NTP server. 
@@ -31,3 +31,28 @@ class NtpExtraDetails:
             raise TypeError(f"leap must be an integer, got {type(self.leap).__name__}")
         if not isinstance(self.poll, int | float):
             raise TypeError(f"poll must be an integer, got {type(self.poll).__name__}")
+
+    @classmethod
+    def trusted(cls, root_delay: PreciseTime, poll: int, root_dispersion: PreciseTime,
+                ntp_last_sync_time: PreciseTime, leap: int) -> "NtpExtraDetails":
+        """
+        Builds an NtpExtraDetails from already validated values, without the type checks of `__post_init__`
+        (see `PreciseTime.trusted`).
+
+        Args:
+            root_delay (PreciseTime): Total round-trip delay to the primary reference source
+            poll (int): The poll interval
+            root_dispersion (PreciseTime): The root dispersion
+            ntp_last_sync_time (PreciseTime): Last time the server was synchronized
+            leap (int): The leap indicator
+
+        Returns:
+            NtpExtraDetails: The extra details.
+        """
+        details = object.__new__(cls)
+        object.__setattr__(details, "root_delay", root_delay)
+        object.__setattr__(details, "poll", poll)
+        object.__setattr__(details, "root_dispersion", root_dispersion)
+        object.__setattr__(details, "ntp_last_sync_time", ntp_last_sync_time)
+        object.__setattr__(details, "leap", leap)
+        return details
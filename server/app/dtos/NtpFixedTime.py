@@ -0,0 +1,212 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, overload
+
+import numpy as np
+
+from server.app.dtos.PreciseTime import PreciseTime
+
+FRACTION_BITS = 32
+UNITS_PER_SECOND = 1 << FRACTION_BITS  # one unit is 2^-32 seconds
+ERA_SECONDS = 1 << 32  # an NTP era lasts 2^32 seconds (the first one ends in February 2036)
+FIXED_POINT_MASK = (1 << 64) - 1
+FRACTION_MASK = UNITS_PER_SECOND - 1
+NTP_EPOCH = datetime(1900, 1, 1, tzinfo=timezone.utc)
+
+
+def seconds_to_units(value: int | float | str | Decimal) -> int:
+    """
+    Converts a number of seconds into fixed-point units (2^-32 seconds) without going through a float fraction.
+    A float is read as the shortest decimal that represents it (the way it was written in JSON), so
+    "3952032001.123456" and 3952032001.123456 give the same result. The result is rounded down.
+
+    Args:
+        value (int | float | str | Decimal): The number of seconds. It may be negative.
+
+    Returns:
+        int: The number of units, as an unbounded Python int.
+    """
+    if isinstance(value, int):
+        return value << FRACTION_BITS
+    exact = Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+    return int((exact * UNITS_PER_SECOND).to_integral_value(rounding="ROUND_FLOOR"))
+
+
+def datetime_to_units(dt: datetime) -> int:
+    """
+    Converts a timezone-aware datetime into the fixed-point units since the NTP epoch (1900-01-01 UTC),
+    with integer arithmetic only, so the microseconds are kept exactly. The result is not wrapped into an era.
+
+    Args:
+        dt (datetime): A timezone-aware datetime.
+
+    Returns:
+        int: The number of units since the NTP epoch (rounded down).
+
+    Raises:
+        ValueError: If the datetime is not timezone-aware.
+    """
+    if dt.tzinfo is None:
+        raise ValueError("Input datetime must be timezone-aware (UTC)")
+    delta = dt - NTP_EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return (microseconds << FRACTION_BITS) // 1_000_000
+
+
+def units_to_datetime(units: int) -> datetime:
+    """
+    Converts fixed-point units since the NTP epoch into a UTC datetime, rounded to the nearest microsecond,
+    so a datetime converted by `datetime_to_units` comes back unchanged.
+
+    Args:
+        units (int): The number of units since the NTP epoch. It is not wrapped into an era.
+
+    Returns:
+        datetime: The UTC datetime.
+    """
+    return NTP_EPOCH + timedelta(microseconds=(units * 1_000_000 + (1 << (FRACTION_BITS - 1))) >> FRACTION_BITS)
+
+
+def units_to_precise_time(units: int) -> PreciseTime:
+    """
+    Converts fixed-point units into a PreciseTime. The seconds are wrapped into an era.
+
+    Args:
+        units (int): The number of units (2^-32 seconds).
+
+    Returns:
+        PreciseTime: The timestamp as seconds and fraction.
+    """
+    units &= FIXED_POINT_MASK
+    return PreciseTime(units >> FRACTION_BITS, units & FRACTION_MASK)
+
+
+class NtpFixedTimeArray:
+    """
+    A sequence of NTP timestamps backed by one uint64 NumPy array of 64-bit fixed-point values,
+    so millions of timestamps cost 8 bytes each instead of an object each.
+
+    The seconds and the fractions (the (seconds, prec) column pairs of the database) are read back as zero-copy
+    views of the array. Building the array from the columns is one vectorized pass.
+
+    Attributes:
+        values (np.ndarray): The 64-bit fixed-point values.
+    """
+    __slots__ = ("values",)
+
+    # the position of the seconds in a uint64 viewed as two uint32
+    _SECONDS_HALF = 1 if sys.byteorder == "little" else 0
+
+    def __init__(self, values: Any) -> None:
+        self.values: np.ndarray = np.ascontiguousarray(values, dtype=np.uint64).reshape(-1)
+
+    @classmethod
+    def from_columns(cls, seconds: Any, fractions: Any) -> "NtpFixedTimeArray":
+        """
+        Builds the array from the seconds and the fractions of the timestamps. The seconds are wrapped into an era.
+
+        Args:
+            seconds (Any): The seconds (an array or a sequence of ints).
+            fractions (Any): The fractions, in 2^-32 seconds.
+
+        Returns:
+            NtpFixedTimeArray: The timestamps.
+        """
+        s = np.asarray(seconds).astype(np.int64) & np.int64(ERA_SECONDS - 1)
+        f = np.asarray(fractions).astype(np.int64) & np.int64(FRACTION_MASK)
+        return cls((s.astype(np.uint64) << np.uint64(FRACTION_BITS)) | f.astype(np.uint64))
+
+    @classmethod
+    def from_times(cls, times: Iterable[PreciseTime]) -> "NtpFixedTimeArray":
+        """
+        Builds the array from PreciseTime objects. The seconds are wrapped into an era.
+
+        Args:
+            times (Iterable[PreciseTime]): The timestamps.
+
+        Returns:
+            NtpFixedTimeArray: The timestamps.
+        """
+        times = list(times)
+        return cls.from_columns([t.seconds for t in times], [t.fraction for t in times])
+
+    def _halves(self) -> np.ndarray:
+        return self.values.view(np.uint32).reshape(-1, 2)
+
+    @property
+    def seconds(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The seconds of the timestamps (uint32), as a view of the array.
+        """
+        seconds: np.ndarray = self._halves()[:, self._SECONDS_HALF]
+        return seconds
+
+    @property
+    def fractions(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The fractions of the timestamps (uint32), as a view of the array.
+        """
+        fractions: np.ndarray = self._halves()[:, 1 - self._SECONDS_HALF]
+        return fractions
+
+    def differences(self, other: "NtpFixedTimeArray") -> np.ndarray:
+        """
+        Subtracts the timestamps of another array, element by element, exactly.
+
+        Args:
+            other (NtpFixedTimeArray): The timestamps to subtract.
+
+        Returns:
+            np.ndarray: The signed differences, as int64 units of 2^-32 seconds.
+        """
+        differences: np.ndarray = (self.values - other.values).view(np.int64)
+        return differences
+
+    def mean(self) -> PreciseTime:
+        """
+        Calculates the mean of the timestamps exactly (rounded down to one unit), also across an era boundary.
+
+        Returns:
+            PreciseTime: The mean timestamp, in the era of the first one.
+
+        Raises:
+            ValueError: If the array is empty.
+        """
+        if len(self.values) == 0:
+            raise ValueError("The mean of no timestamps is undefined")
+        reference = self.values[0]
+        offsets = (self.values - reference).view(np.int64)
+        # the upper and lower halves are summed apart, so the sums cannot overflow
+        total = (int(np.sum(offsets >> FRACTION_BITS)) << FRACTION_BITS) + int(np.sum(offsets & FRACTION_MASK))
+        return units_to_precise_time(int(reference) + total // len(self.values))
+
+    def to_floats(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The seconds since the start of the era as floats, for plotting. They are only precise
+            to about 0.5 µs.
+        """
+        floats: np.ndarray = self.values / float(UNITS_PER_SECOND)
+        return floats
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @overload
+    def __getitem__(self, index: int) -> PreciseTime:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "NtpFixedTimeArray":
+        ...
+
+    def __getitem__(self, index: int | slice) -> "PreciseTime | NtpFixedTimeArray":
+        if isinstance(index, slice):
+            return NtpFixedTimeArray(self.values[index])
+        return units_to_precise_time(int(self.values[index]))
+
+    def __iter__(self) -> Iterator[PreciseTime]:
+        return (units_to_precise_time(v) for v in self.values.tolist())
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class NtpMainDetails:
     """
     Represents the main measurements reported by an NTP server.
@@ -30,3 +30,27 @@ class NtpMainDetails:
             raise TypeError(f"precision must be float or int, got {type(self.precision).__name__}")
         if not isinstance(self.reachability, str):
             raise TypeError(f"reachability must be str, got {type(self.reachability).__name__}")
+
+    @classmethod
+    def trusted(cls, offset: float, rtt: float, stratum: int, precision: float, reachability: str) -> "NtpMainDetails":
+        """
+        Builds an NtpMainDetails from already validated values, without the type checks of `__post_init__`
+        (see `PreciseTime.trusted`).
+
+        Args:
+            offset (float): Clock offset, in seconds
+            rtt (float): Round-trip delay, in seconds
+            stratum (int): Stratum level of the server
+            precision (float): Precision of the system clock of the server
+            reachability (str): Reachability register
+
+        Returns:
+            NtpMainDetails: The main details.
+        """
+        details = object.__new__(cls)
+        object.__setattr__(details, "offset", offset)
+        object.__setattr__(details, "rtt", rtt)
+        object.__setattr__(details, "stratum", stratum)
+        object.__setattr__(details, "precision", precision)
+        object.__setattr__(details, "reachability", reachability)
+        return details
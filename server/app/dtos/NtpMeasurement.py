@@ -5,9 +5,10 @@ from server.app.dtos.NtpExtraDetails import NtpExtraDetails
 from server.app.dtos.NtpServerInfo import NtpServerInfo
 from server.app.dtos.NtpMainDetails import NtpMainDetails
 from server.app.dtos.NtpTimestamps import NtpTimestamps
+from server.app.dtos.NtpSamples import NtpSamples
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class NtpMeasurement:
     """
     Represents the complete set of measurements for a given NTP server.
@@ -18,12 +19,14 @@ class NtpMeasurement:
         timestamps (NtpTimestamps): NTP timestamps from the exchange
         main_details (NtpMainDetails): Key metrics 
         extra_details (NtpExtraDetails): Additional fields
+        samples (NtpSamples | None): All the samples of a burst measurement. None if only one request was sent
     """
     vantage_point_ip: IPv4Address | IPv6Address | None
     server_info: NtpServerInfo
     timestamps: NtpTimestamps
     main_details: NtpMainDetails
     extra_details: NtpExtraDetails
+    samples: NtpSamples | None = None
 
     def __post_init__(self) -> None:
         if not isinstance(self.vantage_point_ip, IPv4Address | IPv6Address | None):
@@ -36,3 +39,33 @@ class NtpMeasurement:
             raise TypeError(f"main_details must be NtpMainDetails, got {type(self.main_details).__name__}")
         if not isinstance(self.extra_details, NtpExtraDetails):
             raise TypeError(f"extra_details must be NtpExtraDetails, got {type(self.extra_details).__name__}")
+        if not isinstance(self.samples, NtpSamples | None):
+            raise TypeError(f"samples must be NtpSamples or None, got {type(self.samples).__name__}")
+
+    @classmethod
+    def trusted(cls, vantage_point_ip: IPv4Address | IPv6Address | None, server_info: NtpServerInfo,
+                timestamps: NtpTimestamps, main_details: NtpMainDetails, extra_details: NtpExtraDetails,
+                samples: NtpSamples | None = None) -> "NtpMeasurement":
+        """
+        Builds an NtpMeasurement from already validated values, without the type checks of `__post_init__`
+        (see `PreciseTime.trusted`).
+
+        Args:
+            vantage_point_ip (IPv4Address | IPv6Address | None): IP address of the vantage point
+            server_info (NtpServerInfo): Metadata about the NTP server
+            timestamps (NtpTimestamps): NTP timestamps from the exchange
+            main_details (NtpMainDetails): Key metrics
+            extra_details (NtpExtraDetails): Additional fields
+            samples (NtpSamples | None): All the samples of a burst measurement, or None
+
+        Returns:
+            NtpMeasurement: The measurement.
+        """
+        measurement = object.__new__(cls)
+        object.__setattr__(measurement, "vantage_point_ip", vantage_point_ip)
+        object.__setattr__(measurement, "server_info", server_info)
+        object.__setattr__(measurement, "timestamps", timestamps)
+        object.__setattr__(measurement, "main_details", main_details)
+        object.__setattr__(measurement, "extra_details", extra_details)
+        object.__setattr__(measurement, "samples", samples)
+        return measurement
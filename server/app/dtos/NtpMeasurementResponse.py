@@ -7,6 +7,7 @@ from server.app.dtos.PreciseTime import PreciseTime
 from server.app.dtos.ProbeData import ServerLocation
 from server.app.dtos.NtpMeasurement import NtpMeasurement
 from server.app.dtos.NtpMainDetails import NtpMainDetails
+from server.app.dtos.NtpSamples import NtpSamples
 
 
 class MeasurementResult(BaseModel):
@@ -33,7 +34,36 @@ class MeasurementResult(BaseModel):
     leap: int
     jitter: float
     nr_measurements_jitter: int
+    samples: Optional[NtpSamples] = None
 
 
 class MeasurementResponse(BaseModel):
     measurements: List[MeasurementResult]
+    next_cursor: Optional[str] = None
+
+
+class BucketStatistics(BaseModel):
+    min: Optional[float]
+    max: Optional[float]
+    mean: Optional[float]
+    p50: Optional[float]
+    p95: Optional[float]
+
+
+class StratumRange(BaseModel):
+    min: Optional[int]
+    max: Optional[int]
+
+
+class MeasurementBucket(BaseModel):
+    bucket_start: PreciseTime
+    count: int
+    offset: BucketStatistics
+    rtt: BucketStatistics
+    stratum: StratumRange
+    failures: int
+
+
+class MeasurementBucketsResponse(BaseModel):
+    bucket_s: int
+    buckets: List[MeasurementBucket]
@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+
+from server.app.dtos.PreciseTime import PreciseTime
+
+
+@dataclass
+class NtpPacket:
+    """
+    Represents the header of an NTP packet (RFC 5905) as it is sent on the wire.
+    All the timestamps are kept as raw 64-bit NTP timestamps, so no precision is lost.
+
+    Attributes:
+        leap (int): 2-bit leap indicator
+        version (int): The version of the NTP protocol
+        mode (int): The mode of the packet (3 for client requests, 4 for server responses)
+        stratum (int): Stratum level of the server
+        poll (int): The poll interval (log2 seconds)
+        precision (int): Precision of the system clock of the server (log2 seconds)
+        root_delay (PreciseTime): Total round-trip delay to the primary reference source
+        root_dispersion (PreciseTime): An estimate of the maximum error due to clock frequency stability
+        ref_id (int): The reference id of the server
+        ref_time (PreciseTime): Last time the server was synchronized
+        orig_time (PreciseTime): The time the request was sent by the client, as copied by the server (t1)
+        recv_time (PreciseTime): The time the request was received by the server (t2)
+        tx_time (PreciseTime): The time the response was sent by the server (t3)
+    """
+    leap: int
+    version: int
+    mode: int
+    stratum: int
+    poll: int
+    precision: int
+    root_delay: PreciseTime
+    root_dispersion: PreciseTime
+    ref_id: int
+    ref_time: PreciseTime
+    orig_time: PreciseTime
+    recv_time: PreciseTime
+    tx_time: PreciseTime
+
+    def __post_init__(self) -> None:
+        for name in ("leap", "version", "mode", "stratum", "poll", "precision", "ref_id"):
+            if not isinstance(getattr(self, name), int):
+                raise TypeError(f"{name} must be an integer, got {type(getattr(self, name)).__name__}")
+        for name in ("root_delay", "root_dispersion", "ref_time", "orig_time", "recv_time", "tx_time"):
+            if not isinstance(getattr(self, name), PreciseTime):
+                raise TypeError(f"{name} must be a PreciseTime, got {type(getattr(self, name)).__name__}")
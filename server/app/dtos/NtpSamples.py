@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class NtpSamples:
+    """
+    The samples of a burst measurement, where several NTP requests were sent to the same server.
+    Like the clock filter of NTP, the sample with the minimum delay is the one used for the measurement.
+
+    Attributes:
+        offsets (list[float]): The offset of every sample, in seconds, in the order they were received
+        rtts (list[float]): The round-trip delay of every sample, in seconds, in the order they were received
+        best_sample (int): The index of the sample with the minimum delay
+        jitter (float): The jitter computed only from the samples of this burst, in seconds
+    """
+    offsets: list[float]
+    rtts: list[float]
+    best_sample: int
+    jitter: float
+
+    def __post_init__(self) -> None:
+        if not isinstance(self.offsets, list) or not all(isinstance(x, (float, int)) for x in self.offsets):
+            raise TypeError("offsets must be a list of floats")
+        if not isinstance(self.rtts, list) or not all(isinstance(x, (float, int)) for x in self.rtts):
+            raise TypeError("rtts must be a list of floats")
+        if len(self.offsets) != len(self.rtts):
+            raise ValueError("offsets and rtts must have the same length")
+        if not isinstance(self.best_sample, int):
+            raise TypeError(f"best_sample must be an integer, got {type(self.best_sample).__name__}")
+        if not 0 <= self.best_sample < len(self.offsets):
+            raise ValueError("best_sample must be the index of a sample")
+        if not isinstance(self.jitter, (float, int)):
+            raise TypeError(f"jitter must be a float, got {type(self.jitter).__name__}")
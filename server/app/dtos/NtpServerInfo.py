@@ -4,7 +4,7 @@ from ipaddress import IPv4Address, IPv6Address
 from server.app.dtos.ProbeData import ServerLocation
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class NtpServerInfo:
     """
     Represents the relevant metadata of an NTP server.
@@ -35,3 +35,31 @@ class NtpServerInfo:
                 f"ntp_server_ref_parent_ip must be IPv4Address or IPv6Address, got {type(self.ntp_server_ref_parent_ip).__name__}")
         if not isinstance(self.ref_name, str | None):
             raise TypeError(f"ref_name must be str, got {type(self.ref_name).__name__}")
+
+    @classmethod
+    def trusted(cls, ntp_version: int, ntp_server_ip: IPv4Address | IPv6Address | None,
+                ntp_server_location: ServerLocation, ntp_server_name: str | None,
+                ntp_server_ref_parent_ip: IPv4Address | IPv6Address | None, ref_name: str | None) -> "NtpServerInfo":
+        """
+        Builds an NtpServerInfo from already validated values, without the type checks of `__post_init__`
+        (see `PreciseTime.trusted`).
+
+        Args:
+            ntp_version (int): The NTP version
+            ntp_server_ip (IPv4Address | IPv6Address | None): The IP of the server
+            ntp_server_location (ServerLocation): The location of the server
+            ntp_server_name (str | None): The name of the server
+            ntp_server_ref_parent_ip (IPv4Address | IPv6Address | None): The IP of the parent server
+            ref_name (str | None): The name of the parent server
+
+        Returns:
+            NtpServerInfo: The server info.
+        """
+        info = object.__new__(cls)
+        object.__setattr__(info, "ntp_version", ntp_version)
+        object.__setattr__(info, "ntp_server_ip", ntp_server_ip)
+        object.__setattr__(info, "ntp_server_location", ntp_server_location)
+        object.__setattr__(info, "ntp_server_name", ntp_server_name)
+        object.__setattr__(info, "ntp_server_ref_parent_ip", ntp_server_ref_parent_ip)
+        object.__setattr__(info, "ref_name", ref_name)
+        return info
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from server.app.dtos.PreciseTime import PreciseTime
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class NtpTimestamps:
     """
     The four key timestamps used in NTP (Network Time Protocol) exchange
@@ -28,3 +28,26 @@ class NtpTimestamps:
             raise TypeError(f"server_sent_time must be a PreciseTime, got {type(self.server_sent_time).__name__}")
         if not isinstance(self.client_recv_time, PreciseTime):
             raise TypeError(f"client_recv_time must be a PreciseTime, got {type(self.client_recv_time).__name__}")
+
+    @classmethod
+    def trusted(cls, client_sent_time: PreciseTime, server_recv_time: PreciseTime, server_sent_time: PreciseTime,
+                client_recv_time: PreciseTime) -> "NtpTimestamps":
+        """
+        Builds an NtpTimestamps from already validated values, without the type checks of `__post_init__`
+        (see `PreciseTime.trusted`).
+
+        Args:
+            client_sent_time (PreciseTime): t1
+            server_recv_time (PreciseTime): t2
+            server_sent_time (PreciseTime): t3
+            client_recv_time (PreciseTime): t4
+
+        Returns:
+            NtpTimestamps: The timestamps.
+        """
+        timestamps = object.__new__(cls)
+        object.__setattr__(timestamps, "client_sent_time", client_sent_time)
+        object.__setattr__(timestamps, "server_recv_time", server_recv_time)
+        object.__setattr__(timestamps, "server_sent_time", server_sent_time)
+        object.__setattr__(timestamps, "client_recv_time", client_recv_time)
+        return timestamps
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PreciseTime:
     """
     Represents a single NTP timestamp.
@@ -20,3 +20,21 @@ class PreciseTime:
             raise TypeError(f"seconds must be an integer, got {type(self.seconds).__name__}")
         if not isinstance(self.fraction, int | float):
             raise TypeError(f"fraction must be an integer, got {type(self.fraction).__name__}")
+
+    @classmethod
+    def trusted(cls, seconds: int, fraction: int) -> "PreciseTime":
+        """
+        Builds a PreciseTime without the type checks of `__post_init__`. It is only meant for values
+        that were already validated, like the rows of our own database.
+
+        Args:
+            seconds (int): The integer part of the timestamp
+            fraction (int): The fractional part of the timestamp
+
+        Returns:
+            PreciseTime: The timestamp.
+        """
+        time = object.__new__(cls)
+        object.__setattr__(time, "seconds", seconds)
+        object.__setattr__(time, "fraction", fraction)
+        return time
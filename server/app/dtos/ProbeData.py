@@ -3,7 +3,7 @@ from ipaddress import IPv4Address, IPv6Address
 from typing import Tuple
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ServerLocation:
     """
     Represents the geographical location of a RIPE Atlas probe.
@@ -25,6 +25,24 @@ class ServerLocation:
             if not isinstance(self.coordinates[1], (float, int)):
                 raise TypeError(f"coordinates must be float or int, got {type(self.coordinates[1]).__name__}")
 
+    @classmethod
+    def trusted(cls, country_code: str | None, coordinates: Tuple[float, float] | None) -> "ServerLocation":
+        """
+        Builds a ServerLocation from already validated values, without the type checks of `__post_init__`
+        (see `PreciseTime.trusted`).
+
+        Args:
+            country_code (str | None): The two-letter country code
+            coordinates (Tuple[float, float] | None): The latitude and longitude
+
+        Returns:
+            ServerLocation: The location.
+        """
+        location = object.__new__(cls)
+        object.__setattr__(location, "country_code", country_code)
+        object.__setattr__(location, "coordinates", coordinates)
+        return location
+
 
 @dataclass
 class ProbeData:
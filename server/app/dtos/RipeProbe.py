@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+from typing import Any, Tuple
+
+
+@dataclass(slots=True, frozen=True)
+class RipeProbe:
+    """
+    Represents a RIPE Atlas probe of the local probe catalogue, with the attributes used to select
+    the probes of a measurement.
+
+    Attributes:
+        id (int): The unique identifier of the probe
+        asn_v4 (int | None): The ASN of the IPv4 network of the probe
+        asn_v6 (int | None): The ASN of the IPv6 network of the probe
+        prefix_v4 (str | None): The IPv4 prefix of the probe
+        prefix_v6 (str | None): The IPv6 prefix of the probe
+        country_code (str | None): Two-letter ISO 3166-1 alpha-2 country code of the probe
+        status (int): The status of the probe (1 means connected)
+        is_public (bool): Whether the probe can be used by everyone
+        tags (frozenset[str]): The slugs of the tags of the probe (e.g. 'system-ipv4-works')
+        coordinates (Tuple[float, float] | None): The latitude and longitude of the probe
+    """
+    id: int
+    asn_v4: int | None
+    asn_v6: int | None
+    prefix_v4: str | None
+    prefix_v6: str | None
+    country_code: str | None
+    status: int
+    is_public: bool
+    tags: frozenset[str]
+    coordinates: Tuple[float, float] | None
+
+    @property
+    def geometry(self) -> dict[str, Any]:
+        """
+        Returns:
+            dict[str, Any]: The location of the probe as a GeoJSON point, like the probes of the RIPE Atlas API
+            (the coordinates are [longitude, latitude], or None if the location is unknown).
+        """
+        if self.coordinates is None:
+            return {"type": "Point", "coordinates": None}
+        return {"type": "Point", "coordinates": [self.coordinates[1], self.coordinates[0]]}
@@ -7,7 +7,13 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from server.app.utils.load_config_data import verify_if_config_is_set
-from server.app.db_config import init_engine
+from server.app.utils.location_resolver import close_geo_readers
+from server.app.utils.ip_utils import preload_anycast_indexes
+from server.app.db_config import init_engine, get_session_maker
+from server.app.db.measurement_writer import start_measurement_writer, stop_measurement_writer
+from server.app.db.rollups import start_rollup_job, stop_rollup_job
+from server.app.utils.probe_catalogue import start_probe_catalogue_job, stop_probe_catalogue_job
+from server.app.utils.ripe_http import close_ripe_http_client
 from server.app.models.Base import Base
 from server.app.api.routing import router
 from server.app.rate_limiter import limiter
@@ -46,7 +52,11 @@ def create_app(dev: bool = True) -> FastAPI:
         """
         Application lifespan context manager.
 
-        Initializes the database schema if in development mode.
+        Initializes the database schema if in development mode, builds the anycast prefix indexes
+        and starts the background writer of the measurements, the job that updates the rollup tables
+        and the job that keeps the local RIPE Atlas probe catalogue in sync.
+        On shutdown, it writes the measurements that are still queued, closes the MaxMind database readers
+        and the pooled connections to RIPE Atlas.
 
         Args:
             app (FastAPI): The FastAPI application instance.
@@ -57,7 +67,16 @@ def create_app(dev: bool = True) -> FastAPI:
         if dev:
             engine = init_engine()
             Base.metadata.create_all(bind=engine)
+        preload_anycast_indexes()
+        start_measurement_writer(get_session_maker())
+        start_rollup_job(get_session_maker())
+        start_probe_catalogue_job()
         yield
+        stop_probe_catalogue_job()
+        stop_rollup_job()
+        stop_measurement_writer()
+        close_geo_readers()
+        close_ripe_http_client()
 
     app = FastAPI(
         lifespan=lifespan,
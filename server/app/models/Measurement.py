@@ -1,14 +1,12 @@
 from ipaddress import IPv4Address, IPv6Address
 
 import sqlalchemy
-from sqlalchemy import ForeignKey, Integer, SmallInteger, Double, Text, BigInteger, PrimaryKeyConstraint, TypeDecorator, \
-    String, Dialect, Index
-from sqlalchemy.orm import relationship, mapped_column, Mapped
+from sqlalchemy import Integer, SmallInteger, Double, Text, BigInteger, TypeDecorator, String, Dialect, Index
+from sqlalchemy.orm import mapped_column, Mapped
 from sqlalchemy.dialects.postgresql import INET
 from sqlalchemy.sql.type_api import TypeEngine
 
 from server.app.models.Base import Base
-from server.app.models.Time import Time
 
 
 class IPAddress(TypeDecorator):
@@ -29,6 +27,11 @@ class IPAddress(TypeDecorator):
 
 
 class Measurement(Base):
+    """
+    One NTP measurement, together with its four timestamps. The table is range-partitioned by month
+    on `client_sent` in PostgreSQL (see `server.app.db.partitions`), so the queries on a time range only read
+    the partitions of those months. The partition key has to be part of the primary key.
+    """
     __tablename__ = "measurements"
 
     __table_args__ = (
@@ -37,13 +40,17 @@ class Measurement(Base):
             "ntp_server_name",
             postgresql_where=sqlalchemy.text("ntp_server_name IS NOT NULL")
         ),
-        # Regular index on IP
-        Index("idx_meas_server_ip", "ntp_server_ip"),
-        # Foreign‑key join
-        Index("idx_meas_time_id", "time_id"),
+        # History of an IP or a domain name in a time range. The id makes the (client_sent, id) pages index ranges.
+        Index("idx_meas_server_ip_client_sent", "ntp_server_ip", "client_sent", "id"),
+        Index("idx_meas_server_name_client_sent", "ntp_server_name", "client_sent", "id"),
+        # The latest measurements of an IP (jitter). It covers all the timestamps, so it allows an index-only scan.
+        Index("idx_meas_server_ip_jitter", "ntp_server_ip", sqlalchemy.text("client_sent DESC"),
+              postgresql_include=["client_sent_prec", "server_recv", "server_recv_prec", "server_sent",
+                                  "server_sent_prec", "client_recv", "client_recv_prec"]),
+        {"postgresql_partition_by": "RANGE (client_sent)"},
     )
 
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    id: Mapped[int] = mapped_column(BigInteger, sqlalchemy.Sequence("measurements_id_seq"), primary_key=True)
     vantage_point_ip: Mapped[str] = mapped_column(IPAddress, nullable=True)
     ntp_server_ip: Mapped[str] = mapped_column(IPAddress, nullable=True)
     ntp_server_name: Mapped[str] = mapped_column(Text, nullable=True)
@@ -51,7 +58,6 @@ class Measurement(Base):
     ntp_server_ref_parent: Mapped[str | None] = mapped_column(IPAddress, nullable=True)
     ref_name: Mapped[str] = mapped_column(Text, nullable=True)
 
-    time_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("times.id"), nullable=True)
     time_offset: Mapped[float] = mapped_column(Double, nullable=True)
 
     rtt: Mapped[float] = mapped_column(Double, nullable=True)
@@ -66,4 +72,12 @@ class Measurement(Base):
     ntp_last_sync_time: Mapped[int] = mapped_column(BigInteger, nullable=True)
     ntp_last_sync_time_prec: Mapped[int] = mapped_column(BigInteger, nullable=True)
 
-    timestamps: Mapped["Time"] = relationship("Time", backref="measurements")
+    # the timestamps of the measurement (NTP seconds and fraction)
+    client_sent: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    client_sent_prec: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    server_recv: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    server_recv_prec: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    server_sent: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    server_sent_prec: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    client_recv: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    client_recv_prec: Mapped[int] = mapped_column(BigInteger, nullable=True)
@@ -0,0 +1,82 @@
+from sqlalchemy import BigInteger, Double, Integer, Text, Index
+from sqlalchemy.orm import mapped_column, Mapped, declared_attr
+
+from server.app.models.Base import Base
+from server.app.models.Measurement import IPAddress
+
+
+class MeasurementRollup(Base):
+    """
+    The columns of a rollup table: the statistics of the measurements of one NTP server (IP address and name)
+    in one time bucket. The sums are kept instead of the means, so new measurements can be merged in.
+    A measurement with stratum 0 or 16 (or more), an unsynchronized server, is counted as a failure.
+    """
+    __abstract__ = True
+
+    ntp_server_ip: Mapped[str] = mapped_column(IPAddress, primary_key=True)
+    bucket_start: Mapped[int] = mapped_column(BigInteger, primary_key=True)  # in NTP seconds
+    ntp_server_name: Mapped[str] = mapped_column(Text, primary_key=True)  # "" if the measurement had no name
+
+    count: Mapped[int] = mapped_column(Integer)
+    offset_min: Mapped[float] = mapped_column(Double, nullable=True)
+    offset_max: Mapped[float] = mapped_column(Double, nullable=True)
+    offset_sum: Mapped[float] = mapped_column(Double, nullable=True)
+    rtt_min: Mapped[float] = mapped_column(Double, nullable=True)
+    rtt_max: Mapped[float] = mapped_column(Double, nullable=True)
+    rtt_sum: Mapped[float] = mapped_column(Double, nullable=True)
+    stratum_min: Mapped[int] = mapped_column(Integer, nullable=True)
+    stratum_max: Mapped[int] = mapped_column(Integer, nullable=True)
+    failures: Mapped[int] = mapped_column(Integer)
+
+    @declared_attr.directive
+    def __table_args__(cls) -> tuple[Index]:
+        """
+        The history of a domain name in a time range. The history of an IP uses the primary key.
+
+        Returns:
+            tuple[Index]: The indexes of the table.
+        """
+        return (Index(f"idx_{cls.__tablename__}_name_bucket", "ntp_server_name", "bucket_start"),)
+
+
+class MeasurementRollup1m(MeasurementRollup):
+    """
+    The statistics of the measurements per server and per minute.
+    """
+    __tablename__ = "measurement_rollups_1m"
+
+
+class MeasurementRollup1h(MeasurementRollup):
+    """
+    The statistics of the measurements per server and per hour.
+    """
+    __tablename__ = "measurement_rollups_1h"
+
+
+class MeasurementRollup1d(MeasurementRollup):
+    """
+    The statistics of the measurements per server and per day.
+    """
+    __tablename__ = "measurement_rollups_1d"
+
+
+class RollupState(Base):
+    """
+    The lock of the rollups: the row is locked while a batch is merged, so the workers of the server do not merge
+    the same measurements twice. It is created when the measurements stored before the rollups existed are queued.
+    """
+    __tablename__ = "rollup_state"
+
+    name: Mapped[str] = mapped_column(Text, primary_key=True)
+
+
+class RollupQueue(Base):
+    """
+    The measurements that are not merged into the rollup tables yet. A row is added in the same transaction
+    as its measurement, so it becomes visible exactly when the measurement is committed, whatever the order
+    of the ids. The rollup job deletes the rows it merged.
+    """
+    __tablename__ = "measurement_rollup_queue"
+
+    measurement_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    client_sent: Mapped[int] = mapped_column(BigInteger)
@@ -1,7 +1,14 @@
 from server.app.dtos.NtpTimestamps import NtpTimestamps
 from server.app.dtos.PreciseTime import PreciseTime
+from server.app.dtos.NtpFixedTime import FRACTION_BITS, NtpFixedTimeArray
 import numpy as np
 
+# one NTP timestamp: the seconds and the 32-bit fraction
+NTP_TIMESTAMP_DTYPE = np.dtype([("seconds", np.int64), ("fraction", np.uint32)])
+# the four timestamps of a measurement (t1, t2, t3 and t4), as one row of a structured array
+NTP_TIMESTAMP_NAMES = ("client_sent", "server_recv", "server_sent", "client_recv")
+NTP_TIMESTAMPS_DTYPE = np.dtype([(name, NTP_TIMESTAMP_DTYPE) for name in NTP_TIMESTAMP_NAMES])
+
 
 class NtpCalculator:
 
@@ -20,20 +27,10 @@ class NtpCalculator:
         Returns:
             float: Clock offset in seconds
         """
-        # a = t2 - t1
-        a = PreciseTime(
-            timestamps.server_recv_time.seconds - timestamps.client_sent_time.seconds,
-            timestamps.server_recv_time.fraction - timestamps.client_sent_time.fraction
-        )
-        # b = t3 - t4
-        b = PreciseTime(
-            timestamps.server_sent_time.seconds - timestamps.client_recv_time.seconds,
-            timestamps.server_sent_time.fraction - timestamps.client_recv_time.fraction
-        )
-
-        offset_seconds: float = (a.seconds + b.seconds) / 2.0
-        offset_fraction: float = (a.fraction + b.fraction) / 2.0
-        return offset_seconds + offset_fraction / (2 ** 32)
+        # a = t2 - t1 and b = t3 - t4, in units of 2^-32 seconds
+        a = NtpCalculator.precise_time_difference(timestamps.server_recv_time, timestamps.client_sent_time)
+        b = NtpCalculator.precise_time_difference(timestamps.server_sent_time, timestamps.client_recv_time)
+        return (a + b) / 2 ** 33
 
     @staticmethod
     def calculate_delay(timestamps: NtpTimestamps) -> float:
@@ -47,16 +44,23 @@ class NtpCalculator:
         Returns:
             float: Delay in seconds
         """
-        a = PreciseTime(
-            timestamps.client_recv_time.seconds - timestamps.client_sent_time.seconds,
-            timestamps.client_recv_time.fraction - timestamps.client_sent_time.fraction
-        )
-        b = PreciseTime(
-            timestamps.server_sent_time.seconds - timestamps.server_recv_time.seconds,
-            timestamps.server_sent_time.fraction - timestamps.server_recv_time.fraction
-        )
-        ans: float = (a.seconds - b.seconds) + (b.fraction - a.fraction) / (2 ** 32)
-        return ans
+        a = NtpCalculator.precise_time_difference(timestamps.client_recv_time, timestamps.client_sent_time)
+        b = NtpCalculator.precise_time_difference(timestamps.server_sent_time, timestamps.server_recv_time)
+        return (a - b) / 2 ** 32
+
+    @staticmethod
+    def precise_time_difference(later: PreciseTime, earlier: PreciseTime) -> int:
+        """
+        Subtracts two timestamps exactly, as 64-bit fixed-point integers.
+
+        Args:
+            later (PreciseTime): The timestamp to subtract from.
+            earlier (PreciseTime): The timestamp to subtract.
+
+        Returns:
+            int: The difference in units of 2^-32 seconds.
+        """
+        return ((int(later.seconds) - int(earlier.seconds)) << FRACTION_BITS) + int(later.fraction) - int(earlier.fraction)
 
     @staticmethod
     def calculate_float_time(time: PreciseTime) -> float:
@@ -69,16 +73,17 @@ class NtpCalculator:
         Returns:
             float: Time in seconds.
         """
-        ans: float = time.seconds + time.fraction / (2 ** 32)
+        ans: float = ((int(time.seconds) << FRACTION_BITS) + int(time.fraction)) / 2 ** 32
         return ans
 
     @staticmethod
-    def calculate_jitter(offsets: list[float]) -> float:
+    def calculate_jitter(offsets: list[float] | np.ndarray) -> float:
         """
         Calculates the jitter of multiple NTP measurements based on their offsets.
 
         Args:
-            offsets (list[float]): A list of floats representing the offsets to calculate jitter.
+            offsets (list[float] | np.ndarray): The offsets to calculate jitter. The jitter is measured against
+                the first one.
 
         Returns:
             float: Jitter in seconds.
@@ -86,8 +91,99 @@ class NtpCalculator:
         if len(offsets) <= 1:
             return 0.0
 
-        s = np.sum([(offset - offsets[0]) ** 2 for offset in offsets[1:]])
+        values = np.asarray(offsets, dtype=np.float64)
+        s = np.sum((values[1:] - values[0]) ** 2)
         denominator = len(offsets) - 1
         jitter: float = float(np.sqrt(s / denominator))
 
         return jitter
+
+    @staticmethod
+    def timestamps_to_array(timestamps: list[NtpTimestamps]) -> np.ndarray:
+        """
+        Converts NTP timestamps objects into a structured array that the batch methods accept.
+
+        Args:
+            timestamps (list[NtpTimestamps]): The timestamps of the measurements.
+
+        Returns:
+            np.ndarray: A structured array with the NTP_TIMESTAMPS_DTYPE, one row per measurement.
+        """
+        return np.array([((t.client_sent_time.seconds, t.client_sent_time.fraction),
+                          (t.server_recv_time.seconds, t.server_recv_time.fraction),
+                          (t.server_sent_time.seconds, t.server_sent_time.fraction),
+                          (t.client_recv_time.seconds, t.client_recv_time.fraction)) for t in timestamps],
+                        dtype=NTP_TIMESTAMPS_DTYPE)
+
+    @staticmethod
+    def to_fixed_point(timestamps: np.ndarray) -> np.ndarray:
+        """
+        Converts the four timestamps of many measurements into 64-bit NTP fixed-point numbers
+        (seconds << 32 | fraction).
+
+        Args:
+            timestamps (np.ndarray): Either a structured array with the NTP_TIMESTAMPS_DTYPE,
+                or an array of shape (n, 4) that is already in fixed point (t1, t2, t3 and t4).
+
+        Returns:
+            np.ndarray: A uint64 array of shape (n, 4).
+        """
+        if timestamps.dtype.names is None:
+            return np.asarray(timestamps, dtype=np.uint64).reshape(-1, 4)
+        columns = [NtpFixedTimeArray.from_columns(timestamps[name]["seconds"], timestamps[name]["fraction"]).values
+                   for name in NTP_TIMESTAMP_NAMES]
+        return np.stack(columns, axis=-1).reshape(-1, 4)
+
+    @staticmethod
+    def fixed_point_difference(later: np.ndarray, earlier: np.ndarray) -> np.ndarray:
+        """
+        Subtracts two arrays of 64-bit NTP fixed-point timestamps without losing precision.
+        The subtraction wraps around in uint64, so the result is exact as long as the difference
+        is less than 2^31 seconds.
+
+        Args:
+            later (np.ndarray): The uint64 timestamps to subtract from.
+            earlier (np.ndarray): The uint64 timestamps to subtract.
+
+        Returns:
+            np.ndarray: The differences, as int64 fixed-point numbers (the unit is 2^-32 seconds).
+        """
+        differences: np.ndarray = (later - earlier).view(np.int64)
+        return differences
+
+    @staticmethod
+    def calculate_offsets(timestamps: np.ndarray) -> np.ndarray:
+        """
+        Calculates the clock offsets of many measurements in one vectorized pass.
+        It is the batch version of `calculate_offset`: ((t2 - t1) + (t3 - t4)) / 2.
+        The differences are computed on integers, so only the final result is rounded to a float.
+
+        Args:
+            timestamps (np.ndarray): The timestamps of the measurements (see `to_fixed_point`).
+
+        Returns:
+            np.ndarray: The clock offsets in seconds.
+        """
+        t = NtpCalculator.to_fixed_point(timestamps)
+        a = NtpCalculator.fixed_point_difference(t[:, 1], t[:, 0])
+        b = NtpCalculator.fixed_point_difference(t[:, 2], t[:, 3])
+        offsets: np.ndarray = (a + b) / float(2 ** 33)
+        return offsets
+
+    @staticmethod
+    def calculate_delays(timestamps: np.ndarray) -> np.ndarray:
+        """
+        Calculates the round-trip delays of many measurements in one vectorized pass.
+        It is the batch version of `calculate_delay`: (t4 - t1) - (t3 - t2).
+
+        Args:
+            timestamps (np.ndarray): The timestamps of the measurements (see `to_fixed_point`).
+
+        Returns:
+            np.ndarray: The delays in seconds.
+        """
+        t = NtpCalculator.to_fixed_point(timestamps)
+        a = NtpCalculator.fixed_point_difference(t[:, 3], t[:, 0])
+        b = NtpCalculator.fixed_point_difference(t[:, 2], t[:, 1])
+        delays: np.ndarray = (a - b) / float(2 ** 32)
+        return delays
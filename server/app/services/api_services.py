@@ -1,32 +1,49 @@
+import asyncio
+import math
+
+import orjson
+
 from sqlalchemy.orm import Session
 
-from server.app.utils.location_resolver import get_asn_for_ip
+from server.app.utils.location_resolver import lookup_ip, get_geo_cache_stats
 from server.app.utils.ip_utils import is_this_ip_anycast
-from server.app.utils.perform_measurements import perform_ntp_measurement_domain_name_list
+from server.app.utils.perform_measurements import perform_ntp_measurement_domain_name_list_async
 from server.app.utils.ip_utils import get_server_ip
 from server.app.models.CustomError import InputError, RipeMeasurementError, DNSError
-from server.app.utils.load_config_data import get_nr_of_measurements_for_jitter
-from server.app.utils.calculations import calculate_jitter_from_measurements, human_date_to_ntp_precise_time
+from server.app.utils.load_config_data import get_nr_of_measurements_for_jitter, get_history_stream_batch_size, \
+    get_history_max_page_size
+from server.app.utils.calculations import calculate_jitter_from_measurements, human_date_to_ntp_precise_time, \
+    lttb_indices
 from server.app.utils.ip_utils import ip_to_str
-from typing import Any, Optional
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
 
-from server.app.utils.ripe_fetch_data import check_all_measurements_scheduled
+from server.app.utils.ripe_fetch_data import check_all_measurements_scheduled, get_probe_cache_stats
 from server.app.utils.perform_measurements import perform_ripe_measurement_domain_name
 from server.app.utils.validate import ensure_utc, is_ip_address, parse_ip
 from server.app.services.NtpCalculator import NtpCalculator
-from server.app.utils.perform_measurements import perform_ntp_measurement_ip, \
+from server.app.utils.perform_measurements import perform_ntp_measurement_ip_async, \
     perform_ripe_measurement_ip
 from datetime import datetime
 from server.app.dtos.ProbeData import ServerLocation
 from server.app.dtos.RipeMeasurement import RipeMeasurement
 from server.app.utils.ripe_fetch_data import parse_data_from_ripe_measurement, get_data_from_ripe_measurement
-from server.app.db.db_interaction import insert_measurement
-from server.app.db.db_interaction import get_measurements_timestamps_ip, get_measurements_timestamps_dn
+from server.app.db.measurement_writer import store_measurements, get_measurement_writer_stats
+from server.app.utils.ripe_http import get_ripe_http_latency_histograms
+from server.app.db.rollups import rollups_available, choose_rollup_granularity, get_rollup_buckets_ip, \
+    get_rollup_buckets_dn
+from server.app.db.db_interaction import get_measurement_buckets_ip, get_measurement_buckets_dn, \
+    get_measurement_points_ip, get_measurement_points_dn, get_measurements_by_ids, \
+    get_measurement_columns_page, stream_measurement_columns, parse_stored_ip
 from server.app.dtos.NtpMeasurement import NtpMeasurement
+from server.app.dtos.PreciseTime import PreciseTime
+from server.app.utils.enrichment_context import EnrichmentContext
 
 
 def get_format(measurement: NtpMeasurement, jitter: Optional[float] = None,
-               nr_jitter_measurements: int = get_nr_of_measurements_for_jitter()) -> dict[str, Any]:
+               nr_jitter_measurements: int = get_nr_of_measurements_for_jitter(),
+               context: Optional[EnrichmentContext] = None) -> dict[str, Any]:
     """
     Format an NTP measurement object into a dictionary suitable for JSON serialization.
 
@@ -34,6 +51,8 @@ def get_format(measurement: NtpMeasurement, jitter: Optional[float] = None,
         measurement (NtpMeasurement): An object representing the NTP measurement result
         jitter (Optional[float]): Optional jitter value if multiple measurements are performed
         nr_jitter_measurements (int): The number of measurements used in the jitter calculation
+        context (Optional[EnrichmentContext]): The lookups of the current response, so the anycast and ASN lookups
+            of a server IP are done once per response. None does them for every measurement.
 
     Returns:
         dict: A dictionary containing key measurement details like this:
@@ -41,14 +60,22 @@ def get_format(measurement: NtpMeasurement, jitter: Optional[float] = None,
             - Timestamps (client sent time, server receive time, server sent time, client receive time)
             - Measurement metrics (offset, delay, stratum, precision, reachability)
             - Extra details (root delay, last sync time, leap indicator)
+            - The samples of a burst measurement (offsets, delays and the jitter of the burst), if any
     """
+    server_ip = ip_to_str(measurement.server_info.ntp_server_ip)
+    if context is None:
+        ip_is_anycast = is_this_ip_anycast(server_ip)
+        asn = lookup_ip(server_ip).asn
+    else:
+        ip_is_anycast = context.is_anycast(server_ip)
+        asn = context.lookup_ip(server_ip).asn
     return {
         "ntp_version": measurement.server_info.ntp_version,
         "vantage_point_ip": ip_to_str(measurement.vantage_point_ip),
-        "ntp_server_ip": ip_to_str(measurement.server_info.ntp_server_ip),
+        "ntp_server_ip": server_ip,
         "ntp_server_name": measurement.server_info.ntp_server_name,
         "ntp_server_location": {
-            "ip_is_anycast": is_this_ip_anycast(ip_to_str(measurement.server_info.ntp_server_ip)),
+            "ip_is_anycast": ip_is_anycast,
             "country_code": measurement.server_info.ntp_server_location.country_code,
             "coordinates": measurement.server_info.ntp_server_location.coordinates
         },
@@ -81,7 +108,7 @@ def get_format(measurement: NtpMeasurement, jitter: Optional[float] = None,
         "root_delay": NtpCalculator.calculate_float_time(measurement.extra_details.root_delay),
         "poll": measurement.extra_details.poll,
         "root_dispersion": NtpCalculator.calculate_float_time(measurement.extra_details.root_dispersion),
-        "asn_ntp_server": get_asn_for_ip(str(measurement.server_info.ntp_server_ip)),
+        "asn_ntp_server": asn,
         "ntp_last_sync_time": {
             "seconds": measurement.extra_details.ntp_last_sync_time.seconds,
             "fraction": measurement.extra_details.ntp_last_sync_time.fraction
@@ -90,10 +117,136 @@ def get_format(measurement: NtpMeasurement, jitter: Optional[float] = None,
         "leap": measurement.extra_details.leap,
         # if the server has multiple IPs addresses we should show them to the client
         "jitter": jitter,
-        "nr_measurements_jitter": nr_jitter_measurements
+        "nr_measurements_jitter": nr_jitter_measurements,
+        # only for burst measurements: every sample of the burst and the jitter of the burst alone
+        "samples": None if measurement.samples is None else {
+            "offsets": measurement.samples.offsets,
+            "rtts": measurement.samples.rtts,
+            "best_sample": measurement.samples.best_sample,
+            "jitter": measurement.samples.jitter
+        }
+    }
+
+
+# the columns of the `measurements` table that the history needs, in the order of the rows of `get_row_format`
+HISTORY_COLUMNS = [
+    "id", "vantage_point_ip", "ntp_server_ip", "ntp_server_name", "ntp_version", "ntp_server_ref_parent", "ref_name",
+    "time_offset", "rtt", "stratum", "precision", "reachability", "root_delay", "root_delay_prec", "poll",
+    "root_dispersion", "root_dispersion_prec", "ntp_last_sync_time", "ntp_last_sync_time_prec",
+    "client_sent", "client_sent_prec", "server_recv", "server_recv_prec", "server_sent", "server_sent_prec",
+    "client_recv", "client_recv_prec"
+]
+
+
+def stored_ip_to_str(ip: Any) -> Optional[str]:
+    """
+    Converts an IP address read from the database into the string that `get_format` returns.
+
+    Args:
+        ip (Any): The IP address (a string or an address object, depending on the database driver), or None.
+
+    Returns:
+        Optional[str]: The IP address, or None if there is no (valid) address.
+    """
+    if not ip:
+        return None
+    try:
+        return ip_to_str(parse_stored_ip(ip))
+    except ValueError:
+        return None
+
+
+def enrich_server_ip(ip: Any, context: EnrichmentContext) -> dict[str, Any]:
+    """
+    Computes the fields of a formatted measurement that only depend on the IP address of the NTP server:
+    its location, whether it is anycast, and its ASN.
+
+    Args:
+        ip (Any): The IP address of the NTP server, as read from the database.
+        context (EnrichmentContext): The lookups of the current response.
+
+    Returns:
+        dict[str, Any]: The IP address under "ip", the location under "location" and the ASN under "asn".
+    """
+    server_ip = stored_ip_to_str(ip)
+    geo = context.lookup_ip(server_ip)
+    return {
+        "ip": server_ip,
+        "location": {
+            "ip_is_anycast": context.is_anycast(server_ip),
+            "country_code": geo.country_code,
+            "coordinates": geo.coordinates
+        },
+        "asn": geo.asn
+    }
+
+
+def get_row_format(row: Sequence[Any], server: dict[str, Any]) -> dict[str, Any]:
+    """
+    Formats a row of the history directly, without building an NtpMeasurement first.
+    The result is the same as `get_format` of the measurement of the row, without jitter.
+
+    Args:
+        row (Sequence[Any]): The values of the `HISTORY_COLUMNS` of the measurement, in this order.
+        server (dict[str, Any]): The fields of the NTP server of the row (see `enrich_server_ip`).
+
+    Returns:
+        dict[str, Any]: The formatted measurement.
+    """
+    (_, vantage_point_ip, _, ntp_server_name, ntp_version, ntp_server_ref_parent, ref_name, offset, rtt, stratum,
+     precision, reachability, root_delay, root_delay_prec, poll, root_dispersion, root_dispersion_prec,
+     ntp_last_sync_time, ntp_last_sync_time_prec, client_sent, client_sent_prec, server_recv, server_recv_prec,
+     server_sent, server_sent_prec, client_recv, client_recv_prec) = row
+    return {
+        "ntp_version": ntp_version,
+        "vantage_point_ip": stored_ip_to_str(vantage_point_ip),
+        "ntp_server_ip": server["ip"],
+        "ntp_server_name": ntp_server_name,
+        "ntp_server_location": server["location"],
+        "ntp_server_ref_parent_ip": stored_ip_to_str(ntp_server_ref_parent),
+        "ref_name": ref_name,
+
+        "client_sent_time": {"seconds": client_sent, "fraction": client_sent_prec},
+        "server_recv_time": {"seconds": server_recv, "fraction": server_recv_prec},
+        "server_sent_time": {"seconds": server_sent, "fraction": server_sent_prec},
+        "client_recv_time": {"seconds": client_recv, "fraction": client_recv_prec},
+
+        "offset": offset,
+        "rtt": rtt,
+        "stratum": stratum,
+        "precision": precision,
+        "reachability": reachability,
+
+        "root_delay": NtpCalculator.calculate_float_time(PreciseTime.trusted(root_delay, root_delay_prec)),
+        "poll": poll,
+        "root_dispersion": NtpCalculator.calculate_float_time(PreciseTime.trusted(root_dispersion,
+                                                                                  root_dispersion_prec)),
+        "asn_ntp_server": server["asn"],
+        "ntp_last_sync_time": {"seconds": ntp_last_sync_time, "fraction": ntp_last_sync_time_prec},
+        "leap": 0,
+        "jitter": None,
+        "nr_measurements_jitter": 0,
+        "samples": None
     }
 
 
+def format_history_rows(rows: Iterable[Sequence[Any]], context: EnrichmentContext) -> list[dict[str, Any]]:
+    """
+    Formats rows of the history (see `get_row_format`). The location, anycast and ASN lookups are done once
+    per distinct IP address of an NTP server in the response, not once per row.
+
+    Args:
+        rows (Iterable[Sequence[Any]]): The rows, with the values of the `HISTORY_COLUMNS`.
+        context (EnrichmentContext): The lookups of the current response. It can be shared by the batches
+            of one response.
+
+    Returns:
+        list[dict[str, Any]]: The formatted measurements.
+    """
+    return [get_row_format(row, context.resolve("server", row[2], lambda ip: enrich_server_ip(ip, context)))
+            for row in rows]
+
+
 def get_ripe_format(measurement: RipeMeasurement) -> dict[str, Any]:
     """
         Converts a RipeMeasurement object into a standardized dictionary format.
@@ -141,7 +294,7 @@ def get_ripe_format(measurement: RipeMeasurement) -> dict[str, Any]:
         "root_delay": NtpCalculator.calculate_float_time(measurement.ntp_measurement.extra_details.root_delay),
         "root_dispersion": NtpCalculator.calculate_float_time(
             measurement.ntp_measurement.extra_details.root_dispersion),
-        "asn_ntp_server": get_asn_for_ip(str(measurement.ntp_measurement.server_info.ntp_server_ip)),
+        "asn_ntp_server": lookup_ip(ip_to_str(measurement.ntp_measurement.server_info.ntp_server_ip)).asn,
         "ref_id": measurement.ref_id,
         "result": [
             {
@@ -186,8 +339,59 @@ def override_desired_ip_type_if_input_is_ip(target_server: str, wanted_ip_type:
         return 6
     return wanted_ip_type
 
-def measure(server: str, wanted_ip_type: int, session: Session, client_ip: Optional[str] = None,
-            measurement_no: int = get_nr_of_measurements_for_jitter()) -> list[tuple[
+def store_measurement_and_get_jitter(measurement: NtpMeasurement, session: Session,
+                                     measurement_no: int = get_nr_of_measurements_for_jitter()) -> tuple[float, int]:
+    """
+    Stores a measurement (through the write-behind queue) and calculates its jitter from the previous measurements
+    of the same server. For a burst measurement, the jitter of the burst is used instead, and the previous measurements are not queried.
+
+    Args:
+        measurement (NtpMeasurement): The measurement to store.
+        session (Session): The currently active database session.
+        measurement_no (int): How many previous measurements to use for the jitter.
+
+    Returns:
+        tuple[float, int]: The jitter and the number of previous measurements used for it.
+    """
+    # the jitter is calculated before the measurement is stored, so it is not counted as its own predecessor
+    if measurement.samples is not None:
+        # a burst measurement has its own jitter, so we do not need the previous measurements
+        jitter = measurement.samples.jitter, len(measurement.samples.offsets) - 1
+    else:
+        jitter = calculate_jitter_from_measurements(session, measurement, measurement_no)
+    store_measurements([measurement], session)
+    return jitter
+
+
+def store_measurements_and_get_jitter(measurements: list[NtpMeasurement], session: Session,
+                                      measurement_no: int = get_nr_of_measurements_for_jitter()) -> list[
+    tuple[float, int]]:
+    """
+    Stores many measurements at once (through the write-behind queue) and calculates the jitter of each of them,
+    in the same way as `store_measurement_and_get_jitter`.
+
+    Args:
+        measurements (list[NtpMeasurement]): The measurements to store.
+        session (Session): The currently active database session.
+        measurement_no (int): How many previous measurements to use for the jitter.
+
+    Returns:
+        list[tuple[float, int]]: The jitter and the number of previous measurements used for it,
+        in the same order as the measurements.
+    """
+    # the jitters are calculated before the measurements are stored, so they are not counted as their own predecessors
+    jitters = []
+    for m in measurements:
+        if m.samples is not None:
+            jitters.append((m.samples.jitter, len(m.samples.offsets) - 1))
+        else:
+            jitters.append(calculate_jitter_from_measurements(session, m, measurement_no))
+    store_measurements(measurements, session)
+    return jitters
+
+
+async def measure(server: str, wanted_ip_type: int, session: Session, client_ip: Optional[str] = None,
+                  measurement_no: int = get_nr_of_measurements_for_jitter(), samples: int = 1) -> list[tuple[
     NtpMeasurement, float, int]] | None:
     """
     Performs an NTP measurement for a given server (IP or domain name) and stores the result in the database.
@@ -196,12 +400,17 @@ def measure(server: str, wanted_ip_type: int, session: Session, client_ip: Optio
     then performs an NTP measurement using the appropriate method. The result is inserted
     into the database and returned.
 
+    It is a coroutine: the NTP requests run on the asyncio NTP engine, and the blocking database work
+    runs in a worker thread, so the event loop can serve other requests in the meantime.
+
     Args:
         server (str): A string representing either an IPv4/IPv6 address or a domain name.
         wanted_ip_type (int): The IP type that we want to measure. Used for domain names.
         session (Session): The currently active database session.
         client_ip (Optional[str]): The client IP or None if it was not provided.
         measurement_no (int): How many extra measurements to perform if the jitter_flag is True.
+        samples (int): How many NTP requests to send to every server (burst mode if it is more than 1).
+            The jitter of a burst measurement is calculated from its own samples.
 
     Returns:
         list[tuple[NtpMeasurement, float, int]] | None:
@@ -218,34 +427,29 @@ def measure(server: str, wanted_ip_type: int, session: Session, client_ip: Optio
     """
     try:
         if is_ip_address(server) is not None:
-            m = perform_ntp_measurement_ip(server)
+            m = await perform_ntp_measurement_ip_async(server, samples=samples)
             if m is not None:
-                jitter = 0.0
-                nr_jitter_measurements = 0
-                insert_measurement(m, session)
-                result = calculate_jitter_from_measurements(session, m, measurement_no)
-                # if result is not None:
-                jitter, nr_jitter_measurements = result
+                jitter, nr_jitter_measurements = await asyncio.to_thread(store_measurement_and_get_jitter,
+                                                                         m, session, measurement_no)
                 return [(m, jitter, nr_jitter_measurements)]
             # the measurement failed
             print("The ntp server " + server + " is not responding.")
             return None
         else:
-            measurements: Optional[list[NtpMeasurement]] = perform_ntp_measurement_domain_name_list(server,
-                                                                                                    client_ip, wanted_ip_type)
+            measurements: Optional[list[NtpMeasurement]] = await perform_ntp_measurement_domain_name_list_async(
+                server, client_ip, wanted_ip_type, samples=samples)
             if measurements is not None:
+                # the servers that did not respond are not stored
+                responding = [m for m in measurements if str(m.server_info.ntp_server_ref_parent_ip) != "0.0.0.0"]
+                jitters = iter(await asyncio.to_thread(store_measurements_and_get_jitter,
+                                                       responding, session, measurement_no))
                 m_results = []
                 for m in measurements:
                     if str(m.server_info.ntp_server_ref_parent_ip) == "0.0.0.0":
                         m_results.append((m, 0.0, 1))
-                        continue
-                    jitter = 0.0
-                    nr_jitter_measurements = 0
-                    insert_measurement(m, session)
-                    result = calculate_jitter_from_measurements(session, m, measurement_no)
-                    # if result is not None:
-                    jitter, nr_jitter_measurements = result
-                    m_results.append((m, jitter, nr_jitter_measurements))
+                    else:
+                        jitter, nr_jitter_measurements = next(jitters)
+                        m_results.append((m, jitter, nr_jitter_measurements))
                 return m_results
             print("The ntp server " + server + " is not responding.")
             return None
@@ -257,45 +461,296 @@ def measure(server: str, wanted_ip_type: int, session: Session, client_ip: Optio
         return None
 
 
-def fetch_historic_data_with_timestamps(server: str, start: datetime, end: datetime, session: Session) -> list[
-    NtpMeasurement]:
+def encode_history_cursor(key: tuple[int, int]) -> str:
+    """
+    Encodes the (`client_sent`, `id`) key of the last measurement of a history page as the cursor of the next page.
+
+    Args:
+        key (tuple[int, int]): The key of the last measurement of the page.
+
+    Returns:
+        str: The cursor that the client sends back to get the next page.
+    """
+    return f"{key[0]}-{key[1]}"
+
+
+def decode_history_cursor(cursor: str) -> tuple[int, int]:
+    """
+    Decodes a cursor of the history endpoint.
+
+    Args:
+        cursor (str): The cursor received from the client.
+
+    Returns:
+        tuple[int, int]: The (`client_sent`, `id`) key of the last measurement of the previous page.
+
+    Raises:
+        InputError: If the cursor is not a valid cursor.
     """
-    Fetches and reconstructs NTP measurements from the database within a specific time range.
+    parts = cursor.split("-")
+    if len(parts) != 2 or not all(part.isdigit() for part in parts):
+        raise InputError(f"Invalid cursor: {cursor}")
+    return int(parts[0]), int(parts[1])
 
-    Converts the provided human-readable datetime range into NTP-compatible timestamps,
-    queries the database based on whether the server is an IP address or domain name,
-    and reconstructs each result as an `NtpMeasurement` object.
+
+def get_history_page_parameters(limit: Optional[int],
+                                cursor: Optional[str]) -> tuple[int, Optional[tuple[int, int]]]:
+    """
+    Checks the pagination parameters of the history endpoint.
+
+    Args:
+        limit (Optional[int]): The size of the page. It is capped at the "history_max_page_size" of the config,
+            which is also the default.
+        cursor (Optional[str]): The "next_cursor" of the previous page, or None for the first page.
+
+    Returns:
+        tuple[int, Optional[tuple[int, int]]]: The size of the page, and the key of the last measurement
+        of the previous page (None for the first page).
+
+    Raises:
+        InputError: If the limit is not positive, or the cursor is invalid.
+    """
+    max_page_size = get_history_max_page_size()
+    if limit is not None and limit <= 0:
+        raise InputError("'limit' must be > 0")
+    page_size = max_page_size if limit is None else min(limit, max_page_size)
+    return page_size, decode_history_cursor(cursor) if cursor is not None else None
+
+
+def split_history_server(server: str) -> tuple[list[str], list[str]]:
+    """
+    Splits the server of a history request into the IP addresses and the domain names to query.
+
+    Args:
+        server (str): An IPv4/IPv6 address or a domain name.
+
+    Returns:
+        tuple[list[str], list[str]]: The normalized IP address, or the domain name, in its list.
+    """
+    if is_ip_address(server) is not None:
+        return [ip_to_str(parse_ip(server)) or server], []
+    return [], [server]
+
+
+def fetch_historic_data_json(server: str, start: datetime, end: datetime, session: Session,
+                             limit: Optional[int] = None, cursor: Optional[str] = None,
+                             context: Optional[EnrichmentContext] = None) -> bytes:
+    """
+    Fetches one page of the history of a server and serializes it to JSON directly from the rows of the database.
+    Only the needed columns are read, the rows are formatted without building NtpMeasurement objects
+    (see `format_history_rows`), and the document is serialized with orjson.
+    The formatted measurements are under "measurements", with the cursor of the next page under "next_cursor".
 
     Args:
         server (str): An IPv4/IPv6 address or domain name string for which measurements should be fetched.
         start (datetime): The start of the time range (in local or UTC timezone).
         end (datetime): The end of the time range (in local or UTC timezone).
         session (Session): The currently active database session.
+        limit (Optional[int]): The size of the page (see `get_history_page_parameters`).
+        cursor (Optional[str]): The "next_cursor" of the previous page, or None for the first page.
+        context (Optional[EnrichmentContext]): The lookups of the response, or None to use a new one.
 
     Returns:
-        list[NtpMeasurement]: A list of `NtpMeasurement` objects representing the historical data
-        for the given server within the time window.
+        bytes: The JSON document.
 
-    Notes:
-        - The input datetimes are converted to UTC before processing.
-        - IP addresses are validated using the `is_ip_address()` utility function.
-        - Data is fetched using `get_measurements_timestamps_ip` or `get_measurements_timestamps_dn`
-          depending on the server type.
-        - The `PreciseTime` wrapper is used to reconstruct accurate timestamps from database fields.
+    Raises:
+        InputError: If the limit is not positive, or the cursor is invalid.
+        MeasurementQueryError: If the database query fails.
+    """
+    page_size, after = get_history_page_parameters(limit, cursor)
+    ips, names = split_history_server(server)
+    rows, next_key = get_measurement_columns_page(session, ips, names, HISTORY_COLUMNS,
+                                                  human_date_to_ntp_precise_time(ensure_utc(start)),
+                                                  human_date_to_ntp_precise_time(ensure_utc(end)), page_size, after)
+    return orjson.dumps({
+        "measurements": format_history_rows(rows, context if context is not None else EnrichmentContext()),
+        "next_cursor": encode_history_cursor(next_key) if next_key is not None else None
+    })
+
+
+def format_bucket(bucket: dict[str, Any]) -> dict[str, Any]:
+    """
+    Formats the statistics of a time bucket of measurements into a dictionary suitable for JSON serialization.
+
+    Args:
+        bucket (dict[str, Any]): The statistics of the bucket, as returned by the database.
+
+    Returns:
+        dict[str, Any]: The start of the bucket (NTP time), the number of measurements, the min, max, mean,
+        median and 95th percentile of the offset and the RTT, the min and max stratum, and the number of
+        measurements of an unsynchronized server.
+    """
+    return {
+        "bucket_start": {
+            "seconds": bucket["bucket_start"],
+            "fraction": 0
+        },
+        "count": bucket["count"],
+        "offset": {stat: bucket[f"offset_{stat}"] for stat in ["min", "max", "mean", "p50", "p95"]},
+        "rtt": {stat: bucket[f"rtt_{stat}"] for stat in ["min", "max", "mean", "p50", "p95"]},
+        "stratum": {"min": bucket["stratum_min"], "max": bucket["stratum_max"]},
+        "failures": bucket["failures"]
+    }
+
+
+def fetch_historic_buckets(server: str, start: datetime, end: datetime, session: Session,
+                           resolution: int) -> dict[str, Any]:
+    """
+    Aggregates the historic measurements of a server per time bucket in the database, so the response has
+    at most "resolution" points whatever the length of the time range.
+
+    If the rollup tables are kept up to date, the buckets are built from the coarsest rollup (1 day, 1 hour or
+    1 minute) whose buckets are aligned with them, so a long time range reads hundreds of rows instead of millions.
+    The percentiles are only available when the buckets are built from the measurements themselves.
+
+    Args:
+        server (str): An IPv4/IPv6 address or domain name string for which measurements should be fetched.
+        start (datetime): The start of the time range (in local or UTC timezone).
+        end (datetime): The end of the time range (in local or UTC timezone).
+        session (Session): The currently active database session.
+        resolution (int): The maximum number of buckets.
+
+    Returns:
+        dict[str, Any]: The size of the buckets in seconds under "bucket_s", and the formatted non-empty buckets
+        under "buckets", the oldest first.
+    """
+    start_pt = human_date_to_ntp_precise_time(ensure_utc(start))
+    end_pt = human_date_to_ntp_precise_time(ensure_utc(end))
+    bucket_s = max(1, math.ceil((end_pt.seconds - start_pt.seconds + 1) / resolution))
+    granularity = choose_rollup_granularity(start_pt, bucket_s) if rollups_available() else None
+    if granularity is not None and is_ip_address(server) is not None:
+        buckets = get_rollup_buckets_ip(session, granularity, parse_ip(server), start_pt, end_pt, bucket_s)
+    elif granularity is not None:
+        buckets = get_rollup_buckets_dn(session, granularity, server, start_pt, end_pt, bucket_s)
+    elif is_ip_address(server) is not None:
+        buckets = get_measurement_buckets_ip(session, parse_ip(server), start_pt, end_pt, bucket_s)
+    else:
+        buckets = get_measurement_buckets_dn(session, server, start_pt, end_pt, bucket_s)
+    return {"bucket_s": bucket_s, "buckets": [format_bucket(b) for b in buckets]}
+
+
+def fetch_historic_data_lttb(server: str, start: datetime, end: datetime, session: Session, resolution: int,
+                             metric: str, context: Optional[EnrichmentContext] = None) -> list[NtpMeasurement]:
+    """
+    Selects at most "resolution" historic measurements of a server that keep the shape of the offset
+    or of the RTT over time (Largest-Triangle-Three-Buckets). Only the time, offset and RTT of the measurements
+    are fetched to choose them, and then only the chosen measurements are fetched completely.
+
+    Args:
+        server (str): An IPv4/IPv6 address or domain name string for which measurements should be fetched.
+        start (datetime): The start of the time range (in local or UTC timezone).
+        end (datetime): The end of the time range (in local or UTC timezone).
+        session (Session): The currently active database session.
+        resolution (int): The maximum number of measurements to return.
+        metric (str): The value whose shape is kept: "offset" or "rtt".
+        context (Optional[EnrichmentContext]): The lookups of the current response.
+
+    Returns:
+        list[NtpMeasurement]: The chosen measurements, the oldest first.
     """
     start_pt = human_date_to_ntp_precise_time(ensure_utc(start))
     end_pt = human_date_to_ntp_precise_time(ensure_utc(end))
-    # print(start_pt)
-    # print(end_pt)
-    # start_pt = PreciseTime(450, 20)
-    # end_pt = PreciseTime(1200, 100)
-    measurements = []
     if is_ip_address(server) is not None:
-        measurements = get_measurements_timestamps_ip(session, parse_ip(server), start_pt, end_pt)
+        points = get_measurement_points_ip(session, parse_ip(server), start_pt, end_pt)
     else:
-        measurements = get_measurements_timestamps_dn(session, server, start_pt, end_pt)
+        points = get_measurement_points_dn(session, server, start_pt, end_pt)
+    value_index = 3 if metric == "offset" else 4
+    points = [p for p in points if p[value_index] is not None]
+    if len(points) == 0:
+        return []
+    x = np.array([p[1] + (p[2] or 0) / 2 ** 32 for p in points], dtype=np.float64)
+    y = np.array([p[value_index] for p in points], dtype=np.float64)
+    ids = [points[i][0] for i in lttb_indices(x, y, resolution)]
+    return get_measurements_by_ids(session, ids, start_pt, end_pt, context)
+
+
+def fetch_downsampled_history(server: str, start: datetime, end: datetime, session: Session, resolution: int,
+                              downsample: str, metric: str,
+                              context: Optional[EnrichmentContext] = None) -> dict[str, Any]:
+    """
+    Fetches the history of a server sized to a chart of "resolution" points, instead of every measurement.
 
-    return measurements
+    Args:
+        server (str): An IPv4/IPv6 address or domain name string for which measurements should be fetched.
+        start (datetime): The start of the time range (in local or UTC timezone).
+        end (datetime): The end of the time range (in local or UTC timezone).
+        session (Session): The currently active database session.
+        resolution (int): The maximum number of points. It cannot be more than the maximum page size.
+        downsample (str): "bucket" aggregates the measurements per time bucket (see `fetch_historic_buckets`),
+            "lttb" keeps the measurements that preserve the shape of the chart (see `fetch_historic_data_lttb`).
+        metric (str): The value whose shape is kept by "lttb": "offset" or "rtt".
+        context (Optional[EnrichmentContext]): The lookups of the current response, used by "lttb".
+            None uses a new one.
+
+    Returns:
+        dict[str, Any]: The content of the response: "bucket_s" and "buckets" for "bucket",
+        or the formatted "measurements" for "lttb".
+
+    Raises:
+        InputError: If one of the parameters is invalid.
+    """
+    if resolution <= 0 or resolution > get_history_max_page_size():
+        raise InputError(f"'resolution' must be between 1 and {get_history_max_page_size()}")
+    if downsample == "bucket":
+        return fetch_historic_buckets(server, start, end, session, resolution)
+    if downsample != "lttb":
+        raise InputError("'downsample' must be 'bucket' or 'lttb'")
+    if metric not in ["offset", "rtt"]:
+        raise InputError("'metric' must be 'offset' or 'rtt'")
+    if context is None:
+        context = EnrichmentContext()
+    measurements = fetch_historic_data_lttb(server, start, end, session, resolution, metric, context)
+    return {"measurements": [get_format(m, nr_jitter_measurements=0, context=context) for m in measurements]}
+
+
+def stream_historic_data_chunks(server: str, start: datetime, end: datetime, session_factory: Callable[[], Session],
+                                ndjson: bool) -> Iterator[bytes]:
+    """
+    Serializes the historic measurements of a server while they are read from the database.
+    It opens its own database session and closes it when the stream is finished or abandoned,
+    because the session of the request may be closed before the response body is sent.
+
+    Nothing is produced before the database returned the first row, so a failing query can still be reported
+    with an error status by whoever consumes the first chunk.
+    Every batch of the database cursor becomes one chunk. Like `fetch_historic_data_json`, the rows are
+    formatted directly and serialized with orjson, and each server IP is looked up once per stream.
+
+    Args:
+        server (str): An IPv4/IPv6 address or domain name string for which measurements should be fetched.
+        start (datetime): The start of the time range (in local or UTC timezone).
+        end (datetime): The end of the time range (in local or UTC timezone).
+        session_factory (Callable[[], Session]): Opens the database session used for the stream.
+        ndjson (bool): Whether to produce one JSON measurement per line (NDJSON), instead of the same
+            {"measurements": [...]} document as the non-streaming response.
+
+    Returns:
+        Iterator[bytes]: The chunks of the response body.
+
+    Raises:
+        MeasurementQueryError: If the database query fails.
+    """
+    ips, names = split_history_server(server)
+    context = EnrichmentContext()
+    session = session_factory()
+    try:
+        batches = stream_measurement_columns(session, ips, names, HISTORY_COLUMNS,
+                                             human_date_to_ntp_precise_time(ensure_utc(start)),
+                                             human_date_to_ntp_precise_time(ensure_utc(end)),
+                                             get_history_stream_batch_size())
+        if ndjson:
+            for rows in batches:
+                yield b"".join(orjson.dumps(m) + b"\n" for m in format_history_rows(rows, context))
+            return
+        separator = b'{"measurements":['
+        for rows in batches:
+            if len(rows) > 0:
+                yield separator + b",".join(orjson.dumps(m) for m in format_history_rows(rows, context))
+                separator = b","
+        if separator != b",":  # no measurements
+            yield separator
+        yield b"]}"
+    finally:
+        session.close()
 
 
 def fetch_ripe_data(measurement_id: str) -> tuple[list[dict], str]:
@@ -375,3 +830,21 @@ def check_ripe_measurement_scheduled(measurement_id: str) -> bool:
         ValueError: If the RIPE API returns an error or unexpected data.
     """
     return check_all_measurements_scheduled(measurement_id=measurement_id)
+
+
+def get_server_stats() -> dict[str, Any]:
+    """
+    Collects the runtime statistics of this worker process: the geolocation cache, the cache of the probe metadata,
+    the back-pressure metrics of the measurement writer and the latency histograms of the requests to RIPE Atlas
+    and stat.ripe.net.
+
+    Returns:
+        dict[str, Any]: The statistics under "geo_cache", "probe_cache", "measurement_writer" (None if the writer
+        is not running) and "ripe_http".
+    """
+    return {
+        "geo_cache": get_geo_cache_stats(),
+        "probe_cache": get_probe_cache_stats(),
+        "measurement_writer": get_measurement_writer_stats(),
+        "ripe_http": get_ripe_http_latency_histograms()
+    }
@@ -0,0 +1,279 @@
+import itertools
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from ipaddress import ip_address
+from typing import Any, Callable, Iterator, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import Row
+from sqlalchemy.orm import Session
+
+from server.app.db.db_interaction import stream_measurement_columns
+from server.app.models.CustomError import InputError
+from server.app.utils.calculations import human_date_to_ntp_precise_time
+from server.app.utils.ip_utils import ip_to_str
+from server.app.utils.load_config_data import get_export_batch_size
+from server.app.utils.validate import ensure_utc, is_ip_address, parse_ip
+
+# the formats of the export endpoint and their media types
+EXPORT_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+NTP_TIMESTAMP = "ntp64"  # seconds << 32 | fraction, as an unsigned 64-bit integer
+IP_ADDRESS = "ip"  # the packed address: 4 bytes for IPv4, 16 bytes for IPv6
+# an unsigned scalar, so the shifted seconds are not cast to a signed integer
+FRACTION_BITS = pa.scalar(32, pa.uint64())
+
+
+@dataclass(frozen=True)
+class ExportColumn:
+    """
+    One column of the exported history.
+
+    Attributes:
+        sources (tuple[str, ...]): The columns of the `measurements` table it is built from. An NTP timestamp
+            is built from its seconds and its fraction.
+        type (pa.DataType): The Arrow type of the column.
+        encoding (Optional[str]): How the values are encoded ("ntp64" or "ip"), or None if they are stored as they are.
+    """
+    sources: tuple[str, ...]
+    type: pa.DataType
+    encoding: Optional[str] = None
+
+
+# the exported columns, in their default order
+EXPORT_COLUMNS: dict[str, ExportColumn] = {
+    "id": ExportColumn(("id",), pa.int64()),
+    "vantage_point_ip": ExportColumn(("vantage_point_ip",), pa.binary(), IP_ADDRESS),
+    "ntp_server_ip": ExportColumn(("ntp_server_ip",), pa.binary(), IP_ADDRESS),
+    "ntp_server_name": ExportColumn(("ntp_server_name",), pa.string()),
+    "ntp_version": ExportColumn(("ntp_version",), pa.int16()),
+    "ntp_server_ref_parent": ExportColumn(("ntp_server_ref_parent",), pa.binary(), IP_ADDRESS),
+    "ref_name": ExportColumn(("ref_name",), pa.string()),
+    "offset": ExportColumn(("time_offset",), pa.float64()),
+    "rtt": ExportColumn(("rtt",), pa.float64()),
+    "stratum": ExportColumn(("stratum",), pa.int32()),
+    "precision": ExportColumn(("precision",), pa.float64()),
+    "reachability": ExportColumn(("reachability",), pa.string()),
+    "root_delay": ExportColumn(("root_delay", "root_delay_prec"), pa.uint64(), NTP_TIMESTAMP),
+    "poll": ExportColumn(("poll",), pa.int64()),
+    "root_dispersion": ExportColumn(("root_dispersion", "root_dispersion_prec"), pa.uint64(), NTP_TIMESTAMP),
+    "ntp_last_sync_time": ExportColumn(("ntp_last_sync_time", "ntp_last_sync_time_prec"), pa.uint64(), NTP_TIMESTAMP),
+    "client_sent": ExportColumn(("client_sent", "client_sent_prec"), pa.uint64(), NTP_TIMESTAMP),
+    "server_recv": ExportColumn(("server_recv", "server_recv_prec"), pa.uint64(), NTP_TIMESTAMP),
+    "server_sent": ExportColumn(("server_sent", "server_sent_prec"), pa.uint64(), NTP_TIMESTAMP),
+    "client_recv": ExportColumn(("client_recv", "client_recv_prec"), pa.uint64(), NTP_TIMESTAMP),
+}
+
+
+def parse_export_columns(columns: Optional[str]) -> list[str]:
+    """
+    Parses the comma-separated list of columns the client wants to export.
+
+    Args:
+        columns (Optional[str]): The names of the columns, separated by commas, or None for all the columns.
+
+    Returns:
+        list[str]: The names of the columns, in the requested order and without duplicates.
+
+    Raises:
+        InputError: If no column is given or if a column does not exist.
+    """
+    if columns is None:
+        return list(EXPORT_COLUMNS)
+    names = list(dict.fromkeys(c.strip() for c in columns.split(",") if c.strip() != ""))
+    if len(names) == 0:
+        raise InputError("'columns' must name at least one column")
+    unknown = [c for c in names if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise InputError(f"Unknown columns {unknown}. The columns are {list(EXPORT_COLUMNS)}")
+    return names
+
+
+def export_schema(columns: list[str]) -> pa.Schema:
+    """
+    Builds the Arrow schema of the export. The encoding of the NTP timestamps and of the IP addresses
+    is described in the metadata of their fields.
+
+    Args:
+        columns (list[str]): The names of the exported columns.
+
+    Returns:
+        pa.Schema: The schema of the exported columns.
+    """
+    fields = []
+    for name in columns:
+        column = EXPORT_COLUMNS[name]
+        metadata = {"encoding": column.encoding} if column.encoding is not None else None
+        fields.append(pa.field(name, column.type, metadata=metadata))
+    return pa.schema(fields)
+
+
+def export_source_columns(columns: list[str]) -> list[str]:
+    """
+    Lists the columns of the `measurements` table that are needed for the exported columns.
+
+    Args:
+        columns (list[str]): The names of the exported columns.
+
+    Returns:
+        list[str]: The columns of the `measurements` table, without duplicates.
+    """
+    return list(dict.fromkeys(source for name in columns for source in EXPORT_COLUMNS[name].sources))
+
+
+@lru_cache(maxsize=4096)
+def pack_ip(ip: str) -> bytes:
+    """
+    Packs an IP address into its 4 (IPv4) or 16 (IPv6) bytes. The result is cached,
+    because an export usually contains the same few addresses many times.
+
+    Args:
+        ip (str): The IP address.
+
+    Returns:
+        bytes: The packed IP address.
+    """
+    return ip_address(ip).packed
+
+
+def rows_to_record_batch(rows: Sequence[Row[Any]], sources: list[str], schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Converts a batch of database rows into an Arrow record batch, one column at a time.
+
+    Args:
+        rows (Sequence[Row[Any]]): The rows, with the values of the "sources" columns in this order.
+        sources (list[str]): The columns of the `measurements` table in the rows.
+        schema (pa.Schema): The schema of the export.
+
+    Returns:
+        pa.RecordBatch: The exported columns of the rows.
+    """
+    values = {name: [row[i] for row in rows] for i, name in enumerate(sources)}
+    arrays = []
+    for name in schema.names:
+        column = EXPORT_COLUMNS[name]
+        if column.encoding == NTP_TIMESTAMP:
+            seconds = pa.array(values[column.sources[0]], pa.uint64())
+            fraction = pc.fill_null(pa.array(values[column.sources[1]], pa.uint64()), 0)
+            arrays.append(pc.bit_wise_or(pc.shift_left(seconds, FRACTION_BITS), fraction))
+        elif column.encoding == IP_ADDRESS:
+            arrays.append(pa.array([None if ip is None else pack_ip(str(ip)) for ip in values[column.sources[0]]],
+                                   pa.binary()))
+        else:
+            arrays.append(pa.array(values[column.sources[0]], column.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ExportSink:
+    """
+    A file-like object that keeps what the Arrow and Parquet writers write, until it is taken
+    and sent to the client.
+    """
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data: Any) -> int:
+        """
+        Keeps the written bytes.
+
+        Args:
+            data (Any): The bytes (or a buffer) to write.
+
+        Returns:
+            int: The number of bytes written.
+        """
+        chunk = bytes(data)
+        self.chunks.append(chunk)
+        self.position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        """
+        Returns:
+            int: The number of bytes written so far.
+        """
+        return self.position
+
+    def flush(self) -> None:
+        """
+        Does nothing. The bytes are taken with `take`.
+        """
+
+    def close(self) -> None:
+        """
+        Marks the sink as closed.
+        """
+        self.closed = True
+
+    def take(self) -> bytes:
+        """
+        Takes the bytes that were written since the previous call.
+
+        Returns:
+            bytes: The written bytes.
+        """
+        chunk = b"".join(self.chunks)
+        self.chunks = []
+        return chunk
+
+
+def stream_history_export(servers: list[str], start: datetime, end: datetime,
+                          session_factory: Callable[[], Session], columns: list[str],
+                          export_format: str) -> Iterator[bytes]:
+    """
+    Exports the historic measurements of one or more servers as an Arrow IPC stream or a Parquet file,
+    while they are read from the database. Every batch of the database cursor becomes one record batch
+    (or one row group), so the memory use does not depend on the size of the export.
+    The NTP timestamps are exported as 64-bit NTP fixed-point numbers and the IP addresses as packed bytes.
+
+    It opens its own database session and closes it when the stream is finished or abandoned.
+    Nothing is produced before the database returned the first batch, so a failing query can still be reported
+    with an error status by whoever consumes the first chunk.
+
+    Args:
+        servers (list[str]): The IP addresses or domain names of the NTP servers.
+        start (datetime): The start of the time range (in local or UTC timezone).
+        end (datetime): The end of the time range (in local or UTC timezone).
+        session_factory (Callable[[], Session]): Opens the database session used for the export.
+        columns (list[str]): The names of the exported columns (see `EXPORT_COLUMNS`).
+        export_format (str): "arrow" or "parquet".
+
+    Returns:
+        Iterator[bytes]: The chunks of the exported file.
+
+    Raises:
+        MeasurementQueryError: If the database query fails.
+    """
+    ips = [ip_to_str(parse_ip(s)) or s for s in servers if is_ip_address(s) is not None]
+    names = [s for s in servers if is_ip_address(s) is None]
+    schema = export_schema(columns)
+    sources = export_source_columns(columns)
+    session = session_factory()
+    try:
+        batches = stream_measurement_columns(session, ips, names, sources,
+                                             human_date_to_ntp_precise_time(ensure_utc(start)),
+                                             human_date_to_ntp_precise_time(ensure_utc(end)), get_export_batch_size())
+        first_batch = next(batches, [])
+        sink = ExportSink()
+        writer: pq.ParquetWriter | pa.ipc.RecordBatchStreamWriter
+        if export_format == "parquet":
+            writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+        for rows in itertools.chain([first_batch], batches):
+            if len(rows) > 0:
+                writer.write_batch(rows_to_record_batch(rows, sources, schema))
+                yield sink.take()
+        writer.close()
+        yield sink.take()
+    finally:
+        session.close()
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLLRUCache(Generic[K, V]):
+    """
+    A bounded, thread-safe LRU cache with a time to live, shared by all the requests of a worker.
+    The least recently used entry is evicted when the cache is full, and an entry expires "ttl_s" seconds
+    after it was added.
+
+    Attributes:
+        max_size (int): The maximum number of entries. 0 disables the cache.
+        ttl_s (float | int): How long (in seconds) an entry stays valid.
+        track_stats (bool): Whether the cache counts its hits, misses and evictions.
+    """
+
+    def __init__(self, max_size: int, ttl_s: float | int, track_stats: bool = True) -> None:
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.track_stats = track_stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        Returns the cached value for this key, or None if it is missing or expired.
+
+        Args:
+            key (K): The key of the entry.
+
+        Returns:
+            Optional[V]: The cached value or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                if self.track_stats:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if self.track_stats:
+                self.hits += 1
+            return entry[1]
+
+    def put(self, key: K, value: V) -> None:
+        """
+        Adds a value to the cache, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (K): The key of the entry.
+            value (V): The value to cache.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                if self.track_stats:
+                    self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Removes all the entries and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the current size of the cache and its counters.
+
+        Returns:
+            dict[str, int]: The size, the maximum size, the hits, the misses and the evictions of the cache.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -7,16 +7,20 @@ from server.app.dtos.NtpServerInfo import NtpServerInfo
 from server.app.dtos.NtpTimestamps import NtpTimestamps
 from server.app.dtos.ProbeData import ServerLocation
 from server.app.utils.ip_utils import get_server_ip, ip_to_str, get_ip_family
-from server.app.utils.location_resolver import get_country_for_ip, get_coordinates_for_ip
+from server.app.utils.location_resolver import lookup_ip
 from server.app.utils.load_config_data import get_nr_of_measurements_for_jitter, get_ntp_version
-from server.app.db.db_interaction import get_measurements_for_jitter_ip
+from server.app.db.db_interaction import get_timestamps_for_jitter_ip
+from server.app.db.measurement_writer import get_pending_measurements
 from server.app.dtos.NtpMeasurement import NtpMeasurement
-from server.app.services.NtpCalculator import NtpCalculator
+from server.app.services.NtpCalculator import NtpCalculator, NTP_TIMESTAMPS_DTYPE
 from sqlalchemy.orm import Session
-import ntplib
-from datetime import datetime, timezone
+from datetime import datetime
 from server.app.dtos.PreciseTime import PreciseTime
+from server.app.dtos.NtpFixedTime import FRACTION_BITS, FRACTION_MASK, datetime_to_units, seconds_to_units, \
+    units_to_datetime
 from math import radians, cos, sin, sqrt, atan2
+import numpy as np
+from numpy.lib.recfunctions import unstructured_to_structured
 
 
 def calculate_jitter_from_measurements(session: Session, initial_measurement: NtpMeasurement,
@@ -31,8 +35,8 @@ def calculate_jitter_from_measurements(session: Session, initial_measurement: Nt
         session (Session): The active SQLAlchemy database session.
         initial_measurement (NtpMeasurement): The reference measurement not already stored in the database,
                                               used as the baseline for offset comparison.
-        no_measurements (int): The number of recent historical measurements to fetch from the database
-                                         for jitter calculation.
+        no_measurements (int): The number of recent historical measurements to fetch from the write-behind queue
+                                         and the database for jitter calculation.
 
     Returns:
         tuple[float, int]:
@@ -40,14 +44,18 @@ def calculate_jitter_from_measurements(session: Session, initial_measurement: Nt
             - int: The actual number of historical measurements used for the calculation.
     """
     offsets = [NtpCalculator.calculate_offset(initial_measurement.timestamps)]
-    last_measurements = get_measurements_for_jitter_ip(session=session,
-                                                       ip=initial_measurement.server_info.ntp_server_ip,
-                                                       number=no_measurements)
-    nr_m = 0
-    for m in last_measurements:
-        if m is not None:
-            offsets.append(NtpCalculator.calculate_offset(m.timestamps))
-            nr_m = nr_m + 1
+    # the measurements that are still in the write-behind queue count as well
+    pending = get_pending_measurements(initial_measurement.server_info.ntp_server_ip, no_measurements)
+    offsets.extend(NtpCalculator.calculate_offset(m.timestamps) for m in pending)
+    nr_m = len(pending)
+    if nr_m < no_measurements:
+        rows = get_timestamps_for_jitter_ip(session=session, ip=initial_measurement.server_info.ntp_server_ip,
+                                            number=no_measurements - nr_m)
+        if len(rows) > 0:
+            # the rows are (seconds, fraction) pairs of t1, t2, t3 and t4
+            timestamps = unstructured_to_structured(np.array(rows, dtype=np.int64), NTP_TIMESTAMPS_DTYPE)
+            offsets.extend(NtpCalculator.calculate_offsets(timestamps).tolist())
+        nr_m += len(rows)
 
     return float(NtpCalculator.calculate_jitter(offsets)), nr_m
 
@@ -55,7 +63,7 @@ def calculate_jitter_from_measurements(session: Session, initial_measurement: Nt
 def ntp_precise_time_to_human_date(t: PreciseTime) -> str:
     """
     Converts a PreciseTime object to a human-readable time string in UTC. (ex:'2025-05-05 14:30:15.123456 UTC')
-    We need to shift from ntp time to unix time so we need to subtract all the seconds from 1900 to 1970.
+    The conversion uses integer arithmetic only, so the microseconds are exact.
 
     Args:
         t (PreciseTime): The PreciseTime object.
@@ -64,8 +72,7 @@ def ntp_precise_time_to_human_date(t: PreciseTime) -> str:
         str: The date in UTC format or empty, depending on whether the PreciseTime object could be converted to UTC.
     """
     try:
-        timestamp = ntplib._to_time(t.seconds - ntplib.NTP.NTP_DELTA, t.fraction)
-        dt = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        dt = units_to_datetime((int(t.seconds) << FRACTION_BITS) + int(t.fraction))
         return dt.strftime("%Y-%m-%d %H:%M:%S.%f UTC")
     except Exception as e:
         print(e)
@@ -74,7 +81,8 @@ def ntp_precise_time_to_human_date(t: PreciseTime) -> str:
 
 def convert_float_to_precise_time(value: float) -> PreciseTime:
     """
-    Converts a float value to a PreciseTime object.
+    Converts a float value to a PreciseTime object. The float is read as the decimal it was written as
+    (see `seconds_to_units`), so no precision is lost on the fraction.
 
     Args:
         value (float): The float value to convert.
@@ -82,14 +90,13 @@ def convert_float_to_precise_time(value: float) -> PreciseTime:
     Returns:
         PreciseTime: A PreciseTime object.
     """
-    seconds = int(value)
-    fraction = ntplib._to_frac(value)  # by default, a second is split into 2^32 parts
-    return PreciseTime(seconds, fraction)
+    units = seconds_to_units(value)  # by default, a second is split into 2^32 parts
+    return PreciseTime(units >> FRACTION_BITS, units & FRACTION_MASK)
 
 
 def human_date_to_ntp_precise_time(dt: datetime) -> PreciseTime:
     """
-    Converts a UTC datetime object to a PreciseTime object in NTP time.
+    Converts a UTC datetime object to a PreciseTime object in NTP time, exactly (without going through a float).
 
     Args:
         dt (datetime): A timezone-aware datetime object in UTC.
@@ -97,16 +104,8 @@ def human_date_to_ntp_precise_time(dt: datetime) -> PreciseTime:
     Returns:
         PreciseTime: The corresponding NTP time.
     """
-    if dt.tzinfo is None:
-        raise ValueError("Input datetime must be timezone-aware (UTC)")
-
-    unix_timestamp = dt.timestamp()
-    ntp_timestamp = unix_timestamp + ntplib.NTP.NTP_DELTA
-
-    ntp_seconds = int(ntp_timestamp)
-    ntp_fraction = int((ntp_timestamp - ntp_seconds) * (2 ** 32))
-
-    return PreciseTime(ntp_seconds, ntp_fraction)
+    units = datetime_to_units(dt)
+    return PreciseTime(units >> FRACTION_BITS, units & FRACTION_MASK)
 
 
 def get_non_responding_ntp_measurement(server_ip_str: str, server_name: Optional[str],
@@ -137,14 +136,14 @@ def get_non_responding_ntp_measurement(server_ip_str: str, server_name: Optional
     if vantage_point_ip_temp is not None:
         vantage_point_ip = vantage_point_ip_temp
     server_ip = ip_address(server_ip_str)
+    geo = lookup_ip(ip_to_str(server_ip))
     server_info: NtpServerInfo = NtpServerInfo(
         ntp_version=ntp_version,
         ntp_server_ip=server_ip,
         ntp_server_name=server_name,
         ntp_server_ref_parent_ip=ip_address("0.0.0.0"),  # if you change this value, change it also in "measure"
         ref_name="",
-        ntp_server_location=ServerLocation(country_code=get_country_for_ip(ip_to_str(server_ip)),
-                                           coordinates=get_coordinates_for_ip(ip_to_str(server_ip)))
+        ntp_server_location=ServerLocation(country_code=geo.country_code, coordinates=geo.coordinates)
     )
 
     timestamps: NtpTimestamps = NtpTimestamps(
@@ -194,3 +193,99 @@ def calculate_haversine_distance(lat1: float, lon1: float, lat2: float, lon2: fl
     a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
     d = 2.0 * r * atan2(sqrt(a), sqrt(1 - a))
     return d
+
+
+def calculate_haversine_distances(lats: np.ndarray, lons: np.ndarray, lat: float, lon: float) -> np.ndarray:
+    """
+    It calculates the haversine distances between many points and a single point at once, with the same formula
+    as `calculate_haversine_distance`.
+
+    Args:
+        lats (np.ndarray): The latitudes of the points.
+        lons (np.ndarray): The longitudes of the points.
+        lat (float): The latitude of the single point.
+        lon (float): The longitude of the single point.
+
+    Returns:
+        np.ndarray: The haversine distance between every point and the single point. (in kilometers)
+    """
+    r = 6371.0
+    lats_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lat_rad = radians(lat)
+    dlat = lat_rad - lats_rad
+    dlon = np.radians(lon - np.asarray(lons, dtype=np.float64))
+    a = np.sin(dlat / 2) ** 2 + np.cos(lats_rad) * cos(lat_rad) * np.sin(dlon / 2) ** 2
+    distances: np.ndarray = 2.0 * r * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return distances
+
+
+def smallest_indices(values: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    """
+    Returns the indices of the k smallest values, sorted by value. Equal values keep their original order,
+    so the result is the same as the first k indices of a stable sort.
+    The k smallest values are found with a partial sort (`np.argpartition`) in O(n), only these are sorted.
+
+    Args:
+        values (np.ndarray): The values (for example distances).
+        k (Optional[int]): How many indices to return. None returns all of them.
+
+    Returns:
+        np.ndarray: The indices of the k smallest values.
+    """
+    n = len(values)
+    if k is None or k >= n:
+        all_indices: np.ndarray = np.argsort(values, kind="stable")
+        return all_indices
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    threshold = values[np.argpartition(values, k - 1)[k - 1]]
+    # all the values below the k-th smallest one, and the first values equal to it
+    below = np.flatnonzero(values < threshold)
+    equal = np.flatnonzero(values == threshold)[:k - len(below)]
+    candidates = np.concatenate((below, equal))
+    indices: np.ndarray = candidates[np.lexsort((candidates, values[candidates]))]
+    return indices
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Selects the points that keep the shape of a series with the Largest-Triangle-Three-Buckets algorithm.
+    The first and the last point are always kept. The other points are split into "threshold - 2" buckets,
+    and from every bucket the point that forms the largest triangle with the point selected from the previous bucket
+    and the average of the next bucket is kept. Unlike an average per bucket, the spikes survive.
+
+    Args:
+        x (np.ndarray): The x values (the time), sorted ascending.
+        y (np.ndarray): The y values.
+        threshold (int): How many points to keep.
+
+    Returns:
+        np.ndarray: The indices of the selected points, ascending. All the indices if there are not more
+        than "threshold" points.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=np.int64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # the bucket edges of the points between the first and the last one
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[edges[i + 1]:edges[i + 2]].mean()
+            next_y = y[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        # twice the area of the triangles (previous point, candidate, average of the next bucket)
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
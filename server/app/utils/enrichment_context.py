@@ -0,0 +1,78 @@
+from typing import Any, Callable, Optional, TypeVar
+
+from server.app.dtos.GeoRecord import GeoRecord
+from server.app.utils.ip_utils import is_this_ip_anycast
+from server.app.utils.location_resolver import lookup_ip
+
+T = TypeVar("T")
+
+
+class EnrichmentContext:
+    """
+    Remembers the lookups (geolocation, anycast, ...) of the IP addresses of a single response, so every distinct IP
+    is resolved only once, however many measurements of that response share it.
+
+    Unlike the global geolocation cache, it lives only as long as the response that created it, so it never
+    has to be invalidated: within one response, the same IP always gets the same answer.
+
+    Attributes:
+        hits (int): How many lookups were answered from the memo.
+        misses (int): How many lookups were actually resolved.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._memos: dict[str, dict[Any, Any]] = {}
+
+    def resolve(self, kind: str, key: Any, compute: Callable[[Any], T]) -> T:
+        """
+        Returns the remembered answer of a lookup, or computes and remembers it.
+
+        Args:
+            kind (str): The kind of lookup (each kind has its own memo).
+            key (Any): What is looked up, usually an IP address.
+            compute (Callable[[Any], T]): Computes the answer for a key.
+
+        Returns:
+            T: The answer for this key.
+        """
+        memo = self._memos.setdefault(kind, {})
+        if key in memo:
+            self.hits += 1
+            answer: T = memo[key]
+            return answer
+        self.misses += 1
+        answer = memo[key] = compute(key)
+        return answer
+
+    def lookup_ip(self, ip: Optional[str]) -> GeoRecord:
+        """
+        Looks up the geolocation of an IP address once per response (see `lookup_ip`).
+
+        Args:
+            ip (Optional[str]): The IP address.
+
+        Returns:
+            GeoRecord: Everything the MaxMind databases know about this IP address.
+        """
+        return self.resolve("geo", ip, lookup_ip)
+
+    def is_anycast(self, ip: Optional[str]) -> bool:
+        """
+        Checks once per response whether an IP address is anycast (see `is_this_ip_anycast`).
+
+        Args:
+            ip (Optional[str]): The IP address.
+
+        Returns:
+            bool: Whether the IP address is anycast.
+        """
+        return self.resolve("anycast", ip, is_this_ip_anycast)
+
+    def debug_headers(self) -> dict[str, str]:
+        """
+        Returns:
+            dict[str, str]: The hits and misses of the memo, as response headers.
+        """
+        return {"X-Enrichment-Memo-Hits": str(self.hits), "X-Enrichment-Memo-Misses": str(self.misses)}
@@ -0,0 +1,25 @@
+import fcntl
+from contextlib import contextmanager
+from typing import Iterator
+
+
+@contextmanager
+def locked_file(path: str, blocking: bool = True) -> Iterator[bool]:
+    """
+    Holds an exclusive lock (flock) on a file, shared by all the processes that use the same path
+    (for example the workers of the server). The file is created if it does not exist.
+
+    Args:
+        path (str): The path of the lock file.
+        blocking (bool): Whether to wait for the lock if another process holds it.
+
+    Yields:
+        bool: True if the lock is held. Only False if "blocking" is False and another process holds it.
+    """
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True  # closing the file releases the lock
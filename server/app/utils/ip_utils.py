@@ -2,10 +2,11 @@ import ipaddress
 import os
 import random
 import socket
+import threading
+from bisect import bisect_right
 from ipaddress import ip_address, IPv4Address, IPv6Address
 from typing import Optional
 import ntplib
-import requests
 import dns.resolver
 import dns.reversename
 
@@ -16,9 +17,10 @@ from datetime import datetime
 
 from server.app.utils.load_config_data import get_ipv4_edns_server, get_ipv6_edns_server
 from server.app.utils.load_config_data import get_mask_ipv4, get_mask_ipv6
-from server.app.utils.location_resolver import get_asn_for_ip, get_country_for_ip, get_continent_for_ip
+from server.app.utils.location_resolver import lookup_ip
 from server.app.models.CustomError import InputError
 from server.app.utils.validate import is_ip_address
+from server.app.utils.ripe_http import ripe_get
 from fastapi import HTTPException, Request
 
 
@@ -87,10 +89,8 @@ def get_ip_network_details(ip_str: str) -> tuple[Optional[str], Optional[str], O
         of an IP address if they can be taken.
     """
     try:
-        asn: Optional[str] = get_asn_for_ip(ip_str)
-        country: Optional[str] = get_country_for_ip(ip_str)
-        continent: Optional[str] = get_continent_for_ip(ip_str)
-        return asn, country, get_area_of_ip(country, continent)
+        geo = lookup_ip(ip_str)
+        return geo.asn, geo.country_code, get_area_of_ip(geo.country_code, geo.continent_code)
     except Exception as e:
         print(e)
         return None, None, None
@@ -139,7 +139,8 @@ def get_prefix_from_ip(ip_str: str) -> Optional[str]:
     """
     try:
         ip_str_to_ask = ip_to_str(randomize_ip(ip_address(ip_str)))
-        response = requests.get(f"https://stat.ripe.net/data/prefix-overview/data.json?resource={ip_str_to_ask}")
+        response = ripe_get("prefix_overview",
+                            f"https://stat.ripe.net/data/prefix-overview/data.json?resource={ip_str_to_ask}")
         response.raise_for_status()
         data = response.json()["data"]
         prefix: str = data.get("resource", None)
@@ -244,7 +245,7 @@ def get_server_ip_from_ipify(wanted_ip_type: int) -> Optional[IPv4Address | IPv6
         if wanted_ip_type == 6:
             ip_type = "6"
         # api64 will return ipv4 or ipv6 if it is available, but we want exactly ipv4 or ipv6
-        response = requests.get(f"https://api{ip_type}.ipify.org?format=json", timeout=3)
+        response = ripe_get("ipify", f"https://api{ip_type}.ipify.org?format=json", retry=False, timeout=3)
         response.raise_for_status()
 
         data = response.json()
@@ -344,9 +345,123 @@ def is_private_ip(ip_str: str) -> bool:
     except Exception:
         return False
 
+def get_anycast_prefixes_path(ip_family: int) -> str:
+    """
+    This method returns the path of the local anycast prefix database (downloaded from bgp.tools) of an IP family.
+
+    Args:
+        ip_family (int): The IP family of the database (4 or 6).
+
+    Returns:
+        str: The absolute path of the anycast prefix database.
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if ip_family == 4:
+        return os.path.abspath(os.path.join(current_dir, "..", "..", "anycast-v4-prefixes.txt"))
+    return os.path.abspath(os.path.join(current_dir, "..", "..", "anycast-v6-prefixes.txt"))
+
+
+def build_anycast_index(file_path: str, ip_family: int) -> tuple[list[int], list[int]]:
+    """
+    This method compiles an anycast prefix database into a sorted array of disjoint integer ranges.
+    Every prefix becomes the range [first address, last address]. Overlapping and adjacent ranges are merged,
+    so an IP address is anycast if and only if it falls in one of the ranges. Invalid lines are skipped.
+
+    Args:
+        file_path (str): The path of the anycast prefix database.
+        ip_family (int): The IP family of the prefixes in the database (4 or 6).
+
+    Returns:
+        tuple[list[int], list[int]]: The sorted starts and the matching ends of the ranges.
+
+    Raises:
+        OSError: If the database cannot be read.
+    """
+    ranges: list[tuple[int, int]] = []
+    with open(file_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            try:
+                whole_network: ipaddress._BaseNetwork
+                if ip_family == 4:
+                    whole_network = ipaddress.IPv4Network(line, strict=False)
+                else:
+                    whole_network = ipaddress.IPv6Network(line, strict=False)
+                ranges.append((int(whole_network.network_address), int(whole_network.broadcast_address)))
+            except Exception:
+                continue
+    ranges.sort()
+    starts: list[int] = []
+    ends: list[int] = []
+    for start, end in ranges:
+        if ends and start <= ends[-1] + 1:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+# IP family -> ((inode, modification time in ns) of the database, starts of the ranges, ends of the ranges)
+_anycast_indexes: dict[int, tuple[tuple[int, int], list[int], list[int]]] = {}
+_anycast_indexes_lock = threading.Lock()
+
+
+def get_anycast_index(ip_family: int) -> tuple[list[int], list[int]]:
+    """
+    This method returns the compiled anycast index of an IP family. The index is built once and then shared
+    by all the lookups. It is rebuilt only if the database on disk changed (different inode or modification time),
+    which happens when `update_geolite_and_bgptools_dbs.sh` downloads new prefixes from bgp.tools.
+
+    Args:
+        ip_family (int): The IP family of the index (4 or 6).
+
+    Returns:
+        tuple[list[int], list[int]]: The sorted starts and the matching ends of the anycast ranges.
+
+    Raises:
+        OSError: If the database does not exist or cannot be read.
+    """
+    file_path = get_anycast_prefixes_path(ip_family)
+    stat = os.stat(file_path)
+    version = (stat.st_ino, stat.st_mtime_ns)
+    entry = _anycast_indexes.get(ip_family)
+    if entry is not None and entry[0] == version:
+        return entry[1], entry[2]
+    with _anycast_indexes_lock:
+        # another thread may have already rebuilt it while we were waiting
+        entry = _anycast_indexes.get(ip_family)
+        if entry is None or entry[0] != version:
+            starts, ends = build_anycast_index(file_path, ip_family)
+            entry = (version, starts, ends)
+            _anycast_indexes[ip_family] = entry
+        return entry[1], entry[2]
+
+
+def preload_anycast_indexes() -> None:
+    """
+    This method builds the IPv4 and IPv6 anycast indexes, so that the first requests do not have to wait for it.
+    It is called when the application starts. It never throws an exception.
+    """
+    for ip_family in (4, 6):
+        try:
+            get_anycast_index(ip_family)
+        except Exception as e:
+            print(f"Error (safe) in preload_anycast_indexes: {e}")
+
+
+def clear_anycast_indexes() -> None:
+    """
+    This method removes the compiled anycast indexes. The next lookup will build them again.
+    """
+    with _anycast_indexes_lock:
+        _anycast_indexes.clear()
+
+
 def is_this_ip_anycast(searched_ip: Optional[str]) -> bool:
     """
     This method checks whether an IP address is anycast or not, by searching in the local anycast prefix databases.
+    The search is a binary search in the compiled index of the database, so it takes O(log n) time.
     This method would never throw an exception (If the databases don't exist, it will return False).
 
     Args:
@@ -359,28 +474,11 @@ def is_this_ip_anycast(searched_ip: Optional[str]) -> bool:
         return False
     try:
         ip_family = get_ip_family(searched_ip)
-        ip = ip_address(searched_ip)
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        # get the correct database
-        if ip_family == 4:
-            file_path = os.path.abspath(os.path.join(current_dir, "..", "..", "anycast-v4-prefixes.txt"))
-        else:
-            file_path = os.path.abspath(os.path.join(current_dir, "..", "..", "anycast-v6-prefixes.txt"))
-
-        with open(file_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                try:
-                    whole_network: ipaddress._BaseNetwork
-                    if ip_family == 4:
-                        whole_network = ipaddress.IPv4Network(line, strict=False)
-                    else:
-                        whole_network = ipaddress.IPv6Network(line, strict=False)
-                    if ip in whole_network:
-                        return True
-                except Exception:
-                    continue
-        return False
+        ip_int = int(ip_address(searched_ip))
+        starts, ends = get_anycast_index(ip_family)
+        # the last range that starts before (or at) this IP is the only one that can contain it
+        position = bisect_right(starts, ip_int) - 1
+        return position >= 0 and ip_int <= ends[position]
     except Exception as e:
         print(f"Error (safe) in is_anycast: {e}")
         return False
@@ -44,6 +44,8 @@ def verify_if_config_is_set() -> bool:
     get_ntp_version()
     get_timeout_measurement_s()
     get_nr_of_measurements_for_jitter()
+    get_max_parallel_measurements()
+    get_domain_measurement_deadline_s()
     get_mask_ipv4()
     get_mask_ipv6()
     get_edns_default_servers()
@@ -52,11 +54,36 @@ def verify_if_config_is_set() -> bool:
     get_ripe_packets_per_probe()
     get_ripe_number_of_probes_per_measurement()
     get_ripe_server_timeout()
+    get_ripe_probe_cache_max_size()
+    get_ripe_probe_cache_ttl_s()
+    get_ripe_probe_catalogue_url()
+    get_ripe_probe_catalogue_sync_interval_s()
+    get_ripe_max_parallel_probe_queries()
+    get_ripe_probe_query_deadline_s()
+    get_ripe_http_timeout_s()
+    get_ripe_http_max_retries()
+    get_ripe_http_backoff_s()
+    get_ripe_http_pool_size()
     get_anycast_prefixes_v4_url()
     get_anycast_prefixes_v6_url()
     get_max_mind_path_city()
     get_max_mind_path_country()
     get_max_mind_path_asn()
+    get_max_mind_cache_max_size()
+    get_max_mind_cache_ttl_s()
+    get_max_mind_cache_track_stats()
+    get_max_mind_version_check_interval_s()
+    get_max_mind_enrichment_debug_headers()
+    get_write_queue_max_size()
+    get_write_batch_size()
+    get_write_flush_interval_s()
+    get_write_spill_path()
+    get_history_stream_batch_size()
+    get_history_max_page_size()
+    get_rollup_interval_s()
+    get_rollup_batch_size()
+    get_export_batch_size()
+    get_monitoring_stats_endpoint()
 
     check_geolite_account_id_and_key()
     # everything is fine
@@ -147,6 +174,46 @@ def get_nr_of_measurements_for_jitter() -> int:
     return ntp["number_of_measurements_for_calculating_jitter"]
 
 
+def get_max_parallel_measurements() -> int:
+    """
+    This method returns the maximum number of NTP queries that run at the same time when
+    we measure all the IPs of a domain name.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ntp" not in config:
+        raise ValueError("ntp section is missing")
+    ntp = config["ntp"]
+    if "max_parallel_measurements" not in ntp:
+        raise ValueError("ntp 'max_parallel_measurements' is missing")
+    if not isinstance(ntp["max_parallel_measurements"], int):
+        raise ValueError("ntp 'max_parallel_measurements' must be an 'int'")
+    if ntp["max_parallel_measurements"] <= 0:
+        raise ValueError("ntp 'max_parallel_measurements' must be > 0")
+    return ntp["max_parallel_measurements"]
+
+
+def get_domain_measurement_deadline_s() -> float | int:
+    """
+    This method returns the overall deadline for measuring all the IPs of a domain name.
+    The IPs that did not answer until then are reported as non-responding.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ntp" not in config:
+        raise ValueError("ntp section is missing")
+    ntp = config["ntp"]
+    if "domain_measurement_deadline_s" not in ntp:
+        raise ValueError("ntp 'domain_measurement_deadline_s' is missing")
+    if not isinstance(ntp["domain_measurement_deadline_s"], float | int):
+        raise ValueError("ntp 'domain_measurement_deadline_s' must be a 'float' or an 'int'")
+    if ntp["domain_measurement_deadline_s"] <= 0:
+        raise ValueError("ntp 'domain_measurement_deadline_s' must be > 0")
+    return ntp["domain_measurement_deadline_s"]
+
+
 def get_rate_limit_per_client_ip() -> str:
     """
     This method returns the rate limit for queries per client IP to our server.
@@ -360,6 +427,201 @@ def get_ripe_server_timeout() -> int:
     return ripe_atlas["server_timeout"]
 
 
+def get_ripe_probe_cache_max_size() -> int:
+    """
+    This method returns how many probes are kept in the in-memory cache of the probe metadata.
+    0 disables the cache.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ripe_atlas" not in config:
+        raise ValueError("ripe_atlas section is missing")
+    ripe_atlas = config["ripe_atlas"]
+    if "probe_cache_max_size" not in ripe_atlas:
+        raise ValueError("ripe_atlas 'probe_cache_max_size' is missing")
+    if not isinstance(ripe_atlas["probe_cache_max_size"], int):
+        raise ValueError("ripe_atlas 'probe_cache_max_size' must be an 'int'")
+    if ripe_atlas["probe_cache_max_size"] < 0:
+        raise ValueError("ripe_atlas 'probe_cache_max_size' cannot be negative")
+    return ripe_atlas["probe_cache_max_size"]
+
+
+def get_ripe_probe_cache_ttl_s() -> float | int:
+    """
+    This method returns how long (in seconds) the metadata of a probe stays in the cache.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ripe_atlas" not in config:
+        raise ValueError("ripe_atlas section is missing")
+    ripe_atlas = config["ripe_atlas"]
+    if "probe_cache_ttl_s" not in ripe_atlas:
+        raise ValueError("ripe_atlas 'probe_cache_ttl_s' is missing")
+    if not isinstance(ripe_atlas["probe_cache_ttl_s"], float | int):
+        raise ValueError("ripe_atlas 'probe_cache_ttl_s' must be a 'float' or an 'int' in s")
+    if ripe_atlas["probe_cache_ttl_s"] <= 0:
+        raise ValueError("ripe_atlas 'probe_cache_ttl_s' must be > 0")
+    return ripe_atlas["probe_cache_ttl_s"]
+
+
+def get_ripe_probe_catalogue_url() -> str:
+    """
+    This method returns the URL of the daily dump of all the RIPE Atlas probes, used to build the local probe catalogue.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ripe_atlas" not in config:
+        raise ValueError("ripe_atlas section is missing")
+    ripe_atlas = config["ripe_atlas"]
+    if "probe_catalogue_url" not in ripe_atlas:
+        raise ValueError("ripe_atlas 'probe_catalogue_url' is missing")
+    if not isinstance(ripe_atlas["probe_catalogue_url"], str):
+        raise ValueError("ripe_atlas 'probe_catalogue_url' must be a 'str'")
+    return ripe_atlas["probe_catalogue_url"]
+
+
+def get_ripe_probe_catalogue_sync_interval_s() -> float | int:
+    """
+    This method returns how often (in seconds) the local probe catalogue is synced with the dump of RIPE Atlas.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ripe_atlas" not in config:
+        raise ValueError("ripe_atlas section is missing")
+    ripe_atlas = config["ripe_atlas"]
+    if "probe_catalogue_sync_interval_s" not in ripe_atlas:
+        raise ValueError("ripe_atlas 'probe_catalogue_sync_interval_s' is missing")
+    if not isinstance(ripe_atlas["probe_catalogue_sync_interval_s"], float | int):
+        raise ValueError("ripe_atlas 'probe_catalogue_sync_interval_s' must be a 'float' or an 'int' in s")
+    if ripe_atlas["probe_catalogue_sync_interval_s"] <= 0:
+        raise ValueError("ripe_atlas 'probe_catalogue_sync_interval_s' must be > 0")
+    return ripe_atlas["probe_catalogue_sync_interval_s"]
+
+
+def get_ripe_max_parallel_probe_queries() -> int:
+    """
+    This method returns how many probe searches (and the prefix lookup of the client) are done at the same time
+    when the probes of a measurement are selected.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ripe_atlas" not in config:
+        raise ValueError("ripe_atlas section is missing")
+    ripe_atlas = config["ripe_atlas"]
+    if "max_parallel_probe_queries" not in ripe_atlas:
+        raise ValueError("ripe_atlas 'max_parallel_probe_queries' is missing")
+    if not isinstance(ripe_atlas["max_parallel_probe_queries"], int):
+        raise ValueError("ripe_atlas 'max_parallel_probe_queries' must be an 'int'")
+    if ripe_atlas["max_parallel_probe_queries"] <= 0:
+        raise ValueError("ripe_atlas 'max_parallel_probe_queries' must be > 0")
+    return ripe_atlas["max_parallel_probe_queries"]
+
+
+def get_ripe_probe_query_deadline_s() -> float | int:
+    """
+    This method returns the deadline of every phase of the probe selection (the prefix lookup with the searches
+    that do not need the prefix, then the searches by prefix). The searches that did not finish until then find no probes.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ripe_atlas" not in config:
+        raise ValueError("ripe_atlas section is missing")
+    ripe_atlas = config["ripe_atlas"]
+    if "probe_query_deadline_s" not in ripe_atlas:
+        raise ValueError("ripe_atlas 'probe_query_deadline_s' is missing")
+    if not isinstance(ripe_atlas["probe_query_deadline_s"], float | int):
+        raise ValueError("ripe_atlas 'probe_query_deadline_s' must be a 'float' or an 'int' in s")
+    if ripe_atlas["probe_query_deadline_s"] <= 0:
+        raise ValueError("ripe_atlas 'probe_query_deadline_s' must be > 0")
+    return ripe_atlas["probe_query_deadline_s"]
+
+
+def get_ripe_http_timeout_s() -> float | int:
+    """
+    This method returns the timeout of the HTTP requests to RIPE Atlas and stat.ripe.net
+    (used for connecting and for every read).
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ripe_atlas" not in config:
+        raise ValueError("ripe_atlas section is missing")
+    ripe_atlas = config["ripe_atlas"]
+    if "http_timeout_s" not in ripe_atlas:
+        raise ValueError("ripe_atlas 'http_timeout_s' is missing")
+    if not isinstance(ripe_atlas["http_timeout_s"], float | int):
+        raise ValueError("ripe_atlas 'http_timeout_s' must be a 'float' or an 'int' in s")
+    if ripe_atlas["http_timeout_s"] <= 0:
+        raise ValueError("ripe_atlas 'http_timeout_s' must be > 0")
+    return ripe_atlas["http_timeout_s"]
+
+
+def get_ripe_http_max_retries() -> int:
+    """
+    This method returns how many times a failed HTTP request to RIPE Atlas or stat.ripe.net is retried
+    (0 disables the retries).
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ripe_atlas" not in config:
+        raise ValueError("ripe_atlas section is missing")
+    ripe_atlas = config["ripe_atlas"]
+    if "http_max_retries" not in ripe_atlas:
+        raise ValueError("ripe_atlas 'http_max_retries' is missing")
+    if not isinstance(ripe_atlas["http_max_retries"], int):
+        raise ValueError("ripe_atlas 'http_max_retries' must be an 'int'")
+    if ripe_atlas["http_max_retries"] < 0:
+        raise ValueError("ripe_atlas 'http_max_retries' cannot be negative")
+    return ripe_atlas["http_max_retries"]
+
+
+def get_ripe_http_backoff_s() -> float | int:
+    """
+    This method returns the base of the exponential backoff between the retries of an HTTP request
+    to RIPE Atlas or stat.ripe.net. A random jitter of up to this value is added to every wait.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ripe_atlas" not in config:
+        raise ValueError("ripe_atlas section is missing")
+    ripe_atlas = config["ripe_atlas"]
+    if "http_backoff_s" not in ripe_atlas:
+        raise ValueError("ripe_atlas 'http_backoff_s' is missing")
+    if not isinstance(ripe_atlas["http_backoff_s"], float | int):
+        raise ValueError("ripe_atlas 'http_backoff_s' must be a 'float' or an 'int' in s")
+    if ripe_atlas["http_backoff_s"] < 0:
+        raise ValueError("ripe_atlas 'http_backoff_s' cannot be negative")
+    return ripe_atlas["http_backoff_s"]
+
+
+def get_ripe_http_pool_size() -> int:
+    """
+    This method returns how many keep-alive connections are kept open to every host
+    (RIPE Atlas, stat.ripe.net, ...).
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "ripe_atlas" not in config:
+        raise ValueError("ripe_atlas section is missing")
+    ripe_atlas = config["ripe_atlas"]
+    if "http_pool_size" not in ripe_atlas:
+        raise ValueError("ripe_atlas 'http_pool_size' is missing")
+    if not isinstance(ripe_atlas["http_pool_size"], int):
+        raise ValueError("ripe_atlas 'http_pool_size' must be an 'int'")
+    if ripe_atlas["http_pool_size"] <= 0:
+        raise ValueError("ripe_atlas 'http_pool_size' must be > 0")
+    return ripe_atlas["http_pool_size"]
+
+
 # bgp_tools
 def get_anycast_prefixes_v4_url() -> str:
     """
@@ -452,6 +714,291 @@ def get_max_mind_path_asn() -> str:
     return str(absolute_path)
 
 
+def get_max_mind_cache_max_size() -> int:
+    """
+    This method returns the maximum number of IP addresses kept in the in-memory geolocation cache.
+    A value of 0 disables the cache.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "max_mind" not in config:
+        raise ValueError("max_mind section is missing")
+    max_mind = config["max_mind"]
+    if "cache_max_size" not in max_mind:
+        raise ValueError("max_mind 'cache_max_size' is missing")
+    if not isinstance(max_mind["cache_max_size"], int):
+        raise ValueError("max_mind 'cache_max_size' must be an 'int'")
+    if max_mind["cache_max_size"] < 0:
+        raise ValueError("max_mind 'cache_max_size' cannot be negative")
+    return max_mind["cache_max_size"]
+
+
+def get_max_mind_cache_ttl_s() -> float | int:
+    """
+    This method returns how long (in seconds) an entry stays in the in-memory geolocation cache.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "max_mind" not in config:
+        raise ValueError("max_mind section is missing")
+    max_mind = config["max_mind"]
+    if "cache_ttl_s" not in max_mind:
+        raise ValueError("max_mind 'cache_ttl_s' is missing")
+    if not isinstance(max_mind["cache_ttl_s"], float | int):
+        raise ValueError("max_mind 'cache_ttl_s' must be a 'float' or an 'int' in s")
+    if max_mind["cache_ttl_s"] <= 0:
+        raise ValueError("max_mind 'cache_ttl_s' must be > 0")
+    return max_mind["cache_ttl_s"]
+
+
+def get_max_mind_cache_track_stats() -> bool:
+    """
+    This method returns whether the in-memory geolocation cache should count its hits and misses.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "max_mind" not in config:
+        raise ValueError("max_mind section is missing")
+    max_mind = config["max_mind"]
+    if "cache_track_stats" not in max_mind:
+        raise ValueError("max_mind 'cache_track_stats' is missing")
+    if not isinstance(max_mind["cache_track_stats"], bool):
+        raise ValueError("max_mind 'cache_track_stats' must be a 'bool'")
+    return max_mind["cache_track_stats"]
+
+
+def get_max_mind_version_check_interval_s() -> float | int:
+    """
+    This method returns how often (in seconds) the files of the max_mind databases are checked for an update.
+    A value of 0 checks them on every lookup.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "max_mind" not in config:
+        raise ValueError("max_mind section is missing")
+    max_mind = config["max_mind"]
+    if "version_check_interval_s" not in max_mind:
+        raise ValueError("max_mind 'version_check_interval_s' is missing")
+    if not isinstance(max_mind["version_check_interval_s"], float | int):
+        raise ValueError("max_mind 'version_check_interval_s' must be a 'float' or an 'int' in s")
+    if max_mind["version_check_interval_s"] < 0:
+        raise ValueError("max_mind 'version_check_interval_s' cannot be negative")
+    return max_mind["version_check_interval_s"]
+
+
+def get_max_mind_enrichment_debug_headers() -> bool:
+    """
+    This method returns whether the hits and misses of the lookup memo of a response (geolocation and anycast)
+    should be added to its headers.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "max_mind" not in config:
+        raise ValueError("max_mind section is missing")
+    max_mind = config["max_mind"]
+    if "enrichment_debug_headers" not in max_mind:
+        raise ValueError("max_mind 'enrichment_debug_headers' is missing")
+    if not isinstance(max_mind["enrichment_debug_headers"], bool):
+        raise ValueError("max_mind 'enrichment_debug_headers' must be a 'bool'")
+    return max_mind["enrichment_debug_headers"]
+
+
+def get_write_queue_max_size() -> int:
+    """
+    This method returns how many measurements can wait in memory to be written to the database.
+    When the queue is full, the new measurements are spilled to disk.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "database" not in config:
+        raise ValueError("database section is missing")
+    database = config["database"]
+    if "write_queue_max_size" not in database:
+        raise ValueError("database 'write_queue_max_size' is missing")
+    if not isinstance(database["write_queue_max_size"], int):
+        raise ValueError("database 'write_queue_max_size' must be an 'int'")
+    if database["write_queue_max_size"] <= 0:
+        raise ValueError("database 'write_queue_max_size' must be > 0")
+    return database["write_queue_max_size"]
+
+
+def get_write_batch_size() -> int:
+    """
+    This method returns how many measurements the background writer stores in one batch.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "database" not in config:
+        raise ValueError("database section is missing")
+    database = config["database"]
+    if "write_batch_size" not in database:
+        raise ValueError("database 'write_batch_size' is missing")
+    if not isinstance(database["write_batch_size"], int):
+        raise ValueError("database 'write_batch_size' must be an 'int'")
+    if database["write_batch_size"] <= 0:
+        raise ValueError("database 'write_batch_size' must be > 0")
+    return database["write_batch_size"]
+
+
+def get_write_flush_interval_s() -> float | int:
+    """
+    This method returns the maximum time (in seconds) a measurement waits in memory before it is written to the database.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "database" not in config:
+        raise ValueError("database section is missing")
+    database = config["database"]
+    if "write_flush_interval_s" not in database:
+        raise ValueError("database 'write_flush_interval_s' is missing")
+    if not isinstance(database["write_flush_interval_s"], float | int):
+        raise ValueError("database 'write_flush_interval_s' must be a 'float' or an 'int' in s")
+    if database["write_flush_interval_s"] <= 0:
+        raise ValueError("database 'write_flush_interval_s' must be > 0")
+    return database["write_flush_interval_s"]
+
+
+def get_write_spill_path() -> str:
+    """
+    This method returns the path to the file where the measurements are kept while the database is unavailable.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "database" not in config:
+        raise ValueError("database section is missing")
+    database = config["database"]
+    if "write_spill_path" not in database:
+        raise ValueError("database 'write_spill_path' is missing")
+    if not isinstance(database["write_spill_path"], str):
+        raise ValueError("database 'write_spill_path' must be a 'str'")
+    # This assumes this file is in server/app/utils/
+    server_dir = Path(__file__).resolve().parent.parent.parent
+    return str((server_dir / database["write_spill_path"]).resolve())
+
+
+def get_history_stream_batch_size() -> int:
+    """
+    This method returns how many rows are fetched from the database at a time when the history is streamed.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "database" not in config:
+        raise ValueError("database section is missing")
+    database = config["database"]
+    if "history_stream_batch_size" not in database:
+        raise ValueError("database 'history_stream_batch_size' is missing")
+    if not isinstance(database["history_stream_batch_size"], int):
+        raise ValueError("database 'history_stream_batch_size' must be an 'int'")
+    if database["history_stream_batch_size"] <= 0:
+        raise ValueError("database 'history_stream_batch_size' must be > 0")
+    return database["history_stream_batch_size"]
+
+
+def get_history_max_page_size() -> int:
+    """
+    This method returns the maximum number of measurements the history endpoint returns in one page.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "database" not in config:
+        raise ValueError("database section is missing")
+    database = config["database"]
+    if "history_max_page_size" not in database:
+        raise ValueError("database 'history_max_page_size' is missing")
+    if not isinstance(database["history_max_page_size"], int):
+        raise ValueError("database 'history_max_page_size' must be an 'int'")
+    if database["history_max_page_size"] <= 0:
+        raise ValueError("database 'history_max_page_size' must be > 0")
+    return database["history_max_page_size"]
+
+
+def get_rollup_interval_s() -> float | int:
+    """
+    This method returns how often (in seconds) the new measurements are merged into the rollup tables.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "database" not in config:
+        raise ValueError("database section is missing")
+    database = config["database"]
+    if "rollup_interval_s" not in database:
+        raise ValueError("database 'rollup_interval_s' is missing")
+    if not isinstance(database["rollup_interval_s"], float | int):
+        raise ValueError("database 'rollup_interval_s' must be a 'float' or an 'int' in s")
+    if database["rollup_interval_s"] <= 0:
+        raise ValueError("database 'rollup_interval_s' must be > 0")
+    return database["rollup_interval_s"]
+
+
+def get_rollup_batch_size() -> int:
+    """
+    This method returns how many new measurements are merged into the rollup tables in one transaction.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "database" not in config:
+        raise ValueError("database section is missing")
+    database = config["database"]
+    if "rollup_batch_size" not in database:
+        raise ValueError("database 'rollup_batch_size' is missing")
+    if not isinstance(database["rollup_batch_size"], int):
+        raise ValueError("database 'rollup_batch_size' must be an 'int'")
+    if database["rollup_batch_size"] <= 0:
+        raise ValueError("database 'rollup_batch_size' must be > 0")
+    return database["rollup_batch_size"]
+
+
+def get_export_batch_size() -> int:
+    """
+    This method returns how many rows are read from the database at a time when the history is exported.
+    Every batch becomes one Arrow record batch (or one Parquet row group).
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "database" not in config:
+        raise ValueError("database section is missing")
+    database = config["database"]
+    if "export_batch_size" not in database:
+        raise ValueError("database 'export_batch_size' is missing")
+    if not isinstance(database["export_batch_size"], int):
+        raise ValueError("database 'export_batch_size' must be an 'int'")
+    if database["export_batch_size"] <= 0:
+        raise ValueError("database 'export_batch_size' must be > 0")
+    return database["export_batch_size"]
+
+
+def get_monitoring_stats_endpoint() -> bool:
+    """
+    This method returns whether the runtime statistics of the server (caches, measurement writer and latencies
+    of the RIPE Atlas requests) are served on the /stats/ endpoint.
+
+    Raises:
+        ValueError: If this variable has not been correctly set.
+    """
+    if "monitoring" not in config:
+        raise ValueError("monitoring section is missing")
+    monitoring = config["monitoring"]
+    if "stats_endpoint" not in monitoring:
+        raise ValueError("monitoring 'stats_endpoint' is missing")
+    if not isinstance(monitoring["stats_endpoint"], bool):
+        raise ValueError("monitoring 'stats_endpoint' must be a 'bool'")
+    return monitoring["stats_endpoint"]
+
+
 def check_geolite_account_id_and_key() -> bool:
     """
     This function checks that we have the account id and key set.
@@ -1,8 +1,193 @@
+import os
+import threading
+import time
 from typing import Optional
 import geoip2.database
+from maxminddb import MODE_MMAP
 
+from server.app.dtos.GeoRecord import GeoRecord
+from server.app.utils.cache import TTLLRUCache
 from server.app.utils.load_config_data import get_max_mind_path_asn
 from server.app.utils.load_config_data import get_max_mind_path_country, get_max_mind_path_city
+from server.app.utils.load_config_data import get_max_mind_cache_max_size, get_max_mind_cache_ttl_s, \
+    get_max_mind_cache_track_stats, get_max_mind_version_check_interval_s
+
+# path of the database -> ((inode, modification time in ns), opened reader)
+_geo_readers: dict[str, tuple[tuple[int, int], geoip2.database.Reader]] = {}
+_geo_readers_lock = threading.Lock()
+
+# path of the database -> (monotonic time of the next check, (inode, modification time in ns) or None if missing)
+_geo_database_versions: dict[str, tuple[float, Optional[tuple[int, int]]]] = {}
+_geo_version_check_interval_s = get_max_mind_version_check_interval_s()
+
+
+def get_geo_database_version(db_path: str) -> Optional[tuple[int, int]]:
+    """
+    Returns the version of a MaxMind database, as (inode, modification time) of its file.
+    The file is checked at most once every "version_check_interval_s" seconds (see the config),
+    so the lookups do not pay for a system call every time.
+
+    Args:
+        db_path (str): The absolute path to the .mmdb database.
+
+    Returns:
+        Optional[tuple[int, int]]: The version of the database, or None if the file is missing.
+    """
+    now = time.monotonic()
+    entry = _geo_database_versions.get(db_path)
+    if entry is not None and now < entry[0]:
+        return entry[1]
+    version: Optional[tuple[int, int]]
+    try:
+        stat = os.stat(db_path)
+        version = (stat.st_ino, stat.st_mtime_ns)
+    except OSError:
+        version = None
+    _geo_database_versions[db_path] = (now + _geo_version_check_interval_s, version)
+    return version
+
+
+def get_geo_reader(db_path: str) -> geoip2.database.Reader:
+    """
+    Returns the long-lived, memory-mapped reader of a MaxMind database. Each database is opened only once
+    per worker and then shared by all the lookups.
+
+    The reader is reopened only if the file on disk changed (different inode or modification time, see
+    `get_geo_database_version`), which happens when `update_geolite_and_bgptools_dbs.sh` replaces the .mmdb files.
+    The new reader replaces the old one atomically, so the lookups that are still running finish on the old
+    (still mapped) file.
+
+    Args:
+        db_path (str): The absolute path to the .mmdb database.
+
+    Returns:
+        geoip2.database.Reader: The reader of that database.
+
+    Raises:
+        OSError: If the database file does not exist or cannot be read.
+        Exception: If the database file is not a valid MaxMind database.
+    """
+    version = get_geo_database_version(db_path)
+    if version is None:
+        raise FileNotFoundError(f"The MaxMind database {db_path} does not exist")
+    entry = _geo_readers.get(db_path)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    with _geo_readers_lock:
+        # another thread may have already reopened it while we were waiting
+        entry = _geo_readers.get(db_path)
+        if entry is None or entry[0] != version:
+            # we do not close the old reader, because other lookups may still use it.
+            # Its memory map is released when nobody references it anymore.
+            entry = (version, geoip2.database.Reader(db_path, mode=MODE_MMAP))
+            _geo_readers[db_path] = entry
+        return entry[1]
+
+
+def close_geo_readers() -> None:
+    """
+    Closes all the opened MaxMind readers, and forgets the versions of their files.
+    The next lookup will check the files and open them again. It is called when the application shuts down.
+    """
+    with _geo_readers_lock:
+        for _, reader in _geo_readers.values():
+            try:
+                reader.close()
+            except Exception as e:
+                print(e)
+        _geo_readers.clear()
+        _geo_database_versions.clear()
+
+
+# (IP address, versions of the databases) -> geolocation of the IP address
+_geo_cache: TTLLRUCache[tuple[str, tuple[Optional[tuple[int, int]], ...]], GeoRecord] = \
+    TTLLRUCache(max_size=get_max_mind_cache_max_size(), ttl_s=get_max_mind_cache_ttl_s(),
+                track_stats=get_max_mind_cache_track_stats())
+
+# the City, Country and ASN databases, resolved once instead of on every lookup
+_geo_database_paths = (get_max_mind_path_city(), get_max_mind_path_country(), get_max_mind_path_asn())
+
+
+def get_geo_databases_version() -> tuple[Optional[tuple[int, int]], ...]:
+    """
+    Returns the version of the City, Country and ASN databases (see `get_geo_database_version`).
+    The version changes every time `update_geolite_and_bgptools_dbs.sh` replaces the .mmdb files.
+    A missing database has version None.
+
+    Returns:
+        tuple[Optional[tuple[int, int]], ...]: The versions of the City, Country and ASN databases.
+    """
+    return tuple(get_geo_database_version(path) for path in _geo_database_paths)
+
+
+def get_geo_cache_stats() -> dict[str, int]:
+    """
+    Returns the size and the hit/miss counters of the geolocation cache.
+
+    Returns:
+        dict[str, int]: The statistics of the geolocation cache.
+    """
+    return _geo_cache.stats()
+
+
+def clear_geo_cache() -> None:
+    """
+    Removes all the entries from the geolocation cache.
+    """
+    _geo_cache.clear()
+
+
+def lookup_ip(client_ip: Optional[str]) -> GeoRecord:
+    """
+    Retrieves the country code, the continent code, the coordinates and the ASN of a given IP address
+    in a single call. The answer is served from the in-memory geolocation cache if possible.
+
+    The key of the cache contains the version of the MaxMind databases, so an update of the .mmdb files
+    invalidates the old entries without restarting the server.
+
+    Args:
+        client_ip (Optional[str]): The IP address to geolocate.
+
+    Returns:
+        GeoRecord: The geolocation information about the IP address.
+    """
+    if client_ip is None:
+        return lookup_ip_uncached(client_ip)
+    key = (client_ip, get_geo_databases_version())
+    record = _geo_cache.get(key)
+    if record is None:
+        record = lookup_ip_uncached(client_ip)
+        _geo_cache.put(key, record)
+    return record
+
+
+def lookup_ip_uncached(client_ip: Optional[str]) -> GeoRecord:
+    """
+    Retrieves the country code, the continent code, the coordinates and the ASN of a given IP address
+    in a single call, using the pooled MaxMind GeoLite2 readers.
+
+    Every field is resolved independently, so a missing database or a missing entry only affects its own field.
+    The fallbacks are the same as in `get_coordinates_for_ip`, `get_country_for_ip`, `get_continent_for_ip`
+    and `get_asn_for_ip`.
+
+    Args:
+        client_ip (Optional[str]): The IP address to geolocate.
+
+    Returns:
+        GeoRecord: The geolocation information about the IP address.
+    """
+    if client_ip is None:
+        return GeoRecord(country_code=None, continent_code=None, coordinates=(25.0, -71.0), asn=None)
+    country_code: Optional[str] = None
+    continent_code: Optional[str] = None
+    try:
+        response = get_geo_reader(get_max_mind_path_country()).country(client_ip)
+        country_code = response.country.iso_code
+        continent_code = response.continent.code
+    except Exception as e:
+        print(e)
+    return GeoRecord(country_code=country_code, continent_code=continent_code,
+                     coordinates=get_coordinates_for_ip(client_ip), asn=get_asn_for_ip(client_ip))
 
 
 def get_coordinates_for_ip(client_ip: Optional[str]) -> tuple[float, float]:
@@ -23,13 +208,12 @@ def get_coordinates_for_ip(client_ip: Optional[str]) -> tuple[float, float]:
     if client_ip is None:
         return 25.0, -71.0
     try:
-        with geoip2.database.Reader(f'{get_max_mind_path_city()}') as reader:
-            response = reader.city(client_ip)
-            lat = response.location.latitude
-            long = response.location.longitude
-            if lat is None or long is None:
-                raise ValueError("Location data incomplete.")
-            return lat, long
+        response = get_geo_reader(get_max_mind_path_city()).city(client_ip)
+        lat = response.location.latitude
+        long = response.location.longitude
+        if lat is None or long is None:
+            raise ValueError("Location data incomplete.")
+        return lat, long
     except Exception as e:
         print(e)
         return 25.0, -71.0
@@ -50,9 +234,8 @@ def get_country_for_ip(client_ip: Optional[str]) -> Optional[str]:
     if client_ip is None:
         return None
     try:
-        with geoip2.database.Reader(f'{get_max_mind_path_country()}') as reader:
-            response = reader.country(client_ip).country.iso_code
-            return response
+        response = get_geo_reader(get_max_mind_path_country()).country(client_ip).country.iso_code
+        return response
     except Exception as e:
         print(e)
         return None
@@ -73,9 +256,8 @@ def get_continent_for_ip(client_ip: Optional[str]) -> Optional[str]:
     if client_ip is None:
         return None
     try:
-        with geoip2.database.Reader(f'{get_max_mind_path_country()}') as reader:
-            response = reader.country(client_ip).continent.code
-            return response
+        response = get_geo_reader(get_max_mind_path_country()).country(client_ip).continent.code
+        return response
     except Exception as e:
         print(e)
         return None
@@ -94,9 +276,8 @@ def get_asn_for_ip(client_ip: str) -> Optional[str]:
         Optional[str]: The ans for the ip location or None.
     """
     try:
-        with geoip2.database.Reader(f'{get_max_mind_path_asn()}') as reader:
-            response = reader.asn(client_ip).autonomous_system_number
-            return str(response)
+        response = get_geo_reader(get_max_mind_path_asn()).asn(client_ip).autonomous_system_number
+        return str(response)
     except Exception as e:
         print(e)
         return None
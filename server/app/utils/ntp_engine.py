@@ -0,0 +1,245 @@
+import asyncio
+import struct
+import time
+from typing import Any, Optional, cast
+
+from server.app.dtos.NtpPacket import NtpPacket
+from server.app.dtos.PreciseTime import PreciseTime
+
+# the same layout as in ntplib: LI/VN/mode, stratum, poll, precision, root delay, root dispersion, ref id
+# and 4 timestamps of 2 x 32 bits
+NTP_PACKET_FORMAT = "!B B B b 11I"
+NTP_PACKET_SIZE = struct.calcsize(NTP_PACKET_FORMAT)
+NTP_PORT = 123
+# seconds between the NTP epoch (1900) and the unix epoch (1970)
+NTP_DELTA = 2208988800
+
+
+def precise_time_now() -> PreciseTime:
+    """
+    Returns the current time of this server as an NTP timestamp. The conversion is done with integers
+    from the nanoseconds of the system clock, so it does not lose precision like the float time.
+
+    Returns:
+        PreciseTime: The current time in NTP format.
+    """
+    now_ns = time.time_ns()
+    seconds, nanoseconds = divmod(now_ns, 1_000_000_000)
+    return PreciseTime(seconds + NTP_DELTA, (nanoseconds << 32) // 1_000_000_000)
+
+
+def short_format_to_precise_time(value: int) -> PreciseTime:
+    """
+    Converts an NTP short format value (16 bits of seconds and 16 bits of fraction), which is used for the root delay
+    and the root dispersion, to a PreciseTime object.
+
+    Args:
+        value (int): The raw 32-bit value from the packet.
+
+    Returns:
+        PreciseTime: The same value as a PreciseTime object.
+    """
+    return PreciseTime(value >> 16, (value & 0xFFFF) << 16)
+
+
+def build_ntp_request(ntp_version: int, transmit_time: PreciseTime) -> bytes:
+    """
+    Builds a mode 3 (client) NTP request. The transmit timestamp of the request is the time the client sends it (t1).
+    The server copies it into the origin timestamp of its response, so we can match the response with the request.
+
+    Args:
+        ntp_version (int): The version of the NTP protocol.
+        transmit_time (PreciseTime): The time the request is sent.
+
+    Returns:
+        bytes: The request packet.
+    """
+    return struct.pack(NTP_PACKET_FORMAT, (0 << 6 | ntp_version << 3 | 3), 0, 0, 0, 0, 0, 0,
+                       0, 0, 0, 0, 0, 0, transmit_time.seconds, transmit_time.fraction)
+
+
+def parse_ntp_packet(data: bytes) -> NtpPacket:
+    """
+    Parses the header of an NTP packet received from the network.
+
+    Args:
+        data (bytes): The payload of the packet.
+
+    Returns:
+        NtpPacket: The parsed packet.
+
+    Raises:
+        ValueError: If the packet is too short to be an NTP packet.
+    """
+    if len(data) < NTP_PACKET_SIZE:
+        raise ValueError(f"Invalid NTP packet of {len(data)} bytes.")
+    unpacked = struct.unpack(NTP_PACKET_FORMAT, data[0:NTP_PACKET_SIZE])
+    return NtpPacket(
+        leap=unpacked[0] >> 6 & 0x3,
+        version=unpacked[0] >> 3 & 0x7,
+        mode=unpacked[0] & 0x7,
+        stratum=unpacked[1],
+        poll=unpacked[2],
+        precision=unpacked[3],
+        root_delay=short_format_to_precise_time(unpacked[4]),
+        root_dispersion=short_format_to_precise_time(unpacked[5]),
+        ref_id=unpacked[6],
+        ref_time=PreciseTime(unpacked[7], unpacked[8]),
+        orig_time=PreciseTime(unpacked[9], unpacked[10]),
+        recv_time=PreciseTime(unpacked[11], unpacked[12]),
+        tx_time=PreciseTime(unpacked[13], unpacked[14])
+    )
+
+
+class NtpClientProtocol(asyncio.DatagramProtocol):
+    """
+    An asyncio UDP protocol that performs NTP requests to a single server over one socket, one request at a time.
+    Every call of `send_request` sends a new request and returns a future that is resolved with the response
+    and the time the response arrived (t4).
+
+    Responses that are not mode 4 or that do not answer the current request (different origin timestamp) are ignored,
+    so a late answer to an older request cannot be taken as the answer to the current one.
+
+    Attributes:
+        ntp_version (int): The version of the NTP protocol.
+    """
+
+    def __init__(self, ntp_version: int) -> None:
+        self.ntp_version = ntp_version
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.transmit_time: Optional[PreciseTime] = None
+        self.answer: Optional[asyncio.Future[tuple[NtpPacket, PreciseTime]]] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """
+        Keeps the UDP transport used to send the requests.
+
+        Args:
+            transport (asyncio.BaseTransport): The UDP transport connected to the NTP server.
+        """
+        self.transport = cast(asyncio.DatagramTransport, transport)
+
+    def send_request(self) -> "asyncio.Future[tuple[NtpPacket, PreciseTime]]":
+        """
+        Sends a new NTP request. The transmit timestamp (t1) is taken right before the packet is sent.
+
+        Returns:
+            asyncio.Future[tuple[NtpPacket, PreciseTime]]: Resolved with the response and the time it arrived.
+        """
+        assert self.transport is not None
+        self.answer = asyncio.get_running_loop().create_future()
+        self.transmit_time = precise_time_now()
+        self.transport.sendto(build_ntp_request(self.ntp_version, self.transmit_time))
+        return self.answer
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        """
+        Records the time the response arrived and checks that it answers the current request.
+
+        Args:
+            data (bytes): The payload of the packet.
+            addr (Any): The address of the sender.
+        """
+        receive_time = precise_time_now()  # t4, taken before anything else
+        if self.answer is None or self.answer.done():
+            return
+        try:
+            packet = parse_ntp_packet(data)
+        except ValueError as e:
+            print(e)
+            return
+        if packet.mode != 4 or packet.orig_time != self.transmit_time:
+            return
+        self.answer.set_result((packet, receive_time))
+
+    def error_received(self, exc: Exception) -> None:
+        """
+        Fails the current request if the socket reported an error (for example ICMP port unreachable).
+
+        Args:
+            exc (Exception): The error of the socket.
+        """
+        if self.answer is not None and not self.answer.done():
+            self.answer.set_exception(exc)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        """
+        Fails the current request if the socket was closed before we got an answer.
+
+        Args:
+            exc (Optional[Exception]): The error that closed the socket, if any.
+        """
+        if self.answer is not None and not self.answer.done():
+            self.answer.set_exception(exc if exc is not None else ConnectionError("The socket was closed."))
+
+
+async def ntp_burst_query(server_ip_str: str, ntp_version: int, timeout: float | int, samples: int = 1,
+                          port: int = NTP_PORT) -> list[tuple[NtpPacket, PreciseTime]]:
+    """
+    Sends a burst of NTP requests to a server over one socket, without blocking the event loop.
+    The requests are sent one after the other: the next one leaves as soon as the previous one was answered.
+    The whole burst has to fit in the timeout, and every request waits at most for its share of it
+    (timeout / samples). A lost request only costs its own share: the next requests are still sent,
+    and the burst returns the samples that were answered.
+
+    Args:
+        server_ip_str (str): The IP address of the NTP server.
+        ntp_version (int): The version of the NTP protocol.
+        timeout (float | int): How long (in seconds) the whole burst may take.
+        samples (int): How many requests to send.
+        port (int): The UDP port of the NTP server.
+
+    Returns:
+        list[tuple[NtpPacket, PreciseTime]]: The responses of the server and the times they arrived (t4),
+        in the order they were received. It contains at least one sample.
+
+    Raises:
+        TimeoutError: If the server did not answer any request in time.
+        OSError: If the requests could not be sent.
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(lambda: NtpClientProtocol(ntp_version),
+                                                              remote_addr=(server_ip_str, port))
+    received: list[tuple[NtpPacket, PreciseTime]] = []
+    error: Optional[OSError] = None
+    deadline = loop.time() + timeout
+    sample_timeout = timeout / samples
+    try:
+        for _ in range(samples):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                received.append(await asyncio.wait_for(protocol.send_request(), min(remaining, sample_timeout)))
+            except asyncio.TimeoutError:
+                pass
+            except OSError as e:
+                error = e
+    finally:
+        transport.close()
+    if len(received) == 0:
+        if error is not None:
+            raise error
+        raise TimeoutError(f"No response received from {server_ip_str}.")
+    return received
+
+
+async def ntp_query(server_ip_str: str, ntp_version: int, timeout: float | int,
+                    port: int = NTP_PORT) -> tuple[NtpPacket, PreciseTime]:
+    """
+    Sends an NTP request to a server without blocking the event loop, so many requests can be in flight at once.
+
+    Args:
+        server_ip_str (str): The IP address of the NTP server.
+        ntp_version (int): The version of the NTP protocol.
+        timeout (float | int): How long (in seconds) to wait for the response.
+        port (int): The UDP port of the NTP server.
+
+    Returns:
+        tuple[NtpPacket, PreciseTime]: The response of the server and the time it arrived (t4).
+
+    Raises:
+        TimeoutError: If the server did not answer in time.
+        OSError: If the request could not be sent.
+    """
+    return (await ntp_burst_query(server_ip_str, ntp_version, timeout, 1, port))[0]
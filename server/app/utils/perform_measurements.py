@@ -1,18 +1,20 @@
+import asyncio
 import ntplib
-from ipaddress import ip_address
+from dataclasses import replace
+from ipaddress import ip_address, IPv4Address, IPv6Address
 import json
 from typing import Optional
-import requests
 
 from server.app.dtos.ProbeData import ServerLocation
-from server.app.utils.location_resolver import get_country_for_ip, get_coordinates_for_ip
+from server.app.utils.location_resolver import lookup_ip
 from server.app.models.CustomError import InputError, RipeMeasurementError
-from server.app.utils.calculations import ntp_precise_time_to_human_date, convert_float_to_precise_time, \
+from server.app.utils.calculations import ntp_precise_time_to_human_date, \
     get_non_responding_ntp_measurement
 from server.app.utils.ip_utils import get_ip_family, ref_id_to_ip_or_name, get_server_ip, ip_to_str
 from server.app.utils.load_config_data import get_ripe_account_email, get_ripe_api_token, get_ntp_version, \
     get_timeout_measurement_s, get_ripe_number_of_probes_per_measurement, \
-    get_ripe_timeout_per_probe_ms, get_ripe_packets_per_probe
+    get_ripe_timeout_per_probe_ms, get_ripe_packets_per_probe, get_max_parallel_measurements, \
+    get_domain_measurement_deadline_s
 from server.app.utils.ripe_probes import get_probes
 from server.app.utils.domain_name_to_ip import domain_name_to_ip_list
 from server.app.dtos.NtpExtraDetails import NtpExtraDetails
@@ -21,142 +23,239 @@ from server.app.dtos.NtpMeasurement import NtpMeasurement
 from server.app.dtos.NtpServerInfo import NtpServerInfo
 from server.app.dtos.NtpTimestamps import NtpTimestamps
 from server.app.dtos.PreciseTime import PreciseTime
+from server.app.dtos.NtpPacket import NtpPacket
+from server.app.services.NtpCalculator import NtpCalculator
+from server.app.utils.ntp_engine import ntp_burst_query
+from server.app.dtos.NtpSamples import NtpSamples
 from server.app.utils.validate import is_ip_address
+from server.app.utils.ripe_http import ripe_post
 
 
 
-def perform_ntp_measurement_domain_name_list(server_name: str, client_ip: Optional[str] = None, wanted_ip_type: int = 4,
-                                             ntp_version: int = get_ntp_version()) -> Optional[list[NtpMeasurement]]:
+def get_vantage_point_ip(server_ip_str: str) -> Optional[IPv4Address | IPv6Address]:
     """
-    This method performs a NTP measurement on a NTP server from all the IPs got back from its domain name.
+    This method returns the IP address of this server (the vantage point) with the same type as the NTP server.
 
     Args:
-        server_name (str): The name of the ntp server.
-        client_ip (Optional[str]): The IP address of the client (if given).
-        wanted_ip_type (int): The IP type that we want to measure.
-        ntp_version (int): The version of the ntp that you want to use.
+        server_ip_str (str): The IP address of the ntp server in string format.
 
     Returns:
-        Optional[list[NtpMeasurement]]: It returns a list of NTP measurement objects or None if there is a timeout.
+        Optional[IPv4Address | IPv6Address]: The IP address of this server or None if it could not be found.
+    """
+    # get the same type (We guaranteed before calling this method that it exists)
+    return get_server_ip(get_ip_family(server_ip_str))
 
-    Raises:
-        DNSError: If the domain name is invalid or cannot be converted to an IP list.
+
+def get_ntp_server_info(server_ip_str: str, server_name: Optional[str], ntp_version: int,
+                        ref_id: int, stratum: int) -> NtpServerInfo:
     """
-    domain_ips: list[str] = domain_name_to_ip_list(server_name, client_ip, wanted_ip_type)
-    # domain_ips contains a list of ips that are good to use.
-    resulted_measurements = []
-    ok = False
-    for ip_str in domain_ips:
-        try:
-            client = ntplib.NTPClient()
-            response_from_ntplib = client.request(ip_str, ntp_version, timeout=get_timeout_measurement_s())
-            r = convert_ntp_response_to_measurement(response=response_from_ntplib,
-                                                    server_ip_str=ip_str,
-                                                    server_name=server_name,
-                                                    ntp_version=ntp_version)
+    This method builds the information about an NTP server (IP, name, reference and location).
 
-            if r is not None:
-                resulted_measurements.append(r)
-                ok = True
-        except Exception as e:
-            print(f"Error in measure from name on ip {ip_str} (this IP failed, maybe others succeeded):", e)
-            empty_measurement = get_non_responding_ntp_measurement(ip_str, server_name, ntp_version)
-            resulted_measurements.append(empty_measurement)
-            continue
+    Args:
+        server_ip_str (str): The IP address of the ntp server in string format.
+        server_name (Optional[str]): The name of the ntp server.
+        ntp_version (int): The version of the ntp that you used.
+        ref_id (int): The reference id from the response of the server.
+        stratum (int): The stratum from the response of the server.
 
-    return resulted_measurements if ok is True else None
+    Returns:
+        NtpServerInfo: The information about the NTP server.
+    """
+    ref_ip, ref_name = ref_id_to_ip_or_name(ref_id, stratum)
+    server_ip = ip_address(server_ip_str)
+    geo = lookup_ip(ip_to_str(server_ip))
+    return NtpServerInfo(
+        ntp_version=ntp_version,
+        ntp_server_ip=server_ip,
+        ntp_server_name=server_name,
+        ntp_server_ref_parent_ip=ref_ip,
+        ref_name=ref_name,
+        ntp_server_location=ServerLocation(country_code=geo.country_code, coordinates=geo.coordinates)
+    )
+
+
+def convert_ntp_packet_to_measurement(packet: NtpPacket, client_recv_time: PreciseTime, server_ip_str: str,
+                                      server_name: Optional[str],
+                                      ntp_version: int = get_ntp_version()) -> Optional[NtpMeasurement]:
+    """
+    This method converts an NTP response received by the asyncio NTP engine to an NTP measurement object.
+    The timestamps are copied from the packet as they are, and the offset and the delay are calculated from them,
+    so nothing is rounded to a float before the calculation.
+
+    Args:
+        packet (NtpPacket): The response of the server.
+        client_recv_time (PreciseTime): The time the response arrived (t4).
+        server_ip_str (str): The IP address of the ntp server in string format.
+        server_name (Optional[str]): The name of the ntp server.
+        ntp_version (int): The version of the ntp that you used.
+
+    Returns:
+        Optional[NtpMeasurement]: It returns an NTP measurement object if the conversion was successful.
+    """
+    try:
+        vantage_point_ip = get_vantage_point_ip(server_ip_str)
+        server_info = get_ntp_server_info(server_ip_str, server_name, ntp_version, packet.ref_id, packet.stratum)
+        timestamps = NtpTimestamps(
+            client_sent_time=packet.orig_time,
+            server_recv_time=packet.recv_time,
+            server_sent_time=packet.tx_time,
+            client_recv_time=client_recv_time
+        )
+        main_details = NtpMainDetails(
+            offset=NtpCalculator.calculate_offset(timestamps),
+            rtt=NtpCalculator.calculate_delay(timestamps),
+            stratum=packet.stratum,
+            precision=packet.precision,
+            reachability=""
+        )
+        extra_details = NtpExtraDetails(
+            root_delay=packet.root_delay,
+            ntp_last_sync_time=packet.ref_time,
+            leap=packet.leap,
+            poll=packet.poll,
+            root_dispersion=packet.root_dispersion
+        )
+        return NtpMeasurement(vantage_point_ip, server_info, timestamps, main_details, extra_details)
+    except Exception as e:
+        print("Error in convert packet to measurement:", e)
+        return None
+
+
+def convert_ntp_samples_to_measurement(samples: list[tuple[NtpPacket, PreciseTime]], server_ip_str: str,
+                                       server_name: Optional[str],
+                                       ntp_version: int = get_ntp_version()) -> Optional[NtpMeasurement]:
+    """
+    This method converts the responses of a burst of NTP requests to an NTP measurement object.
+    Like the clock filter of NTP, the sample with the minimum delay becomes the measurement. If there is more than
+    one sample, the offsets and the delays of all of them and the jitter of the burst are added to the measurement.
 
+    Args:
+        samples (list[tuple[NtpPacket, PreciseTime]]): The responses of the server and the times they arrived (t4).
+        server_ip_str (str): The IP address of the ntp server in string format.
+        server_name (Optional[str]): The name of the ntp server.
+        ntp_version (int): The version of the ntp that you used.
 
-def perform_ntp_measurement_ip(server_ip_str: str, ntp_version: int = get_ntp_version()) -> Optional[NtpMeasurement]:
+    Returns:
+        Optional[NtpMeasurement]: It returns an NTP measurement object if the conversion was successful.
+    """
+    if len(samples) == 0:
+        return None
+    timestamps = NtpCalculator.timestamps_to_array([
+        NtpTimestamps(packet.orig_time, packet.recv_time, packet.tx_time, client_recv_time)
+        for packet, client_recv_time in samples
+    ])
+    offsets: list[float] = NtpCalculator.calculate_offsets(timestamps).tolist()
+    rtts: list[float] = NtpCalculator.calculate_delays(timestamps).tolist()
+    best = min(range(len(rtts)), key=lambda i: rtts[i])
+    measurement = convert_ntp_packet_to_measurement(samples[best][0], samples[best][1], server_ip_str,
+                                                    server_name, ntp_version)
+    if measurement is not None and len(samples) > 1:
+        # the jitter is measured against the offset of the best sample, so it goes first
+        jitter = NtpCalculator.calculate_jitter([offsets[best]] + offsets[:best] + offsets[best + 1:])
+        measurement = replace(measurement, samples=NtpSamples(offsets=offsets, rtts=rtts, best_sample=best,
+                                                               jitter=jitter))
+    return measurement
+
+
+async def perform_ntp_measurement_ip_async(server_ip_str: str, ntp_version: int = get_ntp_version(),
+                                           samples: int = 1) -> Optional[NtpMeasurement]:
     """
-    This method performs an NTP measurement on an NTP server using its IP address.
+    This method performs an NTP measurement on an NTP server using its IP address, with the asyncio NTP engine.
+    It does not block the event loop while it waits for the answer. With more than one sample, it sends a burst
+    of requests and keeps the one with the minimum delay.
 
     Args:
         server_ip_str (str): The IP address of the ntp server in string format.
         ntp_version (int): The version of the ntp that you want to use.
+        samples (int): How many requests to send to the server.
 
     Returns:
         Optional[NtpMeasurement]: It returns the NTP measurement object or None if something wrong happened. (usually timeouts)
     """
     if is_ip_address(server_ip_str) is None:
         return None
-    # server_name is not available here. We can only use the ip which is initially a string
     try:
-        client = ntplib.NTPClient()
-        response = client.request(server_ip_str, ntp_version, timeout=get_timeout_measurement_s())
-        return convert_ntp_response_to_measurement(response=response,
-                                                   server_ip_str=server_ip_str,
-                                                   server_name=None,
-                                                   ntp_version=ntp_version)
+        responses = await ntp_burst_query(server_ip_str, ntp_version, get_timeout_measurement_s(), samples)
+        # finding our own IP may need a request to ipify, so it runs outside the event loop
+        return await asyncio.to_thread(convert_ntp_samples_to_measurement, responses, server_ip_str, None, ntp_version)
     except Exception as e:
         print("Error in measure from ip:", e)
         return None
 
 
-def convert_ntp_response_to_measurement(response: ntplib.NTPStats, server_ip_str: str, server_name: Optional[str],
-                                        ntp_version: int = get_ntp_version()) -> Optional[NtpMeasurement]:
+async def measure_domain_ip_async(ip_str: str, server_name: str, ntp_version: int = get_ntp_version(),
+                                  samples: int = 1) -> Optional[NtpMeasurement]:
     """
-    This method converts an NTP response to an NTP measurement object.
+    This method performs a single NTP measurement on one of the IPs of a domain name, with the asyncio NTP engine.
 
     Args:
-        response (ntplib.NTPStats): The NTP response to convert.
-        server_ip_str (str): The IP address of the ntp server in string format.
-        server_name (Optional[str]): The name of the ntp server.
+        ip_str (str): The IP address of the ntp server in string format.
+        server_name (str): The name of the ntp server.
         ntp_version (int): The version of the ntp that you want to use.
+        samples (int): How many requests to send to the server.
 
     Returns:
-        Optional[NtpMeasurement]: It returns an NTP measurement object if the conversion was successful.
+        Optional[NtpMeasurement]: It returns the NTP measurement object or None if the response could not be converted.
+
+    Raises:
+        Exception: If the NTP server did not answer (usually timeouts).
     """
-    try:
-        vantage_point_ip = None
-        ip_type = get_ip_family(server_ip_str)
-        # get the same type (We guaranteed before calling this method that it exists)
-        vantage_point_ip_temp = get_server_ip(ip_type)
-        if vantage_point_ip_temp is not None:
-            vantage_point_ip = vantage_point_ip_temp
-        ref_ip, ref_name = ref_id_to_ip_or_name(response.ref_id,
-                                                response.stratum)
-        server_ip = ip_address(server_ip_str)
-        server_info: NtpServerInfo = NtpServerInfo(
-            ntp_version=ntp_version,
-            ntp_server_ip=server_ip,
-            ntp_server_name=server_name,
-            ntp_server_ref_parent_ip=ref_ip,
-            ref_name=ref_name,
-            ntp_server_location=ServerLocation(country_code=get_country_for_ip(ip_to_str(server_ip)),
-                                               coordinates=get_coordinates_for_ip(ip_to_str(server_ip)))
-        )
+    responses = await ntp_burst_query(ip_str, ntp_version, get_timeout_measurement_s(), samples)
+    return await asyncio.to_thread(convert_ntp_samples_to_measurement, responses, ip_str, server_name, ntp_version)
 
-        timestamps: NtpTimestamps = NtpTimestamps(
-            client_sent_time=PreciseTime(ntplib._to_int(response.orig_timestamp),
-                                         ntplib._to_frac(response.orig_timestamp)),
-            server_recv_time=PreciseTime(ntplib._to_int(response.recv_timestamp),
-                                         ntplib._to_frac(response.recv_timestamp)),
-            server_sent_time=PreciseTime(ntplib._to_int(response.tx_timestamp),
-                                         ntplib._to_frac(response.tx_timestamp)),
-            client_recv_time=PreciseTime(ntplib._to_int(response.dest_timestamp),
-                                         ntplib._to_frac(response.dest_timestamp))
-        )
-        main_details: NtpMainDetails = NtpMainDetails(
-            offset=response.offset,
-            rtt=response.delay,
-            stratum=response.stratum,
-            precision=response.precision,
-            reachability=""
-        )
 
-        extra_details: NtpExtraDetails = NtpExtraDetails(
-            root_delay=convert_float_to_precise_time(response.root_delay),
-            ntp_last_sync_time=convert_float_to_precise_time(response.ref_timestamp),
-            leap=response.leap,
-            poll=response.poll,
-            root_dispersion=convert_float_to_precise_time(response.root_dispersion)
-        )
+async def perform_ntp_measurement_domain_name_list_async(server_name: str, client_ip: Optional[str] = None,
+                                                         wanted_ip_type: int = 4, ntp_version: int = get_ntp_version(),
+                                                         samples: int = 1) -> Optional[list[NtpMeasurement]]:
+    """
+    This method performs a NTP measurement on a NTP server from all the IPs got back from its domain name,
+    with the asyncio NTP engine. The IPs are measured at the same time on the event loop, at most
+    "max_parallel_measurements" of them at once, so the dead servers cost one timeout in total instead of one
+    timeout each. The IPs that did not answer before the overall deadline are reported as non-responding.
+    The measurements are returned in the same order as the IPs of the domain name.
 
-        return NtpMeasurement(vantage_point_ip, server_info, timestamps, main_details, extra_details)
-    except Exception as e:
-        print("Error in convert response to measurement:", e)
+    Args:
+        server_name (str): The name of the ntp server.
+        client_ip (Optional[str]): The IP address of the client (if given).
+        wanted_ip_type (int): The IP type that we want to measure.
+        ntp_version (int): The version of the ntp that you want to use.
+        samples (int): How many requests to send to every IP.
+
+    Returns:
+        Optional[list[NtpMeasurement]]: It returns a list of NTP measurement objects or None if there is a timeout.
+
+    Raises:
+        DNSError: If the domain name is invalid or cannot be converted to an IP list.
+    """
+    # dnspython is blocking, so the domain name is resolved outside the event loop
+    domain_ips: list[str] = await asyncio.to_thread(domain_name_to_ip_list, server_name, client_ip, wanted_ip_type)
+    if len(domain_ips) == 0:
         return None
+    # like the thread pool it replaced, at most "max_parallel_measurements" IPs of one domain name are measured at once
+    semaphore = asyncio.Semaphore(get_max_parallel_measurements())
+
+    async def measure_bounded(ip_str: str) -> Optional[NtpMeasurement]:
+        async with semaphore:
+            return await measure_domain_ip_async(ip_str, server_name, ntp_version, samples)
+
+    tasks = [asyncio.create_task(measure_bounded(ip_str)) for ip_str in domain_ips]
+    await asyncio.wait(tasks, timeout=get_domain_measurement_deadline_s())
+    resulted_measurements = []
+    ok = False
+    for ip_str, task in zip(domain_ips, tasks):
+        try:
+            if not task.done():
+                task.cancel()
+                raise TimeoutError("the overall deadline has passed")
+            r = task.result()
+            if r is not None:
+                resulted_measurements.append(r)
+                ok = True
+        except Exception as e:
+            print(f"Error in measure from name on ip {ip_str} (this IP failed, maybe others succeeded):", e)
+            resulted_measurements.append(get_non_responding_ntp_measurement(ip_str, server_name, ntp_version))
+
+    return resulted_measurements if ok is True else None
 
 
 def print_ntp_measurement(measurement: NtpMeasurement) -> bool:
@@ -244,7 +343,8 @@ def perform_ripe_measurement_domain_name(server_name: str, client_ip: str, wante
     headers, request_content = get_request_settings(ip_family_of_ntp_server=wanted_ip_type, ntp_server=server_name,
                                                     client_ip=client_ip, probes_requested=probes_requested)
     # perform the measurement
-    response = requests.post(
+    response = ripe_post(
+        "create_measurement",
         "https://atlas.ripe.net/api/v2/measurements/",
         headers=headers,
         data=json.dumps(request_content)
@@ -290,7 +390,8 @@ def perform_ripe_measurement_ip(ntp_server_ip: str, client_ip: str,
     headers, request_content = get_request_settings(ip_family_of_ntp_server=ip_family, ntp_server=ntp_server_ip,
                                                     client_ip=client_ip, probes_requested=probes_requested)
     # perform the measurement
-    response = requests.post(
+    response = ripe_post(
+        "create_measurement",
         "https://atlas.ripe.net/api/v2/measurements/",
         headers=headers,
         data=json.dumps(request_content)
@@ -349,9 +450,5 @@ def get_request_settings(ip_family_of_ntp_server: int, ntp_server: str, client_i
     return headers, request_content
 
 # example to see how you use them
-# print_ntp_measurement(perform_ntp_measurement_domain_name_list("time.apple.com", "5a01:c741:a16:4000::1f2", 6, 4)[0])
-# print_ntp_measurement(perform_ntp_measurement_domain_name_list("time.apple.com", "17.253.6.45", 4,4)[0])
-# print_ntp_measurement(perform_ntp_measurement_domain_name_list("time.apple.com", "17.253.6.45", 6,4)[0])
-
 # print(perform_ripe_measurement_ip("2a01:b740:a16:4000::1f2","2a01:c741:a16:4000::1f2", 12))
 # print(perform_ripe_measurement_domain_name("time.apple.com","83.25.24.10", 6, 15))
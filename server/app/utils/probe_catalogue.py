@@ -0,0 +1,412 @@
+import bz2
+import json
+import os
+import tempfile
+import threading
+import time
+from ipaddress import ip_network, IPv4Network, IPv6Network
+from typing import Any, Iterable, Optional
+
+from server.app.dtos.RipeProbe import RipeProbe
+from server.app.utils.load_config_data import get_ripe_probe_catalogue_url, get_ripe_probe_catalogue_sync_interval_s
+from server.app.utils.ripe_http import ripe_get
+from server.app.utils.file_lock import locked_file
+
+
+def parse_catalogue_probe(entry: dict[str, Any]) -> Optional[RipeProbe]:
+    """
+    Converts a probe of the RIPE Atlas probe dump into a RipeProbe.
+    Both the format of the daily dump ("latitude"/"longitude", status as a number, tags as slugs)
+    and the format of the probes API ("geometry", status as an object, tags as objects) are accepted.
+
+    Args:
+        entry (dict[str, Any]): A probe of the dump.
+
+    Returns:
+        Optional[RipeProbe]: The probe, or None if it has no valid ID.
+    """
+    try:
+        probe_id = int(entry["id"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    coordinates: Optional[tuple[float, float]] = None
+    geometry = entry.get("geometry")
+    if isinstance(geometry, dict) and geometry.get("coordinates"):
+        lon, lat = geometry["coordinates"]
+        coordinates = (float(lat), float(lon))
+    elif entry.get("latitude") is not None and entry.get("longitude") is not None:
+        coordinates = (float(entry["latitude"]), float(entry["longitude"]))
+
+    status = entry.get("status")
+    if isinstance(status, dict):
+        status = status.get("id")
+    slugs = (tag.get("slug") if isinstance(tag, dict) else tag for tag in entry.get("tags") or [])
+    tags: frozenset[str] = frozenset(slug for slug in slugs if isinstance(slug, str))
+
+    return RipeProbe(id=probe_id,
+                     asn_v4=entry.get("asn_v4"),
+                     asn_v6=entry.get("asn_v6"),
+                     prefix_v4=entry.get("prefix_v4"),
+                     prefix_v6=entry.get("prefix_v6"),
+                     country_code=entry.get("country_code"),
+                     status=status if isinstance(status, int) else -1,
+                     is_public=bool(entry.get("is_public", False)),
+                     tags=tags,
+                     coordinates=coordinates)
+
+
+def normalize_prefix(prefix: Optional[str]) -> Optional[IPv4Network | IPv6Network]:
+    """
+    Converts a prefix into a network, so that different ways of writing the same prefix are the same key.
+
+    Args:
+        prefix (Optional[str]): The prefix (e.g. '80.211.224.0/20').
+
+    Returns:
+        Optional[IPv4Network | IPv6Network]: The network, or None if the prefix is missing or invalid.
+    """
+    if prefix is None:
+        return None
+    try:
+        return ip_network(prefix, strict=False)
+    except ValueError:
+        return None
+
+
+class ProbeCatalogue:
+    """
+    An in-memory catalogue of the RIPE Atlas probes, indexed by ASN, prefix, country, status and tags,
+    so the candidate probes of a measurement are found without asking RIPE Atlas.
+
+    It understands the same filters as the probes API of RIPE Atlas (`ProbeRequest`) that are used in `ripe_probes`:
+    "asn" (matches the IPv4 or the IPv6 ASN), "prefix_v4", "prefix_v6", "country_code", "status",
+    "tags" (comma separated, all of them must match) and "is_public".
+    A catalogue never changes after it was built, so it can be shared by all the threads.
+
+    Attributes:
+        probes (list[RipeProbe]): All the probes, sorted by ID.
+    """
+
+    def __init__(self, probes: Iterable[RipeProbe]) -> None:
+        self.probes = sorted({probe.id: probe for probe in probes}.values(), key=lambda probe: probe.id)
+        self._by_asn: dict[int, set[int]] = {}
+        self._by_prefix: dict[IPv4Network | IPv6Network, set[int]] = {}
+        self._by_country: dict[str, set[int]] = {}
+        self._by_status: dict[int, set[int]] = {}
+        self._by_tag: dict[str, set[int]] = {}
+        self._by_public: dict[bool, set[int]] = {}
+        for position, probe in enumerate(self.probes):
+            for asn in {probe.asn_v4, probe.asn_v6}:
+                if asn is not None:
+                    self._by_asn.setdefault(asn, set()).add(position)
+            for prefix in (normalize_prefix(probe.prefix_v4), normalize_prefix(probe.prefix_v6)):
+                if prefix is not None:
+                    self._by_prefix.setdefault(prefix, set()).add(position)
+            if probe.country_code is not None:
+                self._by_country.setdefault(probe.country_code.upper(), set()).add(position)
+            self._by_status.setdefault(probe.status, set()).add(position)
+            for tag in probe.tags:
+                self._by_tag.setdefault(tag, set()).add(position)
+            self._by_public.setdefault(probe.is_public, set()).add(position)
+
+    def __len__(self) -> int:
+        return len(self.probes)
+
+    def _matching(self, name: str, value: Any) -> list[set[int]]:
+        """
+        Returns the positions of the probes that match a single filter.
+
+        Args:
+            name (str): The name of the filter.
+            value (Any): The value of the filter.
+
+        Returns:
+            list[set[int]]: The positions of the matching probes (one set per tag for "tags").
+
+        Raises:
+            ValueError: If the filter is not supported.
+        """
+        if name == "asn":
+            return [self._by_asn.get(int(value), set())]
+        if name in ("prefix_v4", "prefix_v6"):
+            prefix = normalize_prefix(value)
+            return [self._by_prefix.get(prefix, set()) if prefix is not None else set()]
+        if name == "country_code":
+            return [self._by_country.get(str(value).upper(), set())]
+        if name == "status":
+            return [self._by_status.get(int(value), set())]
+        if name == "tags":
+            return [self._by_tag.get(tag.strip(), set()) for tag in str(value).split(",") if tag.strip()]
+        if name == "is_public":
+            return [self._by_public.get(bool(value), set())]
+        raise ValueError(f"unsupported probe filter: {name}")
+
+    def search(self, filters: dict[str, Any]) -> list[RipeProbe]:
+        """
+        Returns the probes that match all the filters, sorted by ID.
+        The matching sets are intersected from the smallest one, so the cost depends on the number of
+        matching probes, not on the size of the catalogue.
+
+        Args:
+            filters (dict[str, Any]): The filters, as they would be given to `ProbeRequest`.
+
+        Returns:
+            list[RipeProbe]: The matching probes.
+
+        Raises:
+            ValueError: If a filter is not supported.
+        """
+        matching: list[set[int]] = []
+        for name, value in filters.items():
+            matching.extend(self._matching(name, value))
+        if not matching:
+            return list(self.probes)
+        matching.sort(key=len)
+        positions = set(matching[0])
+        for other in matching[1:]:
+            if not positions:
+                break
+            positions &= other
+        return [self.probes[position] for position in sorted(positions)]
+
+
+def load_probe_catalogue(data: bytes) -> ProbeCatalogue:
+    """
+    Builds a probe catalogue from a RIPE Atlas probe dump. The dump can be bz2 compressed (like the daily dump)
+    and can be either {"objects": [...]}, a page of the probes API ({"results": [...]}) or a list of probes.
+
+    Args:
+        data (bytes): The content of the dump.
+
+    Returns:
+        ProbeCatalogue: The catalogue of all the valid probes of the dump.
+
+    Raises:
+        ValueError: If the dump is not a valid (compressed) JSON document of probes.
+    """
+    if data[:3] == b"BZh":
+        try:
+            data = bz2.decompress(data)
+        except OSError as e:
+            raise ValueError(f"invalid bz2 probe dump: {e}")
+    document = json.loads(data)
+    if isinstance(document, dict):
+        document = document.get("objects", document.get("results"))
+    if not isinstance(document, list):
+        raise ValueError("the probe dump does not contain a list of probes")
+    probes = [parse_catalogue_probe(entry) for entry in document if isinstance(entry, dict)]
+    return ProbeCatalogue(probe for probe in probes if probe is not None)
+
+
+def get_probe_catalogue_path() -> str:
+    """
+    Returns the path of the local copy of the RIPE Atlas probe dump.
+
+    Returns:
+        str: The absolute path of the probe dump.
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.abspath(os.path.join(current_dir, "..", "..", "ripe-probes-meta.json.bz2"))
+
+
+def download_probe_dump(url: str, path: str, timeout_s: float | int = 120) -> None:
+    """
+    Downloads the RIPE Atlas probe dump and replaces the local copy. The old copy is kept if the download fails.
+
+    Args:
+        url (str): The URL of the dump.
+        path (str): Where the dump is saved.
+        timeout_s (float | int): The timeout of the download (in seconds).
+
+    Raises:
+        requests.RequestException: If the download fails.
+        OSError: If the dump cannot be saved.
+    """
+    response = ripe_get("probe_catalogue", url, timeout=timeout_s)
+    response.raise_for_status()
+    # a unique temporary file, so the copy is never replaced by a partly written dump
+    fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".",
+                                          suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(response.content)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+_catalogue: Optional[ProbeCatalogue] = None
+
+
+def get_probe_catalogue() -> Optional[ProbeCatalogue]:
+    """
+    Returns the current probe catalogue, or None if it has not been loaded (yet).
+    In that case the probes should be searched on RIPE Atlas.
+
+    Returns:
+        Optional[ProbeCatalogue]: The probe catalogue.
+    """
+    return _catalogue
+
+
+def set_probe_catalogue(catalogue: Optional[ProbeCatalogue]) -> None:
+    """
+    Replaces the probe catalogue that is used to select the probes. None disables the catalogue.
+
+    Args:
+        catalogue (Optional[ProbeCatalogue]): The new probe catalogue.
+    """
+    global _catalogue
+    _catalogue = catalogue
+
+
+class ProbeCatalogueJob:
+    """
+    A background thread that keeps the probe catalogue in sync with the daily probe dump of RIPE Atlas.
+    When it starts, it first loads the local copy of the dump (if there is one), so the catalogue is available
+    immediately. The dump is downloaded again when the local copy is older than "interval_s" seconds.
+    Every worker of the server runs this job on the same local copy: the download is done under a file lock,
+    so only one worker downloads, and the others reload the copy when it changed.
+
+    Attributes:
+        url (str): The URL of the probe dump.
+        path (str): The path of the local copy of the dump.
+        interval_s (float | int): How often (in seconds) the dump is downloaded.
+    """
+
+    def __init__(self, url: str, path: str, interval_s: float | int) -> None:
+        self.url = url
+        self.path = path
+        self.interval_s = interval_s
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # the modification time of the local copy that the catalogue was loaded from
+        self._loaded_mtime: Optional[float] = None
+
+    def start(self) -> None:
+        """
+        Starts the background thread.
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="probe-catalogue", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops the background thread. A download that is in progress is finished first.
+
+        Args:
+            timeout (Optional[float]): How long (in seconds) to wait for the thread. None waits until it is done.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def is_running(self) -> bool:
+        """
+        Returns whether the background thread is running.
+
+        Returns:
+            bool: True if the probe catalogue is kept in sync.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def _local_copy_mtime(self) -> Optional[float]:
+        """
+        Returns:
+            Optional[float]: The modification time of the local copy, or None if there is none.
+        """
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def _is_outdated(self) -> bool:
+        """
+        Returns:
+            bool: True if the local copy is missing or older than "interval_s" seconds.
+        """
+        mtime = self._local_copy_mtime()
+        return mtime is None or time.time() - mtime >= self.interval_s
+
+    def run_once(self) -> ProbeCatalogue:
+        """
+        Downloads the dump if the local copy is missing or too old, and replaces the probe catalogue with it.
+        If another worker is downloading it, it waits for that download instead. The local copy is only read again
+        if it changed since it was last loaded.
+
+        Returns:
+            ProbeCatalogue: The current probe catalogue.
+
+        Raises:
+            requests.RequestException: If the dump cannot be downloaded.
+            OSError: If the dump cannot be saved or read.
+            ValueError: If the dump is invalid.
+        """
+        if self._is_outdated():
+            with locked_file(self.path + ".lock"):
+                # another worker may have downloaded it while we waited for the lock
+                if self._is_outdated():
+                    download_probe_dump(self.url, self.path)
+        mtime = self._local_copy_mtime()
+        catalogue = get_probe_catalogue()
+        if catalogue is None or mtime != self._loaded_mtime:
+            with open(self.path, "rb") as f:
+                catalogue = load_probe_catalogue(f.read())
+            set_probe_catalogue(catalogue)
+            self._loaded_mtime = mtime
+        return catalogue
+
+    def _run(self) -> None:
+        """
+        The loop of the background thread.
+        """
+        # load the local copy first, even if it is old, so the probes can be selected while the new dump is downloaded
+        if get_probe_catalogue() is None and os.path.exists(self.path):
+            try:
+                mtime = self._local_copy_mtime()
+                with open(self.path, "rb") as f:
+                    set_probe_catalogue(load_probe_catalogue(f.read()))
+                self._loaded_mtime = mtime
+            except Exception as e:
+                print(f"Failed to load the local probe catalogue: {e}")
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Failed to sync the probe catalogue: {e}")
+            self._stop_event.wait(self.interval_s)
+
+
+_job: Optional[ProbeCatalogueJob] = None
+
+
+def start_probe_catalogue_job() -> ProbeCatalogueJob:
+    """
+    Creates the probe catalogue job from the config and starts its background thread.
+    It is called when the application starts.
+
+    Returns:
+        ProbeCatalogueJob: The running job.
+    """
+    global _job
+    if _job is None:
+        _job = ProbeCatalogueJob(get_ripe_probe_catalogue_url(), get_probe_catalogue_path(),
+                                 interval_s=get_ripe_probe_catalogue_sync_interval_s())
+    _job.start()
+    return _job
+
+
+def stop_probe_catalogue_job() -> None:
+    """
+    Stops the probe catalogue job. It is called when the application shuts down.
+    """
+    global _job
+    if _job is not None:
+        _job.stop()
+        _job = None
@@ -1,10 +1,13 @@
 import time
 from ipaddress import ip_address, IPv4Address, IPv6Address
+from typing import Any, cast, Iterable, Optional
 import requests
 
-from server.app.utils.location_resolver import get_country_for_ip, get_coordinates_for_ip
+from server.app.utils.location_resolver import lookup_ip
+from server.app.utils.cache import TTLLRUCache
 from server.app.models.CustomError import RipeMeasurementError
-from server.app.utils.load_config_data import get_ripe_api_token, get_ripe_server_timeout
+from server.app.utils.load_config_data import get_ripe_api_token, get_ripe_server_timeout, \
+    get_ripe_probe_cache_max_size, get_ripe_probe_cache_ttl_s
 from server.app.dtos.PreciseTime import PreciseTime
 from server.app.dtos.NtpExtraDetails import NtpExtraDetails
 from server.app.dtos.NtpMainDetails import NtpMainDetails
@@ -13,8 +16,11 @@ from server.app.dtos.NtpServerInfo import NtpServerInfo
 from server.app.dtos.NtpTimestamps import NtpTimestamps
 from server.app.dtos.ProbeData import ServerLocation, ProbeData
 from server.app.dtos.RipeMeasurement import RipeMeasurement
-from server.app.utils.perform_measurements import convert_float_to_precise_time
-from typing import Any, cast
+from server.app.utils.calculations import convert_float_to_precise_time
+from server.app.utils.ripe_http import ripe_get
+
+# how many probe IDs are asked for in one request to the probes endpoint (this is also its maximum page size)
+PROBES_PER_REQUEST = 500
 
 
 def check_all_measurements_scheduled(measurement_id: str) -> bool:
@@ -41,7 +47,7 @@ def check_all_measurements_scheduled(measurement_id: str) -> bool:
         "Authorization": f"Key {get_ripe_api_token()}",
         "Content-Type": "application/json"
     }
-    response = requests.get(url, headers=headers)
+    response = ripe_get("measurement", url, headers=headers)
     json_data = response.json()
     if isinstance(json_data, dict) and 'error' in json_data:
         raise ValueError(
@@ -90,7 +96,7 @@ def check_all_measurements_done(measurement_id: str, measurement_req: int) -> st
     }
 
     try:
-        response = requests.get(url, headers=headers)
+        response = ripe_get("measurement", url, headers=headers)
         response.raise_for_status()
         json_data = response.json()
     except requests.RequestException as e:
@@ -147,7 +153,7 @@ def get_data_from_ripe_measurement(measurement_id: str) -> list[dict[str, Any]]:
         "Content-Type": "application/json"
     }
     try:
-        response = requests.get(url, headers=headers)
+        response = ripe_get("measurement_results", url, headers=headers)
         response.raise_for_status()
         json_data = response.json()
     except requests.RequestException as e:
@@ -191,7 +197,7 @@ def get_probe_data_from_ripe_by_id(probe_id: str) -> dict[str, Any]:
         "Content-Type": "application/json"
     }
     try:
-        response = requests.get(url, headers=headers)
+        response = ripe_get("probe", url, headers=headers)
         response.raise_for_status()
         json_data = response.json()
     except requests.RequestException as e:
@@ -201,6 +207,104 @@ def get_probe_data_from_ripe_by_id(probe_id: str) -> dict[str, Any]:
     return cast(dict[str, Any], json_data)
 
 
+def get_probes_data_from_ripe_by_ids(probe_ids: list[str]) -> list[dict[str, Any]]:
+    """
+    Retrieves the metadata of several RIPE Atlas probes at once, using the `id__in` filter of the probes endpoint.
+
+    The IDs are asked for in groups of `PROBES_PER_REQUEST`, so in a single request for a normal measurement.
+    Probes that RIPE Atlas does not know are simply missing from the answer.
+
+    Args:
+        probe_ids (list[str]): The IDs of the RIPE Atlas probes to fetch information for.
+
+    Returns:
+        list[dict[str, Any]]: The metadata of every probe that was found, in the same format as
+        `get_probe_data_from_ripe_by_id`.
+
+    Raises:
+        RipeMeasurementError: If the HTTP request fails or the response is not valid JSON.
+    """
+    headers = {
+        "Authorization": f"Key {get_ripe_api_token()}",
+        "Content-Type": "application/json"
+    }
+    probes: list[dict[str, Any]] = []
+    for start in range(0, len(probe_ids), PROBES_PER_REQUEST):
+        ids = ",".join(str(probe_id) for probe_id in probe_ids[start:start + PROBES_PER_REQUEST])
+        url: Optional[str] = f"https://atlas.ripe.net/api/v2/probes/?id__in={ids}&page_size={PROBES_PER_REQUEST}"
+        while url is not None:
+            try:
+                response = ripe_get("probes", url, headers=headers)
+                response.raise_for_status()
+                json_data = response.json()
+            except requests.RequestException as e:
+                raise RipeMeasurementError(f"Network error while fetching probe data for {ids}: {str(e)}")
+            except ValueError:
+                raise RipeMeasurementError("Invalid JSON response from RIPE API.")
+            if not isinstance(json_data, dict) or not isinstance(json_data.get("results"), list):
+                raise RipeMeasurementError("Unexpected format: Expected a page of probes from RIPE API.")
+            probes.extend(json_data["results"])
+            url = json_data.get("next")
+    return probes
+
+
+# probe ID -> metadata of the probe. It is shared by all the requests, so polling the results of a measurement
+# does not ask RIPE Atlas about the same probes again and again
+_probe_cache: TTLLRUCache[str, ProbeData] = TTLLRUCache(max_size=get_ripe_probe_cache_max_size(),
+                                                         ttl_s=get_ripe_probe_cache_ttl_s())
+
+
+def clear_probe_cache() -> None:
+    """
+    Removes all the probes from the cache of the probe metadata.
+    """
+    _probe_cache.clear()
+
+
+def get_probe_cache_stats() -> dict[str, int]:
+    """
+    Returns the size and the hit/miss counters of the cache of the probe metadata.
+
+    Returns:
+        dict[str, int]: The statistics of the cache of the probe metadata.
+    """
+    return _probe_cache.stats()
+
+
+def get_probes_data(probe_ids: Iterable[Any]) -> dict[str, ProbeData]:
+    """
+    Returns the parsed metadata of several RIPE Atlas probes. The probes that are not in the cache are fetched
+    from RIPE Atlas with a single request (see `get_probes_data_from_ripe_by_ids`) and added to the cache.
+
+    Args:
+        probe_ids (Iterable[Any]): The IDs of the probes (as they appear in the results, int or str).
+
+    Returns:
+        dict[str, ProbeData]: The metadata of every probe, keyed by the probe ID as a string.
+        A probe unknown to RIPE Atlas gets the same default `ProbeData` as an error response in `parse_probe_data`.
+
+    Raises:
+        RipeMeasurementError: If the probes could not be fetched from RIPE Atlas.
+    """
+    probes: dict[str, ProbeData] = {}
+    missing: list[str] = []
+    for probe_id in dict.fromkeys(str(probe_id) for probe_id in probe_ids):
+        cached = _probe_cache.get(probe_id)
+        if cached is not None:
+            probes[probe_id] = cached
+        else:
+            missing.append(probe_id)
+    if missing:
+        for probe_response in get_probes_data_from_ripe_by_ids(missing):
+            probe_data = parse_probe_data(probe_response)
+            probes[str(probe_response.get("id"))] = probe_data
+            _probe_cache.put(str(probe_response.get("id")), probe_data)
+        for probe_id in missing:
+            if probe_id not in probes:
+                probes[probe_id] = parse_probe_data({"error": "probe not found"})
+    return probes
+
+
 def parse_probe_data(probe_response: dict) -> ProbeData:
     """
     Parses probe metadata received from the RIPE Atlas API into a ProbeData object.
@@ -317,7 +421,8 @@ def parse_data_from_ripe_measurement(data_measurement: list[dict]) -> tuple[list
       - Determines whether each measurement entry failed or succeeded.
       - Extracts NTP-related server and timing information.
       - Converts timestamps and metrics into structured internal representations.
-      - Adds probe-specific metadata fetched from the RIPE API.
+      - Adds probe-specific metadata, fetched from the RIPE API in a single request for all the probes
+        (or taken from the cache of the probe metadata).
       - Returns a status string indicating whether all measurements have been processed.
 
     Args:
@@ -331,11 +436,12 @@ def parse_data_from_ripe_measurement(data_measurement: list[dict]) -> tuple[list
 
     Notes:
         - Measurements that are marked as failed are still processed, but filled with default values.
-        - Probe metadata is fetched using the probe ID (`prb_id`) in each measurement.
+        - Probe metadata is fetched using the probe ID (`prb_id`) in each measurement, see `get_probes_data`.
         - Timestamps are converted using `convert_float_to_precise_time`.
     """
     msm_id = -1
     ripe_measurements = []
+    probes = get_probes_data(measurement['prb_id'] for measurement in data_measurement)
     for measurement in data_measurement:
         # check for result if ok
         failed = is_failed_measurement(measurement)
@@ -354,14 +460,14 @@ def parse_data_from_ripe_measurement(data_measurement: list[dict]) -> tuple[list
             dst_addr_ip = None
         dst_name = measurement.get('dst_name')
 
+        geo = lookup_ip(str(dst_addr_ip))
         server_info = NtpServerInfo(
             ntp_version=version,
             ntp_server_ip=dst_addr_ip,
             ntp_server_name=dst_name,
             ntp_server_ref_parent_ip=None,
             ref_name=None,
-            ntp_server_location=ServerLocation(country_code=get_country_for_ip(str(dst_addr_ip)),
-                                               coordinates=get_coordinates_for_ip(str(dst_addr_ip)))
+            ntp_server_location=ServerLocation(country_code=geo.country_code, coordinates=geo.coordinates)
         )
 
         if not failed and idx is not None:
@@ -415,7 +521,7 @@ def parse_data_from_ripe_measurement(data_measurement: list[dict]) -> tuple[list
         ripe_measurement = RipeMeasurement(
             measurement_id=measurement_id,
             ntp_measurement=ntp_measurement,
-            probe_data=parse_probe_data(get_probe_data_from_ripe_by_id(measurement['prb_id'])),
+            probe_data=probes[str(measurement['prb_id'])],
             time_to_result=time_to_result,
             ref_id=ref_id
         )
@@ -0,0 +1,235 @@
+import bisect
+import threading
+import time
+from typing import Any, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from server.app.utils.load_config_data import get_ripe_http_timeout_s, get_ripe_http_max_retries, \
+    get_ripe_http_backoff_s, get_ripe_http_pool_size
+
+# the upper bounds (in ms) of the buckets of the latency histograms. The last bucket has no upper bound
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# the status codes that mean that RIPE Atlas (or stat.ripe.net) is busy, so the request may succeed later
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class LatencyHistogram:
+    """
+    A thread-safe histogram of the latencies of the HTTP requests to one endpoint.
+
+    Attributes:
+        count (int): How many requests were observed.
+        errors (int): How many of them failed (no response at all, not an HTTP error status).
+        sum_ms (float): The sum of their latencies (in ms).
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.sum_ms = 0.0
+        self._buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._lock = threading.Lock()
+
+    def observe(self, latency_ms: float, failed: bool = False) -> None:
+        """
+        Adds the latency of a request to the histogram.
+
+        Args:
+            latency_ms (float): The latency of the request (in ms), including the retries.
+            failed (bool): Whether the request failed.
+        """
+        with self._lock:
+            self.count += 1
+            self.sum_ms += latency_ms
+            if failed:
+                self.errors += 1
+            self._buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Returns the counters of the histogram.
+
+        Returns:
+            dict[str, Any]: The count, the errors, the sum of the latencies (in ms) and the cumulative
+            number of requests of every bucket, by upper bound ("le_10", ..., "le_inf").
+        """
+        with self._lock:
+            buckets: dict[str, int] = {}
+            cumulative = 0
+            for bound, number in zip([*LATENCY_BUCKETS_MS, "inf"], self._buckets):
+                cumulative += number
+                buckets[f"le_{bound}"] = cumulative
+            return {"count": self.count, "errors": self.errors, "sum_ms": self.sum_ms, "buckets": buckets}
+
+
+class RipeHttpClient:
+    """
+    The HTTP client of all the requests to RIPE Atlas and stat.ripe.net (and ipify, to find our public IP).
+    It keeps a pool of keep-alive connections to every host, so the TCP and TLS handshakes are done once per connection
+    instead of once per request. Every request has a timeout, asks for a gzip-compressed answer,
+    and is retried with an exponential, jittered backoff when the connection fails or the host is busy.
+    The POST requests (which create measurements) are only retried if they could not be sent at all,
+    so a measurement is never created twice.
+    The latencies of the requests are recorded in a histogram per endpoint.
+
+    Attributes:
+        timeout_s (float | int): The default timeout of a request (in seconds).
+        session (requests.Session): The session that holds the connection pools.
+        session_without_retries (requests.Session): The session of the requests that must not be retried.
+    """
+
+    def __init__(self, timeout_s: float | int, max_retries: int, backoff_s: float | int, pool_size: int) -> None:
+        self.timeout_s = timeout_s
+        retry = Retry(total=max_retries, status_forcelist=RETRY_STATUS_CODES, allowed_methods=frozenset({"GET"}),
+                      backoff_factor=backoff_s, backoff_jitter=backoff_s, raise_on_status=False)
+        self.session = self._create_session(HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                                        max_retries=retry))
+        # for the best-effort requests, that have their own tight timeout
+        self.session_without_retries = self._create_session(HTTPAdapter(pool_connections=pool_size,
+                                                                        pool_maxsize=pool_size, max_retries=0))
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _create_session(adapter: HTTPAdapter) -> requests.Session:
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Accept-Encoding"] = "gzip, deflate"
+        return session
+
+    def request(self, method: str, endpoint: str, url: str, retry: bool = True, **kwargs: Any) -> requests.Response:
+        """
+        Sends an HTTP request on the pooled session and records its latency.
+
+        Args:
+            method (str): The HTTP method ("GET" or "POST").
+            endpoint (str): The name of the endpoint, used to group the latencies (e.g. "measurement_results").
+            url (str): The URL of the request.
+            retry (bool): Whether the request is retried if it fails.
+            **kwargs (Any): The other arguments of `requests.Session.request` (headers, data, timeout, ...).
+
+        Returns:
+            requests.Response: The response.
+
+        Raises:
+            requests.RequestException: If the request failed (after the retries).
+        """
+        kwargs.setdefault("timeout", self.timeout_s)
+        start = time.perf_counter()
+        failed = True
+        try:
+            session = self.session if retry else self.session_without_retries
+            response = session.request(method, url, **kwargs)
+            failed = False
+            return response
+        finally:
+            self.histogram(endpoint).observe((time.perf_counter() - start) * 1000, failed)
+
+    def histogram(self, endpoint: str) -> LatencyHistogram:
+        """
+        Args:
+            endpoint (str): The name of the endpoint.
+
+        Returns:
+            LatencyHistogram: The latency histogram of this endpoint.
+        """
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[endpoint] = LatencyHistogram()
+            return histogram
+
+    def latency_histograms(self) -> dict[str, dict[str, Any]]:
+        """
+        Returns:
+            dict[str, dict[str, Any]]: The latency histogram of every endpoint that was called.
+        """
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {endpoint: histogram.snapshot() for endpoint, histogram in sorted(histograms.items())}
+
+    def close(self) -> None:
+        """
+        Closes all the pooled connections.
+        """
+        self.session.close()
+        self.session_without_retries.close()
+
+
+_client: Optional[RipeHttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_ripe_http_client() -> RipeHttpClient:
+    """
+    Returns the shared HTTP client, creating it (from the config) on first use.
+
+    Returns:
+        RipeHttpClient: The shared HTTP client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = RipeHttpClient(timeout_s=get_ripe_http_timeout_s(), max_retries=get_ripe_http_max_retries(),
+                                     backoff_s=get_ripe_http_backoff_s(), pool_size=get_ripe_http_pool_size())
+        return _client
+
+
+def close_ripe_http_client() -> None:
+    """
+    Closes the connections of the shared HTTP client. The next request will create a new one.
+    It is called when the application shuts down.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def ripe_get(endpoint: str, url: str, **kwargs: Any) -> requests.Response:
+    """
+    Sends a GET request with the shared HTTP client (see `RipeHttpClient.request`).
+
+    Args:
+        endpoint (str): The name of the endpoint, used to group the latencies.
+        url (str): The URL of the request.
+        **kwargs (Any): The other arguments of the request (headers, timeout, ...).
+
+    Returns:
+        requests.Response: The response.
+    """
+    return get_ripe_http_client().request("GET", endpoint, url, **kwargs)
+
+
+def ripe_post(endpoint: str, url: str, **kwargs: Any) -> requests.Response:
+    """
+    Sends a POST request with the shared HTTP client (see `RipeHttpClient.request`).
+
+    Args:
+        endpoint (str): The name of the endpoint, used to group the latencies.
+        url (str): The URL of the request.
+        **kwargs (Any): The other arguments of the request (headers, data, timeout, ...).
+
+    Returns:
+        requests.Response: The response.
+    """
+    return get_ripe_http_client().request("POST", endpoint, url, **kwargs)
+
+
+def get_ripe_http_latency_histograms() -> dict[str, dict[str, Any]]:
+    """
+    Returns the latency histograms of the requests to RIPE Atlas and stat.ripe.net, by endpoint.
+
+    Returns:
+        dict[str, dict[str, Any]]: The latency histogram of every endpoint that was called.
+    """
+    with _client_lock:
+        client = _client
+    if client is None:
+        return {}
+    return client.latency_histograms()
@@ -1,15 +1,23 @@
-from typing import TypeVar
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, TypeVar
 from typing import Optional
 
 from server.app.utils.location_resolver import get_coordinates_for_ip
-from server.app.utils.calculations import calculate_haversine_distance
+from server.app.utils.calculations import calculate_haversine_distances, smallest_indices
 from server.app.models.CustomError import InputError
-from server.app.utils.load_config_data import get_ripe_number_of_probes_per_measurement
+from server.app.utils.load_config_data import get_ripe_number_of_probes_per_measurement, \
+    get_ripe_max_parallel_probe_queries, get_ripe_probe_query_deadline_s
 from server.app.utils.ip_utils import get_ip_network_details, get_prefix_from_ip, get_ip_family
+from server.app.utils.probe_catalogue import get_probe_catalogue
+from server.app.dtos.RipeProbe import RipeProbe
 from ripe.atlas.cousteau import ProbeRequest
+import numpy as np
 
 T = TypeVar('T', int, float)  # float or int
 
+# the distance (in km) given to the probes without a location, to put them at the end of the list
+NO_LOCATION_DISTANCE = 1000000.0
+
 
 def get_probes(client_ip: str, ip_family_of_ntp_server: int,
                probes_requested: int = get_ripe_number_of_probes_per_measurement()) -> list[dict]:
@@ -33,13 +41,14 @@ def get_probes(client_ip: str, ip_family_of_ntp_server: int,
     # get the details about the client IP.
     ip_family: int = get_ip_family(client_ip)
     ip_asn, ip_country, ip_area = get_ip_network_details(client_ip)
-    ip_prefix = None
     # the prefix is relevant if and only if the client has the same IP type as the NTP server.
     # Otherwise, we won't "find probes with the same prefix as the client that can perform NTP measurements for that server"
 
     # If we do not have this check, "get available" methods that involves prefix will fail
-    if ip_family == ip_family_of_ntp_server:
-        ip_prefix = get_prefix_from_ip(client_ip)
+    # all the searches are done at the same time, their results are then used in the order of priority
+    ip_prefix, candidates = search_candidate_probes(client_ip, ip_asn, ip_country, ip_family_of_ntp_server,
+                                                    with_prefix=ip_family == ip_family_of_ntp_server,
+                                                    limit=probes_requested)
 
     # settings:
     probes: list[dict] = []
@@ -49,7 +58,7 @@ def get_probes(client_ip: str, ip_family_of_ntp_server: int,
         get_best_probes_with_multiple_attributes(client_ip=client_ip, current_probes_set=current_probes_set,
                                                  ip_asn=ip_asn, ip_prefix=ip_prefix,
                                                  ip_country=ip_country, ip_family=ip_family_of_ntp_server,
-                                                 probes_requested=probes_requested))
+                                                 probes_requested=probes_requested, candidates=candidates))
 
     if probes_requested <= 0:
         # add the current IDs of the probes
@@ -61,7 +70,7 @@ def get_probes(client_ip: str, ip_family_of_ntp_server: int,
         get_best_probes_matched_by_single_attribute(client_ip=client_ip, current_probes_set=current_probes_set,
                                                     ip_asn=ip_asn, ip_prefix=ip_prefix,
                                                     ip_country=ip_country, ip_family=ip_family_of_ntp_server,
-                                                    probes_requested=probes_requested))
+                                                    probes_requested=probes_requested, candidates=candidates))
     # add the IDs of the probes
     if len(current_probes_set) > 0:
         probes.append(get_probes_by_ids(list(current_probes_set)))
@@ -75,9 +84,120 @@ def get_probes(client_ip: str, ip_family_of_ntp_server: int,
     return probes
 
 
+def run_probe_queries(executor: ThreadPoolExecutor, queries: dict[str, Callable[[], Any]]) -> dict[str, Any]:
+    """
+    This method runs one phase of the probe selection: all the queries at the same time, until the deadline
+    of the phase. The queries that failed or did not finish before the deadline are left out of the results.
+
+    Args:
+        executor (ThreadPoolExecutor): The thread pool of the probe selection.
+        queries (dict[str, Callable[[], Any]]): The queries, by name.
+
+    Returns:
+        dict[str, Any]: The results of the queries that succeeded, by name.
+
+    Raises:
+        InputError: If a query got an invalid input.
+    """
+    futures = {name: executor.submit(query) for name, query in queries.items()}
+    if futures:
+        wait(futures.values(), timeout=get_ripe_probe_query_deadline_s())
+    results: dict[str, Any] = {}
+    for name, future in futures.items():
+        try:
+            if not future.done():
+                future.cancel()
+                raise TimeoutError("the deadline of the phase has passed")
+            results[name] = future.result()
+        except InputError:
+            raise
+        except Exception as e:
+            print(f"Error (safe) in the probe query {name}: {e}")
+    return results
+
+
+def search_candidate_probes(client_ip: str, ip_asn: Optional[str], ip_country: Optional[str], ip_family: int,
+                            with_prefix: bool, limit: Optional[int] = None) -> tuple[Optional[str], dict[str, list[int]]]:
+    """
+    This method searches the candidate probes of all the categories at the same time, on a bounded thread pool.
+    It works in two phases, each with its own deadline. First, the prefix of the client is looked up together with
+    the searches that do not need it (ASN and country, ASN, country). Then the searches by prefix
+    (ASN and prefix, prefix) are done. So the time it takes is the one of the slowest query of every phase,
+    not the sum of all of them. The order of priority of the categories is applied afterward
+    (see `get_best_probes_with_multiple_attributes` and `get_best_probes_matched_by_single_attribute`),
+    so the selected probes do not depend on which query finished first.
+
+    Args:
+        client_ip (str): The IP address of the client.
+        ip_asn (Optional[str]): The ASN of the client IP address.
+        ip_country (Optional[str]): The country of the client IP address.
+        ip_family (int): The family of the NTP server IP address. (4 or 6)
+        with_prefix (bool): Whether the prefix of the client is looked up (and the probes are searched by prefix).
+        limit (Optional[int]): How many of the nearest probes of every category are kept.
+
+    Returns:
+        tuple[Optional[str], dict[str, list[int]]]: - The prefix of the client, or None if it is unknown.
+                                                    - The IDs of the candidate probes of every category that was searched
+                                                      successfully ("asn_and_prefix", "asn_and_country", "asn",
+                                                      "prefix" and "country").
+
+    Raises:
+        InputError: If the input is invalid.
+    """
+    ip_type = "ipv" + str(ip_family)
+    executor = ThreadPoolExecutor(max_workers=get_ripe_max_parallel_probe_queries())
+    try:
+        # phase 1: the prefix of the client and the searches that do not need it
+        queries: dict[str, Callable[[], Any]] = {}
+        if with_prefix:
+            queries["ip_prefix"] = lambda: get_prefix_from_ip(client_ip)
+        if ip_asn is not None and ip_country is not None:
+            queries["asn_and_country"] = lambda: get_available_probes_asn_and_country(client_ip, ip_asn, ip_country,
+                                                                                      ip_type, limit)
+        if ip_asn is not None:
+            queries["asn"] = lambda: get_available_probes_asn(client_ip, ip_asn, ip_type, limit)
+        if ip_country is not None:
+            queries["country"] = lambda: get_available_probes_country(client_ip, ip_country, ip_type, limit)
+        candidates = run_probe_queries(executor, queries)
+        ip_prefix: Optional[str] = candidates.pop("ip_prefix", None)
+
+        # phase 2: the searches by prefix
+        queries = {}
+        if ip_prefix is not None:
+            if ip_asn is not None:
+                queries["asn_and_prefix"] = lambda: get_available_probes_asn_and_prefix(client_ip, ip_asn, ip_prefix,
+                                                                                        ip_type, limit)
+            queries["prefix"] = lambda: get_available_probes_prefix(client_ip, ip_prefix, ip_type, limit)
+        candidates.update(run_probe_queries(executor, queries))
+    finally:
+        # do not wait for the queries that passed the deadline
+        executor.shutdown(wait=False, cancel_futures=True)
+    return ip_prefix, candidates
+
+
+def get_candidate_probes(candidates: Optional[dict[str, list[int]]], category: str,
+                         search: Callable[[], list[int]]) -> list[int]:
+    """
+    This method returns the candidate probes of a category: the ones already found by `search_candidate_probes`,
+    or, if the probes were not searched in advance, the result of the search.
+
+    Args:
+        candidates (Optional[dict[str, list[int]]]): The candidate probes found in advance, or None.
+        category (str): The category of the probes (e.g. "asn_and_prefix").
+        search (Callable[[], list[int]]): Searches the probes of this category.
+
+    Returns:
+        list[int]: The IDs of the candidate probes of this category. Empty if the search in advance failed.
+    """
+    if candidates is None:
+        return search()
+    return candidates.get(category, [])
+
+
 def get_best_probes_with_multiple_attributes(client_ip: str, current_probes_set: set[int], ip_asn: Optional[str],
                                              ip_prefix: Optional[str], ip_country: Optional[str], ip_family: int,
-                                             probes_requested: int = get_ripe_number_of_probes_per_measurement()) \
+                                             probes_requested: int = get_ripe_number_of_probes_per_measurement(),
+                                             candidates: Optional[dict[str, list[int]]] = None) \
         -> tuple[int, set[int]]:
     """
     This method tries to get probes that has the same ASN and prefix OR the same ASN and country and subtract them
@@ -92,6 +212,8 @@ def get_best_probes_with_multiple_attributes(client_ip: str, current_probes_set:
         ip_country (Optional[str]): The country of the NTP server IP address.
         ip_family (int): The family of the NTP server IP address. (4 or 6)
         probes_requested (int): The number of probes that we still need to request.
+        candidates (Optional[dict[str, list[int]]]): The candidate probes found by `search_candidate_probes`.
+            If None, the probes are searched here, one category after the other.
 
     Returns:
         tuple[int, set[int]]: The updated number of probes that we still need to find after this method call.
@@ -104,16 +226,20 @@ def get_best_probes_with_multiple_attributes(client_ip: str, current_probes_set:
         raise InputError("Probe requested cannot be negative")
 
     ip_type = "ipv" + str(ip_family)
+    # we never need more of the nearest probes than the probes still requested plus the ones we already have
+    # (they may be found again)
     # see if we can get enough probes from probes with the same ASN and same prefix:
     if ip_asn is not None and ip_prefix is not None:
-        ids = get_available_probes_asn_and_prefix(client_ip, ip_asn, ip_prefix, ip_type)
+        ids = get_candidate_probes(candidates, "asn_and_prefix", lambda: get_available_probes_asn_and_prefix(
+            client_ip, ip_asn, ip_prefix, ip_type, probes_requested + len(current_probes_set)))
         probes_requested, current_probes_set = consume_probes(probes_requested, current_probes_set, ids)
         if probes_requested <= 0:
             return 0, set(current_probes_set)
 
     # try with the probes from the same ASN and country
     if ip_asn is not None and ip_country is not None:
-        ids = get_available_probes_asn_and_country(client_ip, ip_asn, ip_country, ip_type)
+        ids = get_candidate_probes(candidates, "asn_and_country", lambda: get_available_probes_asn_and_country(
+            client_ip, ip_asn, ip_country, ip_type, probes_requested + len(current_probes_set)))
         probes_requested, current_probes_set = consume_probes(probes_requested, current_probes_set, ids)
 
     return probes_requested, set(current_probes_set)
@@ -121,7 +247,8 @@ def get_best_probes_with_multiple_attributes(client_ip: str, current_probes_set:
 
 def get_best_probes_matched_by_single_attribute(client_ip: str, current_probes_set: set[int], ip_asn: Optional[str],
                                                 ip_prefix: Optional[str], ip_country: Optional[str], ip_family: int,
-                                                probes_requested: int = get_ripe_number_of_probes_per_measurement()) \
+                                                probes_requested: int = get_ripe_number_of_probes_per_measurement(),
+                                                candidates: Optional[dict[str, list[int]]] = None) \
         -> tuple[int, set[int]]:
     """
     This method is responsible for getting the best probes that has a match by a single attribute in this order: ASN, prefix, country.
@@ -135,6 +262,8 @@ def get_best_probes_matched_by_single_attribute(client_ip: str, current_probes_s
         ip_country (Optional[str]): The country of the NTP server IP address.
         ip_family (int): The family of the NTP server IP address. (4 or 6)
         probes_requested (int): The number of probes that we still need to request.
+        candidates (Optional[dict[str, list[int]]]): The candidate probes found by `search_candidate_probes`.
+            If None, the probes are searched here, one category after the other.
 
     Returns:
         tuple[int, set[int]]: - The updated number of probes that we still need to find after this method call.
@@ -147,23 +276,28 @@ def get_best_probes_matched_by_single_attribute(client_ip: str, current_probes_s
         raise InputError("Probe requested cannot be negative")
     ip_type = "ipv" + str(ip_family)
     ids: list[int]
+    # we never need more of the nearest probes than the probes still requested plus the ones we already have
+    # (they may be found again)
     # try ASN
     if ip_asn is not None:
-        ids = get_available_probes_asn(client_ip, ip_asn, ip_type)
+        ids = get_candidate_probes(candidates, "asn", lambda: get_available_probes_asn(
+            client_ip, ip_asn, ip_type, probes_requested + len(current_probes_set)))
         probes_requested, current_probes_set = consume_probes(probes_requested, current_probes_set, ids)
         if probes_requested <= 0:
             return 0, current_probes_set
 
     # try prefix
     if ip_prefix is not None:
-        ids = get_available_probes_prefix(client_ip, ip_prefix, ip_type)
+        ids = get_candidate_probes(candidates, "prefix", lambda: get_available_probes_prefix(
+            client_ip, ip_prefix, ip_type, probes_requested + len(current_probes_set)))
         probes_requested, current_probes_set = consume_probes(probes_requested, current_probes_set, ids)
         if probes_requested <= 0:
             return 0, current_probes_set
 
     # try country
     if ip_country is not None:
-        ids = get_available_probes_country(client_ip, ip_country, ip_type)
+        ids = get_candidate_probes(candidates, "country", lambda: get_available_probes_country(
+            client_ip, ip_country, ip_type, probes_requested + len(current_probes_set)))
         probes_requested, probes_to_use = consume_probes(probes_requested, current_probes_set, ids)
         if probes_requested <= 0:
             return 0, current_probes_set
@@ -307,7 +441,82 @@ def get_random_probes(n: int) -> dict:
     return get_area_probes("WW", n)
 
 
-def get_available_probes_asn_and_prefix(client_ip: str, ip_asn: str, ip_prefix: str, ip_type: str) -> list[int]:
+def find_probes(filters: dict[str, Any], page_size: int) -> Iterable[Any]:
+    """
+    This method searches the probes that match the filters. They are taken from the local probe catalogue
+    (see `probe_catalogue`), so no request is sent to RIPE Atlas. Only if the catalogue is not loaded (yet),
+    the probes are searched on RIPE Atlas.
+
+    Args:
+        filters (dict[str, Any]): The filters of the probes, as they are given to `ProbeRequest`.
+        page_size (int): The page size of the requests to RIPE Atlas, if the catalogue is not loaded.
+
+    Returns:
+        Iterable[Any]: The matching probes. Every probe has an "id" and a "geometry".
+    """
+    catalogue = get_probe_catalogue()
+    if catalogue is not None:
+        return catalogue.search(filters)
+    probes: Iterable[Any] = ProbeRequest(
+        return_objects=True,
+        fields=["id", "geometry"],
+        page_size=page_size,
+        **filters,
+    )
+    return probes
+
+
+def rank_probes_by_distance(probes: Iterable[Any], lat_client: float, lon_client: float,
+                            limit: Optional[int] = None) -> list[int]:
+    """
+    This method sorts the probes by their distance to the client, the nearest first.
+    The distances of all the probes are calculated at once (see `calculate_haversine_distances`), and
+    if only the nearest "limit" probes are needed, only these are sorted (see `smallest_indices`).
+    Duplicated probes are ignored, and probes without a location are put at the end of the list.
+    Probes at the same distance keep the order in which they were found.
+
+    Args:
+        probes (Iterable[Any]): The probes. Every probe has an "id" and a "geometry".
+        lat_client (float): The latitude of the client.
+        lon_client (float): The longitude of the client.
+        limit (Optional[int]): How many of the nearest probes to return. None returns all of them.
+
+    Returns:
+        list[int]: The ids of the probes, the nearest to the client first.
+    """
+    ids: list[int] = []
+    seen: set[int] = set()
+    lats: list[float] = []
+    lons: list[float] = []
+    nan = float("nan")
+    for p in probes:
+        try:
+            if p.id in seen:
+                continue
+            if isinstance(p, RipeProbe):
+                # the probes of the local catalogue already have their coordinates as (latitude, longitude)
+                lat, lon = p.coordinates if p.coordinates is not None else (nan, nan)
+            else:
+                coordinates = getattr(p, "geometry", {}).get("coordinates")
+                if coordinates:
+                    lon, lat = coordinates
+                    lat, lon = float(lat), float(lon)
+                else:
+                    lat = lon = nan
+            ids.append(p.id)
+            seen.add(p.id)
+            lats.append(lat)
+            lons.append(lon)
+        except Exception as e:
+            print(f"error (safe): {e}")
+
+    distances = calculate_haversine_distances(np.array(lats), np.array(lons), lat_client, lon_client)
+    distances[np.isnan(distances)] = NO_LOCATION_DISTANCE
+    return [ids[i] for i in smallest_indices(distances, limit)]
+
+
+def get_available_probes_asn_and_prefix(client_ip: str, ip_asn: str, ip_prefix: str, ip_type: str,
+                                        limit: Optional[int] = None) -> list[int]:
     """
     This method gets the probes available on RIPE Atlas that has the same ASN and prefix as the client IP.
     These probes should also support ipv4 or ipv6, it depends on the type.
@@ -317,9 +526,10 @@ def get_available_probes_asn_and_prefix(client_ip: str, ip_asn: str, ip_prefix:
         ip_asn (str): The ASN of the searched network.
         ip_prefix(str): The prefix of the respective IP.
         ip_type (str): The IP type (ipv4 or ipv6). (not case-sensitive)
+        limit (Optional[int]): How many of the nearest probes to return. None returns all of them.
 
     Returns:
-        list[int]: A list with the ids of the available probes.
+        list[int]: A list with the ids of the available probes, the nearest to the client first.
 
     Raises:
         Exception: If the input is invalid.
@@ -336,34 +546,13 @@ def get_available_probes_asn_and_prefix(client_ip: str, ip_asn: str, ip_prefix:
         "tags": f"system-{ip_type.lower()}-works",
         "is_public": True
     }
-    probes = ProbeRequest(
-        return_objects=True,
-        fields=["id", "geometry"],
-        page_size=400,
-        **filters,
-    )
+    probes = find_probes(filters, page_size=400)
     lat_client, lon_client = get_coordinates_for_ip(client_ip)
-    probe_ids_dist: dict[int, float] = {}  # each id is mapped to its distance
-
-    for p in probes:
-        try:
-            if p.id in probe_ids_dist:
-                continue
-            coordinates = getattr(p, "geometry", {}).get("coordinates")
-            if coordinates:
-                lon, lat = coordinates
-                dist: float = calculate_haversine_distance(lat, lon, lat_client, lon_client)
-                probe_ids_dist[p.id] = dist
-            else:
-                probe_ids_dist[p.id] = 1000000  # some large value to put this probe at the end of the list
-        except Exception as e:
-            print(f"error (safe): {e}")
-
-    probe_ids_list: list[int] = sorted(probe_ids_dist, key=lambda k: probe_ids_dist[k])
-    return probe_ids_list
+    return rank_probes_by_distance(probes, lat_client, lon_client, limit)
 
 
-def get_available_probes_asn_and_country(client_ip: str, ip_asn: str, ip_country_code: str, ip_type: str) -> list[int]:
+def get_available_probes_asn_and_country(client_ip: str, ip_asn: str, ip_country_code: str, ip_type: str,
+                                         limit: Optional[int] = None) -> list[int]:
     """
     This method gets the probes available on RIPE Atlas that has the same ASN and country as the client IP.
     These probes should also support ipv4 or ipv6, it depends on the type.
@@ -373,9 +562,10 @@ def get_available_probes_asn_and_country(client_ip: str, ip_asn: str, ip_country
         ip_asn (str): The ASN of the searched network.
         ip_country_code(str): The country code of the respective IP.
         ip_type (str): The IP type (ipv4 or ipv6). (not case-sensitive)
+        limit (Optional[int]): How many of the nearest probes to return. None returns all of them.
 
     Returns:
-        list[int]: A list with the ids of the available probes.
+        list[int]: A list with the ids of the available probes, the nearest to the client first.
 
     Raises:
         Exception: If the input is invalid.
@@ -391,35 +581,13 @@ def get_available_probes_asn_and_country(client_ip: str, ip_asn: str, ip_country
         "tags": f"system-{ip_type.lower()}-works",
         "is_public": True
     }
-    probes = ProbeRequest(
-        return_objects=True,
-        fields=["id", "geometry"],
-        page_size=300,
-        **filters,
-    )
+    probes = find_probes(filters, page_size=300)
 
     lat_client, lon_client = get_coordinates_for_ip(client_ip)
-    probe_ids_dist: dict[int, float] = {}  # each id is mapped to its distance
-
-    for p in probes:
-        try:
-            if p.id in probe_ids_dist:
-                continue
-            coordinates = getattr(p, "geometry", {}).get("coordinates")
-            if coordinates:
-                lon, lat = coordinates
-                dist: float = calculate_haversine_distance(lat, lon, lat_client, lon_client)
-                probe_ids_dist[p.id] = dist
-            else:
-                probe_ids_dist[p.id] = 100000.0  # some large value to put this probe at the end of the list
-        except Exception as e:
-            print(f"error (safe): {e}")
-
-    probe_ids_list: list[int] = sorted(probe_ids_dist, key=lambda k: probe_ids_dist[k])
-    return probe_ids_list
+    return rank_probes_by_distance(probes, lat_client, lon_client, limit)
 
 
-def get_available_probes_asn(client_ip: str, ip_asn: str, ip_type: str) -> list[int]:
+def get_available_probes_asn(client_ip: str, ip_asn: str, ip_type: str, limit: Optional[int] = None) -> list[int]:
     """
     This method gets the probes available on RIPE Atlas that has the same ASN as the client IP.
     These probes should also support ipv4 or ipv6, it depends on the type.
@@ -428,9 +596,10 @@ def get_available_probes_asn(client_ip: str, ip_asn: str, ip_type: str) -> list[
         client_ip (str): The IP address of the client.
         ip_asn (str): The ASN of the searched network.
         ip_type (str): The IP type (ipv4 or ipv6). (not case-sensitive)
+        limit (Optional[int]): How many of the nearest probes to return. None returns all of them.
 
     Returns:
-        list[int]: A list with the ids of the available probes.
+        list[int]: A list with the ids of the available probes, the nearest to the client first.
 
     Raises:
         Exception: If the input is invalid.
@@ -445,34 +614,15 @@ def get_available_probes_asn(client_ip: str, ip_asn: str, ip_type: str) -> list[
         "tags": f"system-{ip_type.lower()}-works",
         "is_public": True
     }
-    probes = ProbeRequest(
-        return_objects=True,
-        fields=["id", "geometry"],
-        page_size=250, # we do not have a lot of probes there usually, 250 should be ok
-        **filters,
-    )
+    # we do not have a lot of probes there usually, 250 should be ok
+    probes = find_probes(filters, page_size=250)
 
     lat_client, lon_client = get_coordinates_for_ip(client_ip)
-    probe_ids_dist: dict[int, float] = {}  # each id is mapped to its distance
-    for p in probes:
-        try:
-            if p.id in probe_ids_dist:
-                continue
-            coordinates = getattr(p, "geometry", {}).get("coordinates")
-            if coordinates:
-                lon, lat = coordinates
-                dist: float = calculate_haversine_distance(lat, lon, lat_client, lon_client)
-                probe_ids_dist[p.id] = dist
-            else:
-                probe_ids_dist[p.id] = 2000000  # some large value to put this probe at the end of the list
-        except Exception as e:
-            print(f"error (safe): {e}")
-
-    probe_ids_list: list[int] = sorted(probe_ids_dist, key=lambda k: probe_ids_dist[k])
-    return probe_ids_list
+    return rank_probes_by_distance(probes, lat_client, lon_client, limit)
 
 
-def get_available_probes_prefix(client_ip: str, ip_prefix: str, ip_type: str) -> list[int]:
+def get_available_probes_prefix(client_ip: str, ip_prefix: str, ip_type: str,
+                                limit: Optional[int] = None) -> list[int]:
     """
     This method gets the probes available on RIPE Atlas that has the same prefix as the client IP.
     These probes should also support ipv4 or ipv6, it depends on the type.
@@ -481,9 +631,10 @@ def get_available_probes_prefix(client_ip: str, ip_prefix: str, ip_type: str) ->
         client_ip (str): The IP address of the client.
         ip_prefix (str): The ip_prefix of the searched network.
         ip_type (str): The IP type (ipv4 or ipv6). It should be lowercase.
+        limit (Optional[int]): How many of the nearest probes to return. None returns all of them.
 
     Returns:
-        list[int]: A list with the ids of the available probes.
+        list[int]: A list with the ids of the available probes, the nearest to the client first.
 
     Raises:
         Exception: If the input is invalid.
@@ -495,33 +646,13 @@ def get_available_probes_prefix(client_ip: str, ip_prefix: str, ip_type: str) ->
         "tags": f"system-{ip_type.lower()}-works",
         "is_public": True
     }
-    probes = ProbeRequest(
-        return_objects=True,
-        fields=["id", "geometry"],
-        page_size=250,
-        **filters,
-    )
+    probes = find_probes(filters, page_size=250)
     lat_client, lon_client = get_coordinates_for_ip(client_ip)
+    return rank_probes_by_distance(probes, lat_client, lon_client, limit)
 
-    probe_ids_dist: dict[int, float] = {}  # each id is mapped to its distance
-    for p in probes:
-        try:
-            # we want to ignore duplicates
-            if p.id not in probe_ids_dist:
-                coordinates_prefix = getattr(p, "geometry", {}).get("coordinates")
-                if coordinates_prefix:
-                    lon, lat = coordinates_prefix
-                    dist: float = calculate_haversine_distance(lat, lon, lat_client, lon_client)
-                    probe_ids_dist[p.id] = dist
-                else:
-                    probe_ids_dist[p.id] = 1000000  # some large value to put this probe at the end of the list
-        except Exception as e:
-            print(f"error (safe): {e}")
-    probe_ids_list: list[int] = sorted(probe_ids_dist, key=lambda k: probe_ids_dist[k])
-    return probe_ids_list
 
-
-def get_available_probes_country(client_ip: str, country_code: str, ip_type: str) -> list[int]:
+def get_available_probes_country(client_ip: str, country_code: str, ip_type: str,
+                                 limit: Optional[int] = None) -> list[int]:
     """
     This method gets the probes available on RIPE Atlas that has the same country as the client IP.
     These probes should also support ipv4 or ipv6, it depends on the type.
@@ -530,9 +661,10 @@ def get_available_probes_country(client_ip: str, country_code: str, ip_type: str
         client_ip (str): The IP address of the client.
         country_code (str): The country code.
         ip_type (str): The IP type (ipv4 or ipv6). It should be lowercase.
+        limit (Optional[int]): How many of the nearest probes to return. None returns all of them.
 
     Returns:
-        list[int]: A list with the ids of the available probes.
+        list[int]: A list with the ids of the available probes, the nearest to the client first.
 
     Raises:
         Exception: If the input is invalid.
@@ -545,30 +677,10 @@ def get_available_probes_country(client_ip: str, country_code: str, ip_type: str
         "tags": f"system-{ip_type.lower()}-works",
         "is_public": True
     }
-    probes = ProbeRequest(
-        return_objects=True,
-        fields=["id", "geometry"],
-        page_size=600, # we need a large value here as we have multiple probes. (it is like a buffer size)
-        **filters,
-    )
+    # we need a large value here as we have multiple probes. (it is like a buffer size)
+    probes = find_probes(filters, page_size=600)
     lat_client, lon_client = get_coordinates_for_ip(client_ip)
-    probe_ids_dist: dict[int, float] = {} # each id is mapped to its distance
-    for p in probes:
-        try:
-            if p.id in probe_ids_dist:
-                continue
-            coordinates = getattr(p, "geometry", {}).get("coordinates")
-            if coordinates:
-                lon, lat = coordinates
-                dist: float = calculate_haversine_distance(lat, lon, lat_client, lon_client)
-                probe_ids_dist[p.id] = dist
-            else:
-                probe_ids_dist[p.id] = 1000000.0  # some large value to put this probe at the end of the list
-        except Exception as e:
-            print(f"error (safe): {e}")
-
-    probe_ids_list: list[int] = sorted(probe_ids_dist, key=lambda k: probe_ids_dist[k])
-    return probe_ids_list
+    return rank_probes_by_distance(probes, lat_client, lon_client, limit)
 
 def consume_probes(probes_requested: int, current_probes_set: set[int], probes_ids: list[int]) -> tuple[int, set[int]]:
     """
@@ -0,0 +1,77 @@
+"""
+Measures how long it takes, and how much memory it allocates, to convert 10 000 rows of the `measurements` table
+into NtpMeasurement objects: once through a dictionary and the validating constructors (`dict_to_measurement`)
+and once with the trusted constructors (`row_to_measurement`), which is what the history endpoints use.
+
+The geolocation lookup is replaced by a fixed answer, so only the conversion itself is measured.
+
+Usage: python -m server.scripts.benchmark_dto_construction
+"""
+import time
+import tracemalloc
+from typing import Any, Callable
+from unittest.mock import patch
+
+from server.app.db.db_interaction import dict_to_measurement, row_to_dict, row_to_measurement
+from server.app.dtos.GeoRecord import GeoRecord
+from server.app.models.Measurement import Measurement
+
+ROWS = 10_000
+REPEATS = 5
+
+
+def make_rows() -> list[Measurement]:
+    """
+    Returns:
+        list[Measurement]: 10 000 rows of one server, like the rows of a history.
+    """
+    return [Measurement(id=i, vantage_point_ip="192.0.2.1", ntp_server_ip="192.0.2.123", ntp_server_name="pool.ntp.org",
+                        ntp_version=4, ntp_server_ref_parent="192.0.2.7", ref_name=None, time_offset=0.001 * i,
+                        rtt=0.02, stratum=2, precision=-23.0, reachability="", root_delay=0, root_delay_prec=9000,
+                        poll=6, root_dispersion=0, root_dispersion_prec=12000, ntp_last_sync_time=3957337000,
+                        ntp_last_sync_time_prec=0, client_sent=3957337543 + i, client_sent_prec=1000,
+                        server_recv=3957337543 + i, server_recv_prec=2000, server_sent=3957337543 + i,
+                        server_sent_prec=3000, client_recv=3957337543 + i, client_recv_prec=4000)
+            for i in range(ROWS)]
+
+
+def measure(convert: Callable[[Measurement], Any], rows: list[Measurement]) -> tuple[float, float]:
+    """
+    Converts all the rows, a few times.
+
+    Args:
+        convert (Callable[[Measurement], Any]): Converts one row into an NtpMeasurement.
+        rows (list[Measurement]): The rows.
+
+    Returns:
+        tuple[float, float]: The best time it took, in seconds, and the memory allocated for the measurements, in bytes.
+    """
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for row in rows:
+            convert(row)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    kept = [convert(row) for row in rows]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return best, allocated
+
+
+def main() -> None:
+    """
+    Prints the time and the memory of both conversions.
+    """
+    rows = make_rows()
+    geo = GeoRecord(country_code="NL", coordinates=(52.0, 4.0), continent_code="EU", asn=None)
+    with patch("server.app.db.db_interaction.lookup_ip", new=lambda ip: geo):
+        for name, convert in [("dict_to_measurement", lambda row: dict_to_measurement(row_to_dict(row))),
+                              ("row_to_measurement", row_to_measurement)]:
+            seconds, allocated = measure(convert, rows)
+            print(f"{name:20} {seconds * 1000:8.1f} ms {allocated / 2 ** 20:8.2f} MiB per {ROWS} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 from server.app.db_config import init_engine
 from server.app.models.Base import Base
 
-from server.app.models.Time import Time
 from server.app.models.Measurement import Measurement
+from server.app.models.MeasurementRollup import MeasurementRollup1m, MeasurementRollup1h, MeasurementRollup1d, \
+    RollupState, RollupQueue
 
 engine = init_engine()
 Base.metadata.create_all(bind=engine)
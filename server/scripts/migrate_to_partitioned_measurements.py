@@ -0,0 +1,136 @@
+"""
+Migrates the database from the old layout, where the timestamps of a measurement were stored in a separate `times`
+table (joined on `measurements.time_id`), to the single `measurements` table that carries the timestamps and is
+range-partitioned by month on `client_sent`.
+
+The whole migration runs in one transaction. The old tables are kept as `measurements_old` and `times`,
+unless `--drop-old` is given. Running the script on an already migrated database does nothing.
+
+Usage:
+    python3 server/scripts/migrate_to_partitioned_measurements.py [--drop-old]
+"""
+import argparse
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from server.app.db.partitions import create_measurement_partitions, month_partition_bounds
+from server.app.db_config import init_engine
+from server.app.models.Base import Base
+from server.app.models.Measurement import Measurement
+
+TIME_COLUMNS = ["client_sent", "client_sent_prec", "server_recv", "server_recv_prec",
+                "server_sent", "server_sent_prec", "client_recv", "client_recv_prec"]
+
+
+def needs_migration(session: Session) -> bool:
+    """
+    Checks whether the database still uses the old layout with the `times` table.
+
+    Args:
+        session (Session): The session of the migration.
+
+    Returns:
+        bool: True if the `measurements` table still has the `time_id` column.
+    """
+    inspector = inspect(session.connection())
+    if not inspector.has_table("times") or not inspector.has_table("measurements"):
+        return False
+    return "time_id" in [c["name"] for c in inspector.get_columns("measurements")]
+
+
+def move_old_table_aside(session: Session) -> None:
+    """
+    Renames the old `measurements` table, and the primary key, sequence and indexes whose names
+    the new table needs.
+
+    Args:
+        session (Session): The session of the migration.
+    """
+    session.execute(text("ALTER TABLE measurements RENAME TO measurements_old"))
+    pk_name = inspect(session.connection()).get_pk_constraint("measurements_old").get("name")
+    if pk_name:
+        session.execute(text(f'ALTER TABLE measurements_old RENAME CONSTRAINT "{pk_name}" TO measurements_old_pkey'))
+    session.execute(text("ALTER SEQUENCE IF EXISTS measurements_id_seq RENAME TO measurements_old_id_seq"))
+    session.execute(text("DROP INDEX IF EXISTS idx_meas_name_nn, idx_meas_server_ip, idx_meas_server_ip_time, "
+                         "idx_meas_time_id"))
+
+
+def create_partitions_for_old_data(session: Session) -> int:
+    """
+    Creates the monthly partitions for every month between the oldest and the newest old measurement.
+
+    Args:
+        session (Session): The session of the migration.
+
+    Returns:
+        int: How many partitions were needed.
+    """
+    oldest, newest = session.execute(text(
+        "SELECT MIN(t.client_sent), MAX(t.client_sent) FROM measurements_old m JOIN times t ON t.id = m.time_id"
+    )).one()
+    if oldest is None:
+        return 0
+    months = []
+    current = oldest
+    while current <= newest:
+        months.append(current)
+        current = month_partition_bounds(current)[2]
+    create_measurement_partitions(session, months)
+    return len(months)
+
+
+def copy_old_data(session: Session) -> tuple[int, int]:
+    """
+    Copies the old measurements, joined with their timestamps, into the new table. The ids are kept.
+    Measurements without a `client_sent` time cannot be placed in a partition, so they are skipped.
+
+    Args:
+        session (Session): The session of the migration.
+
+    Returns:
+        tuple[int, int]: How many measurements were copied and how many were skipped.
+    """
+    columns = [c.name for c in Measurement.__table__.columns]
+    targets = ", ".join(f'"{c}"' for c in columns)
+    values = ", ".join(f't."{c}"' if c in TIME_COLUMNS else f'm."{c}"' for c in columns)
+    copied = session.execute(text(
+        f"INSERT INTO measurements ({targets}) "
+        f"SELECT {values} FROM measurements_old m JOIN times t ON t.id = m.time_id "
+        f"WHERE t.client_sent IS NOT NULL"
+    )).rowcount
+    total = session.execute(text("SELECT COUNT(*) FROM measurements_old")).scalar_one()
+    session.execute(text("SELECT setval('measurements_id_seq', (SELECT COALESCE(MAX(id), 0) + 1 FROM measurements), "
+                         "false)"))
+    return copied, total - copied
+
+
+def migrate(drop_old: bool = False) -> None:
+    """
+    Runs the whole migration in one transaction.
+
+    Args:
+        drop_old (bool): Whether to drop the old `measurements_old` and `times` tables at the end.
+    """
+    engine = init_engine()
+    with Session(engine) as session, session.begin():
+        if not needs_migration(session):
+            print("The database already uses the partitioned measurements table. Nothing to migrate.")
+            return
+        move_old_table_aside(session)
+        Base.metadata.create_all(bind=session.connection(), tables=[Measurement.__table__])
+        partitions = create_partitions_for_old_data(session)
+        copied, skipped = copy_old_data(session)
+        print(f"Copied {copied} measurements into {partitions} monthly partitions ({skipped} without a time skipped).")
+        if drop_old:
+            session.execute(text("DROP TABLE measurements_old"))
+            session.execute(text("DROP TABLE times"))
+            print("Dropped the old tables.")
+        else:
+            print("The old tables are kept as 'measurements_old' and 'times'.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the measurements to the partitioned single-table layout.")
+    parser.add_argument("--drop-old", action="store_true", help="drop the old tables after the migration")
+    migrate(parser.parse_args().drop_old)
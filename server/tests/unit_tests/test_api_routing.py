@@ -1,6 +1,10 @@
+import io
+import json
 from unittest.mock import patch, MagicMock
 import pytest
 from fastapi.testclient import TestClient
+import pyarrow as pa
+import pyarrow.parquet as pq
 from ipaddress import IPv4Address, ip_address
 
 from sqlalchemy import Engine
@@ -19,6 +23,8 @@ from server.app.dtos.NtpTimestamps import NtpTimestamps
 from server.app.dtos.PreciseTime import PreciseTime
 from datetime import datetime, timezone, timedelta
 from server.app.api.routing import get_db
+from server.app.db.db_interaction import measurement_to_row
+from server.app.services.api_services import HISTORY_COLUMNS
 
 engine = MagicMock(spec=Engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -92,6 +98,11 @@ def mock_measurement() -> NtpMeasurement:
     )
 
 
+def get_mock_rows():
+    return [tuple({**measurement_to_row(m), "id": i + 1}[c] for c in HISTORY_COLUMNS)
+            for i, m in enumerate(get_mock_data())]
+
+
 def get_mock_data():
     return [
         NtpMeasurement(
@@ -234,8 +245,8 @@ def test_read_root(test_client):
 
 # @patch("server.app.api.routing.Depends")
 @patch("server.app.api.routing.get_server_ip")
-@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list")
-@patch("server.app.services.api_services.insert_measurement")
+@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list_async")
+@patch("server.app.services.api_services.store_measurements")
 @patch("server.app.services.api_services.is_ip_address")
 def test_read_data_measurement_success(mock_is_ip, mock_insert, mock_perform_measurement, mock_get_server_ip,
                                        test_client):
@@ -259,14 +270,14 @@ def test_read_data_measurement_success(mock_is_ip, mock_insert, mock_perform_mea
     assert "measurement" in response.json()
     assert response.json()["measurement"][0]["ntp_server_name"] == "pool.ntp.org"
     assert response.json()["measurement"][0]["jitter"] == 0
-    mock_perform_measurement.assert_called_with("pool.ntp.org", "83.25.24.10", 4)
-    mock_insert.assert_called_once_with(measurement, mock_insert.call_args[0][1])
+    mock_perform_measurement.assert_called_with("pool.ntp.org", "83.25.24.10", 4, samples=1)
+    mock_insert.assert_called_once_with([measurement], mock_insert.call_args[0][1])
     client.close()
 
 
 @patch("server.app.api.routing.get_server_ip")
-@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list")
-@patch("server.app.services.api_services.insert_measurement")
+@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list_async")
+@patch("server.app.services.api_services.store_measurements")
 @patch("server.app.services.api_services.is_ip_address")
 def test_read_data_measurement_missing_measurement_no(mock_is_ip, mock_insert, mock_perform_measurement,
                                                       mock_get_server_ip, test_client):
@@ -282,8 +293,8 @@ def test_read_data_measurement_missing_measurement_no(mock_is_ip, mock_insert, m
 
 
 @patch("server.app.api.routing.get_server_ip")
-@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list")
-@patch("server.app.services.api_services.insert_measurement")
+@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list_async")
+@patch("server.app.services.api_services.store_measurements")
 @patch("server.app.services.api_services.is_ip_address")
 @patch("server.app.services.api_services.calculate_jitter_from_measurements")
 def test_read_data_measurement_with_jitter(mock_jitter, mock_is_ip, mock_insert, mock_perform_measurement,
@@ -325,18 +336,15 @@ def test_read_data_measurement_wrong_server(mock_get_server_ip, test_client):
     assert response.json() == {"detail": "Domain name is invalid or cannot be resolved."}
 
 
-@patch("server.app.services.api_services.get_measurements_timestamps_dn")
-@patch("server.app.services.api_services.get_measurements_timestamps_ip")
+@patch("server.app.services.api_services.get_measurement_columns_page")
 @patch("server.app.services.api_services.is_ip_address")
 @patch("server.app.services.api_services.human_date_to_ntp_precise_time")
-def test_read_historic_data_ip(mock_human_date_to_ntp, mock_is_ip, mock_get_ip, mock_get_dn, test_client):
+def test_read_historic_data_ip(mock_human_date_to_ntp, mock_is_ip, mock_get_page, test_client):
     end = datetime.now(timezone.utc)
     mock_is_ip.return_value = IPv4Address("192.168.1.1")
     mock_human_date_to_ntp.return_value = PreciseTime(1000, 500)
-    mock_data = get_mock_data()
-
-    mock_get_ip.return_value = mock_data  # Mock for IP address fetch
-    mock_get_dn.return_value = mock_data  # Mock for Domain Name fetch
+    mock_get_page.return_value = (get_mock_rows(), None)
+    test_client.app.state.limiter.reset()
     response = test_client.get("/measurements/history/", params={
         "server": "192.168.1.1",
         "start": (end - timedelta(minutes=10)).isoformat(),
@@ -344,27 +352,25 @@ def test_read_historic_data_ip(mock_human_date_to_ntp, mock_is_ip, mock_get_ip,
     })
 
     assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
     data = response.json()["measurements"]
     assert len(data) == 2
     assert data[0]["ntp_server_ip"] == "192.168.1.1"
     assert data[0]["poll"] == 60
     assert data[1]["poll"] == 5
-    mock_get_ip.assert_called_once()
-    mock_get_dn.assert_not_called()
+    assert mock_get_page.call_args.args[1:3] == (["192.168.1.1"], [])
+    assert mock_get_page.call_args.args[3] == HISTORY_COLUMNS
 
 
-@patch("server.app.services.api_services.get_measurements_timestamps_dn")
-@patch("server.app.services.api_services.get_measurements_timestamps_ip")
+@patch("server.app.services.api_services.get_measurement_columns_page")
 @patch("server.app.services.api_services.is_ip_address")
 @patch("server.app.services.api_services.human_date_to_ntp_precise_time")
-def test_read_historic_data_dn(mock_human_date_to_ntp, mock_is_ip, mock_get_ip, mock_get_dn, test_client):
+def test_read_historic_data_dn(mock_human_date_to_ntp, mock_is_ip, mock_get_page, test_client):
     end = datetime.now(timezone.utc)
     mock_is_ip.return_value = None
     mock_human_date_to_ntp.return_value = PreciseTime(1000, 500)
-    mock_data = get_mock_data()
-
-    mock_get_ip.return_value = mock_data  # Mock for IP address fetch
-    mock_get_dn.return_value = mock_data  # Mock for Domain Name fetch
+    mock_get_page.return_value = (get_mock_rows(), None)
+    test_client.app.state.limiter.reset()
     response = test_client.get("/measurements/history/", params={
         "server": "pool.ntp.org",
         "start": (end - timedelta(minutes=10)).isoformat(),
@@ -372,13 +378,14 @@ def test_read_historic_data_dn(mock_human_date_to_ntp, mock_is_ip, mock_get_ip,
     })
 
     assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
     data = response.json()["measurements"]
     assert len(data) == 2
     assert data[0]["ntp_server_name"] == "pool.ntp.org"
     assert data[0]["poll"] == 60
     assert data[1]["poll"] == 5
-    mock_get_ip.assert_not_called()
-    mock_get_dn.assert_called_once()
+    assert mock_get_page.call_args.args[1:3] == ([], ["pool.ntp.org"])
+    assert mock_get_page.call_args.args[3] == HISTORY_COLUMNS
 
 
 def test_read_historic_data_missing_server(test_client):
@@ -417,9 +424,290 @@ def test_read_historic_data_wrong_end(test_client):
     assert response.json() == {"detail": "'end' cannot be in the future"}
 
 
+
+@patch("server.app.api.routing.get_max_mind_enrichment_debug_headers")
+@patch("server.app.services.api_services.get_measurement_columns_page")
+def test_read_historic_data_enrichment_headers(mock_get_page, mock_debug_headers, test_client):
+    end = datetime.now(timezone.utc)
+    # 2 servers, 2 measurements each
+    mock_get_page.return_value = (get_mock_rows() * 2, None)
+    params = {
+        "server": "pool.ntp.org",
+        "start": (end - timedelta(minutes=10)).isoformat(),
+        "end": end.isoformat()
+    }
+
+    mock_debug_headers.return_value = True
+    test_client.app.state.limiter.reset()
+    response = test_client.get("/measurements/history/", params=params)
+    assert response.status_code == 200
+    assert len(response.json()["measurements"]) == 4
+    # per server: the fields, the location and the anycast check are resolved once
+    assert response.headers["X-Enrichment-Memo-Misses"] == "6"
+    assert response.headers["X-Enrichment-Memo-Hits"] == "2"
+
+    mock_debug_headers.return_value = False
+    test_client.app.state.limiter.reset()
+    response = test_client.get("/measurements/history/", params=params)
+    assert "X-Enrichment-Memo-Hits" not in response.headers
+
+@patch("server.app.services.api_services.get_measurement_columns_page")
+@patch("server.app.services.api_services.is_ip_address")
+@patch("server.app.services.api_services.human_date_to_ntp_precise_time")
+def test_read_historic_data_pages(mock_human_date_to_ntp, mock_is_ip, mock_get_ip, test_client):
+    end = datetime.now(timezone.utc)
+    mock_is_ip.return_value = IPv4Address("192.168.1.1")
+    mock_human_date_to_ntp.return_value = PreciseTime(1000, 500)
+    mock_get_ip.return_value = (get_mock_rows()[:1], (1000, 17))
+    test_client.app.state.limiter.reset()
+    params = {
+        "server": "192.168.1.1",
+        "start": (end - timedelta(minutes=10)).isoformat(),
+        "end": end.isoformat(),
+        "limit": 1
+    }
+
+    response = test_client.get("/measurements/history/", params=params)
+    assert response.status_code == 200
+    assert len(response.json()["measurements"]) == 1
+    assert response.json()["next_cursor"] == "1000-17"
+
+    test_client.app.state.limiter.reset()
+    mock_get_ip.return_value = (get_mock_rows()[1:], None)
+    response = test_client.get("/measurements/history/", params={**params, "cursor": "1000-17"})
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] is None
+    assert mock_get_ip.call_args.args[6:] == (1, (1000, 17))
+
+    test_client.app.state.limiter.reset()
+    response = test_client.get("/measurements/history/", params={**params, "cursor": "not a cursor"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor: not a cursor"}
+
+
+@patch("server.app.services.api_services.get_measurement_buckets_dn")
+@patch("server.app.services.api_services.is_ip_address")
+def test_read_historic_data_downsampled(mock_is_ip, mock_buckets, test_client):
+    end = datetime.now(timezone.utc)
+    mock_is_ip.return_value = None
+    mock_buckets.return_value = [{"bucket_start": 3900000000, "count": 2, "offset_min": 0.1, "offset_max": 0.2,
+                                  "offset_mean": 0.15, "offset_p50": None, "offset_p95": None, "rtt_min": 0.01,
+                                  "rtt_max": 0.02, "rtt_mean": 0.015, "rtt_p50": None, "rtt_p95": None,
+                                  "stratum_min": 2, "stratum_max": 2, "failures": 0}]
+    test_client.app.state.limiter.reset()
+    params = {
+        "server": "pool.ntp.org",
+        "start": (end - timedelta(hours=10)).isoformat(),
+        "end": end.isoformat(),
+        "resolution": 100
+    }
+
+    response = test_client.get("/measurements/history/", params=params)
+    assert response.status_code == 200
+    assert response.json()["bucket_s"] == 361  # the end is included
+    assert response.json()["buckets"][0]["count"] == 2
+    assert response.json()["buckets"][0]["offset"]["mean"] == 0.15
+
+    test_client.app.state.limiter.reset()
+    response = test_client.get("/measurements/history/", params={**params, "format": "ndjson"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "'resolution' can only be used with the 'json' format"}
+
+    test_client.app.state.limiter.reset()
+    response = test_client.get("/measurements/history/", params={**params, "downsample": "average"})
+    assert response.status_code == 400
+
+
+def test_read_historic_data_wrong_format(test_client):
+    end = datetime.now(timezone.utc)
+    test_client.app.state.limiter.reset()
+
+    response = test_client.get("/measurements/history/", params={
+        "server": "pool.ntp.org",
+        "start": (end - timedelta(minutes=10)).isoformat(),
+        "end": end.isoformat(),
+        "format": "xml"
+    })
+    assert response.status_code == 400
+    assert response.json() == {"detail": "'format' must be one of ['json', 'json-stream', 'ndjson']"}
+
+
+@patch("server.app.api.routing.get_session_maker")
+@patch("server.app.services.api_services.stream_measurement_columns")
+@patch("server.app.services.api_services.is_ip_address")
+@patch("server.app.services.api_services.human_date_to_ntp_precise_time")
+def test_read_historic_data_ndjson(mock_human_date_to_ntp, mock_is_ip, mock_stream_ip, mock_session_maker,
+                                   test_client):
+    end = datetime.now(timezone.utc)
+    mock_is_ip.return_value = IPv4Address("192.168.1.1")
+    mock_human_date_to_ntp.return_value = PreciseTime(1000, 500)
+    mock_stream_ip.return_value = iter([get_mock_rows()[:1], get_mock_rows()[1:]])
+    test_client.app.state.limiter.reset()
+
+    response = test_client.get("/measurements/history/", params={
+        "server": "192.168.1.1",
+        "start": (end - timedelta(minutes=10)).isoformat(),
+        "end": end.isoformat(),
+        "format": "ndjson"
+    })
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert len(lines) == 2
+    assert [json.loads(line)["poll"] for line in lines] == [60, 5]
+    # the stream uses its own session, which is closed at the end
+    mock_session_maker.return_value.return_value.close.assert_called_once()
+
+
+@patch("server.app.api.routing.get_session_maker")
+@patch("server.app.services.api_services.stream_measurement_columns")
+@patch("server.app.services.api_services.is_ip_address")
+@patch("server.app.services.api_services.human_date_to_ntp_precise_time")
+def test_read_historic_data_json_stream(mock_human_date_to_ntp, mock_is_ip, mock_stream_dn, mock_session_maker,
+                                        test_client):
+    end = datetime.now(timezone.utc)
+    mock_is_ip.return_value = None
+    mock_human_date_to_ntp.return_value = PreciseTime(1000, 500)
+    mock_stream_dn.side_effect = [iter([get_mock_rows()]), iter([])]
+    test_client.app.state.limiter.reset()
+    params = {
+        "server": "pool.ntp.org",
+        "start": (end - timedelta(minutes=10)).isoformat(),
+        "end": end.isoformat(),
+        "format": "json-stream"
+    }
+
+    response = test_client.get("/measurements/history/", params=params)
+    assert response.status_code == 200
+    data = response.json()["measurements"]
+    assert [m["ntp_server_name"] for m in data] == ["pool.ntp.org", "pool.ntp.org"]
+    assert data[1]["poll"] == 5
+
+    test_client.app.state.limiter.reset()
+    response = test_client.get("/measurements/history/", params=params)
+    assert response.status_code == 200
+    assert response.json() == {"measurements": []}
+
+
+@patch("server.app.api.routing.get_session_maker")
+@patch("server.app.services.api_services.stream_measurement_columns")
+@patch("server.app.services.api_services.is_ip_address")
+@patch("server.app.services.api_services.human_date_to_ntp_precise_time")
+def test_read_historic_data_stream_error(mock_human_date_to_ntp, mock_is_ip, mock_stream_dn, mock_session_maker,
+                                         test_client):
+    def failing_stream(*args):
+        raise MeasurementQueryError("Database connection failed")
+        yield
+
+    end = datetime.now(timezone.utc)
+    mock_is_ip.return_value = None
+    mock_human_date_to_ntp.return_value = PreciseTime(1000, 500)
+    mock_stream_dn.side_effect = failing_stream
+    test_client.app.state.limiter.reset()
+
+    response = test_client.get("/measurements/history/", params={
+        "server": "pool.ntp.org",
+        "start": (end - timedelta(minutes=10)).isoformat(),
+        "end": end.isoformat(),
+        "format": "ndjson"
+    })
+    assert response.status_code == 500
+    assert "Database connection failed" in response.json()["detail"]
+    mock_session_maker.return_value.return_value.close.assert_called_once()
+
+
+@patch("server.app.api.routing.get_session_maker")
+@patch("server.app.services.export_services.stream_measurement_columns")
+def test_export_historic_data_arrow(mock_stream, mock_session_maker, test_client):
+    end = datetime.now(timezone.utc)
+    mock_stream.return_value = iter([[("192.168.1.1", 3900000000, 2147483648)], [("2001:db8::1", 3900000001, 0)]])
+    test_client.app.state.limiter.reset()
+
+    response = test_client.get("/measurements/history/export/", params={
+        "server": ["192.168.1.1", "pool.ntp.org"],
+        "start": (end - timedelta(minutes=10)).isoformat(),
+        "end": end.isoformat(),
+        "columns": "ntp_server_ip,client_sent"
+    })
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    assert 'filename="measurements.arrow"' in response.headers["content-disposition"]
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column_names == ["ntp_server_ip", "client_sent"]
+    assert table["ntp_server_ip"].to_pylist() == [bytes([192, 168, 1, 1]), ip_address("2001:db8::1").packed]
+    assert table["client_sent"].to_pylist() == [(3900000000 << 32) | 2147483648, 3900000001 << 32]
+    args = mock_stream.call_args[0]
+    assert (args[1], args[2], args[3]) == (["192.168.1.1"], ["pool.ntp.org"],
+                                           ["ntp_server_ip", "client_sent", "client_sent_prec"])
+    mock_session_maker.return_value.return_value.close.assert_called_once()
+
+
+@patch("server.app.api.routing.get_session_maker")
+@patch("server.app.services.export_services.stream_measurement_columns")
+def test_export_historic_data_parquet(mock_stream, mock_session_maker, test_client):
+    end = datetime.now(timezone.utc)
+    mock_stream.return_value = iter([])
+    test_client.app.state.limiter.reset()
+
+    response = test_client.get("/measurements/history/export/", params={
+        "server": "pool.ntp.org",
+        "start": (end - timedelta(minutes=10)).isoformat(),
+        "end": end.isoformat(),
+        "format": "parquet"
+    })
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 0
+    assert table.schema.field("client_sent").type == pa.uint64()
+    assert table.schema.field("vantage_point_ip").type == pa.binary()
+
+
+@pytest.mark.parametrize("params, detail", [
+    ({"format": "csv"}, "'format' must be one of ['arrow', 'parquet']"),
+    ({"columns": "offset,jitter"}, "Unknown columns ['jitter']"),
+    ({"columns": " , "}, "'columns' must name at least one column"),
+])
+def test_export_historic_data_invalid_parameters(params, detail, test_client):
+    end = datetime.now(timezone.utc)
+    test_client.app.state.limiter.reset()
+    response = test_client.get("/measurements/history/export/", params={
+        "server": "pool.ntp.org",
+        "start": (end - timedelta(minutes=10)).isoformat(),
+        "end": end.isoformat(),
+        **params
+    })
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(detail)
+
+
+@patch("server.app.api.routing.get_session_maker")
+@patch("server.app.services.export_services.stream_measurement_columns")
+def test_export_historic_data_error(mock_stream, mock_session_maker, test_client):
+    def failing_stream(*args):
+        raise MeasurementQueryError("Database connection failed")
+        yield
+
+    end = datetime.now(timezone.utc)
+    mock_stream.side_effect = failing_stream
+    test_client.app.state.limiter.reset()
+
+    response = test_client.get("/measurements/history/export/", params={
+        "server": "pool.ntp.org",
+        "start": (end - timedelta(minutes=10)).isoformat(),
+        "end": end.isoformat()
+    })
+    assert response.status_code == 500
+    assert "Database connection failed" in response.json()["detail"]
+    mock_session_maker.return_value.return_value.close.assert_called_once()
+
+
 @patch("server.app.api.routing.get_server_ip")
-@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list")
-@patch("server.app.services.api_services.insert_measurement")
+@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list_async")
+@patch("server.app.services.api_services.store_measurements")
 @patch("server.app.services.api_services.is_ip_address")
 def test_perform_measurement_with_rate_limiting(mock_is_ip, mock_insert, mock_perform_measurement,
                                                 mock_get_server_ip, test_client):
@@ -439,7 +727,7 @@ def test_perform_measurement_with_rate_limiting(mock_is_ip, mock_insert, mock_pe
         assert "measurement" in response.json()
         assert response.json()["measurement"][0]["ntp_server_name"] == "pool.ntp.org"
         assert response.json()["measurement"][0]["jitter"] == 0.0
-        mock_perform_measurement.assert_called_with("pool.ntp.org", "83.25.24.10", 4)
+        mock_perform_measurement.assert_called_with("pool.ntp.org", "83.25.24.10", 4, samples=1)
 
     assert mock_perform_measurement.call_count == n
     calls_before_6th = mock_perform_measurement.call_count
@@ -451,19 +739,15 @@ def test_perform_measurement_with_rate_limiting(mock_is_ip, mock_insert, mock_pe
     assert mock_perform_measurement.call_count == calls_before_6th
 
 
-@patch("server.app.services.api_services.get_measurements_timestamps_dn")
-@patch("server.app.services.api_services.get_measurements_timestamps_ip")
+@patch("server.app.services.api_services.get_measurement_columns_page")
 @patch("server.app.services.api_services.is_ip_address")
 @patch("server.app.services.api_services.human_date_to_ntp_precise_time")
-def test_historic_data_ip_rate_limiting(mock_human_date_to_ntp, mock_is_ip, mock_get_ip, mock_get_dn, test_client):
+def test_historic_data_ip_rate_limiting(mock_human_date_to_ntp, mock_is_ip, mock_get_ip, test_client):
     end = datetime.now(timezone.utc)
 
     mock_is_ip.return_value = IPv4Address("192.168.0.1")
     mock_human_date_to_ntp.return_value = PreciseTime(1000, 500)
-    mock_data = get_mock_data()
-
-    mock_get_ip.return_value = mock_data  # Mock for IP address fetch
-    mock_get_dn.return_value = mock_data  # Mock for Domain Name fetch
+    mock_get_ip.return_value = (get_mock_rows(), None)
     n = int(get_rate_limit_per_client_ip().split("/")[0])
     test_client.app.state.limiter.reset() # reset the rate limit
     for _ in range(n):
@@ -498,21 +782,17 @@ def test_historic_data_ip_rate_limiting(mock_human_date_to_ntp, mock_is_ip, mock
     assert ("error" in response.json())
 
     assert mock_get_ip.call_count == calls_before_last_one
-    mock_get_dn.assert_not_called()
+    assert mock_get_ip.call_args.args[1:3] == (["192.168.1.1"], [])
 
 
-@patch("server.app.services.api_services.get_measurements_timestamps_dn")
-@patch("server.app.services.api_services.get_measurements_timestamps_ip")
+@patch("server.app.services.api_services.get_measurement_columns_page")
 @patch("server.app.services.api_services.is_ip_address")
 @patch("server.app.services.api_services.human_date_to_ntp_precise_time")
-def test_historic_data_dn_rate_limiting(mock_human_date_to_ntp, mock_is_ip, mock_get_ip, mock_get_dn, test_client):
+def test_historic_data_dn_rate_limiting(mock_human_date_to_ntp, mock_is_ip, mock_get_dn, test_client):
     end = datetime.now(timezone.utc)
     mock_is_ip.return_value = None
     mock_human_date_to_ntp.return_value = PreciseTime(1000, 500)
-    mock_data = get_mock_data()
-
-    mock_get_ip.return_value = mock_data  # Mock for IP address fetch
-    mock_get_dn.return_value = mock_data  # Mock for Domain Name fetch
+    mock_get_dn.return_value = (get_mock_rows(), None)
 
     n = int(get_rate_limit_per_client_ip().split("/")[0])
     test_client.app.state.limiter.reset() # reset the rate limit
@@ -542,7 +822,7 @@ def test_historic_data_dn_rate_limiting(mock_human_date_to_ntp, mock_is_ip, mock
     assert ("error" in response.json())
 
     assert mock_get_dn.call_count == calls_before_last_one
-    mock_get_ip.assert_not_called()
+    assert mock_get_dn.call_args.args[1:3] == ([], ["pool.ntp.org"])
 
 
 def test_trigger_ripe_measurement_server_not_present(test_client):
@@ -629,3 +909,22 @@ def test_get_ripe_measurement_result_error(mock_fetch_ripe_data, test_client):
     assert response.status_code == 405
     assert response.json()[
                "detail"] == "RIPE call failed: RIPE API error: Bad Request - There was a problem with your request. Try again later!"
+
+
+@patch("server.app.api.routing.get_monitoring_stats_endpoint")
+def test_read_server_stats(mock_stats_endpoint, test_client):
+    mock_stats_endpoint.return_value = False
+    test_client.app.state.limiter.reset()
+    assert test_client.get("/stats/").status_code == 404
+
+    mock_stats_endpoint.return_value = True
+    test_client.app.state.limiter.reset()
+    with patch("server.app.services.api_services.get_measurement_writer_stats", return_value={"queue_size": 3}), \
+            patch("server.app.services.api_services.get_ripe_http_latency_histograms",
+                  return_value={"probes": {"count": 1}}):
+        response = test_client.get("/stats/")
+    assert response.status_code == 200
+    assert set(response.json()) == {"geo_cache", "probe_cache", "measurement_writer", "ripe_http"}
+    assert response.json()["geo_cache"]["max_size"] >= 0
+    assert response.json()["measurement_writer"] == {"queue_size": 3}
+    assert response.json()["ripe_http"] == {"probes": {"count": 1}}
@@ -8,9 +8,19 @@ from server.app.dtos.ProbeData import ProbeData
 from ipaddress import ip_address, IPv4Address, IPv6Address
 
 from server.app.services.api_services import *
+from server.app.db.db_interaction import measurement_to_row, row_to_measurement
+from server.app.db.measurement_writer import start_measurement_writer, stop_measurement_writer
+from server.app.services.NtpCalculator import NtpCalculator
+from server.tests.unit_tests.test_db_interaction import make_measurement, sqlite_session
+from server.app.models.Measurement import Measurement
+from server.app.utils.enrichment_context import EnrichmentContext
 from unittest.mock import patch, MagicMock
 from server.app.dtos.NtpMeasurement import NtpMeasurement
+from server.app.dtos.NtpSamples import NtpSamples
+from dataclasses import replace
 from datetime import datetime
+import asyncio
+import json
 import pytest
 
 
@@ -71,79 +81,107 @@ def test_get_format():
 
 
 @patch("server.app.services.api_services.calculate_jitter_from_measurements")
-@patch("server.app.services.api_services.insert_measurement")
-@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list")
-@patch("server.app.services.api_services.perform_ntp_measurement_ip")
+@patch("server.app.services.api_services.store_measurements")
+@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list_async")
+@patch("server.app.services.api_services.perform_ntp_measurement_ip_async")
 def test_measure_with_ip(mock_measure_ip, mock_measure_domain, mock_insert, mock_jitter):
     fake_measurement = MagicMock(spec=NtpMeasurement)
+    fake_measurement.samples = None
     mock_measure_ip.return_value = fake_measurement
     fake_session = MagicMock(spec=Session)
     mock_jitter.return_value = (0.5, 1)
-    result = measure("192.168.1.1", 4, fake_session)
+    result = asyncio.run(measure("192.168.1.1", 4, fake_session))
 
     assert result == [(fake_measurement, 0.5, 1)]
-    mock_measure_ip.assert_called_once_with("192.168.1.1")
-    mock_insert.assert_called_once_with(fake_measurement, mock_insert.call_args[0][1])  # pool
+    mock_measure_ip.assert_called_once_with("192.168.1.1", samples=1)
+    mock_insert.assert_called_once_with([fake_measurement], mock_insert.call_args[0][1])  # pool
     mock_measure_domain.assert_not_called()
 
 
 @patch("server.app.services.api_services.calculate_jitter_from_measurements")
-@patch("server.app.services.api_services.insert_measurement")
-@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list")
-@patch("server.app.services.api_services.perform_ntp_measurement_ip")
+@patch("server.app.services.api_services.store_measurements")
+@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list_async")
+@patch("server.app.services.api_services.perform_ntp_measurement_ip_async")
 def test_measure_with_domain(mock_measure_ip, mock_measure_domain, mock_insert, mock_jitter):
     fake_measurement = MagicMock(spec=NtpMeasurement)
+    fake_measurement.samples = None
     fake_measurement.server_info = MagicMock()
     fake_measurement.server_info.ntp_server_ref_parent_ip = ip_address("1.2.3.4")
     mock_measure_domain.return_value = [fake_measurement]
     mock_measure_ip.return_value = None
     mock_jitter.return_value = (0, 1)
     fake_session = MagicMock(spec=Session)
-    result = measure("pool.ntp.org", 4, fake_session)
+    result = asyncio.run(measure("pool.ntp.org", 4, fake_session))
 
     assert result == [(fake_measurement, 0, 1)]
-    mock_measure_domain.assert_called_once_with("pool.ntp.org", None, 4)
-    mock_insert.assert_called_once_with(fake_measurement, mock_insert.call_args[0][1])  # pool
+    mock_measure_domain.assert_called_once_with("pool.ntp.org", None, 4, samples=1)
+    mock_insert.assert_called_once_with([fake_measurement], mock_insert.call_args[0][1])  # pool
     mock_measure_ip.assert_not_called()
 
 
-@patch("server.app.services.api_services.insert_measurement")
-@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list")
-@patch("server.app.services.api_services.perform_ntp_measurement_ip")
+@patch("server.app.services.api_services.calculate_jitter_from_measurements")
+@patch("server.app.services.api_services.store_measurements")
+@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list_async")
+def test_measure_with_domain_stores_all_ips_at_once(mock_measure_domain, mock_insert, mock_jitter):
+    measurements = []
+    for ref_parent in ["1.2.3.4", "0.0.0.0", "5.6.7.8"]:
+        fake_measurement = MagicMock(spec=NtpMeasurement)
+        fake_measurement.samples = None
+        fake_measurement.server_info = MagicMock()
+        fake_measurement.server_info.ntp_server_ref_parent_ip = ip_address(ref_parent)
+        measurements.append(fake_measurement)
+    mock_measure_domain.return_value = measurements
+    mock_jitter.side_effect = [(0.1, 3), (0.2, 5)]
+    fake_session = MagicMock(spec=Session)
+    result = asyncio.run(measure("pool.ntp.org", 4, fake_session))
+
+    # the server that did not respond is not stored, and the order of the results is kept
+    assert result == [(measurements[0], 0.1, 3), (measurements[1], 0.0, 1), (measurements[2], 0.2, 5)]
+    mock_insert.assert_called_once_with([measurements[0], measurements[2]], fake_session)
+    assert mock_jitter.call_count == 2
+
+
+@patch("server.app.services.api_services.store_measurements")
+@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list_async")
+@patch("server.app.services.api_services.perform_ntp_measurement_ip_async")
 def test_measure_with_invalid_ip(mock_measure_ip, mock_measure_domain, mock_insert):
     fake_measurement = MagicMock(spec=NtpMeasurement)
+    fake_measurement.samples = None
+    # the fields of the slotted DTO are class attributes, so the spec no longer hides them
+    del fake_measurement.server_info
     mock_measure_ip.return_value = None
     mock_measure_domain.return_value = [fake_measurement]
     fake_session = MagicMock(spec=Session)
-    result = measure("not.an.ip", 4, fake_session)
+    result = asyncio.run(measure("not.an.ip", 4, fake_session))
 
     assert result is None
     mock_measure_ip.assert_not_called()
-    mock_measure_domain.assert_called_once_with("not.an.ip", None, 4)
+    mock_measure_domain.assert_called_once_with("not.an.ip", None, 4, samples=1)
     mock_insert.assert_not_called()
 
 
-@patch("server.app.services.api_services.insert_measurement")
-@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list")
-@patch("server.app.services.api_services.perform_ntp_measurement_ip")
+@patch("server.app.services.api_services.store_measurements")
+@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list_async")
+@patch("server.app.services.api_services.perform_ntp_measurement_ip_async")
 def test_measure_with_unresolvable_input(mock_measure_ip, mock_measure_domain, mock_insert):
     mock_measure_ip.return_value = None
     mock_measure_domain.return_value = None
     fake_session = MagicMock(spec=Session)
-    result = measure("not.an.ip", 4, fake_session)
+    result = asyncio.run(measure("not.an.ip", 4, fake_session))
 
     assert result is None
     mock_measure_ip.assert_not_called()
-    mock_measure_domain.assert_called_once_with("not.an.ip", None, 4)
+    mock_measure_domain.assert_called_once_with("not.an.ip", None, 4, samples=1)
     mock_insert.assert_not_called()
 
 
-@patch("server.app.services.api_services.insert_measurement")
-@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list")
-@patch("server.app.services.api_services.perform_ntp_measurement_ip")
+@patch("server.app.services.api_services.store_measurements")
+@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list_async")
+@patch("server.app.services.api_services.perform_ntp_measurement_ip_async")
 @patch("server.app.services.api_services.calculate_jitter_from_measurements")
 def test_measure_with_jitter(mock_jitter, mock_measure_ip, mock_measure_domain, mock_insert):
     fake_measurement = MagicMock(spec=NtpMeasurement)
+    fake_measurement.samples = None
     fake_measurement.timestamps = NtpTimestamps(
         PreciseTime(0, 0),
         PreciseTime(0, 0),
@@ -157,86 +195,205 @@ def test_measure_with_jitter(mock_jitter, mock_measure_ip, mock_measure_domain,
     mock_measure_ip.return_value = fake_measurement
     mock_jitter.return_value = 0.75, 4
     fake_session = MagicMock(spec=Session)
-    result = measure("192.168.1.1", 4, session=fake_session, measurement_no=7)
+    result = asyncio.run(measure("192.168.1.1", 4, session=fake_session, measurement_no=7))
 
     assert result == [(fake_measurement, 0.75, 4)]
-    mock_measure_ip.assert_called_once_with("192.168.1.1")
-    mock_insert.assert_called_once_with(fake_measurement, mock_insert.call_args[0][1])  # pool
+    mock_measure_ip.assert_called_once_with("192.168.1.1", samples=1)
+    mock_insert.assert_called_once_with([fake_measurement], mock_insert.call_args[0][1])  # pool
     mock_jitter.assert_called_once_with(fake_session, fake_measurement, 7)
     mock_measure_domain.assert_not_called()
 
 
-@patch("server.app.services.api_services.insert_measurement")
-@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list")
-@patch("server.app.services.api_services.perform_ntp_measurement_ip")
+@patch("server.app.services.api_services.store_measurements")
+@patch("server.app.services.api_services.perform_ntp_measurement_domain_name_list_async")
+@patch("server.app.services.api_services.perform_ntp_measurement_ip_async")
 def test_measure_with_exception(mock_measure_ip, mock_measure_domain, mock_insert):
     mock_measure_ip.return_value = None
     mock_measure_domain.side_effect = DNSError("DNS failure")
     fake_session = MagicMock(spec=Session)
 
     with pytest.raises(DNSError):
-        measure("invalid.server", 4, fake_session)
+        asyncio.run(measure("invalid.server", 4, fake_session))
     mock_measure_ip.assert_not_called()
-    mock_measure_domain.assert_called_once_with("invalid.server", None, 4)
+    mock_measure_domain.assert_called_once_with("invalid.server", None, 4, samples=1)
     mock_insert.assert_not_called()
 
 
-@patch("server.app.services.api_services.get_measurements_timestamps_ip")
-@patch("server.app.services.api_services.parse_ip")
-def test_fetch_historic_data_empty_result(mock_parse_ip, mock_get_ip):
-    mock_parse_ip.return_value = "10.0.0.5"
-    mock_get_ip.return_value = []
+@patch("server.app.services.api_services.calculate_jitter_from_measurements")
+@patch("server.app.services.api_services.store_measurements")
+@patch("server.app.services.api_services.perform_ntp_measurement_ip_async")
+def test_measure_burst_uses_its_own_jitter(mock_measure_ip, mock_insert, mock_jitter):
+    fake_measurement = MagicMock(spec=NtpMeasurement)
+    fake_measurement.samples = NtpSamples(offsets=[0.1, 0.2, 0.3], rtts=[0.02, 0.01, 0.03], best_sample=1, jitter=0.07)
+    mock_measure_ip.return_value = fake_measurement
     fake_session = MagicMock(spec=Session)
-    start = datetime(2024, 1, 1)
-    end = datetime(2024, 1, 2)
 
-    results = fetch_historic_data_with_timestamps("10.0.0.5", start, end, fake_session)
-    assert results == []
+    result = asyncio.run(measure("192.168.1.1", 4, fake_session, samples=3))
+
+    assert result == [(fake_measurement, 0.07, 2)]
+    mock_measure_ip.assert_called_once_with("192.168.1.1", samples=3)
+    mock_insert.assert_called_once_with([fake_measurement], fake_session)
+    mock_jitter.assert_not_called()
+
+
+def test_get_format_with_samples():
+    measurement = NtpMeasurement(MOCK_NTP_MEASUREMENT.vantage_point_ip, MOCK_NTP_MEASUREMENT.server_info,
+                                 MOCK_NTP_MEASUREMENT.timestamps, MOCK_NTP_MEASUREMENT.main_details,
+                                 MOCK_NTP_MEASUREMENT.extra_details,
+                                 NtpSamples(offsets=[0.1, 0.2], rtts=[0.02, 0.01], best_sample=1, jitter=0.1))
+    with patch("server.app.services.api_services.is_this_ip_anycast", return_value=False), \
+            patch("server.app.services.api_services.lookup_ip"):
+        formatted = get_format(measurement, 0.1, 1)
+        assert formatted["samples"] == {"offsets": [0.1, 0.2], "rtts": [0.02, 0.01], "best_sample": 1, "jitter": 0.1}
+        assert get_format(MOCK_NTP_MEASUREMENT, 0.1, 1)["samples"] is None
+
+
+@patch("server.app.services.api_services.get_history_max_page_size")
+def test_get_history_page_parameters(mock_max_page_size):
+    mock_max_page_size.return_value = 100
+    assert get_history_page_parameters(1, None) == (1, None)
+    # the limit is capped, and the cursor is decoded into the key of the last measurement
+    assert get_history_page_parameters(5000, "3912345678-42") == (100, (3912345678, 42))
+    assert get_history_page_parameters(None, None) == (100, None)
+
+    with pytest.raises(InputError):
+        get_history_page_parameters(0, None)
+    with pytest.raises(InputError):
+        get_history_page_parameters(10, "abc-12")
+
+
+@patch("server.app.utils.enrichment_context.is_this_ip_anycast")
+@patch("server.app.utils.enrichment_context.lookup_ip")
+def test_format_history_rows_matches_get_format(mock_lookup_ip, mock_anycast):
+    mock_lookup_ip.return_value = MagicMock(country_code="RO", coordinates=(25.0, -71.0), asn="AS1104")
+    mock_anycast.return_value = True
+    row = {**measurement_to_row(MOCK_NTP_MEASUREMENT), "id": 7, "root_delay_prec": 2 ** 31}
+    rows = [tuple(row[c] for c in HISTORY_COLUMNS)] * 3
+
+    context = EnrichmentContext()
+    expected = get_format(row_to_measurement(Measurement(**row), context), nr_jitter_measurements=0, context=context)
+    mock_lookup_ip.reset_mock()
+    mock_anycast.reset_mock()
+    context = EnrichmentContext()
+    formatted = format_history_rows(rows, context)
+    assert formatted == [expected] * 3
+    assert list(formatted[0]) == list(expected)  # the same key layout
+    assert formatted[0]["root_delay"] == 5.5
+    # the server was looked up once, not once per row
+    mock_anycast.assert_called_once_with("192.168.0.1")
+    mock_lookup_ip.assert_called_once_with("192.168.0.1")
+    assert (context.hits, context.misses) == (2, 3)
+
+
+@patch("server.app.services.api_services.is_this_ip_anycast")
+@patch("server.app.services.api_services.lookup_ip")
+@patch("server.app.utils.enrichment_context.is_this_ip_anycast")
+@patch("server.app.utils.enrichment_context.lookup_ip")
+def test_get_format_with_context(mock_lookup_ip, mock_anycast, mock_global_lookup_ip, mock_global_anycast):
+    mock_lookup_ip.return_value = MagicMock(asn="AS1104")
+    mock_anycast.return_value = False
+    context = EnrichmentContext()
+
+    results = [get_format(MOCK_NTP_MEASUREMENT, context=context) for _ in range(5)]
+    assert all(r["asn_ntp_server"] == "AS1104" for r in results)
+    mock_lookup_ip.assert_called_once_with("192.168.0.1")
+    mock_anycast.assert_called_once_with("192.168.0.1")
+    assert (context.hits, context.misses) == (8, 2)
+    # without a context, every measurement is looked up
+    mock_global_lookup_ip.return_value = MagicMock(asn="AS1104")
+    get_format(MOCK_NTP_MEASUREMENT)
+    get_format(MOCK_NTP_MEASUREMENT)
+    assert mock_global_lookup_ip.call_count == 2
+
+
+@patch("server.app.services.api_services.get_measurement_columns_page")
+def test_fetch_historic_data_json(mock_get_page):
+    row = {**measurement_to_row(MOCK_NTP_MEASUREMENT), "id": 7}
+    mock_get_page.return_value = ([tuple(row[c] for c in HISTORY_COLUMNS)], (1, 7))
+    fake_session = MagicMock(spec=Session)
 
+    content = json.loads(fetch_historic_data_json("192.168.0.1", datetime(2024, 1, 1), datetime(2024, 1, 2),
+                                                  fake_session, 1))
+    assert content["next_cursor"] == "1-7"
+    assert content["measurements"][0]["ntp_server_ip"] == "192.168.0.1"
+    assert mock_get_page.call_args.args[1:4] == (["192.168.0.1"], [], HISTORY_COLUMNS)
+
+    mock_get_page.return_value = ([], None)
+    content = json.loads(fetch_historic_data_json("time.google.com", datetime(2024, 1, 1), datetime(2024, 1, 2),
+                                                  fake_session))
+    assert content == {"measurements": [], "next_cursor": None}
+    assert mock_get_page.call_args.args[1:3] == ([], ["time.google.com"])
+
+def test_history_cursor():
+    assert decode_history_cursor(encode_history_cursor((3912345678, 7))) == (3912345678, 7)
+    for cursor in ["", "1", "1-2-3", "-1-2", "1.5-2"]:
+        with pytest.raises(InputError):
+            decode_history_cursor(cursor)
+
+
+@patch("server.app.services.api_services.get_measurement_buckets_dn")
+@patch("server.app.services.api_services.human_date_to_ntp_precise_time")
+def test_fetch_downsampled_history_buckets(mock_human_date_to_ntp, mock_buckets):
+    mock_human_date_to_ntp.side_effect = [PreciseTime(1000, 0), PreciseTime(4599, 0)]
+    mock_buckets.return_value = [{"bucket_start": 1000, "count": 3, "offset_min": -0.1, "offset_max": 0.3,
+                                  "offset_mean": 0.1, "offset_p50": 0.1, "offset_p95": 0.28, "rtt_min": 0.01,
+                                  "rtt_max": 0.03, "rtt_mean": 0.02, "rtt_p50": 0.02, "rtt_p95": 0.029,
+                                  "stratum_min": 1, "stratum_max": 2, "failures": 0}]
+    fake_session = MagicMock(spec=Session)
 
-@patch("server.app.services.api_services.get_measurements_timestamps_ip")
-@patch("server.app.services.api_services.get_measurements_timestamps_dn")
-@patch("server.app.services.api_services.parse_ip")
-def test_fetch_historic_data_ip(mock_parse_ip, mock_get_dn, mock_get_ip):
-    mock_parse_ip.return_value = "192.168.1.1"
-    mock_get_ip.return_value = [
-        MOCK_NTP_MEASUREMENT
-    ]
-    mock_get_dn.return_value = []
+    result = fetch_downsampled_history("time.google.com", datetime(2024, 1, 1), datetime(2024, 1, 2), fake_session,
+                                       60, "bucket", "offset")
+
+    # 3600 seconds in 60 buckets
+    assert result["bucket_s"] == 60
+    assert mock_buckets.call_args.args[4] == 60
+    assert result["buckets"] == [{
+        "bucket_start": {"seconds": 1000, "fraction": 0},
+        "count": 3,
+        "offset": {"min": -0.1, "max": 0.3, "mean": 0.1, "p50": 0.1, "p95": 0.28},
+        "rtt": {"min": 0.01, "max": 0.03, "mean": 0.02, "p50": 0.02, "p95": 0.029},
+        "stratum": {"min": 1, "max": 2},
+        "failures": 0
+    }]
+
+
+@patch("server.app.services.api_services.get_measurements_by_ids")
+@patch("server.app.services.api_services.get_measurement_points_ip")
+@patch("server.app.services.api_services.human_date_to_ntp_precise_time")
+def test_fetch_downsampled_history_lttb(mock_human_date_to_ntp, mock_points, mock_by_ids):
+    mock_human_date_to_ntp.return_value = PreciseTime(1000, 0)
+    # the RTT of the 3rd point is missing, and the 5th point is a spike of the RTT
+    mock_points.return_value = [(i, 1000 + i, 0, 0.1, None if i == 3 else (5.0 if i == 5 else 0.02))
+                                for i in range(1, 11)]
+    mock_by_ids.return_value = [MOCK_NTP_MEASUREMENT]
     fake_session = MagicMock(spec=Session)
-    start = datetime(2024, 1, 1)
-    end = datetime(2024, 1, 2)
 
-    results = fetch_historic_data_with_timestamps("192.168.1.1", start, end, fake_session)
+    result = fetch_downsampled_history("192.168.1.1", datetime(2024, 1, 1), datetime(2024, 1, 2), fake_session,
+                                       3, "lttb", "rtt")
+
+    assert mock_by_ids.call_args.args[1] == [1, 5, 10]
+    assert len(result["measurements"]) == 1
+    assert result["measurements"][0]["ntp_server_name"] == MOCK_NTP_MEASUREMENT.server_info.ntp_server_name
 
-    assert isinstance(results, list)
-    assert len(results) == 1
-    print(results[0])
-    assert isinstance(results[0], NtpMeasurement)
-    mock_parse_ip.assert_called_once()
-    mock_get_ip.assert_called_once()
-    mock_get_dn.assert_not_called()
+    mock_points.return_value = []
+    assert fetch_downsampled_history("192.168.1.1", datetime(2024, 1, 1), datetime(2024, 1, 2), fake_session,
+                                     3, "lttb", "offset") == {"measurements": []}
 
 
-@patch("server.app.services.api_services.get_measurements_timestamps_ip")
-@patch("server.app.services.api_services.get_measurements_timestamps_dn")
-def test_fetch_historic_data_domain_name(mock_get_dn, mock_get_ip):
-    mock_get_ip.return_value = []
-    mock_get_dn.return_value = [
-        MOCK_NTP_MEASUREMENT
-    ]
+@patch("server.app.services.api_services.get_history_max_page_size")
+def test_fetch_downsampled_history_invalid(mock_max_page_size):
+    mock_max_page_size.return_value = 100
     fake_session = MagicMock(spec=Session)
     start = datetime(2024, 1, 1)
     end = datetime(2024, 1, 2)
-
-    results = fetch_historic_data_with_timestamps("time.google.com", start, end, fake_session)
-
-    assert isinstance(results, list)
-    assert len(results) == 1
-    print(results[0])
-    assert isinstance(results[0], NtpMeasurement)
-    mock_get_ip.assert_not_called()
-    mock_get_dn.assert_called_once()
+    with pytest.raises(InputError, match="'resolution' must be between 1 and 100"):
+        fetch_downsampled_history("time.google.com", start, end, fake_session, 101, "bucket", "offset")
+    with pytest.raises(InputError, match="'resolution' must be between 1 and 100"):
+        fetch_downsampled_history("time.google.com", start, end, fake_session, 0, "bucket", "offset")
+    with pytest.raises(InputError, match="'downsample' must be 'bucket' or 'lttb'"):
+        fetch_downsampled_history("time.google.com", start, end, fake_session, 10, "average", "offset")
+    with pytest.raises(InputError, match="'metric' must be 'offset' or 'rtt'"):
+        fetch_downsampled_history("time.google.com", start, end, fake_session, 10, "lttb", "jitter")
 
 
 def mock_ripe_parse_result():
@@ -423,3 +580,37 @@ def test_check_ripe_measurement_complete_raises_generic_exception(mock_check_sch
     with pytest.raises(ValueError, match="RIPE API error: The number of scheduled probes is negative"):
         check_ripe_measurement_scheduled("123456")
     mock_check_scheduled.assert_called_once_with(measurement_id="123456")
+
+
+def make_measurement_with_offset(offset_s: int) -> NtpMeasurement:
+    # t2 - t1 = t3 - t4 = offset_s, so the offset of the measurement is offset_s
+    m = make_measurement("192.168.0.1")
+    return replace(m, timestamps=NtpTimestamps(PreciseTime(100, 0), PreciseTime(100 + offset_s, 0),
+                                               PreciseTime(101 + offset_s, 0), PreciseTime(101, 0)))
+
+
+@patch("server.app.db.measurement_writer.get_write_spill_path")
+def test_store_measurement_and_get_jitter_uses_only_previous_measurements(mock_spill_path, sqlite_session, tmp_path):
+    mock_spill_path.return_value = str(tmp_path / "spill.jsonl")
+    start_measurement_writer(MagicMock())
+    try:
+        with patch("server.app.db.measurement_writer.insert_measurements_bulk"):
+            # no history: the measurement is not its own predecessor
+            assert store_measurement_and_get_jitter(make_measurement_with_offset(1), sqlite_session, 5) == (0.0, 0)
+            # the first measurement is still queued, the second one is compared only with it
+            jitter, nr = store_measurement_and_get_jitter(make_measurement_with_offset(3), sqlite_session, 5)
+            assert (jitter, nr) == (NtpCalculator.calculate_jitter([3, 1]), 1)
+    finally:
+        stop_measurement_writer()
+
+
+def test_store_measurements_and_get_jitter_with_stored_history(sqlite_session):
+    for i, offset in enumerate([2, 5, 9]):
+        row = measurement_to_row(make_measurement_with_offset(offset))
+        sqlite_session.add(Measurement(**{**row, "id": i + 1}))
+    sqlite_session.commit()
+
+    with patch("server.app.services.api_services.store_measurements") as mock_store:
+        jitters = store_measurements_and_get_jitter([make_measurement_with_offset(4)], sqlite_session, 5)
+    assert jitters == [(NtpCalculator.calculate_jitter([4, 9, 5, 2]), 3)]
+    mock_store.assert_called_once()
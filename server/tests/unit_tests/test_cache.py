@@ -0,0 +1,39 @@
+from unittest.mock import patch
+
+from server.app.utils.cache import TTLLRUCache
+
+
+def test_ttl_lru_cache_lru():
+    cache: TTLLRUCache[str, int] = TTLLRUCache(max_size=2, ttl_s=100)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" is now the most recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 0, "max_size": 2, "hits": 0, "misses": 1, "evictions": 0}
+
+
+@patch("server.app.utils.cache.time.monotonic")
+def test_ttl_lru_cache_ttl(mock_time):
+    cache: TTLLRUCache[str, int] = TTLLRUCache(max_size=10, ttl_s=5)
+    mock_time.return_value = 100.0
+    cache.put("a", 1)
+    mock_time.return_value = 104.0
+    assert cache.get("a") == 1
+    mock_time.return_value = 105.5
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_ttl_lru_cache_disabled_and_no_stats():
+    cache: TTLLRUCache[str, int] = TTLLRUCache(max_size=0, ttl_s=5, track_stats=False)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 0, "max_size": 0, "hits": 0, "misses": 0, "evictions": 0}
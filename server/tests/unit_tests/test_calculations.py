@@ -1,7 +1,9 @@
 import math
 from ipaddress import IPv4Address
+from datetime import datetime, timezone
 from unittest.mock import patch, MagicMock
 
+import numpy as np
 import pytest
 
 from server.app.dtos.PreciseTime import PreciseTime
@@ -9,7 +11,8 @@ from server.app.dtos.NtpTimestamps import NtpTimestamps
 from server.app.dtos.NtpMeasurement import NtpMeasurement
 from server.app.services.NtpCalculator import NtpCalculator
 from server.app.utils.calculations import calculate_jitter_from_measurements, calculate_haversine_distance, \
-    ntp_precise_time_to_human_date
+    ntp_precise_time_to_human_date, lttb_indices, human_date_to_ntp_precise_time, convert_float_to_precise_time, \
+    calculate_haversine_distances, smallest_indices
 from sqlalchemy.orm import Session
 
 
@@ -31,7 +34,12 @@ def make_mock_measurement(seconds_offset: int) -> NtpMeasurement:
     return fake_measurement
 
 
-@patch("server.app.utils.calculations.get_measurements_for_jitter_ip")
+def make_timestamps_row(seconds_offset: int) -> tuple[int, int, int, int, int, int, int, int]:
+    # the same timestamps as make_mock_measurement, as they are returned by the jitter query
+    return 0, 0, seconds_offset // 4, 0, seconds_offset // 2, 0, seconds_offset, 0
+
+
+@patch("server.app.utils.calculations.get_timestamps_for_jitter_ip")
 def test_calculate_jitter_from_measurements(mock_get_measurements):
     fake_initial_measurement = make_mock_measurement(1)
     fake_session = MagicMock(spec=Session)
@@ -42,7 +50,7 @@ def test_calculate_jitter_from_measurements(mock_get_measurements):
         make_mock_measurement(6)
     ]
 
-    mock_get_measurements.return_value = other_measurements
+    mock_get_measurements.return_value = [make_timestamps_row(o) for o in [5, 3, 4, 6]]
 
     times = 6
     res, no_measurement = calculate_jitter_from_measurements(fake_session, fake_initial_measurement, times)
@@ -54,9 +62,31 @@ def test_calculate_jitter_from_measurements(mock_get_measurements):
 
     assert res == expected
     assert no_measurement == 4
+    mock_get_measurements.assert_called_once_with(session=fake_session,
+                                                  ip=fake_initial_measurement.server_info.ntp_server_ip, number=6)
+
+
+@patch("server.app.utils.calculations.get_pending_measurements")
+@patch("server.app.utils.calculations.get_timestamps_for_jitter_ip")
+def test_calculate_jitter_reads_through_the_write_queue(mock_get_measurements, mock_pending):
+    fake_initial_measurement = make_mock_measurement(1)
+    fake_session = MagicMock(spec=Session)
+    pending = [make_mock_measurement(2), make_mock_measurement(3)]
+    stored = [make_mock_measurement(4)]
+    mock_pending.return_value = pending
+    mock_get_measurements.return_value = [make_timestamps_row(4)]
+
+    res, no_measurement = calculate_jitter_from_measurements(fake_session, fake_initial_measurement, 3)
 
+    offsets = [NtpCalculator.calculate_offset(m.timestamps) for m in [fake_initial_measurement] + pending + stored]
+    assert res == NtpCalculator.calculate_jitter(offsets)
+    assert no_measurement == 3
+    # only the measurements that are not queued anymore are read from the database
+    mock_get_measurements.assert_called_once_with(session=fake_session,
+                                                  ip=fake_initial_measurement.server_info.ntp_server_ip, number=1)
 
-@patch("server.app.utils.calculations.get_measurements_for_jitter_ip")
+
+@patch("server.app.utils.calculations.get_timestamps_for_jitter_ip")
 def test_calculate_jitter_with_no_history(mock_get_measurements):
     fake_initial_measurement = make_mock_measurement(2)
     fake_session = MagicMock(spec=Session)
@@ -69,25 +99,20 @@ def test_calculate_jitter_with_no_history(mock_get_measurements):
     assert no_measurement == 0
 
 
-@patch("server.app.utils.calculations.get_measurements_for_jitter_ip")
-def test_calculate_jitter_with_some_none(mock_get_measurements):
+@patch("server.app.utils.calculations.get_timestamps_for_jitter_ip")
+def test_calculate_jitter_with_short_history(mock_get_measurements):
     fake_initial_measurement = make_mock_measurement(1)
     fake_session = MagicMock(spec=Session)
 
-    other_measurements = [
-        make_mock_measurement(3),
-        None,
-        make_mock_measurement(5),
-        None,
-    ]
-    mock_get_measurements.return_value = other_measurements
+    # the server was measured only twice before
+    mock_get_measurements.return_value = [make_timestamps_row(3), make_timestamps_row(5)]
 
     res, no_measurement = calculate_jitter_from_measurements(fake_session, fake_initial_measurement)
 
     valid_offsets = [
         NtpCalculator.calculate_offset(fake_initial_measurement.timestamps),
-        NtpCalculator.calculate_offset(other_measurements[0].timestamps),
-        NtpCalculator.calculate_offset(other_measurements[2].timestamps),
+        NtpCalculator.calculate_offset(make_mock_measurement(3).timestamps),
+        NtpCalculator.calculate_offset(make_mock_measurement(5).timestamps),
     ]
     expected = NtpCalculator.calculate_jitter(valid_offsets)
 
@@ -95,13 +120,12 @@ def test_calculate_jitter_with_some_none(mock_get_measurements):
     assert no_measurement == 2
 
 
-@patch("server.app.utils.calculations.get_measurements_for_jitter_ip")
+@patch("server.app.utils.calculations.get_timestamps_for_jitter_ip")
 def test_calculate_jitter_with_identical_offsets(mock_get_measurements):
     fake_initial_measurement = make_mock_measurement(4)
     fake_session = MagicMock(spec=Session)
 
-    identical_measurements = [make_mock_measurement(4) for _ in range(5)]
-    mock_get_measurements.return_value = identical_measurements
+    mock_get_measurements.return_value = [make_timestamps_row(4) for _ in range(5)]
 
     res, no_measurement = calculate_jitter_from_measurements(fake_session, fake_initial_measurement)
 
@@ -114,6 +138,64 @@ def test_ntp_precise_time_to_human_date():
     t2 = PreciseTime(3955513183, 623996928)
     assert ntp_precise_time_to_human_date(t2) == "2025-05-06 09:39:43.145286 UTC"
 
+def test_exact_time_conversions():
+    dt = datetime(2025, 5, 6, 9, 39, 43, 145286, tzinfo=timezone.utc)
+    t = human_date_to_ntp_precise_time(dt)
+    assert t == PreciseTime(3955513183, (145286 << 32) // 1_000_000)
+    assert ntp_precise_time_to_human_date(t) == "2025-05-06 09:39:43.145286 UTC"
+    with pytest.raises(ValueError):
+        human_date_to_ntp_precise_time(datetime(2025, 5, 6))
+    assert convert_float_to_precise_time(3952032001.25) == PreciseTime(3952032001, 2 ** 30)
+    assert convert_float_to_precise_time(0.000015) == PreciseTime(0, 64424)  # 0.000015 * 2^32 = 64424.5
+    assert convert_float_to_precise_time(-1.0) == PreciseTime(-1, 0)  # the placeholder of a missing time
+
 def test_haversine_distance():
     assert math.isclose(calculate_haversine_distance(2.3, 5.6, -0.9, 12),795.51579092, rel_tol=1e-9)
-    assert math.isclose(calculate_haversine_distance(-82, -0.006, 45, 77),14755.0306084, rel_tol=1e-9)
\ No newline at end of file
+    assert math.isclose(calculate_haversine_distance(-82, -0.006, 45, 77),14755.0306084, rel_tol=1e-9)
+
+
+def test_haversine_distances():
+    lats = np.array([2.3, -82, 52.0, 0.0])
+    lons = np.array([5.6, -0.006, 4.9, 180.0])
+    distances = calculate_haversine_distances(lats, lons, -0.9, 12)
+    for lat, lon, distance in zip(lats, lons, distances):
+        assert math.isclose(distance, calculate_haversine_distance(lat, lon, -0.9, 12), rel_tol=1e-12)
+    assert len(calculate_haversine_distances(np.array([]), np.array([]), 1.0, 1.0)) == 0
+
+
+def test_smallest_indices():
+    values = np.array([5.0, 1.0, 3.0, 1.0, 9.0, 3.0, 3.0])
+    # the same order as a stable sort
+    assert list(smallest_indices(values)) == [1, 3, 2, 5, 6, 0, 4]
+    assert list(smallest_indices(values, 1)) == [1]
+    assert list(smallest_indices(values, 3)) == [1, 3, 2]
+    assert list(smallest_indices(values, 4)) == [1, 3, 2, 5]
+    assert list(smallest_indices(values, 100)) == [1, 3, 2, 5, 6, 0, 4]
+    assert len(smallest_indices(values, 0)) == 0
+
+    rng = np.random.default_rng(3)
+    values = rng.integers(0, 50, 1000).astype(float)
+    for k in (1, 10, 333):
+        assert list(smallest_indices(values, k)) == list(np.argsort(values, kind="stable")[:k])
+
+def test_lttb_indices_keeps_the_spikes():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.sin(x / 50)
+    y[500] = 10.0
+    y[731] = -10.0
+
+    indices = lttb_indices(x, y, 20)
+
+    assert len(indices) == 20
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+    assert 500 in indices and 731 in indices
+
+
+def test_lttb_indices_small_inputs():
+    x = np.arange(5, dtype=np.float64)
+    assert list(lttb_indices(x, x, 10)) == [0, 1, 2, 3, 4]
+    assert list(lttb_indices(x, x, 5)) == [0, 1, 2, 3, 4]
+    assert list(lttb_indices(x, x, 2)) == [0, 4]
+    assert list(lttb_indices(x, x, 1)) == [0]
+    assert len(lttb_indices(np.array([]), np.array([]), 3)) == 0
@@ -6,7 +6,6 @@ from unittest.mock import MagicMock
 from server.app.models.CustomError import InvalidMeasurementDataError
 from server.app.db.db_interaction import row_to_dict, rows_to_dicts, dict_to_measurement, rows_to_measurements
 from server.app.models.Measurement import Measurement
-from server.app.models.Time import Time
 from server.app.dtos.NtpMeasurement import NtpMeasurement
 
 
@@ -32,25 +31,19 @@ def fake_measurement():
     m.ntp_last_sync_time = 1650000000
     m.ntp_last_sync_time_prec = 1
     m.poll = 0
+    m.client_sent = 1650000001
+    m.client_sent_prec = 0
+    m.server_recv = 1650000002
+    m.server_recv_prec = 0
+    m.server_sent = 1650000003
+    m.server_sent_prec = 0
+    m.client_recv = 1650000004
+    m.client_recv_prec = 0
     return m
 
 
-@pytest.fixture
-def fake_time():
-    t = MagicMock(spec=Time)
-    t.client_sent = 1650000001
-    t.client_sent_prec = 0
-    t.server_recv = 1650000002
-    t.server_recv_prec = 0
-    t.server_sent = 1650000003
-    t.server_sent_prec = 0
-    t.client_recv = 1650000004
-    t.client_recv_prec = 0
-    return t
-
-
-def test_row_to_dict(fake_measurement, fake_time):
-    result = row_to_dict(fake_measurement, fake_time)
+def test_row_to_dict(fake_measurement):
+    result = row_to_dict(fake_measurement)
 
     assert result["vantage_point_ip"] == "1.2.3.4"
     assert result["ntp_server_ip"] == ip_address("5.6.7.8")
@@ -59,11 +52,8 @@ def test_row_to_dict(fake_measurement, fake_time):
     assert result["client_recv_prec"] == 0
 
 
-def test_rows_to_dicts(fake_measurement, fake_time):
-    fake_row = MagicMock()
-    fake_row.Measurement = fake_measurement
-    fake_row.Time = fake_time
-    rows = [fake_row, fake_row]
+def test_rows_to_dicts(fake_measurement):
+    rows = [fake_measurement, fake_measurement]
 
     result = rows_to_dicts(rows)
 
@@ -73,8 +63,8 @@ def test_rows_to_dicts(fake_measurement, fake_time):
     assert result[1]["ntp_server_ip"] == ip_address("5.6.7.8")
 
 
-def test_dict_to_measurement(fake_measurement, fake_time):
-    entry = row_to_dict(fake_measurement, fake_time)
+def test_dict_to_measurement(fake_measurement):
+    entry = row_to_dict(fake_measurement)
     ntp_measurement = dict_to_measurement(entry)
 
     assert isinstance(ntp_measurement, NtpMeasurement)
@@ -129,11 +119,8 @@ def test_dict_to_measurement_malformed_values():
     assert "Failed to build NtpMeasurement" in str(exc_info.value)
 
 
-def test_rows_to_measurements(fake_measurement, fake_time):
-    fake_row = MagicMock()
-    fake_row.Measurement = fake_measurement
-    fake_row.Time = fake_time
-    rows = [fake_row, fake_row]
+def test_rows_to_measurements(fake_measurement):
+    rows = [fake_measurement, fake_measurement]
 
     result = rows_to_measurements(rows)
 
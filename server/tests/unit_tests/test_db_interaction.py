@@ -0,0 +1,226 @@
+from ipaddress import ip_address, IPv4Address
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from server.app.db.db_interaction import insert_measurements_bulk, measurement_to_row, get_timestamps_for_jitter_ip, \
+    stream_measurement_columns, get_measurement_buckets_ip, \
+    get_measurement_points_dn, get_measurements_by_ids, row_to_measurement, row_to_dict, dict_to_measurement, \
+    get_measurement_columns_page, insert_measurement_rows_bulk
+from server.app.dtos.NtpExtraDetails import NtpExtraDetails
+from server.app.dtos.NtpMainDetails import NtpMainDetails
+from server.app.dtos.NtpMeasurement import NtpMeasurement
+from server.app.dtos.NtpServerInfo import NtpServerInfo
+from server.app.dtos.NtpTimestamps import NtpTimestamps
+from server.app.dtos.PreciseTime import PreciseTime
+from server.app.dtos.ProbeData import ServerLocation
+from server.app.models.Base import Base
+from server.app.models.CustomError import DatabaseInsertError, MeasurementQueryError, InvalidMeasurementDataError
+from server.app.models.Measurement import Measurement
+from server.app.models.MeasurementRollup import RollupQueue
+
+
+def make_measurement(server_ip: str, name: str = "pool.ntp.org\x00") -> NtpMeasurement:
+    return NtpMeasurement(
+        vantage_point_ip=ip_address("127.0.0.1"),
+        server_info=NtpServerInfo(
+            ntp_version=4,
+            ntp_server_ip=IPv4Address(server_ip),
+            ntp_server_name=name,
+            ntp_server_ref_parent_ip=ip_address("10.0.0.1"),
+            ref_name=None,
+            ntp_server_location=ServerLocation(country_code="NL", coordinates=(52.0, 4.0))
+        ),
+        timestamps=NtpTimestamps(PreciseTime(1, 10), PreciseTime(2, 20), PreciseTime(3, 30), PreciseTime(4, 40)),
+        main_details=NtpMainDetails(offset=0.1, rtt=0.2, stratum=2, precision=-20.0, reachability=""),
+        extra_details=NtpExtraDetails(PreciseTime(5, 50), 6, PreciseTime(7, 70), PreciseTime(8, 80), 0)
+    )
+
+
+def test_measurement_row():
+    m = make_measurement("192.168.0.1")
+    row = measurement_to_row(m)
+
+    assert row["client_sent"] == 1
+    assert row["client_recv_prec"] == 40
+    assert row["ntp_server_ip"] == "192.168.0.1"
+    assert row["ntp_server_name"] == "pool.ntp.org"  # sanitized
+    assert row["ntp_server_ref_parent"] == "10.0.0.1"
+    assert row["root_dispersion_prec"] == 70
+
+
+@patch("server.app.db.db_interaction.lookup_ip")
+def test_row_to_measurement_matches_validated_path(mock_lookup_ip):
+    mock_lookup_ip.return_value = MagicMock(country_code="NL", coordinates=(52.0, 4.0))
+    row = Measurement(**measurement_to_row(make_measurement("192.168.0.1")))
+
+    measurement = row_to_measurement(row)
+    assert measurement == dict_to_measurement(row_to_dict(row))
+    assert measurement.server_info.ntp_server_ip == IPv4Address("192.168.0.1")
+    assert measurement.timestamps.server_recv_time == PreciseTime(2, 20)
+    assert measurement.samples is None
+
+    row.ntp_server_ip = "not an ip"
+    with pytest.raises(InvalidMeasurementDataError):
+        row_to_measurement(row)
+
+
+@patch("server.app.db.db_interaction.create_measurement_partitions")
+def test_insert_measurements_bulk(mock_partitions):
+    session = MagicMock(spec=Session)
+    measurements = [make_measurement("192.168.0.1"), make_measurement("192.168.0.2")]
+
+    insert_measurements_bulk(measurements, session)
+
+    # one statement for all the rows, and one for their entries in the rollup queue
+    mock_partitions.assert_called_once_with(session, [1, 1])
+    assert session.execute.call_count == 2
+    rows = session.execute.call_args_list[0][0][1]
+    assert [r["ntp_server_ip"] for r in rows] == ["192.168.0.1", "192.168.0.2"]
+    session.commit.assert_called_once()
+    session.rollback.assert_not_called()
+
+
+def test_insert_measurements_bulk_queues_the_rollups(sqlite_session):
+    rows = [{**measurement_to_row(make_measurement("192.168.0.1")), "id": 7},
+            {**measurement_to_row(make_measurement("192.168.0.2")), "id": 3}]
+    insert_measurement_rows_bulk(rows, sqlite_session)
+
+    queued = sqlite_session.query(RollupQueue.measurement_id, RollupQueue.client_sent).order_by(RollupQueue.measurement_id)
+    assert [tuple(q) for q in queued] == [(3, 1), (7, 1)]
+
+
+def test_insert_measurements_bulk_empty():
+    session = MagicMock(spec=Session)
+    insert_measurements_bulk([], session)
+    session.execute.assert_not_called()
+    session.commit.assert_not_called()
+
+
+@patch("server.app.db.db_interaction.forget_measurement_partitions")
+@patch("server.app.db.db_interaction.create_measurement_partitions")
+def test_insert_measurements_bulk_rolls_back(mock_partitions, mock_forget):
+    session = MagicMock(spec=Session)
+    session.execute.side_effect = Exception("constraint violation")
+
+    with pytest.raises(DatabaseInsertError):
+        insert_measurements_bulk([make_measurement("192.168.0.1")], session)
+    session.rollback.assert_called_once()
+    session.commit.assert_not_called()
+    # the partitions created in the transaction were rolled back as well
+    mock_forget.assert_called_once()
+
+
+@pytest.fixture
+def sqlite_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_get_timestamps_for_jitter_ip_returns_the_newest(sqlite_session):
+    for i, ip in [(1, "192.168.0.1"), (4, "192.168.0.1"), (2, "192.168.0.2"), (3, "192.168.0.1")]:
+        sqlite_session.add(Measurement(id=i, ntp_server_ip=ip, client_sent=i, client_sent_prec=0, server_recv=i,
+                                       server_recv_prec=0, server_sent=i, server_sent_prec=0, client_recv=i,
+                                       client_recv_prec=i * 10))
+    sqlite_session.commit()
+
+    rows = get_timestamps_for_jitter_ip(sqlite_session, IPv4Address("192.168.0.1"), 2)
+
+    assert rows == [(4, 0, 4, 0, 4, 0, 4, 40), (3, 0, 3, 0, 3, 0, 3, 30)]
+    assert get_timestamps_for_jitter_ip(sqlite_session, IPv4Address("10.0.0.1"), 2) == []
+
+
+def test_get_timestamps_for_jitter_ip_error():
+    session = MagicMock(spec=Session)
+    session.query.side_effect = Exception("connection lost")
+    with pytest.raises(MeasurementQueryError):
+        get_timestamps_for_jitter_ip(session, IPv4Address("192.168.0.1"), 2)
+
+
+def add_history_rows(session: Session) -> None:
+    for i, (client_sent, ip) in enumerate([(30, "192.168.0.1"), (10, "192.168.0.1"), (20, "192.168.0.2"),
+                                           (20, "192.168.0.1"), (90, "192.168.0.1"), (20, "192.168.0.1")]):
+        row = measurement_to_row(make_measurement(ip))
+        session.add(Measurement(**{**row, "id": i + 1, "client_sent": client_sent}))
+    session.commit()
+
+
+def test_get_measurement_columns_page(sqlite_session):
+    add_history_rows(sqlite_session)
+    start = PreciseTime(10, 0)
+    end = PreciseTime(50, 0)
+
+    rows, next_key = get_measurement_columns_page(sqlite_session, ["192.168.0.1"], [], ["id", "client_sent"],
+                                                  start, end, 2)
+    assert [tuple(r) for r in rows] == [(2, 10), (4, 20)]
+    assert next_key == (20, 4)
+    rows, next_key = get_measurement_columns_page(sqlite_session, ["192.168.0.1"], [], ["id", "client_sent"],
+                                                  start, end, 2, next_key)
+    assert [tuple(r) for r in rows] == [(6, 20), (1, 30)]
+    assert next_key is None
+
+    rows, _ = get_measurement_columns_page(sqlite_session, [], ["pool.ntp.org"], ["ntp_server_ip"], start, end, 10)
+    assert len(rows) == 5
+
+
+def test_get_measurement_columns_page_error():
+    session = MagicMock(spec=Session)
+    session.execute.side_effect = Exception("connection lost")
+    with pytest.raises(MeasurementQueryError):
+        get_measurement_columns_page(session, ["192.168.0.1"], [], ["id"], PreciseTime(0, 0), PreciseTime(10, 0), 5)
+
+
+
+def test_stream_measurement_columns(sqlite_session):
+    add_history_rows(sqlite_session)
+
+    batches = list(stream_measurement_columns(sqlite_session, ["192.168.0.1"], [], ["id", "client_sent"],
+                                              PreciseTime(10, 0), PreciseTime(50, 0), batch_size=2))
+
+    assert [[tuple(r) for r in batch] for batch in batches] == [[(2, 10), (4, 20)], [(6, 20), (1, 30)]]
+
+
+def test_stream_measurement_columns_error():
+    session = MagicMock(spec=Session)
+    session.execute.side_effect = Exception("connection lost")
+    stream = stream_measurement_columns(session, ["192.168.0.1"], [], ["id"], PreciseTime(10, 0),
+                                        PreciseTime(50, 0), batch_size=2)
+    with pytest.raises(MeasurementQueryError):
+        next(stream)
+
+
+def test_get_measurement_buckets_ip(sqlite_session):
+    for i, (client_sent, offset) in enumerate([(100, 1.0), (130, 3.0), (159, 2.0), (160, 5.0), (400, -1.0)]):
+        row = measurement_to_row(make_measurement("192.168.0.1"))
+        sqlite_session.add(Measurement(**{**row, "id": i + 1, "client_sent": client_sent, "time_offset": offset}))
+    sqlite_session.commit()
+
+    buckets = get_measurement_buckets_ip(sqlite_session, IPv4Address("192.168.0.1"), PreciseTime(0, 0),
+                                         PreciseTime(1000, 0), 60)
+
+    assert [(b["bucket_start"], b["count"]) for b in buckets] == [(60, 1), (120, 3), (360, 1)]
+    assert (buckets[1]["offset_min"], buckets[1]["offset_max"]) == (2.0, 5.0)
+    assert buckets[1]["offset_mean"] == pytest.approx(10 / 3)
+    assert buckets[1]["rtt_mean"] == pytest.approx(0.2)
+    # the percentiles are only computed by PostgreSQL
+    assert buckets[1]["offset_p95"] is None
+
+
+def test_get_measurement_points_and_measurements_by_ids(sqlite_session):
+    add_history_rows(sqlite_session)
+    start = PreciseTime(10, 0)
+    end = PreciseTime(50, 0)
+
+    points = get_measurement_points_dn(sqlite_session, "pool.ntp.org", start, end)
+    assert [(p[0], p[1]) for p in points] == [(2, 10), (3, 20), (4, 20), (6, 20), (1, 30)]
+    assert points[0][3:] == (0.1, 0.2)
+
+    measurements = get_measurements_by_ids(sqlite_session, [1, 3, 5], start, end)
+    assert [m.timestamps.client_sent_time.seconds for m in measurements] == [20, 30]
+    assert get_measurements_by_ids(sqlite_session, [], start, end) == []
@@ -1,3 +1,5 @@
+from dataclasses import FrozenInstanceError
+
 import pytest
 from psycopg.types.net import IPv4Address
 
@@ -7,6 +9,12 @@ from server.app.dtos.NtpMainDetails import NtpMainDetails
 from server.app.dtos.PreciseTime import PreciseTime
 from server.app.dtos.NtpExtraDetails import NtpExtraDetails
 from server.app.dtos.MeasurementRequest import MeasurementRequest
+from server.app.dtos.NtpSamples import NtpSamples
+from server.app.dtos.NtpFixedTime import FRACTION_MASK, NtpFixedTimeArray, datetime_to_units, seconds_to_units, \
+    units_to_datetime, units_to_precise_time
+from datetime import datetime, timezone
+import numpy as np
+from pydantic import ValidationError
 
 
 def test_measurement_request():
@@ -14,6 +22,12 @@ def test_measurement_request():
         MeasurementRequest(3,True)
     with pytest.raises(TypeError):
         MeasurementRequest("server", 2)
+    assert MeasurementRequest(server="server").samples == 1
+    assert MeasurementRequest(server="server", samples=8).samples == 8
+    with pytest.raises(ValidationError):
+        MeasurementRequest(server="server", samples=0)
+    with pytest.raises(ValidationError):
+        MeasurementRequest(server="server", samples=9)
 
 def test_ntp_extra_details():
     # root_delay
@@ -71,4 +85,72 @@ def test_ntp_server_info():
     with pytest.raises(TypeError):
         NtpServerInfo(3, IPv4Address("123.23.34.5"), ServerLocation("DE", (2, 3)), "yes", IPv4Address("123.33.34.5"), 3)
 
-    NtpServerInfo(3, None, ServerLocation("DE", (2, 3)), "yes", None, "GPS")
\ No newline at end of file
+    NtpServerInfo(3, None, ServerLocation("DE", (2, 3)), "yes", None, "GPS")
+
+def test_ntp_samples():
+    with pytest.raises(TypeError):
+        NtpSamples(offsets="0.1", rtts=[0.1], best_sample=0, jitter=0.0)
+    with pytest.raises(TypeError):
+        NtpSamples(offsets=[0.1], rtts=["0.1"], best_sample=0, jitter=0.0)
+    with pytest.raises(ValueError):
+        NtpSamples(offsets=[0.1, 0.2], rtts=[0.1], best_sample=0, jitter=0.0)
+    with pytest.raises(ValueError):
+        NtpSamples(offsets=[0.1], rtts=[0.1], best_sample=1, jitter=0.0)
+    with pytest.raises(TypeError):
+        NtpSamples(offsets=[0.1], rtts=[0.1], best_sample=0, jitter="0")
+
+    NtpSamples(offsets=[0.1, 0.2], rtts=[0.1, 0.05], best_sample=1, jitter=0.1)
+
+
+def test_slotted_dtos_and_trusted_construction():
+    time = PreciseTime(3, 5)
+    with pytest.raises(FrozenInstanceError):
+        time.seconds = 4
+    assert not hasattr(time, "__dict__")
+    assert PreciseTime.trusted(3, 5) == time
+    assert hash(PreciseTime.trusted(3, 5)) == hash(time)
+
+    details = NtpMainDetails(0.1, 0.2, 2, -20.0, "")
+    assert NtpMainDetails.trusted(0.1, 0.2, 2, -20.0, "") == details
+    assert NtpExtraDetails.trusted(time, 6, time, time, 0) == NtpExtraDetails(time, 6, time, time, 0)
+    assert ServerLocation.trusted("NL", (52.0, 4.0)) == ServerLocation("NL", (52.0, 4.0))
+    # the trusted path does not validate
+    assert NtpMainDetails.trusted("0.1", 0.2, 2, -20.0, "").offset == "0.1"
+
+
+def test_ntp_fixed_time_exact_conversions():
+    dt = datetime(2025, 5, 6, 9, 39, 43, 145286, tzinfo=timezone.utc)
+    assert units_to_precise_time(datetime_to_units(dt)) == PreciseTime(3955513183, (145286 << 32) // 1_000_000)
+    assert units_to_datetime(datetime_to_units(dt)) == dt
+    assert units_to_datetime((3955513183 << 32) + 623996928) == dt
+    with pytest.raises(ValueError):
+        datetime_to_units(datetime(2025, 5, 6))
+    # the decimal digits of the float are kept: 0.5 + 2^-32 is not representable next to 3.9e9 in a float
+    assert seconds_to_units("3952032001.500000000232830643653869628906250") & FRACTION_MASK == 2 ** 31 + 1
+    assert seconds_to_units(3952032001.123456) == seconds_to_units("3952032001.123456")
+
+
+def test_ntp_fixed_time_array():
+    seconds = np.array([3955513183, 3955513184, 3955513190], dtype=np.int64)
+    fractions = np.array([5, 2 ** 32 - 1, 0], dtype=np.uint32)
+    times = NtpFixedTimeArray.from_columns(seconds, fractions)
+
+    assert len(times) == 3
+    assert times[1] == PreciseTime(3955513184, 2 ** 32 - 1)
+    assert list(times[1:]) == [times[1], times[2]]
+    # the columns are views of the fixed-point values
+    assert times.seconds.tolist() == seconds.tolist()
+    assert times.fractions.tolist() == fractions.tolist()
+    assert np.shares_memory(times.seconds, times.values)
+    assert times.differences(NtpFixedTimeArray.from_times([times[0]] * 3)).tolist() == \
+           [0, 2 ** 32 + 2 ** 32 - 1 - 5, 7 * 2 ** 32 - 5]
+    # the first timestamp plus (0 + (2^32 + 2^32 - 6) + (7 * 2^32 - 5)) // 3 = 3 * 2^32 - 4 units
+    assert times.mean() == PreciseTime(3955513186, 1)
+
+
+def test_ntp_fixed_time_array_across_eras():
+    times = NtpFixedTimeArray.from_times([PreciseTime(2 ** 32 - 1, 2 ** 31), PreciseTime(2 ** 32, 0)])
+    assert times[1] == PreciseTime(0, 0)
+    assert times.differences(times[::-1]).tolist() == [-2 ** 31, 2 ** 31]
+    assert times.mean() == PreciseTime(2 ** 32 - 1, 2 ** 31 + 2 ** 30)
+
@@ -0,0 +1,34 @@
+from unittest.mock import patch, MagicMock
+
+from server.app.utils.enrichment_context import EnrichmentContext
+
+
+@patch("server.app.utils.enrichment_context.is_this_ip_anycast")
+@patch("server.app.utils.enrichment_context.lookup_ip")
+def test_enrichment_context_resolves_every_ip_once(mock_lookup_ip, mock_anycast):
+    mock_lookup_ip.side_effect = lambda ip: MagicMock(country_code=ip)
+    mock_anycast.return_value = False
+    context = EnrichmentContext()
+
+    countries = [context.lookup_ip(ip).country_code for ip in ["10.0.0.1", "10.0.0.2", "10.0.0.1", "10.0.0.1"]]
+    assert countries == ["10.0.0.1", "10.0.0.2", "10.0.0.1", "10.0.0.1"]
+    assert mock_lookup_ip.call_count == 2
+    assert context.is_anycast("10.0.0.1") is False
+    assert context.is_anycast("10.0.0.1") is False
+    mock_anycast.assert_called_once_with("10.0.0.1")
+    # None is a key like any other
+    context.lookup_ip(None)
+    context.lookup_ip(None)
+
+    assert (context.hits, context.misses) == (4, 4)
+    assert context.debug_headers() == {"X-Enrichment-Memo-Hits": "4", "X-Enrichment-Memo-Misses": "4"}
+
+
+def test_enrichment_context_kinds_are_separate():
+    context = EnrichmentContext()
+    assert context.resolve("a", 1, lambda key: key + 1) == 2
+    assert context.resolve("b", 1, lambda key: key + 2) == 3
+    assert context.resolve("a", 1, lambda key: 0) == 2
+    assert (context.hits, context.misses) == (1, 2)
+    # a new response starts with an empty memo
+    assert EnrichmentContext().resolve("a", 1, lambda key: 0) == 0
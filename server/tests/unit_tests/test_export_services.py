@@ -0,0 +1,86 @@
+import io
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from server.app.db.db_interaction import measurement_to_row
+from server.app.models.Base import Base
+from server.app.models.CustomError import InputError
+from server.app.models.Measurement import Measurement
+from server.app.services.export_services import parse_export_columns, export_schema, export_source_columns, \
+    stream_history_export, EXPORT_COLUMNS
+from server.app.utils.calculations import human_date_to_ntp_precise_time
+from server.tests.unit_tests.test_db_interaction import make_measurement
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+END = datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    session = factory()
+    client_sent = human_date_to_ntp_precise_time(START).seconds
+    servers = ["192.168.0.1", "2001:db8::1", "10.0.0.1", "192.168.0.1"]
+    for i, ip in enumerate(servers):
+        row = measurement_to_row(make_measurement("192.168.0.1"))
+        session.add(Measurement(**{**row, "id": i + 1, "ntp_server_ip": ip, "client_sent": client_sent + 10 * i,
+                                   "client_sent_prec": i, "ntp_server_name": "time.example.org" if ip == "10.0.0.1" else None}))
+    session.commit()
+    session.close()
+    yield factory
+    engine.dispose()
+
+
+def test_parse_export_columns():
+    assert parse_export_columns(None) == list(EXPORT_COLUMNS)
+    assert parse_export_columns("client_sent, offset,client_sent") == ["client_sent", "offset"]
+    with pytest.raises(InputError, match="Unknown columns"):
+        parse_export_columns("offset,jitter")
+    with pytest.raises(InputError, match="at least one column"):
+        parse_export_columns(",")
+
+
+def test_export_schema_and_sources():
+    schema = export_schema(["ntp_server_ip", "offset", "client_sent"])
+    assert schema.field("ntp_server_ip").metadata == {b"encoding": b"ip"}
+    assert schema.field("offset").metadata is None
+    assert schema.field("client_sent").type == pa.uint64()
+    assert export_source_columns(["offset", "client_sent", "server_recv"]) == \
+           ["time_offset", "client_sent", "client_sent_prec", "server_recv", "server_recv_prec"]
+
+
+@patch("server.app.services.export_services.get_export_batch_size")
+def test_stream_history_export_arrow(mock_batch_size, session_factory):
+    mock_batch_size.return_value = 2
+    chunks = list(stream_history_export(["192.168.0.1", "2001:0db8::0001", "time.example.org"], START, END,
+                                        session_factory, ["id", "ntp_server_ip", "client_sent"], "arrow"))
+
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+    assert table.column_names == ["id", "ntp_server_ip", "client_sent"]
+    assert table["id"].to_pylist() == [1, 2, 3, 4]
+    assert table["ntp_server_ip"].to_pylist()[:2] == [bytes([192, 168, 0, 1]),
+                                                      bytes.fromhex("20010db8000000000000000000000001")]
+    client_sent = human_date_to_ntp_precise_time(START).seconds
+    assert table["client_sent"].to_pylist()[1] == ((client_sent + 10) << 32) | 1
+    # one record batch per batch of rows of the database
+    assert len(table.to_batches()) == 2
+
+
+@patch("server.app.services.export_services.get_export_batch_size")
+def test_stream_history_export_parquet(mock_batch_size, session_factory):
+    mock_batch_size.return_value = 1000
+    data = b"".join(stream_history_export(["10.0.0.1"], START, END, session_factory, list(EXPORT_COLUMNS), "parquet"))
+
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 1
+    assert table["ntp_server_name"].to_pylist() == ["time.example.org"]
+    assert table["offset"].type == pa.float64()
+    assert table.schema == export_schema(list(EXPORT_COLUMNS))
@@ -1,11 +1,16 @@
-from ipaddress import IPv4Address, IPv6Address
-from unittest.mock import patch, MagicMock, mock_open
+import os
+import random
+import time
+from ipaddress import IPv4Address, IPv6Address, IPv4Network, ip_address
+from unittest.mock import patch, MagicMock
 import pytest
 from fastapi import HTTPException, Request
 
+from server.app.dtos.GeoRecord import GeoRecord
 from server.app.utils.load_config_data import get_mask_ipv4, get_mask_ipv6
 from server.app.utils.ip_utils import ref_id_to_ip_or_name, get_ip_family, get_area_of_ip, get_ip_network_details, \
-    ip_to_str, is_this_ip_anycast, randomize_ip, get_server_ip_if_possible, is_private_ip, client_ip_fetch
+    ip_to_str, is_this_ip_anycast, randomize_ip, get_server_ip_if_possible, is_private_ip, client_ip_fetch, \
+    get_anycast_prefixes_path, build_anycast_index, clear_anycast_indexes, preload_anycast_indexes
 
 
 def test_ip_to_str():
@@ -45,28 +50,22 @@ def test_get_area_of_ip():
     assert get_area_of_ip("CN", "AS") == "South-East"
 
 
-@patch("server.app.utils.ip_utils.get_continent_for_ip")
-@patch("server.app.utils.ip_utils.get_country_for_ip")
-@patch("server.app.utils.ip_utils.get_asn_for_ip")
-def test_get_ip_network_details_success(mock_get_asn, mock_get_country, mock_get_continent):
-    mock_get_asn.return_value = "12345"
-    mock_get_country.return_value = "NL"
-    mock_get_continent.return_value = "EU"
+@patch("server.app.utils.ip_utils.lookup_ip")
+def test_get_ip_network_details_success(mock_lookup_ip):
+    mock_lookup_ip.return_value = GeoRecord(country_code="NL", continent_code="EU", coordinates=(52.0, 4.0),
+                                            asn="12345")
 
     asn, country, area = get_ip_network_details("1.1.1.1")
 
     assert asn == "12345"
     assert country == "NL"
     assert area == "North-Central"
+    mock_lookup_ip.assert_called_once_with("1.1.1.1")
 
 
-@patch("server.app.utils.ip_utils.get_continent_for_ip")
-@patch("server.app.utils.ip_utils.get_country_for_ip")
-@patch("server.app.utils.ip_utils.get_asn_for_ip")
-def test_get_ip_network_details_exception(mock_get_asn, mock_get_country, mock_get_continent):
-    mock_get_asn.side_effect = Exception("fail")
-    mock_get_country.side_effect = Exception("fail")
-    mock_get_continent.side_effect = Exception("fail")
+@patch("server.app.utils.ip_utils.lookup_ip")
+def test_get_ip_network_details_exception(mock_lookup_ip):
+    mock_lookup_ip.side_effect = Exception("fail")
 
     asn, country, area = get_ip_network_details("1.1.1.1")
 
@@ -155,59 +154,104 @@ def test_is_this_ip_anycast_input_errors():
     assert is_this_ip_anycast("blabla") is False
 
 
-@patch("server.app.utils.ip_utils.open", new_callable=mock_open, read_data="1.0.0.0/24\ninvalid\n1.3.1.0/16\n")
-@patch("server.app.utils.ip_utils.os.path.join")
-@patch("server.app.utils.ip_utils.os.path.dirname")
-@patch("server.app.utils.ip_utils.os.path.abspath")
-def test_is_this_ip_anycast_ipv4(mock_abspath, mock_dirname, mock_join, mock_openn):
-    mock_dirname.return_value = "/server/app/utils"
-    mock_abspath.return_value = "/server/app/utils/data/prefix"
-    mock_join.return_value = "/server/app/utils/prefix"
-    # true
-    result = is_this_ip_anycast("1.3.0.0")
-    assert result is True
-    mock_join.assert_called_once_with("/server/app/utils", "..", "..", "anycast-v4-prefixes.txt")
-
-    # false
-    mock_join.reset_mock()
-    result = is_this_ip_anycast("1.7.0.0")
-    assert result is False
-    mock_join.assert_called_once_with("/server/app/utils", "..", "..", "anycast-v4-prefixes.txt")
-
-
-@patch("server.app.utils.ip_utils.open", new_callable=mock_open,
-       read_data="2001:4998:170::/48\ninvalid\n2400:44a0:1::/48\n")
-@patch("server.app.utils.ip_utils.os.path.join")
-@patch("server.app.utils.ip_utils.os.path.dirname")
-@patch("server.app.utils.ip_utils.os.path.abspath")
-def test_is_this_ip_anycast_ipv6(mock_abspath, mock_dirname, mock_join, mock_openn):
-    mock_dirname.return_value = "/server/app/utils"
-    mock_abspath.return_value = "/server/app/utils/data/prefix"
-    mock_join.return_value = "/server/app/utils/prefix"
-    # true
-    result = is_this_ip_anycast("2400:44a0:1::")
-    assert result is True
-    mock_join.assert_called_once_with("/server/app/utils", "..", "..", "anycast-v6-prefixes.txt")
-
-    # false
-    mock_join.reset_mock()
-    result = is_this_ip_anycast("3001:4998::")
-    assert result is False
-    mock_join.assert_called_once_with("/server/app/utils", "..", "..", "anycast-v6-prefixes.txt")
-
-
-@patch("server.app.utils.ip_utils.open", new_callable=mock_open,
-       read_data="2001:4998:170::/48\ninvalid\n2400:44a0:1::/48\n")
-@patch("server.app.utils.ip_utils.os.path.join")
-@patch("server.app.utils.ip_utils.os.path.dirname")
-@patch("server.app.utils.ip_utils.os.path.abspath")
-def test_is_this_ip_anycast_exception(mock_abspath, mock_dirname, mock_join, mock_openn):
-    mock_dirname.return_value = "/server/app/utils"
-    mock_abspath.return_value = "/server/app/utils/data/prefix"
-    mock_join.side_effect = Exception("not found")
+@pytest.fixture
+def anycast_files(tmp_path):
+    clear_anycast_indexes()
+    files = {4: tmp_path / "anycast-v4-prefixes.txt", 6: tmp_path / "anycast-v6-prefixes.txt"}
+    files[4].write_text("1.0.0.0/24\ninvalid\n1.3.1.0/16\n")
+    files[6].write_text("2001:4998:170::/48\ninvalid\n2400:44a0:1::/48\n")
+    with patch("server.app.utils.ip_utils.get_anycast_prefixes_path", side_effect=lambda family: str(files[family])):
+        yield files
+    clear_anycast_indexes()
+
+
+def test_get_anycast_prefixes_path():
+    assert get_anycast_prefixes_path(4).endswith(os.path.join("server", "anycast-v4-prefixes.txt"))
+    assert get_anycast_prefixes_path(6).endswith(os.path.join("server", "anycast-v6-prefixes.txt"))
+
+
+def test_build_anycast_index_merges_ranges(tmp_path):
+    db = tmp_path / "prefixes.txt"
+    db.write_text("10.0.1.0/24\n10.0.0.0/16\n10.1.0.0/24\n10.1.1.0/24\n\n10.3.0.0/24\n")
+    starts, ends = build_anycast_index(str(db), 4)
+    assert starts == [int(IPv4Address("10.0.0.0")), int(IPv4Address("10.3.0.0"))]
+    assert ends == [int(IPv4Address("10.1.1.255")), int(IPv4Address("10.3.0.255"))]
+
+
+def test_is_this_ip_anycast_ipv4(anycast_files):
+    assert is_this_ip_anycast("1.3.0.0") is True
+    assert is_this_ip_anycast("1.3.255.255") is True
+    assert is_this_ip_anycast("1.0.0.200") is True
+    assert is_this_ip_anycast("1.7.0.0") is False
+    assert is_this_ip_anycast("0.255.255.255") is False
+
+
+def test_is_this_ip_anycast_ipv6(anycast_files):
+    assert is_this_ip_anycast("2400:44a0:1::") is True
+    assert is_this_ip_anycast("2001:4998:170:ffff::1") is True
+    assert is_this_ip_anycast("3001:4998::") is False
+    assert is_this_ip_anycast("2001:4998:171::") is False
+
+
+@patch("server.app.utils.ip_utils.build_anycast_index")
+def test_anycast_index_is_built_once_and_reloaded_on_change(mock_build, anycast_files):
+    mock_build.return_value = ([10], [20])
+    assert is_this_ip_anycast("0.0.0.15") is True
+    assert is_this_ip_anycast("0.0.0.25") is False
+    assert mock_build.call_count == 1
+
+    # the update script moves a new file over the old one
+    new_db = anycast_files[4].parent / "new.txt"
+    new_db.write_text("0.0.0.0/27\n")
+    os.replace(new_db, anycast_files[4])
+    stat = os.stat(anycast_files[4])
+    os.utime(anycast_files[4], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    mock_build.return_value = ([0], [31])
+    assert is_this_ip_anycast("0.0.0.25") is True
+    assert mock_build.call_count == 2
+
+
+def test_is_this_ip_anycast_exception(anycast_files):
     # error loading database
-    result = is_this_ip_anycast("2400:44a0:1::")
-    assert result is False
+    anycast_files[6].unlink()
+    assert is_this_ip_anycast("2400:44a0:1::") is False
+    preload_anycast_indexes()  # must not raise
+
+
+def linear_scan_is_anycast(file_path, searched_ip):
+    """The previous implementation, used as reference: it parses the whole file on every call."""
+    ip = ip_address(searched_ip)
+    with open(file_path, 'r') as f:
+        for line in f:
+            try:
+                if ip in IPv4Network(line.strip(), strict=False):
+                    return True
+            except Exception:
+                continue
+    return False
+
+
+def test_anycast_index_benchmark_against_linear_scan(anycast_files):
+    rng = random.Random(42)
+    prefixes = {f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.0/{rng.choice([16, 20, 24])}"
+                for _ in range(20000)}
+    anycast_files[4].write_text("\n".join(prefixes) + "\n")
+    ips = [str(IPv4Address(rng.getrandbits(32))) for _ in range(20)]
+    ips += [p.split("/")[0] for p in list(prefixes)[:5]]
+
+    start = time.perf_counter()
+    expected = [linear_scan_is_anycast(str(anycast_files[4]), ip) for ip in ips]
+    linear_s = time.perf_counter() - start
+
+    is_this_ip_anycast("1.1.1.1")  # build the index outside the timed section
+    start = time.perf_counter()
+    actual = [is_this_ip_anycast(ip) for ip in ips]
+    indexed_s = time.perf_counter() - start
+
+    print(f"anycast lookup of {len(ips)} IPs over {len(prefixes)} prefixes: "
+          f"linear scan {linear_s * 1000:.1f} ms, index {indexed_s * 1000:.3f} ms")
+    assert actual == expected
+    assert indexed_s < linear_s
 
 
 def test_randomize_ipv4():
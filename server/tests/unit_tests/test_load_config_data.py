@@ -660,6 +660,266 @@ def test_get_max_mind_path_asn(mock_config):
     assert isinstance(get_max_mind_path_asn(), str)
 
 
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_max_mind_cache_max_size(mock_config):
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="max_mind section is missing"):
+        get_max_mind_cache_max_size()
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="max_mind 'cache_max_size' is missing"):
+        get_max_mind_cache_max_size()
+    mock_config["max_mind"] = {"cache_max_size": 1.5}
+    with pytest.raises(ValueError, match="max_mind 'cache_max_size' must be an 'int'"):
+        get_max_mind_cache_max_size()
+    mock_config["max_mind"] = {"cache_max_size": -1}
+    with pytest.raises(ValueError, match="max_mind 'cache_max_size' cannot be negative"):
+        get_max_mind_cache_max_size()
+    mock_config["max_mind"] = {"cache_max_size": 0}
+    assert get_max_mind_cache_max_size() == 0
+    mock_config["max_mind"] = {"cache_max_size": 4096}
+    assert get_max_mind_cache_max_size() == 4096
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_max_mind_cache_ttl_s(mock_config):
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="max_mind section is missing"):
+        get_max_mind_cache_ttl_s()
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="max_mind 'cache_ttl_s' is missing"):
+        get_max_mind_cache_ttl_s()
+    mock_config["max_mind"] = {"cache_ttl_s": "no"}
+    with pytest.raises(ValueError, match="max_mind 'cache_ttl_s' must be a 'float' or an 'int'"):
+        get_max_mind_cache_ttl_s()
+    mock_config["max_mind"] = {"cache_ttl_s": 0}
+    with pytest.raises(ValueError, match="max_mind 'cache_ttl_s' must be > 0"):
+        get_max_mind_cache_ttl_s()
+    mock_config["max_mind"] = {"cache_ttl_s": 0.5}
+    assert get_max_mind_cache_ttl_s() == 0.5
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_max_mind_cache_track_stats(mock_config):
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="max_mind section is missing"):
+        get_max_mind_cache_track_stats()
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="max_mind 'cache_track_stats' is missing"):
+        get_max_mind_cache_track_stats()
+    mock_config["max_mind"] = {"cache_track_stats": 1}
+    with pytest.raises(ValueError, match="max_mind 'cache_track_stats' must be a 'bool'"):
+        get_max_mind_cache_track_stats()
+    mock_config["max_mind"] = {"cache_track_stats": False}
+    assert get_max_mind_cache_track_stats() is False
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_max_mind_version_check_interval_s(mock_config):
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="max_mind section is missing"):
+        get_max_mind_version_check_interval_s()
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="max_mind 'version_check_interval_s' is missing"):
+        get_max_mind_version_check_interval_s()
+    mock_config["max_mind"] = {"version_check_interval_s": "no"}
+    with pytest.raises(ValueError, match="max_mind 'version_check_interval_s' must be a 'float' or an 'int'"):
+        get_max_mind_version_check_interval_s()
+    mock_config["max_mind"] = {"version_check_interval_s": -1}
+    with pytest.raises(ValueError, match="max_mind 'version_check_interval_s' cannot be negative"):
+        get_max_mind_version_check_interval_s()
+    mock_config["max_mind"] = {"version_check_interval_s": 0}
+    assert get_max_mind_version_check_interval_s() == 0
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_max_mind_enrichment_debug_headers(mock_config):
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="max_mind section is missing"):
+        get_max_mind_enrichment_debug_headers()
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="max_mind 'enrichment_debug_headers' is missing"):
+        get_max_mind_enrichment_debug_headers()
+    mock_config["max_mind"] = {"enrichment_debug_headers": "yes"}
+    with pytest.raises(ValueError, match="max_mind 'enrichment_debug_headers' must be a 'bool'"):
+        get_max_mind_enrichment_debug_headers()
+    mock_config["max_mind"] = {"enrichment_debug_headers": True}
+    assert get_max_mind_enrichment_debug_headers() is True
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_write_queue_max_size(mock_config):
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database section is missing"):
+        get_write_queue_max_size()
+    mock_config["database"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database 'write_queue_max_size' is missing"):
+        get_write_queue_max_size()
+    mock_config["database"] = {"write_queue_max_size": "100"}
+    with pytest.raises(ValueError, match="database 'write_queue_max_size' must be an 'int'"):
+        get_write_queue_max_size()
+    mock_config["database"] = {"write_queue_max_size": 0}
+    with pytest.raises(ValueError, match="database 'write_queue_max_size' must be > 0"):
+        get_write_queue_max_size()
+    mock_config["database"] = {"write_queue_max_size": 10000}
+    assert get_write_queue_max_size() == 10000
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_write_batch_size(mock_config):
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database section is missing"):
+        get_write_batch_size()
+    mock_config["database"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database 'write_batch_size' is missing"):
+        get_write_batch_size()
+    mock_config["database"] = {"write_batch_size": 2.5}
+    with pytest.raises(ValueError, match="database 'write_batch_size' must be an 'int'"):
+        get_write_batch_size()
+    mock_config["database"] = {"write_batch_size": -3}
+    with pytest.raises(ValueError, match="database 'write_batch_size' must be > 0"):
+        get_write_batch_size()
+    mock_config["database"] = {"write_batch_size": 200}
+    assert get_write_batch_size() == 200
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_write_flush_interval_s(mock_config):
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database section is missing"):
+        get_write_flush_interval_s()
+    mock_config["database"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database 'write_flush_interval_s' is missing"):
+        get_write_flush_interval_s()
+    mock_config["database"] = {"write_flush_interval_s": "1"}
+    with pytest.raises(ValueError, match="database 'write_flush_interval_s' must be a 'float' or an 'int'"):
+        get_write_flush_interval_s()
+    mock_config["database"] = {"write_flush_interval_s": 0}
+    with pytest.raises(ValueError, match="database 'write_flush_interval_s' must be > 0"):
+        get_write_flush_interval_s()
+    mock_config["database"] = {"write_flush_interval_s": 0.5}
+    assert get_write_flush_interval_s() == 0.5
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_write_spill_path(mock_config):
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database section is missing"):
+        get_write_spill_path()
+    mock_config["database"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database 'write_spill_path' is missing"):
+        get_write_spill_path()
+    mock_config["database"] = {"write_spill_path": 5}
+    with pytest.raises(ValueError, match="database 'write_spill_path' must be a 'str'"):
+        get_write_spill_path()
+    mock_config["database"] = {"write_spill_path": "spill.jsonl"}
+    assert get_write_spill_path().endswith(os.path.join("server", "spill.jsonl"))
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_history_stream_batch_size(mock_config):
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database section is missing"):
+        get_history_stream_batch_size()
+    mock_config["database"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database 'history_stream_batch_size' is missing"):
+        get_history_stream_batch_size()
+    mock_config["database"] = {"history_stream_batch_size": "1000"}
+    with pytest.raises(ValueError, match="database 'history_stream_batch_size' must be an 'int'"):
+        get_history_stream_batch_size()
+    mock_config["database"] = {"history_stream_batch_size": 0}
+    with pytest.raises(ValueError, match="database 'history_stream_batch_size' must be > 0"):
+        get_history_stream_batch_size()
+    mock_config["database"] = {"history_stream_batch_size": 1000}
+    assert get_history_stream_batch_size() == 1000
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_history_max_page_size(mock_config):
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database section is missing"):
+        get_history_max_page_size()
+    mock_config["database"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database 'history_max_page_size' is missing"):
+        get_history_max_page_size()
+    mock_config["database"] = {"history_max_page_size": 10.5}
+    with pytest.raises(ValueError, match="database 'history_max_page_size' must be an 'int'"):
+        get_history_max_page_size()
+    mock_config["database"] = {"history_max_page_size": -1}
+    with pytest.raises(ValueError, match="database 'history_max_page_size' must be > 0"):
+        get_history_max_page_size()
+    mock_config["database"] = {"history_max_page_size": 1000}
+    assert get_history_max_page_size() == 1000
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_rollup_interval_s(mock_config):
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database section is missing"):
+        get_rollup_interval_s()
+    mock_config["database"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database 'rollup_interval_s' is missing"):
+        get_rollup_interval_s()
+    mock_config["database"] = {"rollup_interval_s": "60"}
+    with pytest.raises(ValueError, match="database 'rollup_interval_s' must be a 'float' or an 'int'"):
+        get_rollup_interval_s()
+    mock_config["database"] = {"rollup_interval_s": -1}
+    with pytest.raises(ValueError, match="database 'rollup_interval_s' must be > 0"):
+        get_rollup_interval_s()
+    mock_config["database"] = {"rollup_interval_s": 60}
+    assert get_rollup_interval_s() == 60
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_rollup_batch_size(mock_config):
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database section is missing"):
+        get_rollup_batch_size()
+    mock_config["database"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database 'rollup_batch_size' is missing"):
+        get_rollup_batch_size()
+    mock_config["database"] = {"rollup_batch_size": 1.5}
+    with pytest.raises(ValueError, match="database 'rollup_batch_size' must be an 'int'"):
+        get_rollup_batch_size()
+    mock_config["database"] = {"rollup_batch_size": 0}
+    with pytest.raises(ValueError, match="database 'rollup_batch_size' must be > 0"):
+        get_rollup_batch_size()
+    mock_config["database"] = {"rollup_batch_size": 10000}
+    assert get_rollup_batch_size() == 10000
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_export_batch_size(mock_config):
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database section is missing"):
+        get_export_batch_size()
+    mock_config["database"] = {"bla": -1}
+    with pytest.raises(ValueError, match="database 'export_batch_size' is missing"):
+        get_export_batch_size()
+    mock_config["database"] = {"export_batch_size": "50000"}
+    with pytest.raises(ValueError, match="database 'export_batch_size' must be an 'int'"):
+        get_export_batch_size()
+    mock_config["database"] = {"export_batch_size": -1}
+    with pytest.raises(ValueError, match="database 'export_batch_size' must be > 0"):
+        get_export_batch_size()
+    mock_config["database"] = {"export_batch_size": 50000}
+    assert get_export_batch_size() == 50000
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_monitoring_stats_endpoint(mock_config):
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="monitoring section is missing"):
+        get_monitoring_stats_endpoint()
+    mock_config["monitoring"] = {"bla": -1}
+    with pytest.raises(ValueError, match="monitoring 'stats_endpoint' is missing"):
+        get_monitoring_stats_endpoint()
+    mock_config["monitoring"] = {"stats_endpoint": "yes"}
+    with pytest.raises(ValueError, match="monitoring 'stats_endpoint' must be a 'bool'"):
+        get_monitoring_stats_endpoint()
+    mock_config["monitoring"] = {"stats_endpoint": True}
+    assert get_monitoring_stats_endpoint() is True
+
+
 @patch("server.app.utils.load_config_data.os.getenv")
 def test_check_geolite_account_id_and_key(mock):
     mock.side_effect = [None, "something"]
@@ -680,3 +940,214 @@ def test_check_geolite_account_id_and_key(mock):
     # with pytest.raises(ValueError):
     #     get_ripe_account_email()
     # mock.assert_called_with("ripe_account_email")
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_max_parallel_measurements(mock_config):
+    with pytest.raises(ValueError, match="ntp section is missing"):
+        get_max_parallel_measurements()
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ntp 'max_parallel_measurements' is missing"):
+        get_max_parallel_measurements()
+    mock_config["ntp"] = {"max_parallel_measurements": 2.5}
+    with pytest.raises(ValueError, match="ntp 'max_parallel_measurements' must be an 'int'"):
+        get_max_parallel_measurements()
+    mock_config["ntp"] = {"max_parallel_measurements": 0}
+    with pytest.raises(ValueError, match="ntp 'max_parallel_measurements' must be > 0"):
+        get_max_parallel_measurements()
+    mock_config["ntp"] = {"max_parallel_measurements": 8}
+    assert get_max_parallel_measurements() == 8
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_domain_measurement_deadline_s(mock_config):
+    with pytest.raises(ValueError, match="ntp section is missing"):
+        get_domain_measurement_deadline_s()
+    mock_config["ntp"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ntp 'domain_measurement_deadline_s' is missing"):
+        get_domain_measurement_deadline_s()
+    mock_config["ntp"] = {"domain_measurement_deadline_s": "9"}
+    with pytest.raises(ValueError, match="ntp 'domain_measurement_deadline_s' must be a 'float' or an 'int'"):
+        get_domain_measurement_deadline_s()
+    mock_config["ntp"] = {"domain_measurement_deadline_s": 0}
+    with pytest.raises(ValueError, match="ntp 'domain_measurement_deadline_s' must be > 0"):
+        get_domain_measurement_deadline_s()
+    mock_config["ntp"] = {"domain_measurement_deadline_s": 9.5}
+    assert get_domain_measurement_deadline_s() == 9.5
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_ripe_probe_cache_max_size(mock_config):
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas section is missing"):
+        get_ripe_probe_cache_max_size()
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_cache_max_size' is missing"):
+        get_ripe_probe_cache_max_size()
+    mock_config["ripe_atlas"] = {"probe_cache_max_size": 1.5}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_cache_max_size' must be an 'int'"):
+        get_ripe_probe_cache_max_size()
+    mock_config["ripe_atlas"] = {"probe_cache_max_size": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_cache_max_size' cannot be negative"):
+        get_ripe_probe_cache_max_size()
+    mock_config["ripe_atlas"] = {"probe_cache_max_size": 0}
+    assert get_ripe_probe_cache_max_size() == 0
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_ripe_probe_cache_ttl_s(mock_config):
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas section is missing"):
+        get_ripe_probe_cache_ttl_s()
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_cache_ttl_s' is missing"):
+        get_ripe_probe_cache_ttl_s()
+    mock_config["ripe_atlas"] = {"probe_cache_ttl_s": "no"}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_cache_ttl_s' must be a 'float' or an 'int'"):
+        get_ripe_probe_cache_ttl_s()
+    mock_config["ripe_atlas"] = {"probe_cache_ttl_s": 0}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_cache_ttl_s' must be > 0"):
+        get_ripe_probe_cache_ttl_s()
+    mock_config["ripe_atlas"] = {"probe_cache_ttl_s": 3600}
+    assert get_ripe_probe_cache_ttl_s() == 3600
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_ripe_probe_catalogue_url(mock_config):
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas section is missing"):
+        get_ripe_probe_catalogue_url()
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_catalogue_url' is missing"):
+        get_ripe_probe_catalogue_url()
+    mock_config["ripe_atlas"] = {"probe_catalogue_url": 3}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_catalogue_url' must be a 'str'"):
+        get_ripe_probe_catalogue_url()
+    mock_config["ripe_atlas"] = {"probe_catalogue_url": "https://example.org/meta-latest"}
+    assert get_ripe_probe_catalogue_url() == "https://example.org/meta-latest"
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_ripe_probe_catalogue_sync_interval_s(mock_config):
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas section is missing"):
+        get_ripe_probe_catalogue_sync_interval_s()
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_catalogue_sync_interval_s' is missing"):
+        get_ripe_probe_catalogue_sync_interval_s()
+    mock_config["ripe_atlas"] = {"probe_catalogue_sync_interval_s": "daily"}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_catalogue_sync_interval_s' must be a 'float' or an 'int'"):
+        get_ripe_probe_catalogue_sync_interval_s()
+    mock_config["ripe_atlas"] = {"probe_catalogue_sync_interval_s": -5}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_catalogue_sync_interval_s' must be > 0"):
+        get_ripe_probe_catalogue_sync_interval_s()
+    mock_config["ripe_atlas"] = {"probe_catalogue_sync_interval_s": 21600}
+    assert get_ripe_probe_catalogue_sync_interval_s() == 21600
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_ripe_max_parallel_probe_queries(mock_config):
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas section is missing"):
+        get_ripe_max_parallel_probe_queries()
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'max_parallel_probe_queries' is missing"):
+        get_ripe_max_parallel_probe_queries()
+    mock_config["ripe_atlas"] = {"max_parallel_probe_queries": 2.5}
+    with pytest.raises(ValueError, match="ripe_atlas 'max_parallel_probe_queries' must be an 'int'"):
+        get_ripe_max_parallel_probe_queries()
+    mock_config["ripe_atlas"] = {"max_parallel_probe_queries": 0}
+    with pytest.raises(ValueError, match="ripe_atlas 'max_parallel_probe_queries' must be > 0"):
+        get_ripe_max_parallel_probe_queries()
+    mock_config["ripe_atlas"] = {"max_parallel_probe_queries": 6}
+    assert get_ripe_max_parallel_probe_queries() == 6
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_ripe_probe_query_deadline_s(mock_config):
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas section is missing"):
+        get_ripe_probe_query_deadline_s()
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_query_deadline_s' is missing"):
+        get_ripe_probe_query_deadline_s()
+    mock_config["ripe_atlas"] = {"probe_query_deadline_s": "5"}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_query_deadline_s' must be a 'float' or an 'int'"):
+        get_ripe_probe_query_deadline_s()
+    mock_config["ripe_atlas"] = {"probe_query_deadline_s": 0}
+    with pytest.raises(ValueError, match="ripe_atlas 'probe_query_deadline_s' must be > 0"):
+        get_ripe_probe_query_deadline_s()
+    mock_config["ripe_atlas"] = {"probe_query_deadline_s": 2.5}
+    assert get_ripe_probe_query_deadline_s() == 2.5
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_ripe_http_timeout_s(mock_config):
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas section is missing"):
+        get_ripe_http_timeout_s()
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_timeout_s' is missing"):
+        get_ripe_http_timeout_s()
+    mock_config["ripe_atlas"] = {"http_timeout_s": "10"}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_timeout_s' must be a 'float' or an 'int'"):
+        get_ripe_http_timeout_s()
+    mock_config["ripe_atlas"] = {"http_timeout_s": 0}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_timeout_s' must be > 0"):
+        get_ripe_http_timeout_s()
+    mock_config["ripe_atlas"] = {"http_timeout_s": 2.5}
+    assert get_ripe_http_timeout_s() == 2.5
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_ripe_http_max_retries(mock_config):
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas section is missing"):
+        get_ripe_http_max_retries()
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_max_retries' is missing"):
+        get_ripe_http_max_retries()
+    mock_config["ripe_atlas"] = {"http_max_retries": "3"}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_max_retries' must be an 'int'"):
+        get_ripe_http_max_retries()
+    mock_config["ripe_atlas"] = {"http_max_retries": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_max_retries' cannot be negative"):
+        get_ripe_http_max_retries()
+    mock_config["ripe_atlas"] = {"http_max_retries": 0}
+    assert get_ripe_http_max_retries() == 0
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_ripe_http_backoff_s(mock_config):
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas section is missing"):
+        get_ripe_http_backoff_s()
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_backoff_s' is missing"):
+        get_ripe_http_backoff_s()
+    mock_config["ripe_atlas"] = {"http_backoff_s": "0.5"}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_backoff_s' must be a 'float' or an 'int'"):
+        get_ripe_http_backoff_s()
+    mock_config["ripe_atlas"] = {"http_backoff_s": -0.5}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_backoff_s' cannot be negative"):
+        get_ripe_http_backoff_s()
+    mock_config["ripe_atlas"] = {"http_backoff_s": 0.25}
+    assert get_ripe_http_backoff_s() == 0.25
+
+
+@patch("server.app.utils.load_config_data.config", new_callable=dict)
+def test_get_ripe_http_pool_size(mock_config):
+    mock_config["max_mind"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas section is missing"):
+        get_ripe_http_pool_size()
+    mock_config["ripe_atlas"] = {"bla": -1}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_pool_size' is missing"):
+        get_ripe_http_pool_size()
+    mock_config["ripe_atlas"] = {"http_pool_size": "10"}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_pool_size' must be an 'int'"):
+        get_ripe_http_pool_size()
+    mock_config["ripe_atlas"] = {"http_pool_size": 0}
+    with pytest.raises(ValueError, match="ripe_atlas 'http_pool_size' must be > 0"):
+        get_ripe_http_pool_size()
+    mock_config["ripe_atlas"] = {"http_pool_size": 4}
+    assert get_ripe_http_pool_size() == 4
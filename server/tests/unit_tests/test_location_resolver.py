@@ -1,58 +1,208 @@
-from unittest.mock import patch, Mock
+import os
+from unittest.mock import patch, Mock, MagicMock
 
-from server.app.utils.location_resolver import get_coordinates_for_ip
+import pytest
+
+from server.app.dtos.GeoRecord import GeoRecord
+from server.app.utils.location_resolver import get_coordinates_for_ip, get_geo_reader, close_geo_readers, \
+    lookup_ip, get_country_for_ip, get_asn_for_ip, clear_geo_cache, get_geo_cache_stats, \
+    get_geo_databases_version
+from server.app.utils.load_config_data import get_max_mind_version_check_interval_s
 from geoip2.errors import AddressNotFoundError, GeoIP2Error
 
 
-@patch("server.app.utils.location_resolver.geoip2.database.Reader")
-def test_valid_ip_returns_coordinates(mock_reader):
+@pytest.fixture(autouse=True)
+def clear_readers():
+    close_geo_readers()
+    clear_geo_cache()
+    yield
+    close_geo_readers()
+    clear_geo_cache()
+
+
+@patch("server.app.utils.location_resolver.get_geo_reader")
+def test_valid_ip_returns_coordinates(mock_get_reader):
     mock_response = Mock()
     mock_response.location.latitude = 1.23
     mock_response.location.longitude = -1.22
-    mock_reader.return_value.__enter__.return_value.city.return_value = mock_response
+    mock_get_reader.return_value.city.return_value = mock_response
 
     coords = get_coordinates_for_ip("0.0.0.0")
     assert coords == (1.23, -1.22)
 
 
-@patch("server.app.utils.location_resolver.geoip2.database.Reader")
-def test_ip_not_found_returns_fallback(mock_reader):
-    mock_reader.return_value.__enter__.return_value.city.side_effect = AddressNotFoundError("Not found")
+@patch("server.app.utils.location_resolver.get_geo_reader")
+def test_ip_not_found_returns_fallback(mock_get_reader):
+    mock_get_reader.return_value.city.side_effect = AddressNotFoundError("Not found")
 
     coords = get_coordinates_for_ip("0.0.0.0")
     assert coords == (25.0, -71.0)
 
 
-@patch("server.app.utils.location_resolver.geoip2.database.Reader")
-def test_none_location_fields_return_fallback(mock_reader):
+@patch("server.app.utils.location_resolver.get_geo_reader")
+def test_none_location_fields_return_fallback(mock_get_reader):
     mock_response = Mock()
     mock_response.location.latitude = None
     mock_response.location.longitude = -10.0
-    mock_reader.return_value.__enter__.return_value.city.return_value = mock_response
+    mock_get_reader.return_value.city.return_value = mock_response
 
     coords = get_coordinates_for_ip("0.0.0.0")
     assert coords == (25.0, -71.0)
 
 
 @patch("server.app.utils.location_resolver.geoip2.database.Reader")
-def test_geoip2_error_returns_fallback(mock_reader):
+def test_geoip2_error_returns_fallback(mock_reader, tmp_path):
     mock_reader.side_effect = GeoIP2Error("Database corrupted")
+    db = tmp_path / "GeoLite2-City.mmdb"
+    db.write_bytes(b"")
 
-    coords = get_coordinates_for_ip("0.0.0.0")
+    with patch("server.app.utils.location_resolver.get_max_mind_path_city", return_value=str(db)):
+        coords = get_coordinates_for_ip("0.0.0.0")
     assert coords == (25.0, -71.0)
 
 
-@patch("server.app.utils.location_resolver.geoip2.database.Reader")
-def test_file_not_found_returns_fallback(mock_reader):
-    mock_reader.side_effect = OSError("File not found")
+def test_file_not_found_returns_fallback(tmp_path):
+    with patch("server.app.utils.location_resolver.get_max_mind_path_city",
+               return_value=str(tmp_path / "missing.mmdb")):
+        coords = get_coordinates_for_ip("0.0.0.0")
+    assert coords == (25.0, -71.0)
+
+
+@patch("server.app.utils.location_resolver.get_geo_reader")
+def test_other_exception_returns_fallback(mock_get_reader):
+    mock_get_reader.side_effect = Exception("Other exception")
 
     coords = get_coordinates_for_ip("0.0.0.0")
     assert coords == (25.0, -71.0)
 
 
 @patch("server.app.utils.location_resolver.geoip2.database.Reader")
-def test_other_exception_returns_fallback(mock_reader):
-    mock_reader.side_effect = Exception("Other exception")
+def test_reader_is_opened_once(mock_reader, tmp_path):
+    db = tmp_path / "GeoLite2-Country.mmdb"
+    db.write_bytes(b"v1")
 
-    coords = get_coordinates_for_ip("0.0.0.0")
-    assert coords == (25.0, -71.0)
+    first = get_geo_reader(str(db))
+    second = get_geo_reader(str(db))
+
+    assert first is second
+    assert mock_reader.call_count == 1
+
+
+@patch("server.app.utils.location_resolver.time.monotonic")
+@patch("server.app.utils.location_resolver.geoip2.database.Reader")
+def test_reader_is_swapped_when_file_is_replaced(mock_reader, mock_time, tmp_path):
+    mock_reader.side_effect = [MagicMock(), MagicMock()]
+    mock_time.return_value = 100.0
+    db = tmp_path / "GeoLite2-Country.mmdb"
+    db.write_bytes(b"v1")
+    first = get_geo_reader(str(db))
+
+    # the update script moves a new file over the old one
+    new_db = tmp_path / "new.mmdb"
+    new_db.write_bytes(b"v2")
+    os.replace(new_db, db)
+    stat = os.stat(db)
+    os.utime(db, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    # the file is not checked again before the interval is over
+    assert get_geo_reader(str(db)) is first
+    mock_time.return_value = 100.0 + get_max_mind_version_check_interval_s()
+    second = get_geo_reader(str(db))
+
+    assert first is not second
+    assert get_geo_reader(str(db)) is second
+    assert mock_reader.call_count == 2
+
+
+@patch("server.app.utils.location_resolver._geo_database_paths", ("city", "country", "asn"))
+@patch("server.app.utils.location_resolver.time.monotonic")
+@patch("server.app.utils.location_resolver.os.stat")
+def test_get_geo_databases_version(mock_stat, mock_time):
+    mock_stat.return_value = MagicMock(st_ino=7, st_mtime_ns=1000)
+    mock_time.return_value = 100.0
+    assert get_geo_databases_version() == ((7, 1000), (7, 1000), (7, 1000))
+    assert get_geo_databases_version() == ((7, 1000), (7, 1000), (7, 1000))
+    # the paths were resolved once, and every file is checked once per interval
+    assert [c.args for c in mock_stat.call_args_list] == [("city",), ("country",), ("asn",)]
+
+    mock_stat.side_effect = [MagicMock(st_ino=7, st_mtime_ns=1000), OSError("missing"),
+                             MagicMock(st_ino=8, st_mtime_ns=2000)]
+    mock_time.return_value = 100.0 + get_max_mind_version_check_interval_s()
+    assert get_geo_databases_version() == ((7, 1000), None, (8, 2000))
+    assert mock_stat.call_count == 6
+
+
+@patch("server.app.utils.location_resolver.geoip2.database.Reader")
+def test_close_geo_readers(mock_reader, tmp_path):
+    db = tmp_path / "GeoLite2-ASN.mmdb"
+    db.write_bytes(b"v1")
+    reader = get_geo_reader(str(db))
+
+    close_geo_readers()
+
+    reader.close.assert_called_once()
+    get_geo_reader(str(db))
+    assert mock_reader.call_count == 2
+
+
+@patch("server.app.utils.location_resolver.get_geo_reader")
+def test_lookup_ip(mock_get_reader):
+    reader = mock_get_reader.return_value
+    reader.country.return_value.country.iso_code = "NL"
+    reader.country.return_value.continent.code = "EU"
+    reader.city.return_value.location.latitude = 52.1
+    reader.city.return_value.location.longitude = 4.3
+    reader.asn.return_value.autonomous_system_number = 1140
+
+    geo = lookup_ip("94.198.159.14")
+
+    assert geo.country_code == "NL"
+    assert geo.continent_code == "EU"
+    assert geo.coordinates == (52.1, 4.3)
+    assert geo.asn == "1140"
+
+
+@patch("server.app.utils.location_resolver.get_geo_reader")
+def test_lookup_ip_fallbacks(mock_get_reader):
+    mock_get_reader.side_effect = OSError("File not found")
+
+    geo = lookup_ip("94.198.159.14")
+    assert geo.country_code is None
+    assert geo.continent_code is None
+    assert geo.coordinates == (25.0, -71.0)
+    assert geo.asn is None
+
+    geo = lookup_ip(None)
+    assert geo.country_code is None
+    assert geo.coordinates == (25.0, -71.0)
+    assert get_country_for_ip(None) is None
+    assert get_asn_for_ip("94.198.159.14") is None
+
+
+def record(country_code="NL"):
+    return GeoRecord(country_code=country_code, continent_code="EU", coordinates=(52.1, 4.3), asn="1140")
+
+
+@patch("server.app.utils.location_resolver.get_geo_databases_version")
+@patch("server.app.utils.location_resolver.lookup_ip_uncached")
+def test_lookup_ip_uses_cache(mock_uncached, mock_version):
+    mock_uncached.return_value = record()
+    mock_version.return_value = ((1, 1), (2, 2), (3, 3))
+
+    assert lookup_ip("94.198.159.14").country_code == "NL"
+    assert lookup_ip("94.198.159.14").country_code == "NL"
+    assert mock_uncached.call_count == 1
+    assert get_geo_cache_stats()["hits"] == 1
+    assert get_geo_cache_stats()["misses"] == 1
+
+
+@patch("server.app.utils.location_resolver.get_geo_databases_version")
+@patch("server.app.utils.location_resolver.lookup_ip_uncached")
+def test_lookup_ip_cache_invalidated_by_database_update(mock_uncached, mock_version):
+    mock_uncached.side_effect = [record("NL"), record("BE")]
+    mock_version.return_value = ((1, 1), (2, 2), (3, 3))
+    assert lookup_ip("94.198.159.14").country_code == "NL"
+
+    # the nightly update replaced the country database
+    mock_version.return_value = ((1, 1), (4, 4), (3, 3))
+    assert lookup_ip("94.198.159.14").country_code == "BE"
+    assert mock_uncached.call_count == 2
@@ -0,0 +1,204 @@
+import fcntl
+import json
+import os
+from ipaddress import ip_address
+from unittest.mock import patch, MagicMock
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from server.app.db.measurement_writer import MeasurementWriter, store_measurements, get_pending_measurements, \
+    start_measurement_writer, stop_measurement_writer, get_measurement_writer_stats, read_spill_file
+from server.app.models.CustomError import DatabaseInsertError
+from server.tests.unit_tests.test_db_interaction import make_measurement
+
+
+@pytest.fixture
+def writer(tmp_path):
+    w = MeasurementWriter(MagicMock, max_size=3, batch_size=2, flush_interval_s=0.05,
+                          spill_path=str(tmp_path / "spill.jsonl"))
+    yield w
+    w.stop()
+
+
+@patch("server.app.db.measurement_writer.insert_measurements_bulk")
+def test_writer_flushes_in_batches(mock_insert, writer):
+    writer.start()
+    writer.enqueue([make_measurement("192.168.0.1"), make_measurement("192.168.0.2"), make_measurement("192.168.0.3")])
+    writer.stop()
+
+    assert [len(call.args[0]) for call in mock_insert.call_args_list] == [2, 1]
+    stats = writer.stats()
+    assert stats["flushed"] == 3
+    assert stats["batches"] == 2
+    assert stats["queue_size"] == 0
+    assert stats["high_water_mark"] == 3
+
+
+def test_pending_measurements_newest_first(writer):
+    first = make_measurement("192.168.0.1")
+    other = make_measurement("192.168.0.2")
+    second = make_measurement("192.168.0.1")
+    writer.enqueue([first, other, second])  # not started, so nothing is flushed
+
+    assert writer.pending_measurements(ip_address("192.168.0.1"), 5) == [second, first]
+    assert writer.pending_measurements(ip_address("192.168.0.1"), 1) == [second]
+    assert writer.pending_measurements(ip_address("10.0.0.1"), 5) == []
+
+
+@patch("server.app.db.measurement_writer.insert_measurement_rows_bulk")
+@patch("server.app.db.measurement_writer.insert_measurements_bulk")
+def test_writer_spills_and_replays(mock_insert, mock_insert_rows, writer):
+    mock_insert.side_effect = [DatabaseInsertError("database is down"), None]
+    writer.start()
+    writer.enqueue([make_measurement("192.168.0.1"), make_measurement("192.168.0.2")])
+    writer.stop()
+
+    with open(writer.spill_path) as f:
+        lines = [json.loads(line) for line in f]
+    assert [line["ntp_server_ip"] for line in lines] == ["192.168.0.1", "192.168.0.2"]
+    assert writer.stats()["spilled"] == 2
+    assert writer.stats()["failed_batches"] == 1
+
+    # the database is back: the next successful flush replays the spill file
+    writer.start()
+    writer.enqueue([make_measurement("192.168.0.3"), make_measurement("192.168.0.4")])
+    writer.stop()
+
+    rows = mock_insert_rows.call_args[0][0]
+    assert [row["ntp_server_ip"] for row in rows] == ["192.168.0.1", "192.168.0.2"]
+    assert writer.stats()["replayed"] == 2
+    with pytest.raises(FileNotFoundError):
+        open(writer.spill_path)
+
+
+def test_writer_spills_when_full(writer):
+    writer.enqueue([make_measurement(f"192.168.0.{i}") for i in range(5)])
+
+    stats = writer.stats()
+    assert stats["queue_size"] == 3
+    assert stats["spilled"] == 2
+    with open(writer.spill_path) as f:
+        assert len(f.readlines()) == 2
+
+
+@patch("server.app.db.measurement_writer.insert_measurement_rows_bulk")
+def test_replay_skips_truncated_lines(mock_insert_rows, writer):
+    writer._spill([make_measurement("192.168.0.1")])
+    with open(writer.spill_path, "a") as f:
+        f.write('{"client_sent": 39')  # the server crashed while writing this line
+
+    writer._replay_spill()
+    assert len(mock_insert_rows.call_args[0][0]) == 1
+
+
+@patch("server.app.db.measurement_writer.insert_measurements_bulk")
+@patch("server.app.db.measurement_writer.insert_measurement")
+def test_store_measurements_without_writer(mock_insert, mock_insert_bulk):
+    session = MagicMock()
+    m1 = make_measurement("192.168.0.1")
+    m2 = make_measurement("192.168.0.2")
+    store_measurements([m1], session)
+    mock_insert.assert_called_once_with(m1, session)
+    store_measurements([m1, m2], session)
+    mock_insert_bulk.assert_called_once_with([m1, m2], session)
+    assert get_pending_measurements(ip_address("192.168.0.1"), 5) == []
+    assert get_measurement_writer_stats() is None
+
+
+@patch("server.app.db.measurement_writer.get_write_spill_path")
+@patch("server.app.db.measurement_writer.insert_measurement")
+def test_store_measurements_with_writer(mock_insert, mock_spill_path, tmp_path):
+    mock_spill_path.return_value = str(tmp_path / "spill.jsonl")
+    session_factory = MagicMock()
+    start_measurement_writer(session_factory)
+    try:
+        with patch("server.app.db.measurement_writer.insert_measurements_bulk"):
+            m = make_measurement("192.168.0.1")
+            store_measurements([m], MagicMock())
+            mock_insert.assert_not_called()
+            assert get_measurement_writer_stats()["enqueued"] == 1
+    finally:
+        stop_measurement_writer()
+    assert get_measurement_writer_stats() is None
+
+
+@patch("server.app.db.measurement_writer.insert_measurement_rows_bulk")
+def test_replay_moves_the_rejected_rows_to_the_dead_letter_file(mock_insert_rows, writer):
+    writer._spill([make_measurement(f"192.168.0.{i}") for i in range(1, 5)])
+
+    def insert(rows, session):
+        if any(row["ntp_server_ip"] == "192.168.0.3" for row in rows):
+            raise DatabaseInsertError("invalid input syntax")
+    mock_insert_rows.side_effect = insert
+
+    writer._replay_spill()
+    with open(writer.spill_path + ".dead") as f:
+        assert [json.loads(line)["ntp_server_ip"] for line in f] == ["192.168.0.3"]
+    assert writer.stats()["replayed"] == 3
+    assert writer.stats()["dead_lettered"] == 1
+    assert not os.path.exists(writer.spill_path + ".replay")
+
+
+@patch("server.app.db.measurement_writer.insert_measurement_rows_bulk")
+def test_replay_keeps_the_rows_when_the_database_is_down(mock_insert_rows, writer):
+    writer._spill([make_measurement("192.168.0.1"), make_measurement("192.168.0.2")])
+
+    def insert(rows, session):
+        try:
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        except OperationalError as e:
+            raise DatabaseInsertError(f"Failed to insert {len(rows)} measurements: {e}")
+    mock_insert_rows.side_effect = insert
+
+    writer._replay_spill()
+    assert mock_insert_rows.call_count == 1  # not split
+    assert len(read_spill_file(writer.spill_path + ".replay")) == 2
+    assert not os.path.exists(writer.spill_path + ".dead")
+
+    # the database is back: the old rows and the ones spilled in the meantime are replayed
+    mock_insert_rows.side_effect = None
+    writer._spill([make_measurement("192.168.0.3")])
+    writer._replay_spill()
+    assert [len(call.args[0]) for call in mock_insert_rows.call_args_list[1:]] == [2, 1]
+    assert not os.path.exists(writer.spill_path)
+    assert not os.path.exists(writer.spill_path + ".replay")
+
+
+@patch("server.app.db.measurement_writer.insert_measurement_rows_bulk")
+def test_replay_keeps_only_the_rows_that_were_not_committed(mock_insert_rows, writer, tmp_path):
+    writer.batch_size = 4
+    writer._spill([make_measurement(f"192.168.0.{i}") for i in range(1, 5)])
+    inserted = []
+
+    def insert(rows, session):
+        ips = [row["ntp_server_ip"] for row in rows]
+        if "192.168.0.2" in ips:
+            raise DatabaseInsertError("invalid input syntax")
+        if "192.168.0.3" in ips:
+            # the database goes down after the first half of the batch was written
+            try:
+                raise OperationalError("INSERT", {}, Exception("connection refused"))
+            except OperationalError as e:
+                raise DatabaseInsertError(f"Failed to insert {len(rows)} measurements: {e}")
+        inserted.extend(ips)
+    mock_insert_rows.side_effect = insert
+
+    writer._replay_spill()
+    assert inserted == ["192.168.0.1"]
+    assert writer.stats()["dead_lettered"] == 1
+    assert [row["ntp_server_ip"] for row in read_spill_file(writer.spill_path + ".replay")] == \
+           ["192.168.0.3", "192.168.0.4"]
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+
+
+@patch("server.app.db.measurement_writer.insert_measurement_rows_bulk")
+def test_replay_is_skipped_while_another_worker_replays(mock_insert_rows, writer):
+    writer._spill([make_measurement("192.168.0.1")])
+    with open(writer.spill_path + ".replay.lock", "a") as f:
+        # the lock is per open file, so this is what another process holding it looks like
+        fcntl.flock(f, fcntl.LOCK_EX)
+        writer._replay_spill()
+        mock_insert_rows.assert_not_called()
+    writer._replay_spill()
+    mock_insert_rows.assert_called_once()
@@ -0,0 +1,157 @@
+import asyncio
+import struct
+import time
+from unittest.mock import patch
+
+import pytest
+
+from server.app.dtos.PreciseTime import PreciseTime
+from server.app.utils.ntp_engine import precise_time_now, short_format_to_precise_time, build_ntp_request, \
+    parse_ntp_packet, ntp_query, ntp_burst_query, NTP_PACKET_FORMAT, NTP_DELTA
+
+
+def server_response(request: bytes, mode: int = 4, orig: tuple[int, int] | None = None) -> bytes:
+    unpacked = struct.unpack(NTP_PACKET_FORMAT, request)
+    orig_seconds, orig_fraction = orig if orig is not None else (unpacked[13], unpacked[14])
+    return struct.pack(NTP_PACKET_FORMAT, (0 << 6 | 4 << 3 | mode), 2, 6, -20, (1 << 16) | 0x8000, 0x4000, 0x0A000001,
+                       3900000000, 5, orig_seconds, orig_fraction, 3900000001, 7, 3900000001, 9)
+
+
+class FakeNtpServer(asyncio.DatagramProtocol):
+    def __init__(self, answers):
+        self.answers = answers  # a function that builds the list of packets to send back from a request
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        for packet in self.answers(data):
+            self.transport.sendto(packet, addr)
+
+
+async def query_fake_server(answers, timeout=1.0, samples=None):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: FakeNtpServer(answers), local_addr=("127.0.0.1", 0))
+    try:
+        port = transport.get_extra_info("sockname")[1]
+        if samples is not None:
+            return await ntp_burst_query("127.0.0.1", 4, timeout, samples, port=port)
+        return await ntp_query("127.0.0.1", 4, timeout, port=port)
+    finally:
+        transport.close()
+
+
+@patch("server.app.utils.ntp_engine.time.time_ns")
+def test_precise_time_now(mock_time):
+    mock_time.return_value = 1_700_000_000_500_000_000
+    assert precise_time_now() == PreciseTime(1_700_000_000 + NTP_DELTA, 2 ** 31)
+    mock_time.return_value = 1_700_000_000_000_000_001
+    assert precise_time_now() == PreciseTime(1_700_000_000 + NTP_DELTA, 4)
+
+
+def test_short_format_to_precise_time():
+    assert short_format_to_precise_time((3 << 16) | 0x8000) == PreciseTime(3, 2 ** 31)
+    assert short_format_to_precise_time(0) == PreciseTime(0, 0)
+
+
+def test_build_and_parse_ntp_packet():
+    request = build_ntp_request(4, PreciseTime(3900000000, 123456789))
+    assert len(request) == 48
+    packet = parse_ntp_packet(request)
+    assert packet.mode == 3
+    assert packet.version == 4
+    assert packet.tx_time == PreciseTime(3900000000, 123456789)
+
+    packet = parse_ntp_packet(server_response(request))
+    assert packet.mode == 4
+    assert packet.stratum == 2
+    assert packet.precision == -20
+    assert packet.root_delay == PreciseTime(1, 2 ** 31)
+    assert packet.root_dispersion == PreciseTime(0, 2 ** 30)
+    assert packet.ref_id == 0x0A000001
+    assert packet.orig_time == PreciseTime(3900000000, 123456789)
+    assert packet.recv_time == PreciseTime(3900000001, 7)
+    assert packet.tx_time == PreciseTime(3900000001, 9)
+
+    with pytest.raises(ValueError):
+        parse_ntp_packet(b"\x00" * 20)
+
+
+def test_ntp_query():
+    packet, receive_time = asyncio.run(query_fake_server(lambda request: [server_response(request)]))
+    assert packet.mode == 4
+    assert packet.recv_time == PreciseTime(3900000001, 7)
+    # the origin timestamp is our transmit timestamp, so it was taken just before the receive time
+    assert (packet.orig_time.seconds, packet.orig_time.fraction) <= (receive_time.seconds, receive_time.fraction)
+    assert abs(receive_time.seconds - (time.time() + NTP_DELTA)) < 5
+
+
+def test_ntp_query_ignores_bogus_answers():
+    def answers(request):
+        return [b"short",
+                server_response(request, mode=3),  # not a server response
+                server_response(request, orig=(1, 1)),  # an answer to another request
+                server_response(request)]
+    packet, _ = asyncio.run(query_fake_server(answers))
+    assert packet.mode == 4
+    assert packet.orig_time != PreciseTime(1, 1)
+
+
+def test_ntp_query_timeout():
+    with pytest.raises(TimeoutError):
+        asyncio.run(query_fake_server(lambda request: [], timeout=0.2))
+
+
+def test_ntp_query_multiplexes_requests():
+    async def many():
+        return await asyncio.gather(*[query_fake_server(lambda request: [server_response(request)]) for _ in range(50)])
+    start = time.perf_counter()
+    results = asyncio.run(many())
+    assert len(results) == 50
+    assert all(packet.mode == 4 for packet, _ in results)
+    assert time.perf_counter() - start < 5
+
+
+def test_ntp_burst_query():
+    requests = []
+
+    def answers(request):
+        requests.append(request)
+        return [server_response(request)]
+    samples = asyncio.run(query_fake_server(answers, samples=4))
+
+    assert len(samples) == 4
+    assert len(requests) == 4
+    # every sample answers its own request
+    transmit_times = [parse_ntp_packet(request).tx_time for request in requests]
+    assert [packet.orig_time for packet, _ in samples] == transmit_times
+    assert len(set((t.seconds, t.fraction) for t in transmit_times)) == 4
+
+
+def test_ntp_burst_query_keeps_sending_after_a_loss():
+    requests = []
+
+    def answers(request):
+        requests.append(request)
+        # the 2nd and the 4th requests are lost
+        return [] if len(requests) in (2, 4) else [server_response(request)]
+
+    start = time.perf_counter()
+    samples = asyncio.run(query_fake_server(answers, timeout=1.0, samples=5))
+    # every lost request only waited for its share of the timeout
+    assert time.perf_counter() - start < 0.9
+    assert len(requests) == 5
+    transmit_times = [parse_ntp_packet(request).tx_time for request in requests]
+    assert [packet.orig_time for packet, _ in samples] == [transmit_times[i] for i in (0, 2, 4)]
+
+
+def test_ntp_burst_query_timeout():
+    requests = []
+
+    def answers(request):
+        requests.append(request)
+        return []
+    with pytest.raises(TimeoutError):
+        asyncio.run(query_fake_server(answers, timeout=0.3, samples=3))
+    assert len(requests) == 3
@@ -9,7 +9,7 @@ from server.app.dtos.NtpMeasurement import NtpMeasurement
 from server.app.dtos.NtpServerInfo import NtpServerInfo
 from server.app.dtos.NtpTimestamps import NtpTimestamps
 from server.app.dtos.PreciseTime import PreciseTime
-from server.app.services.NtpCalculator import NtpCalculator
+from server.app.services.NtpCalculator import NtpCalculator, NTP_TIMESTAMPS_DTYPE
 from server.app.services.NtpValidation import NtpValidation
 
 
@@ -42,7 +42,8 @@ def test_different_times_delay():
     t4 = PreciseTime(10004, 2 ** 27)
     times = NtpTimestamps(t1, t2, t3, t4)
     # 2^27/2^32=2^-5
-    assert round(NtpCalculator.calculate_delay(times), 14) == 3 - 2 ** (-5)
+    # (t4 - t1) - (t3 - t2) = (4 + 2^-5) - 1
+    assert round(NtpCalculator.calculate_delay(times), 14) == 3 + 2 ** (-5)
 
 
 def test_create_object():
@@ -98,3 +99,42 @@ def test_jitter_negative_offsets():
     expected = ((-0.001 + 0.002) ** 2 + (-0.003 + 0.002) ** 2) / 2
     expected = expected ** 0.5
     assert result == expected
+
+
+def make_timestamps(n: int) -> list[NtpTimestamps]:
+    rng = np.random.default_rng(7)
+    result = []
+    for i in range(n):
+        # NTP seconds of 2025, so seconds << 32 does not fit in a signed 64-bit integer
+        base = 3944000000 + 60 * i
+        result.append(NtpTimestamps(*[PreciseTime(base + int(rng.integers(0, 3)), int(rng.integers(0, 2 ** 32)))
+                                      for _ in range(4)]))
+    return result
+
+
+def test_batch_offsets_and_delays_match_single():
+    timestamps = make_timestamps(50)
+    array = NtpCalculator.timestamps_to_array(timestamps)
+    assert array.dtype == NTP_TIMESTAMPS_DTYPE
+
+    offsets = NtpCalculator.calculate_offsets(array)
+    delays = NtpCalculator.calculate_delays(array)
+    assert offsets.tolist() == [NtpCalculator.calculate_offset(t) for t in timestamps]
+    assert delays.tolist() == [NtpCalculator.calculate_delay(t) for t in timestamps]
+
+    # the same timestamps in 64-bit fixed point
+    fixed_point = NtpCalculator.to_fixed_point(array)
+    assert fixed_point.dtype == np.uint64
+    assert int(fixed_point[0, 1]) == (timestamps[0].server_recv_time.seconds << 32) + \
+           timestamps[0].server_recv_time.fraction
+    assert NtpCalculator.calculate_offsets(fixed_point).tolist() == offsets.tolist()
+    assert NtpCalculator.calculate_delays(fixed_point).tolist() == delays.tolist()
+
+
+def test_batch_offset_keeps_the_fraction():
+    t1 = PreciseTime(3944000000, 2 ** 32 - 1)
+    t2 = PreciseTime(3944000001, 0)
+    array = NtpCalculator.timestamps_to_array([NtpTimestamps(t1, t2, t2, t2)])
+    # t2 - t1 is one fraction unit: (2^-32 + 0) / 2
+    assert NtpCalculator.calculate_offsets(array)[0] == 2 ** -33
+
@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.orm import Session
+
+from server.app.db.partitions import month_partition_bounds, create_measurement_partitions, \
+    forget_measurement_partitions
+
+# 2025-06-15 12:00:00 UTC in NTP seconds
+JUNE_2025 = 1749988800 + 2208988800
+JUNE_1_2025 = 1748736000 + 2208988800
+JULY_1_2025 = 1751328000 + 2208988800
+
+
+@pytest.fixture(autouse=True)
+def clear_partitions():
+    forget_measurement_partitions()
+    yield
+    forget_measurement_partitions()
+
+
+def postgres_session():
+    session = MagicMock(spec=Session)
+    session.get_bind.return_value.dialect.name = "postgresql"
+    return session
+
+
+def test_month_partition_bounds():
+    assert month_partition_bounds(JUNE_2025) == ("measurements_y2025m06", JUNE_1_2025, JULY_1_2025)
+    assert month_partition_bounds(JUNE_1_2025)[0] == "measurements_y2025m06"
+    assert month_partition_bounds(JULY_1_2025 - 1)[0] == "measurements_y2025m06"
+    assert month_partition_bounds(JULY_1_2025)[0] == "measurements_y2025m07"
+    # December goes into the next year
+    name, start, end = month_partition_bounds(JUNE_2025 + 180 * 86400)
+    assert name == "measurements_y2025m12"
+    assert month_partition_bounds(end)[0] == "measurements_y2026m01"
+
+
+def test_create_measurement_partitions():
+    session = postgres_session()
+    created = create_measurement_partitions(session, [JUNE_2025, JUNE_2025 + 1, JULY_1_2025])
+
+    assert created == ["measurements_y2025m06", "measurements_y2025m07"]
+    statements = [str(call.args[0]) for call in session.execute.call_args_list]
+    assert "pg_advisory_xact_lock" in statements[0]
+    assert statements[1] == (f"CREATE TABLE IF NOT EXISTS measurements_y2025m06 PARTITION OF measurements "
+                             f"FOR VALUES FROM ({JUNE_1_2025}) TO ({JULY_1_2025})")
+
+    # the partitions are known now, so nothing is sent to the database
+    session.execute.reset_mock()
+    assert create_measurement_partitions(session, [JUNE_2025]) == []
+    session.execute.assert_not_called()
+
+
+def test_create_measurement_partitions_other_database():
+    session = MagicMock(spec=Session)
+    session.get_bind.return_value.dialect.name = "sqlite"
+    assert create_measurement_partitions(session, [JUNE_2025]) == []
+    session.execute.assert_not_called()
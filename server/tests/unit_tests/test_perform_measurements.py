@@ -1,225 +1,151 @@
+import asyncio
+import time
 from ipaddress import IPv4Address
 import pytest
 from server.app.utils.perform_measurements import *
 from unittest.mock import patch, MagicMock
 from server.app.dtos.PreciseTime import PreciseTime
+from server.app.dtos.NtpPacket import NtpPacket
 
 
-@patch("server.app.utils.perform_measurements.domain_name_to_ip_list")
-@patch("server.app.utils.perform_measurements.get_timeout_measurement_s")
-@patch("server.app.utils.perform_measurements.ntplib.NTPClient")
-@patch("server.app.utils.perform_measurements.convert_ntp_response_to_measurement")
-def test_perform_ntp_measurement_domain_name_list(mock_convert, mock_ntpclient_class,
-                                                  mock_timeout, mock_domain_names):
-    mock_domain_names.return_value = ["3.4.5.6", "12.34.123.90", "102.34.123.90"]
-    mock_timeout.return_value = 3.5
-    mock_measurement1 = MagicMock(spec=NtpMeasurement)
-    mock_measurement2 = None
-    mock_measurement3 = MagicMock(spec=NtpMeasurement)
-    mock_convert.side_effect  = [mock_measurement1, mock_measurement2, mock_measurement3]
-    # mock responses from ntplib
-    mock_client = MagicMock()
-    mock_ntpclient_class.return_value = mock_client
-    mock_ntp_response = MagicMock()
-    mock_client.request.return_value = mock_ntp_response
-
-    result = perform_ntp_measurement_domain_name_list("time.server.nl", "123.45.67.89", 4, 4)
-    assert result == [mock_measurement1, mock_measurement3]
-    assert mock_convert.call_count == 3
-    assert mock_client.request.call_count == 3
+def ntp_packet(orig=PreciseTime(3000, 2 ** 31)):
+    return NtpPacket(leap=0, version=4, mode=4, stratum=2, poll=6, precision=-20,
+                     root_delay=PreciseTime(0, 2 ** 30), root_dispersion=PreciseTime(1, 0), ref_id=23467,
+                     ref_time=PreciseTime(2999, 5), orig_time=orig, recv_time=PreciseTime(3001, 0),
+                     tx_time=PreciseTime(3001, 2 ** 31))
 
 
-@patch("server.app.utils.perform_measurements.domain_name_to_ip_list")
-@patch("server.app.utils.perform_measurements.get_timeout_measurement_s")
-@patch("server.app.utils.perform_measurements.ntplib.NTPClient")
-@patch("server.app.utils.perform_measurements.convert_ntp_response_to_measurement")
-def test_perform_ntp_measurement_domain_name_list_want_ipv6(mock_convert, mock_ntpclient_class,
-                                                  mock_timeout, mock_domain_names):
-    mock_domain_names.return_value = ["2a06:93c0::24", "3a06:93c0::24", "2a06:90c0::24"]
-    mock_timeout.return_value = 3.5
-    mock_measurement1 = MagicMock(spec=NtpMeasurement)
-    mock_measurement2 = None
-    mock_measurement3 = MagicMock(spec=NtpMeasurement)
-    mock_convert.side_effect  = [mock_measurement1, mock_measurement2, mock_measurement3]
-    # mock responses from ntplib
-    mock_client = MagicMock()
-    mock_ntpclient_class.return_value = mock_client
-    mock_ntp_response = MagicMock()
-    mock_client.request.return_value = mock_ntp_response
-
-    result = perform_ntp_measurement_domain_name_list("time.server.nl", "123.45.67.89", 6, 4)
-    assert result == [mock_measurement1, mock_measurement3]
-    assert mock_convert.call_count == 3
-    assert mock_client.request.call_count == 3
+@patch("server.app.utils.perform_measurements.get_server_ip")
+def test_convert_ntp_packet_to_measurement(mock_server_ip):
+    mock_server_ip.return_value = IPv4Address("2.4.5.6")
 
+    result = convert_ntp_packet_to_measurement(ntp_packet(), PreciseTime(3002, 0), "32.34.35.36", "ntp server", 4)
 
-@patch("server.app.utils.perform_measurements.domain_name_to_ip_list")
-@patch("server.app.utils.perform_measurements.get_timeout_measurement_s")
-@patch("server.app.utils.perform_measurements.ntplib.NTPClient")
-@patch("server.app.utils.perform_measurements.convert_ntp_response_to_measurement")
-def test_perform_ntp_measurement_domain_name_list_none(mock_convert, mock_ntpclient_class,
-                                                       mock_timeout, mock_domain_names):
-    mock_domain_names.return_value = ["3.4.5.6", "12.34.123.90", "102.34.123.90"]
-    mock_timeout.return_value = 3.5
-    mock_convert.side_effect  = [None, None, None]
-    # mock responses from ntplib
-    mock_client = MagicMock()
-    mock_ntpclient_class.return_value = mock_client
-    mock_ntp_response = MagicMock()
-    mock_client.request.return_value = mock_ntp_response
-
-    result = perform_ntp_measurement_domain_name_list("time.server.nl", "123.45.67.89", 4, 4)
-    assert result is None
-    assert mock_convert.call_count == 3
-    assert mock_client.request.call_count == 3
+    assert result.vantage_point_ip == IPv4Address("2.4.5.6")
+    assert result.server_info.ntp_server_ip == IPv4Address("32.34.35.36")
+    assert result.server_info.ntp_server_name == "ntp server"
+    assert result.server_info.ntp_server_ref_parent_ip == IPv4Address('0.0.91.171')
+    # the timestamps are copied without any rounding
+    assert result.timestamps.client_sent_time == PreciseTime(3000, 2 ** 31)
+    assert result.timestamps.server_recv_time == PreciseTime(3001, 0)
+    assert result.timestamps.server_sent_time == PreciseTime(3001, 2 ** 31)
+    assert result.timestamps.client_recv_time == PreciseTime(3002, 0)
+    # offset = ((t2 - t1) + (t3 - t4)) / 2 and delay = (t4 - t1) - (t3 - t2)
+    assert result.main_details.offset == 0.0
+    assert result.main_details.rtt == 1.0
+    assert result.main_details.precision == -20
+    assert result.extra_details.root_delay == PreciseTime(0, 2 ** 30)
+    assert result.extra_details.ntp_last_sync_time == PreciseTime(2999, 5)
+    assert result.extra_details.poll == 6
+    assert print_ntp_measurement(result) == True
+    assert print_ntp_measurement(23) == False
+
+    mock_server_ip.side_effect = Exception("no network")
+    assert convert_ntp_packet_to_measurement(ntp_packet(), PreciseTime(3002, 0), "32.34.35.36", None, 4) is None
 
-@patch("server.app.utils.perform_measurements.domain_name_to_ip_list")
-@patch("server.app.utils.perform_measurements.get_timeout_measurement_s")
-@patch("server.app.utils.perform_measurements.ntplib.NTPClient")
-@patch("server.app.utils.perform_measurements.convert_ntp_response_to_measurement")
-def test_perform_ntp_measurement_domain_name_list_exception(mock_convert, mock_ntpclient_class,
-                                                            mock_timeout, mock_domain_names):
-    mock_domain_names.return_value = ["3.4.5.6", "12.34.123.90", "102.34.123.90"]
-    mock_timeout.return_value = 3.5
-    mock_measurement3 = MagicMock(spec=NtpMeasurement)
-    mock_convert.side_effect  = [Exception("some message"), mock_measurement3] # 2 instead of 3 because the first time it
-    # won't be called as we will throw an error in client.request()
-
-    # mock responses from ntplib
-    mock_client = MagicMock()
-    mock_ntpclient_class.return_value = mock_client
-    mock_ntp_response = MagicMock()
-    mock_client.request.side_effect = [Exception("other message"), mock_ntp_response, mock_ntp_response]
-
-    result = perform_ntp_measurement_domain_name_list("time.server.nl", "123.45.67.89", 4, 4)
-    assert result == [get_non_responding_ntp_measurement("3.4.5.6", "time.server.nl", 4),
-                      get_non_responding_ntp_measurement("12.34.123.90", "time.server.nl", 4), mock_measurement3]
-    assert mock_convert.call_count == 2
-    assert mock_client.request.call_count == 3
 
 @patch("server.app.utils.perform_measurements.get_timeout_measurement_s")
-@patch("server.app.utils.perform_measurements.ntplib.NTPClient")
-@patch("server.app.utils.perform_measurements.convert_ntp_response_to_measurement")
-def test_perform_ntp_measurement_ip(mock_convert, mock_ntpclient_class, mock_timeout):
+@patch("server.app.utils.perform_measurements.ntp_burst_query")
+@patch("server.app.utils.perform_measurements.convert_ntp_samples_to_measurement")
+def test_perform_ntp_measurement_ip_async(mock_convert, mock_query, mock_timeout):
     mock_timeout.return_value = 3.5
+    responses = [(ntp_packet(), PreciseTime(3002, 0))]
+    mock_query.return_value = responses
     mock_measurement = MagicMock(spec=NtpMeasurement)
     mock_convert.return_value = mock_measurement
-    # mock responses from ntplib
-    mock_client = MagicMock()
-    mock_ntpclient_class.return_value = mock_client
-    mock_ntp_response = MagicMock()
-    mock_client.request.return_value = mock_ntp_response
 
-    result = perform_ntp_measurement_ip("123.45.67.89", 4)
-    assert result == mock_measurement
+    assert asyncio.run(perform_ntp_measurement_ip_async("123.45.67.89", 4)) == mock_measurement
+    mock_query.assert_awaited_once_with("123.45.67.89", 4, 3.5, 1)
+    mock_convert.assert_called_once_with(responses, "123.45.67.89", None, 4)
 
-    mock_client.request.assert_called_once_with("123.45.67.89", 4, timeout=3.5)
-    mock_convert.assert_called_once_with(response=mock_ntp_response,
-                                         server_ip_str="123.45.67.89",
-                                         server_name=None,
-                                         ntp_version=4)
+    asyncio.run(perform_ntp_measurement_ip_async("123.45.67.89", 4, samples=5))
+    mock_query.assert_awaited_with("123.45.67.89", 4, 3.5, 5)
 
-@patch("server.app.utils.perform_measurements.get_timeout_measurement_s")
-@patch("server.app.utils.perform_measurements.ntplib.NTPClient")
-@patch("server.app.utils.perform_measurements.convert_ntp_response_to_measurement")
-def test_perform_ntp_measurement_ip_exception(mock_convert, mock_ntpclient_class, mock_timeout):
-
-    assert perform_ntp_measurement_ip("something67.89", 4) is None
-    mock_timeout.return_value = 3.5
-    mock_measurement = MagicMock(spec=NtpMeasurement)
-    mock_convert.return_value = mock_measurement
-    # mock responses from ntplib
-    mock_client = MagicMock()
-    mock_ntpclient_class.return_value = mock_client
-    mock_client.request.side_effect = Exception("invalid")
-
-    result = perform_ntp_measurement_ip("123.45.67.89", 4)
-    assert result is None
+    assert asyncio.run(perform_ntp_measurement_ip_async("something67.89", 4)) is None
+    mock_query.side_effect = TimeoutError("No response received from 123.45.67.89.")
+    assert asyncio.run(perform_ntp_measurement_ip_async("123.45.67.89", 4)) is None
 
 
 @patch("server.app.utils.perform_measurements.get_server_ip")
-def test_convert_ntp_response_to_measurement(mock_server_ip):
+def test_convert_ntp_samples_to_measurement(mock_server_ip):
     mock_server_ip.return_value = IPv4Address("2.4.5.6")
-    mock_response = MagicMock()
-    mock_response.ref_id = 23467
-    mock_response.stratum = 1
-    mock_response.orig_timestamp = 3000.23
-    mock_response.recv_timestamp = 3001.56
-    mock_response.tx_timestamp = 3002.78
-    mock_response.dest_timestamp = 3003.97
-    mock_response.ref_timestamp = 2999.123
-    mock_response.offset = 0.001
-    mock_response.delay = 0.002
-    mock_response.stratum = 2
-    mock_response.precision = -20
-
-    mock_response.root_delay = 0.025
-    mock_response.leap = 0
-    mock_response.poll = 0.02
-    mock_response.root_dispersion = 4000
-
-    result = convert_ntp_response_to_measurement(mock_response, "32.34.35.36", "ntp server", 4)
-
-    assert result is not None
-
-    assert result.server_info.ntp_version == 4
-    assert result.server_info.ntp_server_ip == IPv4Address("32.34.35.36")
-    assert result.server_info.ntp_server_name == "ntp server"
-    assert result.server_info.ntp_server_ref_parent_ip == IPv4Address('0.0.91.171')
-    assert result.server_info.ref_name is None
-
-    assert result.timestamps.client_sent_time == PreciseTime(seconds=3000, fraction=987842478)
-    assert result.timestamps.server_recv_time == PreciseTime(seconds=3001, fraction=2405181685)
-    assert result.timestamps.server_sent_time == PreciseTime(seconds=3002, fraction=3350074490)
-    assert result.timestamps.client_recv_time == PreciseTime(seconds=3003, fraction=4166118277)
+    # delays: 1.0, 0.5, 2.0 and offsets: 0.0, 0.25, -0.5
+    samples = [(ntp_packet(PreciseTime(3000, 2 ** 31)), PreciseTime(3002, 0)),
+               (ntp_packet(PreciseTime(3000, 2 ** 31)), PreciseTime(3001, 2 ** 31)),
+               (ntp_packet(PreciseTime(3000, 2 ** 31)), PreciseTime(3003, 0))]
 
-    assert result.main_details.offset == 0.001
-    assert result.main_details.rtt == 0.002
-    assert result.main_details.stratum == 2
-    assert result.main_details.precision == -20
-    assert result.main_details.reachability == ""
+    result = convert_ntp_samples_to_measurement(samples, "32.34.35.36", "ntp server", 4)
 
-    assert result.extra_details.root_delay == PreciseTime(seconds=0, fraction=107374182)
-    assert result.extra_details.ntp_last_sync_time == PreciseTime(seconds=2999, fraction=528280977)
-    assert result.extra_details.leap == 0
-    assert result.extra_details.poll == 0.02
-    assert result.extra_details.root_dispersion == PreciseTime(seconds=4000, fraction=0)
+    # the sample with the minimum delay is the measurement
+    assert result.timestamps.client_recv_time == PreciseTime(3001, 2 ** 31)
+    assert result.main_details.rtt == 0.5
+    assert result.main_details.offset == 0.25
+    assert result.samples.offsets == [0.0, 0.25, -0.5]
+    assert result.samples.rtts == [1.0, 0.5, 2.0]
+    assert result.samples.best_sample == 1
+    # jitter against the best offset: sqrt(((0 - 0.25)^2 + (-0.5 - 0.25)^2) / 2)
+    assert result.samples.jitter == pytest.approx(((0.25 ** 2 + 0.75 ** 2) / 2) ** 0.5)
 
-    assert result.vantage_point_ip == IPv4Address("2.4.5.6")
-    assert print_ntp_measurement(result) == True
-    assert print_ntp_measurement(23) == False
+    single = convert_ntp_samples_to_measurement(samples[:1], "32.34.35.36", "ntp server", 4)
+    assert single.samples is None
+    assert single.main_details.rtt == 1.0
+    assert convert_ntp_samples_to_measurement([], "32.34.35.36", "ntp server", 4) is None
 
-@patch("server.app.utils.perform_measurements.get_server_ip")
-def test_convert_ntp_response_to_measurement_exception(mock_server_ip):
-    mock_server_ip.return_value = None
-    mock_response = MagicMock()
-    mock_response.ref_id = 23467
-    mock_response.stratum = 1
-    mock_response.orig_timestamp = 3000.23
-    mock_response.recv_timestamp = 3001.56
-    mock_response.tx_timestamp = 3002.78
-    mock_response.dest_timestamp = 3003.97
-    mock_response.ref_timestamp = 2999.123
-    mock_response.offset = 0.001
-    mock_response.delay = 0.002
-    mock_response.stratum = 2
-    mock_response.precision = -20
 
-    mock_response.root_delay = 0.025
-    mock_response.leap = 0
-    mock_response.poll = 0.02
-    mock_response.root_dispersion = 4000
-
-    result = convert_ntp_response_to_measurement(mock_response, "32.34.35.36", "ntp server", 4)
-
-    assert result is not None
-    assert result.server_info.ntp_version == 4
-    assert result.vantage_point_ip is None
-
-    assert convert_ntp_response_to_measurement(mock_response, "something else", "ntp server", 4) is None
+@patch("server.app.utils.perform_measurements.domain_name_to_ip_list")
+@patch("server.app.utils.perform_measurements.get_domain_measurement_deadline_s")
+@patch("server.app.utils.perform_measurements.measure_domain_ip_async")
+def test_perform_ntp_measurement_domain_name_list_async(mock_measure, mock_deadline, mock_domain_names):
+    mock_domain_names.return_value = ["3.4.5.6", "12.34.123.90", "102.34.123.90", "5.6.7.8"]
+    mock_deadline.return_value = 0.5
+    measurements = {"3.4.5.6": MagicMock(spec=NtpMeasurement), "5.6.7.8": MagicMock(spec=NtpMeasurement)}
+
+    async def measure(ip_str, server_name, ntp_version, samples):
+        if ip_str == "12.34.123.90":  # a dead server
+            await asyncio.sleep(10)
+        if ip_str == "102.34.123.90":
+            raise TimeoutError("No response received")
+        await asyncio.sleep(0.05)
+        return measurements[ip_str]
+    mock_measure.side_effect = measure
+
+    start = time.perf_counter()
+    result = asyncio.run(perform_ntp_measurement_domain_name_list_async("time.server.nl", "123.45.67.89", 4, 4))
+    assert time.perf_counter() - start < 1.5
+    assert result == [measurements["3.4.5.6"], get_non_responding_ntp_measurement("12.34.123.90", "time.server.nl", 4),
+                      get_non_responding_ntp_measurement("102.34.123.90", "time.server.nl", 4),
+                      measurements["5.6.7.8"]]
+    mock_domain_names.assert_called_once_with("time.server.nl", "123.45.67.89", 4)
+
+    mock_domain_names.return_value = []
+    assert asyncio.run(perform_ntp_measurement_domain_name_list_async("time.server.nl", None, 4, 4)) is None
 
 
-@patch("server.app.utils.perform_measurements.requests.post")
+@patch("server.app.utils.perform_measurements.domain_name_to_ip_list")
+@patch("server.app.utils.perform_measurements.get_max_parallel_measurements")
+@patch("server.app.utils.perform_measurements.measure_domain_ip_async")
+def test_perform_ntp_measurement_domain_name_list_async_bounded(mock_measure, mock_parallel, mock_domain_names):
+    mock_domain_names.return_value = [f"10.0.0.{i}" for i in range(1, 7)]
+    mock_parallel.return_value = 2
+    running = 0
+    max_running = 0
+
+    async def measure(ip_str, server_name, ntp_version, samples):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return ip_str
+    mock_measure.side_effect = measure
+
+    result = asyncio.run(perform_ntp_measurement_domain_name_list_async("time.server.nl", "123.45.67.89", 4, 4))
+    assert result == mock_domain_names.return_value
+    assert max_running == 2
+    assert mock_measure.call_count == 6
+
+
+@patch("server.app.utils.perform_measurements.ripe_post")
 @patch("server.app.utils.perform_measurements.get_request_settings")
 def test_perform_ripe_measurement_domain_name_normal(mock_settings, mock_post):
     mock_settings.return_value = ({"Authorization": "Key"}, {"some": 36, "other": "other"})
@@ -232,7 +158,7 @@ def test_perform_ripe_measurement_domain_name_normal(mock_settings, mock_post):
     assert result == 85439
 
 
-@patch("server.app.utils.perform_measurements.requests.post")
+@patch("server.app.utils.perform_measurements.ripe_post")
 @patch("server.app.utils.perform_measurements.get_request_settings")
 def test_perform_ripe_measurement_domain_name_normal_want_ipv6(mock_settings, mock_post):
     mock_settings.return_value = ({"Authorization": "Key"}, {"some": 36, "other": "other"})
@@ -244,7 +170,7 @@ def test_perform_ripe_measurement_domain_name_normal_want_ipv6(mock_settings, mo
 
     assert result == 85439
 
-@patch("server.app.utils.perform_measurements.requests.post")
+@patch("server.app.utils.perform_measurements.ripe_post")
 @patch("server.app.utils.perform_measurements.get_request_settings")
 def test_perform_ripe_measurement_domain_name_try_catch(mock_settings, mock_post):
     mock_settings.return_value = ({"Authorization": "Key"}, {"somefield": 3, "other": "no"})
@@ -261,7 +187,7 @@ def test_perform_ripe_measurement_domain_name_try_catch(mock_settings, mock_post
     with pytest.raises(RipeMeasurementError, match=r"Ripe measurement failed:.*"):
         perform_ripe_measurement_domain_name("time.apple.com", "2.3.4.5", 4, 10)
 
-@patch("server.app.utils.perform_measurements.requests.post")
+@patch("server.app.utils.perform_measurements.ripe_post")
 @patch("server.app.utils.perform_measurements.get_request_settings")
 def test_perform_ripe_measurement_domain_name_exceptions(mock_settings, mock_post):
     # invalid "probes requested"
@@ -276,7 +202,7 @@ def test_perform_ripe_measurement_domain_name_exceptions(mock_settings, mock_pos
         perform_ripe_measurement_domain_name("ntp.pool.org", "blabla", 4, 3)
 
 
-@patch("server.app.utils.perform_measurements.requests.post")
+@patch("server.app.utils.perform_measurements.ripe_post")
 @patch("server.app.utils.perform_measurements.get_request_settings")
 def test_perform_ripe_measurement_ip_normal(mock_settings, mock_post):
     mock_settings.return_value = ({"Authorization": "Key"}, {"somefield": 3, "other": "no"})
@@ -288,7 +214,7 @@ def test_perform_ripe_measurement_ip_normal(mock_settings, mock_post):
 
     assert result == 12412
 
-@patch("server.app.utils.perform_measurements.requests.post")
+@patch("server.app.utils.perform_measurements.ripe_post")
 @patch("server.app.utils.perform_measurements.get_request_settings")
 def test_perform_ripe_measurement_ip_try_catch(mock_settings, mock_post):
     mock_settings.return_value = ({"Authorization": "Key"}, {"somefield": 3, "other": "no"})
@@ -306,7 +232,7 @@ def test_perform_ripe_measurement_ip_try_catch(mock_settings, mock_post):
         perform_ripe_measurement_ip("123.45.67.89", "2.3.4.5", 10)
 
 
-@patch("server.app.utils.perform_measurements.requests.post")
+@patch("server.app.utils.perform_measurements.ripe_post")
 @patch("server.app.utils.perform_measurements.get_request_settings")
 def test_perform_ripe_measurement_ip_exceptions(mock_settings, mock_post):
     # invalid "probes requested"
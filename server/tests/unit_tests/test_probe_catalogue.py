@@ -0,0 +1,173 @@
+import bz2
+import json
+import os
+import threading
+import time
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from server.app.dtos.RipeProbe import RipeProbe
+from server.app.utils.probe_catalogue import parse_catalogue_probe, ProbeCatalogue, load_probe_catalogue, \
+    ProbeCatalogueJob, get_probe_catalogue, set_probe_catalogue, download_probe_dump
+
+# the format of the daily dump of RIPE Atlas
+DUMP = {"objects": [
+    {"id": 1, "asn_v4": 1136, "asn_v6": 1136, "prefix_v4": "80.211.224.0/20", "prefix_v6": "2a06:93c0::/29",
+     "country_code": "NL", "status": 1, "status_name": "Connected", "is_public": True,
+     "tags": ["system-ipv4-works", "system-ipv6-works"], "latitude": 52.0, "longitude": 4.9},
+    {"id": 2, "asn_v4": 1136, "asn_v6": None, "prefix_v4": "80.211.224.0/20", "prefix_v6": None,
+     "country_code": "NL", "status": 1, "is_public": True, "tags": ["system-ipv4-works"],
+     "latitude": 53.2, "longitude": 6.5},
+    {"id": 3, "asn_v4": 3320, "asn_v6": 3320, "prefix_v4": "91.0.0.0/10", "prefix_v6": None,
+     "country_code": "DE", "status": 2, "is_public": True, "tags": ["system-ipv4-works"],
+     "latitude": None, "longitude": None},
+    {"id": 4, "asn_v4": 1136, "asn_v6": None, "prefix_v4": "80.211.224.0/20", "prefix_v6": None,
+     "country_code": "nl", "status": 1, "is_public": False, "tags": ["system-ipv4-works"],
+     "latitude": 51.4, "longitude": 5.4},
+    {"id": "not an id"},
+]}
+
+
+def test_parse_catalogue_probe():
+    probe = parse_catalogue_probe(DUMP["objects"][0])
+    assert probe == RipeProbe(id=1, asn_v4=1136, asn_v6=1136, prefix_v4="80.211.224.0/20",
+                              prefix_v6="2a06:93c0::/29", country_code="NL", status=1, is_public=True,
+                              tags=frozenset({"system-ipv4-works", "system-ipv6-works"}), coordinates=(52.0, 4.9))
+    # the geometry is in the same format as the probes of the RIPE Atlas API
+    assert probe.geometry["coordinates"] == [4.9, 52.0]
+    assert parse_catalogue_probe(DUMP["objects"][2]).geometry["coordinates"] is None
+    assert parse_catalogue_probe(DUMP["objects"][4]) is None
+
+    # the format of the probes API
+    api_probe = parse_catalogue_probe({"id": "7", "status": {"id": 1, "name": "Connected"},
+                                       "tags": [{"name": "IPv4 Works", "slug": "system-ipv4-works"}],
+                                       "geometry": {"type": "Point", "coordinates": [4.9, 52.0]}})
+    assert api_probe.id == 7
+    assert api_probe.status == 1
+    assert api_probe.tags == frozenset({"system-ipv4-works"})
+    assert api_probe.coordinates == (52.0, 4.9)
+    assert api_probe.is_public is False
+
+
+def test_probe_catalogue_search():
+    catalogue = load_probe_catalogue(json.dumps(DUMP).encode())
+    assert len(catalogue) == 4
+
+    def ids(filters):
+        return [probe.id for probe in catalogue.search(filters)]
+
+    connected_v4 = {"status": 1, "tags": "system-ipv4-works", "is_public": True}
+    assert ids({"asn": 1136, **connected_v4}) == [1, 2]
+    assert ids({"asn": 1136, "prefix_v4": "80.211.230.0/20", **connected_v4}) == [1, 2]
+    assert ids({"asn": 1136, "prefix_v6": "2a06:93c0::/29", "status": 1,
+                "tags": "system-ipv6-works", "is_public": True}) == [1]
+    assert ids({"country_code": "nl", "status": 1}) == [1, 2, 4]
+    assert ids({"asn": 3320, **connected_v4}) == []
+    assert ids({"asn": 3320, "tags": "system-ipv4-works,system-ipv6-works"}) == []
+    assert ids({"prefix_v4": "not a prefix"}) == []
+    assert ids({}) == [1, 2, 3, 4]
+    with pytest.raises(ValueError, match="unsupported probe filter"):
+        catalogue.search({"is_anchor": True})
+
+
+def test_load_probe_catalogue_formats():
+    assert len(load_probe_catalogue(bz2.compress(json.dumps(DUMP).encode()))) == 4
+    assert len(load_probe_catalogue(json.dumps({"results": DUMP["objects"][:2]}).encode())) == 2
+    assert len(load_probe_catalogue(json.dumps(DUMP["objects"][:1]).encode())) == 1
+    with pytest.raises(ValueError):
+        load_probe_catalogue(json.dumps({"count": 0}).encode())
+    with pytest.raises(ValueError):
+        load_probe_catalogue(b"BZh9 not bz2")
+
+
+@patch("server.app.utils.probe_catalogue.ripe_get")
+def test_download_probe_dump(mock_get, tmp_path):
+    mock_get.return_value = MagicMock(content=b"dump")
+    path = str(tmp_path / "probes.json.bz2")
+    download_probe_dump("https://example.org/meta-latest", path)
+    with open(path, "rb") as f:
+        assert f.read() == b"dump"
+    assert os.listdir(tmp_path) == ["probes.json.bz2"]
+
+
+@patch("server.app.utils.probe_catalogue.ripe_get")
+def test_download_probe_dump_failure_keeps_the_old_copy(mock_get, tmp_path):
+    path = str(tmp_path / "probes.json.bz2")
+    with open(path, "wb") as f:
+        f.write(b"old dump")
+    mock_get.return_value = MagicMock(content=None)  # writing None fails
+    with pytest.raises(TypeError):
+        download_probe_dump("https://example.org/meta-latest", path)
+    with open(path, "rb") as f:
+        assert f.read() == b"old dump"
+    assert os.listdir(tmp_path) == ["probes.json.bz2"]
+
+
+@patch("server.app.utils.probe_catalogue.download_probe_dump")
+def test_probe_catalogue_job_run_once(mock_download, tmp_path):
+    path = str(tmp_path / "probes.json.bz2")
+
+    def download(url, dump_path):
+        with open(dump_path, "wb") as f:
+            f.write(bz2.compress(json.dumps(DUMP).encode()))
+
+    mock_download.side_effect = download
+    job = ProbeCatalogueJob("https://example.org/meta-latest", path, interval_s=3600)
+    try:
+        catalogue = job.run_once()
+        assert get_probe_catalogue() is catalogue
+        assert len(catalogue) == 4
+        mock_download.assert_called_once_with("https://example.org/meta-latest", path)
+
+        # the local copy is recent, so it is not downloaded again
+        mock_download.reset_mock()
+        job.run_once()
+        mock_download.assert_not_called()
+
+        # the local copy is too old
+        os.utime(path, (time.time() - 7200, time.time() - 7200))
+        job.run_once()
+        mock_download.assert_called_once()
+    finally:
+        set_probe_catalogue(None)
+
+
+@patch("server.app.utils.probe_catalogue.download_probe_dump")
+def test_probe_catalogue_job_downloads_once_for_all_workers(mock_download, tmp_path):
+    path = str(tmp_path / "probes.json.bz2")
+    downloading = threading.Event()
+    release = threading.Event()
+
+    def download(url, dump_path):
+        downloading.set()
+        release.wait(5)
+        with open(dump_path, "wb") as f:
+            f.write(bz2.compress(json.dumps(DUMP).encode()))
+
+    mock_download.side_effect = download
+    # two workers that share the local copy
+    first = ProbeCatalogueJob("https://example.org/meta-latest", path, interval_s=3600)
+    second = ProbeCatalogueJob("https://example.org/meta-latest", path, interval_s=3600)
+    try:
+        thread = threading.Thread(target=first.run_once)
+        thread.start()
+        assert downloading.wait(5)
+        results = []
+        waiting = threading.Thread(target=lambda: results.append(second.run_once()))
+        waiting.start()
+        waiting.join(0.2)
+        assert waiting.is_alive()  # it waits for the download of the first worker
+        release.set()
+        thread.join(5)
+        waiting.join(5)
+        assert mock_download.call_count == 1
+        assert len(results[0]) == 4
+
+        # the local copy did not change, so it is not read again
+        with patch("server.app.utils.probe_catalogue.load_probe_catalogue") as mock_load:
+            assert second.run_once() is get_probe_catalogue()
+            mock_load.assert_not_called()
+    finally:
+        release.set()
+        set_probe_catalogue(None)
@@ -10,7 +10,8 @@ from server.app.dtos.RipeMeasurement import RipeMeasurement
 from server.app.dtos.ProbeData import ProbeData
 from server.app.utils.ripe_fetch_data import get_data_from_ripe_measurement, get_probe_data_from_ripe_by_id, \
     parse_probe_data, is_failed_measurement, successful_measurement, parse_data_from_ripe_measurement, \
-    check_all_measurements_scheduled, check_all_measurements_done
+    check_all_measurements_scheduled, check_all_measurements_done, get_probes_data_from_ripe_by_ids, get_probes_data, \
+    clear_probe_cache, get_probe_cache_stats
 
 MOCK_MEASUREMENT_INFO = {
     "af": 4,
@@ -373,7 +374,7 @@ MOCK_UNEXPECTED_STRING_RESPONSE = "This is not a list or an error dict."
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_get_data_from_ripe_measurement(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=200)
@@ -391,7 +392,7 @@ def test_get_data_from_ripe_measurement(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_get_data_from_ripe_measurement_raises_on_error_response(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=400)
@@ -409,7 +410,7 @@ def test_get_data_from_ripe_measurement_raises_on_error_response(mock_get, mock_
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_get_probe_data_from_ripe_by_id(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=200)
@@ -491,9 +492,10 @@ def test_successful_measurement_none():
 
 
 @patch("server.app.utils.ripe_fetch_data.check_all_measurements_done")
-@patch("server.app.utils.ripe_fetch_data.get_probe_data_from_ripe_by_id")
-def test_parse_data_from_ripe_measurement(mock_get_probe, mock_check_done):
-    mock_get_probe.return_value = MOCK_PROBE_RESPONSE
+@patch("server.app.utils.ripe_fetch_data.get_probes_data_from_ripe_by_ids")
+def test_parse_data_from_ripe_measurement(mock_get_probes, mock_check_done):
+    clear_probe_cache()
+    mock_get_probes.return_value = [MOCK_PROBE_RESPONSE]
     mock_check_done.return_value = "Complete"
     results, status = parse_data_from_ripe_measurement(MOCK_MEASUREMENT_RESPONSE)
     assert status == "Complete"
@@ -506,6 +508,7 @@ def test_parse_data_from_ripe_measurement(mock_get_probe, mock_check_done):
     assert results[0].ref_id == "GPSs"
     assert results[0].ntp_measurement.extra_details.poll == 64
     assert results[0].probe_data.probe_id == "9999"
+    mock_get_probes.assert_called_once_with(["9999"])
 
     assert results[0].ntp_measurement.timestamps.client_sent_time.seconds != 0
     assert results[0].ntp_measurement.timestamps.client_sent_time.fraction != 0
@@ -521,9 +524,10 @@ def test_parse_data_from_ripe_measurement(mock_get_probe, mock_check_done):
 
 
 @patch("server.app.utils.ripe_fetch_data.check_all_measurements_done")
-@patch("server.app.utils.ripe_fetch_data.get_probe_data_from_ripe_by_id")
-def test_parse_data_from_ripe_measurement_with_no_response(mock_get_probe, mock_check_done):
-    mock_get_probe.return_value = MOCK_PROBE_RESPONSE
+@patch("server.app.utils.ripe_fetch_data.get_probes_data_from_ripe_by_ids")
+def test_parse_data_from_ripe_measurement_with_no_response(mock_get_probes, mock_check_done):
+    clear_probe_cache()
+    mock_get_probes.return_value = [{**MOCK_PROBE_RESPONSE, "id": 999}]
     mock_check_done.return_value = "Timeout"
     results, status = parse_data_from_ripe_measurement(MOCK_MEASUREMENT_RESPONSE_FAILED)
     assert status == "Timeout"
@@ -535,7 +539,8 @@ def test_parse_data_from_ripe_measurement_with_no_response(mock_get_probe, mock_
     assert results[0].ntp_measurement.extra_details.root_dispersion == PreciseTime(seconds=-1, fraction=0)
     assert results[0].ref_id == "NO REFERENCE"
     assert results[0].ntp_measurement.extra_details.poll == -1
-    assert results[0].probe_data.probe_id == str(9999)
+    assert results[0].probe_data.probe_id == 999
+    mock_get_probes.assert_called_once_with(["999"])
 
     assert results[0].ntp_measurement.timestamps.client_sent_time.seconds == -1
     assert results[0].ntp_measurement.timestamps.client_sent_time.fraction == 0
@@ -551,7 +556,7 @@ def test_parse_data_from_ripe_measurement_with_no_response(mock_get_probe, mock_
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_scheduled(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=200)
@@ -562,7 +567,7 @@ def test_check_all_measurement_scheduled(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_not_scheduled(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=200)
@@ -573,7 +578,7 @@ def test_check_all_measurement_not_scheduled(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_probes_error(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=200)
@@ -584,7 +589,7 @@ def test_check_all_measurement_probes_error(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_scheduled_error_get(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=200)
@@ -596,7 +601,7 @@ def test_check_all_measurement_scheduled_error_get(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_done(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=200)
@@ -607,7 +612,7 @@ def test_check_all_measurement_done(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_done_stopped(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=200)
@@ -620,7 +625,7 @@ def test_check_all_measurement_done_stopped(mock_get, mock_get_token):
 
 @patch("server.app.utils.ripe_fetch_data.time.time")
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_done_ongoing(mock_get, mock_get_token, mock_time):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=200)
@@ -633,7 +638,7 @@ def test_check_all_measurement_done_ongoing(mock_get, mock_get_token, mock_time)
 
 @patch("server.app.utils.ripe_fetch_data.time.time")
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_done_timeout(mock_get, mock_get_token, mock_time):
     mock_get_token.return_value = "token"
     mock_time.return_value = 1748876770
@@ -645,7 +650,7 @@ def test_check_all_measurement_done_timeout(mock_get, mock_get_token, mock_time)
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_done_no_status_name_from_ripe(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=200)
@@ -656,7 +661,7 @@ def test_check_all_measurement_done_no_status_name_from_ripe(mock_get, mock_get_
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_done_error_get(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.return_value = Mock(status_code=200)
@@ -671,7 +676,7 @@ def test_check_all_measurement_done_error_get(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_done_request_exception(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_get.side_effect = requests.exceptions.ConnectionError("Mocked network error")
@@ -683,7 +688,7 @@ def test_check_all_measurement_done_request_exception(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_done_http_error(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_response = Mock()
@@ -697,7 +702,7 @@ def test_check_all_measurement_done_http_error(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_check_all_measurement_done_invalid_json(mock_get, mock_get_token):
     mock_get_token.return_value = "token"
     mock_response = Mock()
@@ -713,7 +718,7 @@ def test_check_all_measurement_done_invalid_json(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_get_data_from_ripe_measurement_network_error(mock_get, mock_get_token):
     """
     Tests if RipeMeasurementError is raised when requests.get encounters a network issue.
@@ -730,7 +735,7 @@ def test_get_data_from_ripe_measurement_network_error(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_get_data_from_ripe_measurement_http_status_error(mock_get, mock_get_token):
     mock_get_token.return_value = "fake_token"
     mock_response = Mock()
@@ -747,7 +752,7 @@ def test_get_data_from_ripe_measurement_http_status_error(mock_get, mock_get_tok
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_get_data_from_ripe_measurement_invalid_json(mock_get, mock_get_token):
     mock_get_token.return_value = "fake_token"
     mock_response = Mock()
@@ -764,7 +769,7 @@ def test_get_data_from_ripe_measurement_invalid_json(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_get_data_from_ripe_measurement_unexpected_json_format_dict(mock_get, mock_get_token):
     mock_get_token.return_value = "fake_token"
     mock_get.return_value = Mock(status_code=200)
@@ -778,7 +783,7 @@ def test_get_data_from_ripe_measurement_unexpected_json_format_dict(mock_get, mo
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_get_data_from_ripe_measurement_unexpected_json_format_string(mock_get, mock_get_token):
     mock_get_token.return_value = "fake_token"
     mock_get.return_value = Mock(status_code=200)
@@ -792,7 +797,7 @@ def test_get_data_from_ripe_measurement_unexpected_json_format_string(mock_get,
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_get_probe_data_from_ripe_by_id_network_error(mock_get, mock_get_token):
     mock_get_token.return_value = "fake_token"
     mock_get.side_effect = requests.exceptions.ConnectionError("Network is unreachable")
@@ -806,7 +811,7 @@ def test_get_probe_data_from_ripe_by_id_network_error(mock_get, mock_get_token):
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_get_probe_data_from_ripe_by_id_http_status_error(mock_get, mock_get_token):
     mock_get_token.return_value = "fake_token"
 
@@ -825,7 +830,7 @@ def test_get_probe_data_from_ripe_by_id_http_status_error(mock_get, mock_get_tok
 
 
 @patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
-@patch("server.app.utils.ripe_fetch_data.requests.get")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
 def test_get_probe_data_from_ripe_by_id_invalid_json(mock_get, mock_get_token):
     mock_get_token.return_value = "fake_token"
     mock_response = Mock()
@@ -840,3 +845,63 @@ def test_get_probe_data_from_ripe_by_id_invalid_json(mock_get, mock_get_token):
 
     mock_get.assert_called_once()
     mock_get_token.assert_called_once()
+
+
+@patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
+def test_get_probes_data_from_ripe_by_ids(mock_get, mock_get_token):
+    mock_get_token.return_value = "token"
+    first_page = Mock(status_code=200)
+    first_page.json.return_value = {"count": 2, "next": "https://atlas.ripe.net/api/v2/probes/?page=2",
+                                    "results": [MOCK_PROBE_RESPONSE]}
+    second_page = Mock(status_code=200)
+    second_page.json.return_value = {"count": 2, "next": None, "results": [{**MOCK_PROBE_RESPONSE, "id": 7}]}
+    mock_get.side_effect = [first_page, second_page]
+
+    data = get_probes_data_from_ripe_by_ids(["9999", "7"])
+    assert [probe["id"] for probe in data] == ["9999", 7]
+    assert mock_get.call_count == 2
+    assert "id__in=9999,7" in mock_get.call_args_list[0].args[1]
+    assert mock_get.call_args_list[1].args[1] == "https://atlas.ripe.net/api/v2/probes/?page=2"
+
+
+@patch("server.app.utils.ripe_fetch_data.get_ripe_api_token")
+@patch("server.app.utils.ripe_fetch_data.ripe_get")
+def test_get_probes_data_from_ripe_by_ids_errors(mock_get, mock_get_token):
+    mock_get_token.return_value = "token"
+    mock_get.side_effect = requests.exceptions.ConnectionError("Network is unreachable")
+    with pytest.raises(RipeMeasurementError, match="Network error while fetching probe data for 1,2"):
+        get_probes_data_from_ripe_by_ids(["1", "2"])
+
+    mock_get.side_effect = None
+    mock_get.return_value = Mock(status_code=200)
+    mock_get.return_value.json.return_value = {"error": {"title": "Bad Request"}}
+    with pytest.raises(RipeMeasurementError, match="Unexpected format"):
+        get_probes_data_from_ripe_by_ids(["1"])
+
+
+@patch("server.app.utils.ripe_fetch_data.get_probes_data_from_ripe_by_ids")
+def test_get_probes_data_uses_one_request_and_the_cache(mock_get_probes):
+    clear_probe_cache()
+    mock_get_probes.return_value = [MOCK_PROBE_RESPONSE, {**MOCK_PROBE_RESPONSE, "id": 7}]
+
+    probes = get_probes_data(["9999", 7, "9999", "12"])
+    mock_get_probes.assert_called_once_with(["9999", "7", "12"])
+    assert set(probes) == {"9999", "7", "12"}
+    assert probes["9999"].probe_location.country_code == "RO"
+    # unknown probes get the default metadata, and are not cached
+    assert probes["12"].probe_id == "-1"
+
+    mock_get_probes.reset_mock()
+    mock_get_probes.return_value = []
+    probes = get_probes_data([7, "12"])
+    mock_get_probes.assert_called_once_with(["12"])
+    assert probes["7"].probe_id == 7
+
+    # nothing is fetched when every probe is cached
+    mock_get_probes.reset_mock()
+    get_probes_data(["9999", "7"])
+    mock_get_probes.assert_not_called()
+    assert get_probe_cache_stats()["size"] == 2
+    assert get_probe_cache_stats()["hits"] == 3
+    clear_probe_cache()
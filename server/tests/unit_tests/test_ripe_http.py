@@ -0,0 +1,120 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from server.app.utils.ripe_http import LatencyHistogram, RipeHttpClient, ripe_get, close_ripe_http_client, \
+    get_ripe_http_latency_histograms
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """
+    Answers 503 to the first "failures" requests, then 200. It remembers the port of the client of every request.
+    """
+    protocol_version = "HTTP/1.1"
+    failures = 0
+    requests_seen: list[tuple[str, int]] = []
+
+    def answer(self) -> None:
+        FlakyHandler.requests_seen.append((self.command, self.client_address[1]))
+        if int(self.headers.get("Content-Length", 0)) > 0:
+            self.rfile.read(int(self.headers["Content-Length"]))
+        status = 503 if FlakyHandler.failures > 0 else 200
+        FlakyHandler.failures -= 1
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = answer
+    do_POST = answer
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FlakyHandler.failures = 0
+    FlakyHandler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    for latency_ms in (5, 10, 30, 20000):
+        histogram.observe(latency_ms)
+    histogram.observe(400, failed=True)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 5
+    assert snapshot["errors"] == 1
+    assert snapshot["sum_ms"] == 20445
+    assert snapshot["buckets"]["le_10"] == 2
+    assert snapshot["buckets"]["le_50"] == 3
+    assert snapshot["buckets"]["le_500"] == 4
+    assert snapshot["buckets"]["le_10000"] == 4
+    assert snapshot["buckets"]["le_inf"] == 5
+
+
+def test_client_reuses_connections_and_retries(server):
+    client = RipeHttpClient(timeout_s=5, max_retries=3, backoff_s=0, pool_size=2)
+    try:
+        FlakyHandler.failures = 2
+        response = client.request("GET", "measurement", server + "/api/v2/measurements/1/")
+        assert response.status_code == 200
+        assert response.json() == {"ok": True}
+        for _ in range(3):
+            client.request("GET", "measurement", server + "/api/v2/measurements/1/")
+        # 2 failed tries, then 4 answered requests, all on the same keep-alive connection
+        assert len(FlakyHandler.requests_seen) == 6
+        assert len({port for _, port in FlakyHandler.requests_seen}) == 1
+
+        # a measurement is never created twice
+        FlakyHandler.failures = 1
+        response = client.request("POST", "create_measurement", server + "/api/v2/measurements/", data="{}")
+        assert response.status_code == 503
+        assert [method for method, _ in FlakyHandler.requests_seen].count("POST") == 1
+
+        # the best-effort requests are not retried
+        FlakyHandler.failures = 1
+        assert client.request("GET", "ipify", server + "/", retry=False).status_code == 503
+
+        histograms = client.latency_histograms()
+        assert list(histograms) == ["create_measurement", "ipify", "measurement"]
+        assert histograms["measurement"]["count"] == 4
+        assert histograms["measurement"]["errors"] == 0
+    finally:
+        client.close()
+
+
+def test_client_records_failed_requests():
+    client = RipeHttpClient(timeout_s=5, max_retries=0, backoff_s=0, pool_size=1)
+    try:
+        with patch.object(client.session, "request", side_effect=requests.ConnectionError("refused")):
+            with pytest.raises(requests.ConnectionError):
+                client.request("GET", "probes", "https://atlas.ripe.net/api/v2/probes/")
+        assert client.latency_histograms()["probes"]["errors"] == 1
+    finally:
+        client.close()
+
+
+def test_shared_client(server):
+    close_ripe_http_client()
+    assert get_ripe_http_latency_histograms() == {}
+    try:
+        assert ripe_get("prefix_overview", server + "/data/prefix-overview/data.json").status_code == 200
+        assert get_ripe_http_latency_histograms()["prefix_overview"]["count"] == 1
+    finally:
+        close_ripe_http_client()
+    assert get_ripe_http_latency_histograms() == {}
@@ -1,10 +1,18 @@
+import json
+import random
+import time
+
 import pytest
 from server.app.models.CustomError import InputError
 from server.app.utils.ripe_probes import get_random_probes, get_area_probes, get_asn_probes, get_prefix_probes, \
     get_country_probes, get_best_probes_with_multiple_attributes, get_probes, get_available_probes_asn, \
     get_available_probes_prefix, \
     get_available_probes_country, get_best_probes_matched_by_single_attribute, get_available_probes_asn_and_prefix, \
-    get_available_probes_asn_and_country, get_probes_by_ids, consume_probes
+    get_available_probes_asn_and_country, get_probes_by_ids, consume_probes, find_probes, rank_probes_by_distance, \
+    search_candidate_probes, get_candidate_probes
+from server.app.utils.calculations import calculate_haversine_distance
+from server.app.dtos.RipeProbe import RipeProbe
+from server.app.utils.probe_catalogue import load_probe_catalogue
 from unittest.mock import patch, MagicMock
 
 
@@ -13,8 +21,8 @@ from unittest.mock import patch, MagicMock
 @patch("server.app.utils.ripe_probes.get_best_probes_with_multiple_attributes")
 @patch("server.app.utils.ripe_probes.get_best_probes_matched_by_single_attribute")
 @patch("server.app.utils.ripe_probes.get_ip_network_details")
-@patch("server.app.utils.ripe_probes.get_prefix_from_ip")
-def test_get_probes_all_good(mock_get_prefix_from_ip, mock_get_network_details, mock_get_best_single,
+@patch("server.app.utils.ripe_probes.search_candidate_probes")
+def test_get_probes_all_good(mock_search_candidates, mock_get_network_details, mock_get_best_single,
                              mock_get_multiple_attributes, mock_get_probes_by_ids, mock_geolocation):
     mock_geolocation.return_value = (1.0, 1.0)
     mock_get_multiple_attributes.return_value = (9, {345})
@@ -25,7 +33,7 @@ def test_get_probes_all_good(mock_get_prefix_from_ip, mock_get_network_details,
         'value': '345,11,22,33,45,55,66,77,88,99'
     }
 
-    mock_get_prefix_from_ip.return_value = "80.211.224.0/20"
+    mock_search_candidates.return_value = ("80.211.224.0/20", {})
     mock_get_network_details.return_value = ("AS15169", "IT", "West")
 
     probes_result = get_probes("80.211.238.247", 4, 10)
@@ -40,8 +48,8 @@ def test_get_probes_all_good(mock_get_prefix_from_ip, mock_get_network_details,
 @patch("server.app.utils.ripe_probes.get_best_probes_with_multiple_attributes")
 @patch("server.app.utils.ripe_probes.get_best_probes_matched_by_single_attribute")
 @patch("server.app.utils.ripe_probes.get_ip_network_details")
-@patch("server.app.utils.ripe_probes.get_prefix_from_ip")
-def test_get_probes_some_found_from_first_try(mock_get_prefix_from_ip, mock_get_network_details, mock_get_best_single,
+@patch("server.app.utils.ripe_probes.search_candidate_probes")
+def test_get_probes_some_found_from_first_try(mock_search_candidates, mock_get_network_details, mock_get_best_single,
                                               mock_get_multiple_attributes, mock_get_probes_by_ids, mock_geolocation):
     mock_geolocation.return_value = (1.0, 1.0)
     mock_get_multiple_attributes.return_value = (0, {11, 22, 33, 45, 55})
@@ -51,13 +59,13 @@ def test_get_probes_some_found_from_first_try(mock_get_prefix_from_ip, mock_get_
         'type': 'probes',
         'value': '11,22,33,45,55'
     }
-    mock_get_prefix_from_ip.return_value = None
+    mock_search_candidates.return_value = (None, {})
     mock_get_network_details.return_value = ("AS15169", "IT", None)
 
     probes_result = get_probes("80.211.238.247", 4, 5)
     mock_get_multiple_attributes.assert_called_with(client_ip="80.211.238.247", current_probes_set=set(), ip_asn="AS15169",
                                             ip_prefix=None, ip_country="IT", ip_family=4,
-                                            probes_requested=5)
+                                            probes_requested=5, candidates={})
 
     assert mock_get_multiple_attributes.call_count == 1
     assert mock_get_best_single.call_count == 0
@@ -70,8 +78,8 @@ def test_get_probes_some_found_from_first_try(mock_get_prefix_from_ip, mock_get_
 @patch("server.app.utils.ripe_probes.get_best_probes_with_multiple_attributes")
 @patch("server.app.utils.ripe_probes.get_best_probes_matched_by_single_attribute")
 @patch("server.app.utils.ripe_probes.get_ip_network_details")
-@patch("server.app.utils.ripe_probes.get_prefix_from_ip")
-def test_get_probes_some_found_from_first_try_ipv4_ask_ipv6(mock_get_prefix_from_ip, mock_get_network_details, mock_get_best_single,
+@patch("server.app.utils.ripe_probes.search_candidate_probes")
+def test_get_probes_some_found_from_first_try_ipv4_ask_ipv6(mock_search_candidates, mock_get_network_details, mock_get_best_single,
                                               mock_get_multiple_attributes, mock_get_probes_by_ids, mock_geolocation):
     mock_geolocation.return_value = (1.0, 1.0)
     mock_get_multiple_attributes.return_value = (0, {11, 22, 33, 45, 55})
@@ -81,13 +89,14 @@ def test_get_probes_some_found_from_first_try_ipv4_ask_ipv6(mock_get_prefix_from
         'type': 'probes',
         'value': '11,22,33,45,55'
     }
-    mock_get_prefix_from_ip.return_value = "80.211.224.0/20"
+    mock_search_candidates.return_value = (None, {})
     mock_get_network_details.return_value = ("AS15169", "IT", None)
 
     probes_result = get_probes("80.211.238.247", 6, 5)
+    assert mock_search_candidates.call_args.kwargs["with_prefix"] is False
     mock_get_multiple_attributes.assert_called_with(client_ip="80.211.238.247", current_probes_set=set(), ip_asn="AS15169",
                                             ip_prefix=None, ip_country="IT", ip_family=6,
-                                            probes_requested=5)
+                                            probes_requested=5, candidates={})
 
     assert mock_get_multiple_attributes.call_count == 1
     assert mock_get_best_single.call_count == 0
@@ -100,8 +109,8 @@ def test_get_probes_some_found_from_first_try_ipv4_ask_ipv6(mock_get_prefix_from
 @patch("server.app.utils.ripe_probes.get_best_probes_with_multiple_attributes")
 @patch("server.app.utils.ripe_probes.get_best_probes_matched_by_single_attribute")
 @patch("server.app.utils.ripe_probes.get_ip_network_details")
-@patch("server.app.utils.ripe_probes.get_prefix_from_ip")
-def test_get_probes_area(mock_get_prefix_from_ip, mock_get_network_details, mock_get_best_single,
+@patch("server.app.utils.ripe_probes.search_candidate_probes")
+def test_get_probes_area(mock_search_candidates, mock_get_network_details, mock_get_best_single,
                          mock_get_multiple_attributes, mock_get_probes_by_ids, mock_geolocation):
     mock_geolocation.return_value = (1.0, 1.0)
     mock_get_multiple_attributes.return_value = (9, {345})
@@ -112,13 +121,13 @@ def test_get_probes_area(mock_get_prefix_from_ip, mock_get_network_details, mock
         'value': '345,11,22,33,45,55,66,77'
     }
 
-    mock_get_prefix_from_ip.return_value = "80.211.224.0/20"
+    mock_search_candidates.return_value = ("80.211.224.0/20", {})
     mock_get_network_details.return_value = ("AS15169", "IT", "West")
 
     probes_result = get_probes("80.211.238.247", 4, 10)
     mock_get_best_single.assert_called_with(client_ip="80.211.238.247", current_probes_set={345}, ip_asn="AS15169",
                                             ip_prefix="80.211.224.0/20", ip_country="IT", ip_family=4,
-                                            probes_requested=9)
+                                            probes_requested=9, candidates={})
 
     answer = [{'requested': 8, 'type': 'probes', 'value': '345,11,22,33,45,55,66,77'},
               {'requested': 2, 'type': 'area', 'value': 'West'}]
@@ -130,8 +139,8 @@ def test_get_probes_area(mock_get_prefix_from_ip, mock_get_network_details, mock
 @patch("server.app.utils.ripe_probes.get_best_probes_with_multiple_attributes")
 @patch("server.app.utils.ripe_probes.get_best_probes_matched_by_single_attribute")
 @patch("server.app.utils.ripe_probes.get_ip_network_details")
-@patch("server.app.utils.ripe_probes.get_prefix_from_ip")
-def test_get_probes_area_ipv4_ask_ipv6(mock_get_prefix_from_ip, mock_get_network_details, mock_get_best_single,
+@patch("server.app.utils.ripe_probes.search_candidate_probes")
+def test_get_probes_area_ipv4_ask_ipv6(mock_search_candidates, mock_get_network_details, mock_get_best_single,
                          mock_get_multiple_attributes, mock_get_probes_by_ids, mock_geolocation):
     mock_geolocation.return_value = (1.0, 1.0)
     mock_get_multiple_attributes.return_value = (9, {345})
@@ -142,13 +151,14 @@ def test_get_probes_area_ipv4_ask_ipv6(mock_get_prefix_from_ip, mock_get_network
         'value': '345,11,22,33,45,55,66,77'
     }
 
-    mock_get_prefix_from_ip.return_value = "80.211.224.0/20"
+    mock_search_candidates.return_value = (None, {})
     mock_get_network_details.return_value = ("AS15169", "IT", "West")
 
     probes_result = get_probes("80.211.238.247", 6, 10)
+    assert mock_search_candidates.call_args.kwargs["with_prefix"] is False
     mock_get_best_single.assert_called_with(client_ip="80.211.238.247", current_probes_set={345}, ip_asn="AS15169",
                                             ip_prefix=None, ip_country="IT", ip_family=6,
-                                            probes_requested=9)
+                                            probes_requested=9, candidates={})
 
     answer = [{'requested': 8, 'type': 'probes', 'value': '345,11,22,33,45,55,66,77'},
               {'requested': 2, 'type': 'area', 'value': 'West'}]
@@ -160,8 +170,8 @@ def test_get_probes_area_ipv4_ask_ipv6(mock_get_prefix_from_ip, mock_get_network
 @patch("server.app.utils.ripe_probes.get_best_probes_with_multiple_attributes")
 @patch("server.app.utils.ripe_probes.get_best_probes_matched_by_single_attribute")
 @patch("server.app.utils.ripe_probes.get_ip_network_details")
-@patch("server.app.utils.ripe_probes.get_prefix_from_ip")
-def test_get_probes_area_ipv6_ask_ipv4(mock_get_prefix_from_ip, mock_get_network_details, mock_get_best_single,
+@patch("server.app.utils.ripe_probes.search_candidate_probes")
+def test_get_probes_area_ipv6_ask_ipv4(mock_search_candidates, mock_get_network_details, mock_get_best_single,
                          mock_get_multiple_attributes, mock_get_probes_by_ids, mock_geolocation):
     mock_geolocation.return_value = (1.0, 1.0)
     mock_get_multiple_attributes.return_value = (9, {345})
@@ -172,18 +182,19 @@ def test_get_probes_area_ipv6_ask_ipv4(mock_get_prefix_from_ip, mock_get_network
         'value': '345,11,22,33,45,55,66,77'
     }
 
-    mock_get_prefix_from_ip.return_value = "2a06:93c0::/48"
+    mock_search_candidates.return_value = (None, {})
     mock_get_network_details.return_value = ("AS15169", "IT", "West")
 
     probes_result = get_probes("2a06:93c0::24", 4, 10)
+    assert mock_search_candidates.call_args.kwargs["with_prefix"] is False
 
     mock_get_multiple_attributes.assert_called_with(client_ip="2a06:93c0::24", current_probes_set=set(),
                                                     ip_asn="AS15169",
                                                     ip_prefix=None, ip_country="IT", ip_family=4,
-                                                    probes_requested=10)
+                                                    probes_requested=10, candidates={})
     mock_get_best_single.assert_called_with(client_ip="2a06:93c0::24", current_probes_set={345}, ip_asn="AS15169",
                                             ip_prefix=None, ip_country="IT", ip_family=4,
-                                            probes_requested=9)
+                                            probes_requested=9, candidates={})
 
     answer = [{'requested': 8, 'type': 'probes', 'value': '345,11,22,33,45,55,66,77'},
               {'requested': 2, 'type': 'area', 'value': 'West'}]
@@ -195,8 +206,8 @@ def test_get_probes_area_ipv6_ask_ipv4(mock_get_prefix_from_ip, mock_get_network
 @patch("server.app.utils.ripe_probes.get_best_probes_with_multiple_attributes")
 @patch("server.app.utils.ripe_probes.get_best_probes_matched_by_single_attribute")
 @patch("server.app.utils.ripe_probes.get_ip_network_details")
-@patch("server.app.utils.ripe_probes.get_prefix_from_ip")
-def test_get_probes_random(mock_get_prefix_from_ip, mock_get_network_details, mock_get_best_single,
+@patch("server.app.utils.ripe_probes.search_candidate_probes")
+def test_get_probes_random(mock_search_candidates, mock_get_network_details, mock_get_best_single,
                            mock_get_multiple_attributes, mock_get_probes_by_ids, mock_geolocation):
     mock_geolocation.return_value = (1.0, 1.0)
     mock_get_multiple_attributes.return_value = (9, {345})
@@ -207,13 +218,13 @@ def test_get_probes_random(mock_get_prefix_from_ip, mock_get_network_details, mo
         'value': '345,11,22,33,45,55,66,77'
     }
 
-    mock_get_prefix_from_ip.return_value = "80.211.224.0/20"
+    mock_search_candidates.return_value = ("80.211.224.0/20", {})
     mock_get_network_details.return_value = ("AS15169", "IT", None)
 
     probes_result = get_probes("80.211.238.247", 4, 10)
     mock_get_best_single.assert_called_with(client_ip="80.211.238.247", current_probes_set={345}, ip_asn="AS15169",
                                             ip_prefix="80.211.224.0/20", ip_country="IT", ip_family=4,
-                                            probes_requested=9)
+                                            probes_requested=9, candidates={})
 
     answer = [{'requested': 8, 'type': 'probes', 'value': '345,11,22,33,45,55,66,77'},
               {'requested': 2, 'type': 'area', 'value': 'WW'}]
@@ -226,13 +237,13 @@ def test_get_probes_random(mock_get_prefix_from_ip, mock_get_network_details, mo
 @patch("server.app.utils.ripe_probes.get_best_probes_matched_by_single_attribute")
 @patch("server.app.utils.ripe_probes.get_ip_network_details")
 @patch("server.app.utils.ripe_probes.get_prefix_probes")
-def test_get_probes_only_area(mock_get_prefix_from_ip, mock_get_network_details, mock_get_best_single,
+def test_get_probes_only_area(mock_search_candidates, mock_get_network_details, mock_get_best_single,
                               mock_get_multiple_attributes, mock_get_probes_by_ids, mock_geolocation):
     mock_geolocation.return_value = (1.0, 1.0)
     mock_get_multiple_attributes.return_value = (11, {})
     mock_get_best_single.return_value = (11, {})  # nothing new
 
-    mock_get_prefix_from_ip.return_value = "80.211.224.0/20"
+    mock_search_candidates.return_value = ("80.211.224.0/20", {})
     mock_get_network_details.return_value = ("AS15169", "IT", "West")
 
     probes_result = get_probes("80.211.238.247", 4, 11)
@@ -854,3 +865,163 @@ def test_consume_probes():
     assert (0, {1, 34, 12, 23}) == consume_probes(2, {34, 1}, [12, 23, 67, 67, 900])
     with pytest.raises(InputError):
         consume_probes(-7, {34}, [67, 900])
+
+
+@patch("server.app.utils.ripe_probes.get_coordinates_for_ip")
+@patch("server.app.utils.ripe_probes.get_probe_catalogue")
+@patch("server.app.utils.ripe_probes.ProbeRequest")
+def test_find_probes_uses_the_catalogue(mock_probe_request, mock_get_catalogue, mock_geolocation):
+    mock_geolocation.return_value = (52.0, 5.0)
+    mock_get_catalogue.return_value = load_probe_catalogue(json.dumps({"objects": [
+        {"id": 1, "asn_v4": 1136, "prefix_v4": "80.211.224.0/20", "country_code": "NL", "status": 1,
+         "is_public": True, "tags": ["system-ipv4-works"], "latitude": 53.2, "longitude": 6.5},
+        {"id": 2, "asn_v4": 1136, "prefix_v4": "80.211.224.0/20", "country_code": "NL", "status": 1,
+         "is_public": True, "tags": ["system-ipv4-works"], "latitude": 52.1, "longitude": 5.1},
+        {"id": 3, "asn_v4": 1136, "prefix_v4": "80.211.224.0/20", "country_code": "NL", "status": 1,
+         "is_public": True, "tags": ["system-ipv4-works"], "latitude": None, "longitude": None},
+        {"id": 4, "asn_v4": 1136, "prefix_v4": "80.211.224.0/20", "country_code": "NL", "status": 2,
+         "is_public": True, "tags": ["system-ipv4-works"], "latitude": 52.0, "longitude": 5.0},
+    ]}).encode())
+
+    assert get_available_probes_asn_and_prefix("80.211.238.247", "AS1136", "80.211.224.0/20", "ipv4") == [2, 1, 3]
+    assert get_available_probes_country("80.211.238.247", "NL", "ipv4") == [2, 1, 3]
+    assert get_available_probes_asn("80.211.238.247", "AS1136", "ipv6") == []
+    mock_probe_request.assert_not_called()
+
+    # without a catalogue, the probes are searched on RIPE Atlas
+    mock_get_catalogue.return_value = None
+    find_probes({"country_code": "NL"}, page_size=100)
+    mock_probe_request.assert_called_once_with(return_objects=True, fields=["id", "geometry"], page_size=100,
+                                               country_code="NL")
+
+
+def make_probe(probe_id, coordinates):
+    probe = MagicMock()
+    probe.id = probe_id
+    probe.geometry = {"coordinates": coordinates}
+    return probe
+
+
+def test_rank_probes_by_distance():
+    probes = [make_probe(1, [4.9, 52.0]), make_probe(2, None), make_probe(3, [5.1, 52.1]), make_probe(1, [0, 0]),
+              make_probe(4, [4.9, 52.0]), "not a probe", make_probe(5, [-74.0, 40.7])]
+    assert rank_probes_by_distance(probes, 52.1, 5.1) == [3, 1, 4, 5, 2]
+    assert rank_probes_by_distance(probes, 52.1, 5.1, limit=2) == [3, 1]
+    assert rank_probes_by_distance(probes, 52.1, 5.1, limit=10) == [3, 1, 4, 5, 2]
+    assert rank_probes_by_distance([], 52.1, 5.1, limit=3) == []
+
+
+def rank_probes_by_distance_scalar(probes, lat_client, lon_client):
+    """The ranking as it was done before: one haversine distance per probe and a sort of a dict."""
+    probe_ids_dist = {}
+    for p in probes:
+        if p.id in probe_ids_dist:
+            continue
+        coordinates = p.geometry.get("coordinates")
+        if coordinates:
+            lon, lat = coordinates
+            probe_ids_dist[p.id] = calculate_haversine_distance(lat, lon, lat_client, lon_client)
+        else:
+            probe_ids_dist[p.id] = 1000000.0
+    return sorted(probe_ids_dist, key=lambda k: probe_ids_dist[k])
+
+
+def test_benchmark_rank_probes_by_distance():
+    """
+    Compares the vectorized ranking with the scalar one on a country-wide query (20 000 probes of the catalogue).
+    Both must give the same ranking, and the vectorized one must be faster.
+    """
+    rng = random.Random(7)
+    probes = [RipeProbe(id=i, asn_v4=None, asn_v6=None, prefix_v4=None, prefix_v6=None, country_code="NL", status=1,
+                        is_public=True, tags=frozenset(), coordinates=(rng.uniform(-90, 90), rng.uniform(-180, 180)))
+              for i in range(20000)]
+    probes[5] = RipeProbe(id=5, asn_v4=None, asn_v6=None, prefix_v4=None, prefix_v6=None, country_code="NL", status=1,
+                          is_public=True, tags=frozenset(), coordinates=None)
+
+    def best_of(function, repeats=3):
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = function()
+            best = min(best, time.perf_counter() - start)
+        return best, result
+
+    scalar_s, scalar = best_of(lambda: rank_probes_by_distance_scalar(probes, 52.1, 5.1))
+    vectorized_s, vectorized = best_of(lambda: rank_probes_by_distance(probes, 52.1, 5.1))
+    top_k_s, top_k = best_of(lambda: rank_probes_by_distance(probes, 52.1, 5.1, limit=10))
+    print(f"scalar {scalar_s * 1000:.1f} ms, vectorized {vectorized_s * 1000:.1f} ms, "
+          f"vectorized top 10 {top_k_s * 1000:.1f} ms")
+
+    assert vectorized == scalar
+    assert top_k == scalar[:10]
+    assert vectorized_s < scalar_s
+    assert top_k_s < scalar_s
+
+
+@patch("server.app.utils.ripe_probes.get_available_probes_country")
+@patch("server.app.utils.ripe_probes.get_available_probes_asn")
+@patch("server.app.utils.ripe_probes.get_available_probes_prefix")
+@patch("server.app.utils.ripe_probes.get_available_probes_asn_and_country")
+@patch("server.app.utils.ripe_probes.get_available_probes_asn_and_prefix")
+@patch("server.app.utils.ripe_probes.get_prefix_from_ip")
+def test_search_candidate_probes(mock_get_prefix, mock_asn_and_prefix, mock_asn_and_country, mock_prefix, mock_asn,
+                                 mock_country):
+    mock_get_prefix.return_value = "80.211.224.0/20"
+    mock_asn_and_prefix.return_value = [1]
+    mock_asn_and_country.return_value = [1, 2]
+    mock_prefix.return_value = [1, 3]
+    mock_asn.return_value = [1, 2, 4]
+    mock_country.return_value = [1, 2, 5]
+
+    ip_prefix, candidates = search_candidate_probes("80.211.238.247", "1136", "NL", 4, with_prefix=True, limit=10)
+    assert ip_prefix == "80.211.224.0/20"
+    assert candidates == {"asn_and_prefix": [1], "asn_and_country": [1, 2], "prefix": [1, 3],
+                          "asn": [1, 2, 4], "country": [1, 2, 5]}
+    mock_asn_and_prefix.assert_called_once_with("80.211.238.247", "1136", "80.211.224.0/20", "ipv4", 10)
+    mock_country.assert_called_once_with("80.211.238.247", "NL", "ipv4", 10)
+
+    # without the prefix, the probes are not searched by prefix
+    mock_asn_and_prefix.reset_mock()
+    mock_prefix.reset_mock()
+    mock_get_prefix.reset_mock()
+    ip_prefix, candidates = search_candidate_probes("80.211.238.247", "1136", None, 6, with_prefix=False)
+    assert ip_prefix is None
+    assert candidates == {"asn": [1, 2, 4]}
+    mock_get_prefix.assert_not_called()
+    mock_asn_and_prefix.assert_not_called()
+    mock_prefix.assert_not_called()
+    mock_asn.assert_called_with("80.211.238.247", "1136", "ipv6", None)
+
+
+@patch("server.app.utils.ripe_probes.get_ripe_probe_query_deadline_s")
+@patch("server.app.utils.ripe_probes.get_available_probes_country")
+@patch("server.app.utils.ripe_probes.get_available_probes_asn")
+@patch("server.app.utils.ripe_probes.get_available_probes_asn_and_country")
+@patch("server.app.utils.ripe_probes.get_prefix_from_ip")
+def test_search_candidate_probes_failed_queries(mock_get_prefix, mock_asn_and_country, mock_asn, mock_country,
+                                                mock_deadline):
+    mock_deadline.return_value = 0.2
+    mock_get_prefix.side_effect = Exception("stat.ripe.net is down")
+    mock_asn_and_country.side_effect = lambda *args: time.sleep(1) or [1]
+    mock_asn.return_value = [1, 2]
+    mock_country.return_value = [1, 3]
+
+    # the failed and the slow queries are left out, and the probes are not searched by prefix
+    start = time.perf_counter()
+    ip_prefix, candidates = search_candidate_probes("80.211.238.247", "1136", "NL", 4, with_prefix=True)
+    assert time.perf_counter() - start < 0.9
+    assert ip_prefix is None
+    assert candidates == {"asn": [1, 2], "country": [1, 3]}
+
+    mock_asn.side_effect = InputError("invalid ASN")
+    with pytest.raises(InputError):
+        search_candidate_probes("80.211.238.247", "1136", "NL", 4, with_prefix=False)
+
+
+def test_get_candidate_probes():
+    search = MagicMock(return_value=[7, 8])
+    assert get_candidate_probes({"asn": [1, 2]}, "asn", search) == [1, 2]
+    assert get_candidate_probes({"asn": [1, 2]}, "country", search) == []
+    search.assert_not_called()
+    assert get_candidate_probes(None, "asn", search) == [7, 8]
+    search.assert_called_once()
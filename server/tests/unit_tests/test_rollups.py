@@ -0,0 +1,207 @@
+import threading
+from ipaddress import IPv4Address
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from server.app.db.db_interaction import measurement_to_row, insert_measurement_rows_bulk, get_measurement_buckets_ip
+from server.app.db.rollups import rollup_new_measurements, choose_rollup_granularity, get_rollup_buckets_ip, \
+    get_rollup_buckets_dn, RollupJob, rollups_available
+from server.app.dtos.PreciseTime import PreciseTime
+from server.app.models.Base import Base
+from server.app.models.CustomError import MeasurementQueryError
+from server.app.models.Measurement import Measurement
+from server.app.models.MeasurementRollup import MeasurementRollup1m, MeasurementRollup1h, RollupQueue
+from server.tests.unit_tests.test_db_interaction import make_measurement
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def add_measurements(session: Session, first_id: int, values: list[tuple[str, int, float, int]]) -> None:
+    rows = []
+    for i, (ip, client_sent, offset, stratum) in enumerate(values):
+        row = measurement_to_row(make_measurement(ip))
+        rows.append({**row, "id": first_id + i, "client_sent": client_sent, "time_offset": offset, "stratum": stratum})
+    insert_measurement_rows_bulk(rows, session)
+
+
+def test_rollup_new_measurements_is_incremental(session_factory):
+    session = session_factory()
+    add_measurements(session, 1, [("192.168.0.1", 3600, 1.0, 2), ("192.168.0.1", 3630, 3.0, 2),
+                                  ("192.168.0.1", 3660, 2.0, 3), ("192.168.0.2", 3600, 5.0, 16)])
+
+    assert rollup_new_measurements(session, batch_size=3) == 3
+    assert rollup_new_measurements(session, batch_size=3) == 1
+    assert rollup_new_measurements(session, batch_size=3) == 0
+    assert session.query(RollupQueue).count() == 0
+
+    minutes = session.query(MeasurementRollup1m).order_by(MeasurementRollup1m.ntp_server_ip,
+                                                          MeasurementRollup1m.bucket_start).all()
+    assert [(m.ntp_server_ip, m.bucket_start, m.count) for m in minutes] == \
+           [("192.168.0.1", 3600, 2), ("192.168.0.1", 3660, 1), ("192.168.0.2", 3600, 1)]
+    assert (minutes[0].offset_min, minutes[0].offset_max, minutes[0].offset_sum) == (1.0, 3.0, 4.0)
+    assert minutes[2].failures == 1
+
+    # a new measurement is merged into the existing bucket
+    add_measurements(session, 5, [("192.168.0.1", 3610, -1.0, 1)])
+    assert rollup_new_measurements(session, batch_size=3) == 1
+    hour = session.get(MeasurementRollup1h, ("192.168.0.1", 3600, "pool.ntp.org"))
+    assert (hour.count, hour.offset_min, hour.offset_max, hour.offset_sum) == (4, -1.0, 3.0, 5.0)
+    assert (hour.stratum_min, hour.stratum_max, hour.failures) == (1, 3, 0)
+    session.close()
+
+
+def test_rollup_measurements_committed_out_of_order(session_factory):
+    session = session_factory()
+    # the measurement with id 5 is committed (and merged) before the one with id 3
+    add_measurements(session, 5, [("192.168.0.1", 3600, 1.0, 2)])
+    assert rollup_new_measurements(session, batch_size=100) == 1
+    add_measurements(session, 3, [("192.168.0.1", 3610, 3.0, 2)])
+    assert rollup_new_measurements(session, batch_size=100) == 1
+    assert rollup_new_measurements(session, batch_size=100) == 0
+
+    minute = session.get(MeasurementRollup1m, ("192.168.0.1", 3600, "pool.ntp.org"))
+    assert (minute.count, minute.offset_sum) == (2, 4.0)
+    session.close()
+
+
+def test_rollup_queues_the_measurements_stored_before(session_factory):
+    session = session_factory()
+    # stored before the rollups existed, so they are not in the queue
+    for i in range(3):
+        row = measurement_to_row(make_measurement("192.168.0.1"))
+        session.add(Measurement(**{**row, "id": i + 1, "client_sent": 3600 + i}))
+    session.commit()
+    add_measurements(session, 4, [("192.168.0.1", 3603, 1.0, 2)])
+
+    assert rollup_new_measurements(session, batch_size=100) == 4
+    assert session.get(MeasurementRollup1m, ("192.168.0.1", 3600, "pool.ntp.org")).count == 4
+    # the queue is filled only once
+    session.add(Measurement(**{**row, "id": 10, "client_sent": 3700}))
+    session.commit()
+    assert rollup_new_measurements(session, batch_size=100) == 0
+    session.close()
+
+
+def test_get_rollup_buckets(session_factory):
+    session = session_factory()
+    add_measurements(session, 1, [("192.168.0.1", 3600, 1.0, 2), ("192.168.0.1", 3630, 3.0, 2),
+                                  ("192.168.0.1", 7300, 2.0, 3), ("192.168.0.2", 3600, 5.0, 16)])
+    rollup_new_measurements(session, batch_size=100)
+
+    buckets = get_rollup_buckets_ip(session, 60, IPv4Address("192.168.0.1"), PreciseTime(3600, 0),
+                                    PreciseTime(10000, 0), 1800)
+    assert [(b["bucket_start"], b["count"]) for b in buckets] == [(3600, 2), (7200, 1)]
+    assert buckets[0]["offset_mean"] == pytest.approx(2.0)
+    assert buckets[0]["offset_p95"] is None
+    assert (buckets[1]["stratum_min"], buckets[1]["stratum_max"]) == (3, 3)
+
+    buckets = get_rollup_buckets_dn(session, 3600, "pool.ntp.org", PreciseTime(3600, 0), PreciseTime(10000, 0), 7200)
+    assert [(b["bucket_start"], b["count"], b["failures"]) for b in buckets] == [(3600, 4, 1)]
+    session.close()
+
+
+def test_get_rollup_buckets_error():
+    session = MagicMock(spec=Session)
+    session.query.side_effect = Exception("connection lost")
+    with pytest.raises(MeasurementQueryError):
+        get_rollup_buckets_ip(session, 60, IPv4Address("192.168.0.1"), PreciseTime(0, 0), PreciseTime(10, 0), 60)
+
+
+def test_choose_rollup_granularity():
+    assert choose_rollup_granularity(PreciseTime(0, 0), 30) is None
+    assert choose_rollup_granularity(PreciseTime(0, 0), 60) == 60
+    assert choose_rollup_granularity(PreciseTime(0, 0), 3599) is None
+    assert choose_rollup_granularity(PreciseTime(0, 0), 3660) == 60
+    assert choose_rollup_granularity(PreciseTime(0, 0), 7200) == 3600
+    assert choose_rollup_granularity(PreciseTime(0, 0), 10 * 86400) == 86400
+    # the buckets do not start on an hour or a day, so a finer rollup is used
+    assert choose_rollup_granularity(PreciseTime(3660, 0), 7200) == 60
+    assert choose_rollup_granularity(PreciseTime(7200, 0), 10 * 86400) == 3600
+    assert choose_rollup_granularity(PreciseTime(3630, 0), 7200) is None
+
+
+def test_rollup_buckets_match_the_measurements(session_factory):
+    session = session_factory()
+    values = [("192.168.0.1", 3600 + 97 * i, float(i % 7) - 3.0, 2 + i % 3) for i in range(200)]
+    add_measurements(session, 1, values)
+    rollup_new_measurements(session, batch_size=1000)
+
+    # neither the start nor the size of the buckets is a whole number of hours
+    start, end = PreciseTime(5460, 0), PreciseTime(3600 + 97 * 199, 0)
+    granularity = choose_rollup_granularity(start, 5400)
+    assert granularity == 60
+    from_rollup = get_rollup_buckets_ip(session, granularity, IPv4Address("192.168.0.1"), start, end, 5400)
+    from_measurements = get_measurement_buckets_ip(session, IPv4Address("192.168.0.1"), start, end, 5400)
+    assert len(from_rollup) == len(from_measurements) > 1
+    for rollup_bucket, bucket in zip(from_rollup, from_measurements):
+        for key in ["bucket_start", "count", "offset_min", "offset_max", "rtt_min", "rtt_max", "stratum_min",
+                    "stratum_max", "failures"]:
+            assert rollup_bucket[key] == bucket[key]
+        assert rollup_bucket["offset_mean"] == pytest.approx(bucket["offset_mean"])
+        assert rollup_bucket["rtt_mean"] == pytest.approx(bucket["rtt_mean"])
+    session.close()
+
+
+def test_rollup_job_catches_up(session_factory):
+    session = session_factory()
+    add_measurements(session, 1, [("192.168.0.1", 3600 + i, 1.0, 2) for i in range(5)])
+    session.close()
+
+    job = RollupJob(session_factory, interval_s=60, batch_size=2)
+    assert not job.is_caught_up()
+    assert job.run_once() == 5
+    assert job.is_caught_up()
+    assert job.run_once() == 0
+    assert not rollups_available()
+
+
+@patch("server.app.db.rollups.get_rollup_batch_size")
+@patch("server.app.db.rollups.get_rollup_interval_s")
+@patch("server.app.db.rollups.rollup_new_measurements")
+def test_rollup_job_start_and_stop(mock_rollup, mock_interval, mock_batch_size):
+    from server.app.db.rollups import start_rollup_job, stop_rollup_job
+    mock_interval.return_value = 60
+    mock_batch_size.return_value = 100
+    mock_rollup.return_value = 0
+    job = start_rollup_job(MagicMock())
+    try:
+        assert job._caught_up.wait(5)
+        assert rollups_available()
+    finally:
+        stop_rollup_job()
+    assert not rollups_available()
+    mock_rollup.assert_called()
+
+
+@patch("server.app.db.rollups.get_rollup_batch_size")
+@patch("server.app.db.rollups.get_rollup_interval_s")
+@patch("server.app.db.rollups.rollup_new_measurements")
+def test_rollups_not_available_during_the_backfill(mock_rollup, mock_interval, mock_batch_size):
+    from server.app.db.rollups import start_rollup_job, stop_rollup_job
+    mock_interval.return_value = 60
+    mock_batch_size.return_value = 100
+    backfill = threading.Event()
+
+    def rollup(session, batch_size):
+        backfill.wait(5)
+        return 0
+    mock_rollup.side_effect = rollup
+    job = start_rollup_job(MagicMock())
+    try:
+        # the job runs, but the measurements stored before it are not merged yet
+        assert job.is_running()
+        assert not rollups_available()
+        backfill.set()
+        assert job._caught_up.wait(5)
+        assert rollups_available()
+    finally:
+        stop_rollup_job()